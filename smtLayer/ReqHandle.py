@@ -18,6 +18,7 @@ import logging
 import logging.handlers
 import shlex
 from six import string_types
+import time
 
 from smtLayer import changeVM
 from smtLayer import cmdVM
@@ -49,47 +50,56 @@ class ReqHandle(object):
             lambda rh: changeVM.showInvLines(rh),
             lambda rh: changeVM.showOperandLines(rh),
             lambda rh: changeVM.parseCmdline(rh),
-            lambda rh: changeVM.doIt(rh)],
+            lambda rh: changeVM.doIt(rh),
+            lambda rh: changeVM.checkRequest(rh)],
         'CMDVM': [
             lambda rh: cmdVM.showInvLines(rh),
             lambda rh: cmdVM.showOperandLines(rh),
             lambda rh: cmdVM.parseCmdline(rh),
-            lambda rh: cmdVM.doIt(rh)],
+            lambda rh: cmdVM.doIt(rh),
+            lambda rh: cmdVM.checkRequest(rh)],
         'DELETEVM': [
             lambda rh: deleteVM.showInvLines(rh),
             lambda rh: deleteVM.showOperandLines(rh),
             lambda rh: deleteVM.parseCmdline(rh),
-            lambda rh: deleteVM.doIt(rh)],
+            lambda rh: deleteVM.doIt(rh),
+            lambda rh: deleteVM.checkRequest(rh)],
         'GETHOST': [
             lambda rh: getHost.showInvLines(rh),
             lambda rh: getHost.showOperandLines(rh),
             lambda rh: getHost.parseCmdline(rh),
-            lambda rh: getHost.doIt(rh)],
+            lambda rh: getHost.doIt(rh),
+            lambda rh: getHost.checkRequest(rh)],
         'GETVM': [
             lambda rh: getVM.showInvLines(rh),
             lambda rh: getVM.showOperandLines(rh),
             lambda rh: getVM.parseCmdline(rh),
-            lambda rh: getVM.doIt(rh)],
+            lambda rh: getVM.doIt(rh),
+            lambda rh: getVM.checkRequest(rh)],
         'MAKEVM': [
             lambda rh: makeVM.showInvLines(rh),
             lambda rh: makeVM.showOperandLines(rh),
             lambda rh: makeVM.parseCmdline(rh),
-            lambda rh: makeVM.doIt(rh)],
+            lambda rh: makeVM.doIt(rh),
+            lambda rh: makeVM.checkRequest(rh)],
         'MIGRATEVM': [
             lambda rh: migrateVM.showInvLines(rh),
             lambda rh: migrateVM.showOperandLines(rh),
             lambda rh: migrateVM.parseCmdline(rh),
-            lambda rh: migrateVM.doIt(rh)],
+            lambda rh: migrateVM.doIt(rh),
+            lambda rh: migrateVM.checkRequest(rh)],
         'POWERVM': [
             lambda rh: powerVM.showInvLines(rh),
             lambda rh: powerVM.showOperandLines(rh),
             lambda rh: powerVM.parseCmdline(rh),
-            lambda rh: powerVM.doIt(rh)],
+            lambda rh: powerVM.doIt(rh),
+            lambda rh: powerVM.checkRequest(rh)],
         'SMAPI': [
             lambda rh: smapi.showInvLines(rh),
             lambda rh: smapi.showOperandLines(rh),
             lambda rh: smapi.parseCmdline(rh),
-            lambda rh: smapi.doIt(rh)],
+            lambda rh: smapi.doIt(rh),
+            lambda rh: smapi.checkRequest(rh)],
     }
 
     def __init__(self, **kwArgs):
@@ -165,6 +175,10 @@ class ReqHandle(object):
             self.captureLogs = kwArgs['captureLogs']
         else:
             self.captureLogs = False
+        self.logRecords = []          # Captured (time, message, args)
+
+        # Only log when debug is enabled
+        self.logDebug = zvmsdklog.LOGGER.getloglevel() <= logging.DEBUG
 
     def driveFunction(self):
         """
@@ -207,6 +221,8 @@ class ReqHandle(object):
                 self.printLn("ES", msg)
                 self.updateResults(msgs.msg['0007'][0])
 
+        if self.captureLogs is True:
+            self.results['logEntries'] = self.getLogEntries()
         return self.results
 
     def parseCmdline(self, requestData):
@@ -236,6 +252,8 @@ class ReqHandle(object):
             msg = msgs.msg['0012'][1] % (modId, type(requestData))
             self.printLn("ES", msg)
             self.updateResults(msgs.msg['0012'][0])
+            if self.captureLogs is True:
+                self.results['logEntries'] = self.getLogEntries()
             return self.results
         self.totalParms = len(self.request)   # Number of parms in the cmd
 
@@ -270,8 +288,10 @@ class ReqHandle(object):
                     self.printLn("ES", msg)
                     self.updateResults(msgs.msg['0007'][0])
 
-        self.printSysLog("Exit ReqHandle.parseCmdline, rc: " +
-                         str(self.results['overallRC']))
+        self.printSysLog("Exit ReqHandle.parseCmdline, rc: %s",
+                         self.results['overallRC'])
+        if self.captureLogs is True:
+            self.results['logEntries'] = self.getLogEntries()
         return self.results
 
     def printLn(self, respType, respString):
@@ -296,26 +316,108 @@ class ReqHandle(object):
                                    respString.splitlines())
         return
 
-    def printSysLog(self, logString):
+    def getLogEntries(self):
+        """
+        Format the captured log records.
+
+        The records are only formatted here, once the request is processed.
+        The time spent between an 'Enter <function>' record and the next
+        'Exit <function>' record is added to the exit entry.
+
+        Output:
+           List of the log entries.
+        """
+
+        entries = []
+        entered = {}
+        for when, logString, args in self.logRecords:
+            if args:
+                logString = logString % args
+            words = logString.split(None, 2)
+            if len(words) > 1 and words[0] in ('Enter', 'Exit'):
+                func = words[1].rstrip(',').lower()
+                if words[0] == 'Enter':
+                    entered.setdefault(func, []).append(when)
+                elif entered.get(func):
+                    logString += " (%.3f ms)" % (
+                        (when - entered[func].pop()) * 1000)
+            entries.append(self.requestId + ": " + logString)
+        return entries
+
+    def printSysLog(self, logString, *args):
         """
         Log one or more lines.  Optionally, add them to logEntries list.
 
+        The line is only formatted when it is logged, captured lines are
+        formatted by getLogEntries once the request is processed.
+
         Input:
-           Strings to be logged.
+           Strings to be logged, with %-style placeholders for the args.
+           Arguments of the placeholders.
         """
 
-        if zvmsdklog.LOGGER.getloglevel() <= logging.DEBUG:
+        if not self.logDebug and self.captureLogs is not True:
+            return
+
+        if self.logDebug:
             # print log only when debug is enabled
+            if args:
+                logString = logString % args
+                args = ()
             if self.daemon == '':
-                self.logger.debug(self.requestId + ": " + logString)
+                self.logger.debug("%s: %s", self.requestId, logString)
             else:
-                self.daemon.logger.debug(self.requestId + ": " + logString)
+                self.daemon.logger.debug("%s: %s", self.requestId,
+                                         logString)
 
         if self.captureLogs is True:
-            self.results['logEntries'].append(self.requestId + ": " +
-                logString)
+            self.logRecords.append((time.time(), logString, args))
         return
 
+    def setRequest(self, function, subfunction='', userid='', parms=None):
+        """
+        Set up the request from its function, subfunction, userid and parms
+        instead of parsing a command line.
+
+        Input:
+           Function, e.g. 'PowerVM'
+           Subfunction, e.g. 'status'
+           Target userid, empty for the functions which do not have one
+           Dictionary of the parms, keyed by their ReqHandle.parms name,
+              e.g. {'maxWait': 300, 'poll': 15, 'wait': True}
+
+        Output:
+           Request Handle updated with the verified request information.
+           Return code - 0: successful, non-zero: error
+        """
+
+        self.printSysLog("Enter ReqHandle.setRequest")
+
+        self.function = function.upper()
+        self.subfunction = subfunction.upper()
+        self.userid = userid.upper()
+        self.parms = dict(parms or {})
+        self.requestString = ' '.join(
+            [word for word in (function, userid, subfunction) if word])
+        if self.parms:
+            self.requestString += ' ' + str(self.parms)
+
+        if self.function == 'HELP' or self.function == 'VERSION':
+            pass
+        elif self.function in ReqHandle.funcHandler:
+            self.funcHandler[self.function][4](self)
+        else:
+            # Unrecognized function
+            msg = msgs.msg['0007'][1] % (modId, self.function)
+            self.printLn("ES", msg)
+            self.updateResults(msgs.msg['0007'][0])
+
+        self.printSysLog("Exit ReqHandle.setRequest, rc: %s",
+                         self.results['overallRC'])
+        if self.captureLogs is True:
+            self.results['logEntries'] = self.getLogEntries()
+        return self.results
+
     def updateResults(self, newResults, **kwArgs):
         """
         Update the results related to this request excluding the 'response'
@@ -364,6 +466,7 @@ class ReqHandle(object):
             self.results['errno'] = 0
             self.results['strError'] = ''
             self.results['logEntries'] = ''
+            self.logRecords = []
             self.results['response'] = ''
 
         return
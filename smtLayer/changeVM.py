@@ -232,8 +232,7 @@ def add3390(rh):
                 rh.printLn("ES", results['response'])
                 rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.add3390, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.add3390, rc: %s", rh.results['overallRC'])
 
     return rh.results['overallRC']
 
@@ -330,8 +329,56 @@ def add9336(rh):
                 rh.printLn("ES", results['response'])
                 rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.add9336, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.add9336, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter changeVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    if rh.results['overallRC'] == 0:
+        completeParms(rh)
+
+    rh.printSysLog("Exit changeVM.checkRequest, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def completeParms(rh):
+    """
+    Verify the values of the parms and set the defaults of the omitted ones.
+
+    Input:
+       Request Handle with the parms set
+
+    Output:
+       Request Handle updated with the completed parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    if rh.results['overallRC'] == 0:
+        if rh.subfunction in ['ADD3390', 'ADD9336']:
+            if ('fileSystem' in rh.parms and rh.parms['fileSystem'] not in
+                ['ext2', 'ext3', 'ext4', 'xfs', 'swap']):
+                # Invalid file system specified.
+                msg = msgs.msg['0015'][1] % (modId, rh.parms['fileSystem'])
+                rh.printLn("ES", msg)
+                rh.updateResults(msgs.msg['0015'][0])
+
     return rh.results['overallRC']
 
 
@@ -390,8 +437,7 @@ def dedicate(rh):
                 rh.printLn("ES", results['response'])
                 rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.dedicate, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.dedicate, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -445,8 +491,7 @@ def undedicate(rh):
                 rh.printLn("ES", results['response'])
                 rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.undedicate, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.undedicate, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -511,8 +556,7 @@ def addAEMOD(rh):
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0400'][0])
 
-    rh.printSysLog("Exit changeVM.addAEMOD, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.addAEMOD, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -550,8 +594,7 @@ def addIPL(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.addIPL, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.addIPL, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -658,8 +701,7 @@ def addLOADDEV(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)
 
-    rh.printSysLog("Exit changeVM.addLOADDEV, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.addLOADDEV, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -695,8 +737,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit changeVM.doIt, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -754,8 +795,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit changeVM.parseCmdLine, rc: " +
-            str(rh.results['overallRC']))
+        rh.printSysLog("Exit changeVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -779,16 +820,10 @@ def parseCmdline(rh):
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
     if rh.results['overallRC'] == 0:
-        if rh.subfunction in ['ADD3390', 'ADD9336']:
-            if ('fileSystem' in rh.parms and rh.parms['fileSystem'] not in
-                ['ext2', 'ext3', 'ext4', 'xfs', 'swap']):
-                # Invalid file system specified.
-                msg = msgs.msg['0015'][1] % (modId, rh.parms['fileSystem'])
-                rh.printLn("ES", msg)
-                rh.updateResults(msgs.msg['0015'][0])
+        completeParms(rh)
 
-    rh.printSysLog("Exit changeVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -818,8 +853,7 @@ def punchFile(rh):
 
     punch2reader(rh, rh.userid, rh.parms['file'], spoolClass)
 
-    rh.printSysLog("Exit changeVM.punchFile, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.punchFile, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -841,8 +875,7 @@ def purgeRDR(rh):
     rh.printSysLog("Enter changeVM.purgeRDR")
     results = purgeReader(rh)
     rh.updateResults(results)
-    rh.printSysLog("Exit changeVM.purgeRDR, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.purgeRDR, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -915,8 +948,7 @@ def removeDisk(rh):
         # Unexpected error.  Message already sent.
         rh.updateResults(results)
 
-    rh.printSysLog("Exit changeVM.removeDisk, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.removeDisk, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -945,8 +977,7 @@ def removeIPL(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit changeVM.removeIPL, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit changeVM.removeIPL, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
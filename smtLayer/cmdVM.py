@@ -16,7 +16,7 @@
 
 from smtLayer import generalUtils
 from smtLayer import msgs
-from smtLayer.vmUtils import execCmdThruIUCV
+from smtLayer.vmUtils import execCmdThruIUCV, execCmdsThruIUCV
 
 modId = 'CMD'
 version = "1.0.0"
@@ -29,6 +29,7 @@ Each subfunction contains a list that has:
 """
 subfuncHandler = {
     'CMD': ['invokeCmd', lambda rh: invokeCmd(rh)],
+    'CMDS': ['invokeCmds', lambda rh: invokeCmds(rh)],
     'HELP': ['help', lambda rh: help(rh)],
     'VERSION': ['getVersion', lambda rh: getVersion(rh)],
     }
@@ -46,6 +47,9 @@ posOpsList = {
     'CMD': [
                ['Command to send', 'cmd', True, 2],
            ],
+    'CMDS': [
+               ['Commands to send', 'cmds', True, 2],
+           ],
 }
 
 """
@@ -60,9 +64,34 @@ keyOpsList = {
     'CMD': {
         '--showparms': ['showParms', 0, 0],
     },
+    'CMDS': {
+        '--showparms': ['showParms', 0, 0],
+        '--stoponerror': ['stopOnError', 0, 0],
+    },
 }
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter cmdVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit cmdVM.checkRequest, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def doIt(rh):
     """
     Perform the requested function by invoking the subfunction handler.
@@ -94,7 +123,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit cmdVM.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit cmdVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -147,7 +176,7 @@ def invokeCmd(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter cmdVM.invokeCmd, userid: " + rh.userid)
+    rh.printSysLog("Enter cmdVM.invokeCmd, userid: %s", rh.userid)
 
     results = execCmdThruIUCV(rh, rh.userid, rh.parms['cmd'])
 
@@ -157,7 +186,49 @@ def invokeCmd(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)
 
-    rh.printSysLog("Exit cmdVM.invokeCmd, rc: " + str(results['overallRC']))
+    rh.printSysLog("Exit cmdVM.invokeCmd, rc: %s", results['overallRC'])
+    return results['overallRC']
+
+
+def invokeCmds(rh):
+    """
+    Invoke several commands in the virtual machine's operating system with
+    a single IUCV request.
+
+    Input:
+       Request Handle with the following properties:
+          function    - 'CMDVM'
+          subfunction - 'CMDS'
+          userid      - userid of the virtual machine
+          parms['cmds']        - List of commands to send, or a string
+                                 with one command per line
+          parms['stopOnError'] - True to stop at the first command which
+                                 fails
+
+    Output:
+       Request Handle updated with the results, the output and the return
+       code of each command which was run are in the cmdResults list of
+       the results.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter cmdVM.invokeCmds, userid: %s", rh.userid)
+
+    cmds = rh.parms['cmds']
+    if not isinstance(cmds, list):
+        cmds = [cmd for cmd in cmds.splitlines() if cmd.strip()]
+    results = execCmdsThruIUCV(rh, rh.userid, cmds,
+                               stopOnError=rh.parms.get('stopOnError', False))
+
+    if results['overallRC'] == 0:
+        for cmdResult in results['cmdResults']:
+            rh.printLn("N", cmdResult['response'])
+        rh.results['cmdResults'] = results['cmdResults']
+    else:
+        rh.printLn("ES", results['response'])
+        rh.updateResults(results)
+
+    rh.printSysLog("Exit cmdVM.invokeCmds, rc: %s", results['overallRC'])
     return results['overallRC']
 
 
@@ -182,8 +253,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit cmdVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit cmdVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -206,8 +277,7 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit cmdVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit cmdVM.parseCmdLine, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -223,6 +293,8 @@ def showInvLines(rh):
         rh.printLn("N", "Usage:")
     rh.printLn("N", "  python " + rh.cmdName +
         " CmdVM <userid> cmd <cmdToSend>")
+    rh.printLn("N", "  python " + rh.cmdName +
+        " CmdVM <userid> cmds <cmdsToSend> [--stoponerror]")
     rh.printLn("N", "  python " + rh.cmdName +
         " CmdVM help")
     rh.printLn("N", "  python " + rh.cmdName +
@@ -244,6 +316,9 @@ def showOperandLines(rh):
         rh.printLn("N", "Sub-Functions(s):")
     rh.printLn("N", "      cmd           - " +
         "Send a command to a virtual machine's operating system.")
+    rh.printLn("N", "      cmds          - " +
+        "Send several commands to a virtual machine's operating")
+    rh.printLn("N", "                      system with a single request.")
     rh.printLn("N", "      help          - " +
         "Displays this help information.")
     rh.printLn("N", "      version       - " +
@@ -254,5 +329,10 @@ def showOperandLines(rh):
         "Userid of the target virtual machine")
     rh.printLn("N", "      <cmdToSend>   - " +
         "Command to send to the virtual machine's OS.")
+    rh.printLn("N", "      <cmdsToSend>  - " +
+        "Commands to send to the virtual machine's OS, one")
+    rh.printLn("N", "                      per line.")
+    rh.printLn("N", "      --stoponerror - " +
+        "Do not run the commands following a failed command.")
 
     return
@@ -57,6 +57,28 @@ keyOpsList = {
     }
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter deleteVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit deleteVM.checkRequest, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def deleteMachine(rh):
     """
     Delete a virtual machine from the user directory.
@@ -123,8 +145,8 @@ def deleteMachine(rh):
             rh.printLn("ES", results['response'])
             rh.updateResults(results)  # Use results returned by invokeSMCLI
 
-    rh.printSysLog("Exit deleteVM.deleteMachine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit deleteVM.deleteMachine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -160,7 +182,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit deleteVM.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit deleteVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -218,8 +240,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit deleteVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit deleteVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -242,8 +264,8 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit deleteVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit deleteVM.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -0,0 +1,242 @@
+# Request dispatcher for Systems Management Ultra Thin Layer
+#
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import threading
+import time
+
+from zvmsdk import config
+
+modId = 'DSP'
+version = '1.0.0'         # Version of this script
+
+"""
+Subfunctions which only query the virtual machine, by function. They do not
+wait for the other requests on the same userid. None stands for all the
+subfunctions of the function.
+"""
+queryFuncs = {
+    'GETHOST': None,
+    'GETVM': None,
+    'POWERVM': ['HELP', 'ISREACHABLE', 'LOGGEDON', 'STATUS', 'VERSION',
+                'WAIT'],
+    }
+
+"""
+Prefixes of the names of the SMAPI APIs which change the virtual machine of
+the request userid. The other SMAPI requests target the host, such as the
+vswitches or the name lists, with the userid of the SMT server or a name
+list name as userid, and the queries do not change anything. They do not
+wait for the other requests on the same userid.
+"""
+guestApiPrefixes = ('Image_', 'Virtual_Network_Adapter_')
+
+_dispatcher = None
+_limiter = None
+_lock = threading.Lock()
+
+
+class KeyedLocks(object):
+    """
+    Locks created on demand for each key, and dropped once they are no
+    longer used.
+    """
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.locks = {}               # key: [lock, number of users]
+
+    @contextlib.contextmanager
+    def locked(self, key):
+        """
+        Hold the lock of the key in the with block.
+
+        Output:
+           Seconds waited for the lock.
+        """
+        with self.mutex:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        start = time.time()
+        entry[0].acquire()
+        try:
+            yield time.time() - start
+        finally:
+            entry[0].release()
+            with self.mutex:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.locks[key]
+
+    def count(self):
+        with self.mutex:
+            return len(self.locks)
+
+
+class Dispatcher(object):
+    """
+    Drive the requests so that the requests which change a virtual machine
+    run one at a time for each userid, while the requests on different
+    userids run in parallel.
+    """
+
+    def __init__(self):
+        self.locks = KeyedLocks()
+        self.mutex = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.lockWaits = 0
+        self.lockWaitTime = 0.0
+
+    def isSerialized(self, rh):
+        """
+        Determine whether the request waits for the other requests on its
+        userid.
+        """
+        if rh.userid == '':
+            return False
+        if rh.function == 'SMAPI':
+            apiName = rh.parms.get('apiName', '')
+            return (apiName.startswith(guestApiPrefixes) and
+                    'Query' not in apiName)
+        if rh.function in queryFuncs:
+            subfuncs = queryFuncs[rh.function]
+            return subfuncs is not None and rh.subfunction not in subfuncs
+        return True
+
+    def dispatch(self, rh):
+        """
+        Drive the function of the request.
+
+        Input:
+           Request Handle with the request parsed.
+
+        Output:
+           Request Handle updated with the results.
+        """
+        with self.mutex:
+            self.requests += 1
+            self.active += 1
+        try:
+            if self.isSerialized(rh):
+                with self.locks.locked(rh.userid) as waited:
+                    if waited > 0.001:
+                        with self.mutex:
+                            self.lockWaits += 1
+                            self.lockWaitTime += waited
+                    rh.driveFunction()
+            else:
+                rh.driveFunction()
+        finally:
+            with self.mutex:
+                self.active -= 1
+        return rh.results
+
+    def getMetrics(self):
+        with self.mutex:
+            return {
+                'requests_total': self.requests,
+                'requests_active': self.active,
+                'lock_waits_total': self.lockWaits,
+                'lock_wait_seconds_total': self.lockWaitTime,
+                'locked_userids': self.locks.count(),
+                }
+
+
+class CallLimiter(object):
+    """
+    Bound the number of concurrent calls to the SMAPI server, through smcli
+    or its socket. A limit of 0 does not bound the calls.
+    """
+
+    def __init__(self, limit=0):
+        self.limit = limit
+        self.slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self.mutex = threading.Lock()
+        self.calls = 0
+        self.active = 0
+        self.waits = 0
+        self.waitTime = 0.0
+
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        Hold a call slot in the with block.
+        """
+        waited = 0
+        if self.slots is not None:
+            if not self.slots.acquire(False):
+                start = time.time()
+                self.slots.acquire()
+                waited = time.time() - start
+        with self.mutex:
+            self.calls += 1
+            self.active += 1
+            if waited:
+                self.waits += 1
+                self.waitTime += waited
+        try:
+            yield
+        finally:
+            with self.mutex:
+                self.active -= 1
+            if self.slots is not None:
+                self.slots.release()
+
+    def getMetrics(self):
+        with self.mutex:
+            return {
+                'smapi_calls_total': self.calls,
+                'smapi_calls_active': self.active,
+                'smapi_call_limit': self.limit,
+                'smapi_call_waits_total': self.waits,
+                'smapi_call_wait_seconds_total': self.waitTime,
+                }
+
+
+def getDispatcher():
+    """
+    Get the dispatcher shared by all the SMT instances of the process.
+    """
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher()
+    return _dispatcher
+
+
+def getCallLimiter():
+    """
+    Get the limiter of the SMAPI calls set up by the [smapi]
+    max_concurrent_calls configuration option.
+    """
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = CallLimiter(config.CONF.smapi.max_concurrent_calls)
+    return _limiter
+
+
+def getMetrics():
+    """
+    Get the metrics of the dispatcher and of the SMAPI call limiter.
+
+    Output:
+       Dictionary of the metric values by name.
+    """
+    metrics = getDispatcher().getMetrics()
+    metrics.update(getCallLimiter().getMetrics())
+    return metrics
@@ -22,6 +22,95 @@ fiveGigSize = (1024 * 5)
 modId = 'GUT'
 
 
+def checkParms(rh, subfuncHandler, posOpsList, keyOpsList):
+    """
+    Verify the subfunction and the parms of a request which was set up
+    by ReqHandle.setRequest instead of being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set.
+       Subfunction Handler dictionary of the function.
+       Positional Operands List, as described for parseCmdline.
+       Keyword Operands List, as described for parseCmdline.
+
+    Output:
+       Request Handle updated with the integer parms converted to int.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter generalUtils.checkParms")
+
+    if rh.subfunction not in subfuncHandler:
+        # Subfunction is missing or unknown.
+        subList = ', '.join(sorted(subfuncHandler.keys()))
+        msg = msgs.msg['0011'][1] % (modId, subList)
+        rh.printLn("ES", msg)
+        rh.updateResults(msgs.msg['0011'][0])
+
+    # Handle the positional operands.
+    posKeys = []
+    if rh.results['overallRC'] == 0:
+        ops = posOpsList.get(rh.subfunction, [])
+        for currOp in range(0, len(ops)):
+            key = ops[currOp][1]
+            posKeys.append(key)
+            if key not in rh.parms:
+                if ops[currOp][2] is True:
+                    # Required operand is missing.
+                    msg = msgs.msg['0002'][1] % (modId, rh.function,
+                        rh.subfunction, ops[currOp][0], (currOp + 1))
+                    rh.printLn("ES", msg)
+                    rh.updateResults(msgs.msg['0002'][0])
+                    break
+            elif ops[currOp][3] == 1:
+                try:
+                    rh.parms[key] = int(rh.parms[key])
+                except (TypeError, ValueError):
+                    # Operand is not an integer
+                    msg = msgs.msg['0001'][1] % (modId, rh.function,
+                        rh.subfunction, (currOp + 1),
+                        ops[currOp][0], rh.parms[key])
+                    rh.printLn("ES", msg)
+                    rh.updateResults(msgs.msg['0001'][0])
+                    break
+
+    # Handle the keyword operands, which are keyed by their parms name.
+    if rh.results['overallRC'] == 0:
+        keyOps = {}
+        for keyword, op in keyOpsList.get(rh.subfunction, {}).items():
+            keyOps[op[0]] = [keyword] + op[1:]
+        for key in sorted(rh.parms.keys()):
+            if key in posKeys:
+                continue
+            if key not in keyOps:
+                # Parm is not in the subfunction's keyword list
+                msg = msgs.msg['0005'][1] % (modId, rh.function,
+                    rh.subfunction, key)
+                rh.printLn("ES", msg)
+                rh.updateResults(msgs.msg['0005'][0])
+                break
+
+            keyword, opCnt, opType = keyOps[key]
+            if opCnt == 0 or opType != 1:
+                continue
+            try:
+                if opCnt == 1:
+                    rh.parms[key] = int(rh.parms[key])
+                else:
+                    rh.parms[key] = [int(value) for value in rh.parms[key]]
+            except (TypeError, ValueError):
+                # keyword is not an integer
+                msg = msgs.msg['0004'][1] % (modId, rh.function,
+                    rh.subfunction, keyword, rh.parms[key])
+                rh.printLn("ES", msg)
+                rh.updateResults(msgs.msg['0004'][0])
+                break
+
+    rh.printSysLog("Exit generalUtils.checkParms, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def cvtToBlocks(rh, diskSize):
     """
     Convert a disk storage value to a number of blocks.
@@ -73,8 +162,8 @@ def cvtToBlocks(rh, diskSize):
         rh.printLn("ES", msg)
         results = msgs.msg['0202'][0]
 
-    rh.printSysLog("Exit generalUtils.cvtToBlocks, rc: " +
-        str(results['overallRC']))
+    rh.printSysLog("Exit generalUtils.cvtToBlocks, rc: %s",
+                   results['overallRC'])
     return results, blocks
 
 
@@ -129,8 +218,7 @@ def cvtToCyl(rh, diskSize):
         rh.printLn("ES", msg)
         results = msgs.msg['0202'][0]
 
-    rh.printSysLog("Exit generalUtils.cvtToCyl, rc: " +
-        str(results['overallRC']))
+    rh.printSysLog("Exit generalUtils.cvtToCyl, rc: %s", results['overallRC'])
     return results, cyl
 
 
@@ -159,7 +247,7 @@ def cvtToMag(rh, size):
         # Size is less than or equal 5G. Using "M" magnitude.
         mSize = "%.1fM" % size
 
-    rh.printSysLog("Exit generalUtils.cvtToMag, magSize: " + mSize)
+    rh.printSysLog("Exit generalUtils.cvtToMag, magSize: %s", mSize)
     return mSize
 
 
@@ -179,7 +267,7 @@ def getSizeFromPage(rh, page):
     bSize = float(page) * 4096
     mSize = cvtToMag(rh, bSize)
 
-    rh.printSysLog("Exit generalUtils.getSizeFromPage, magSize: " + mSize)
+    rh.printSysLog("Exit generalUtils.getSizeFromPage, magSize: %s", mSize)
     return mSize
 
 
@@ -331,6 +419,6 @@ def parseCmdline(rh, posOpsList, keyOpsList):
                 rh.updateResults(msgs.msg['0006'][0])
                 break
 
-    rh.printSysLog("Exit generalUtils.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit generalUtils.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
@@ -20,6 +20,7 @@ import subprocess
 from smtLayer import generalUtils
 from smtLayer import msgs
 from smtLayer.vmUtils import invokeSMCLI
+from zvmsdk import cmdrunner
 
 modId = 'GHO'
 version = "1.0.0"
@@ -72,6 +73,28 @@ keyOpsList = {
     }
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter getHost.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit getHost.checkRequest, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def doIt(rh):
     """
     Perform the requested function by invoking the subfunction handler.
@@ -103,7 +126,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit getHost.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -134,8 +157,8 @@ def getDiskPoolNames(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit getHost.getDiskPoolNames, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.getDiskPoolNames, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -216,8 +239,8 @@ def getDiskPoolSpace(rh):
                     rh.printLn("N", poolName + " Free: " +
                         generalUtils.cvtToMag(rh, totals[poolName]["2"]))
 
-    rh.printSysLog("Exit getHost.getDiskPoolSpace, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.getDiskPoolSpace, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -246,8 +269,8 @@ def getFcpDevices(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit getHost.getFcpDevices, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.getFcpDevices, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -272,11 +295,10 @@ def getGeneralInfo(rh):
     rh.results['overallRC'] = 0
     cmd = ["sudo", "/sbin/vmcp", "query userid"]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
-        host = subprocess.check_output(
+        host = cmdrunner.check_output(
             cmd,
-            close_fds=True,
             stderr=subprocess.STDOUT)
         host = bytes.decode(host)
         userid = host.split()[0]
@@ -392,11 +414,10 @@ def getGeneralInfo(rh):
     ipl = ""
     cmd = ["sudo", "/sbin/vmcp", "query cplevel"]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
-        ipl = subprocess.check_output(
+        ipl = cmdrunner.check_output(
             cmd,
-            close_fds=True,
             stderr=subprocess.STDOUT)
         ipl = bytes.decode(ipl).split("\n")[2]
     except subprocess.CalledProcessError as e:
@@ -426,8 +447,8 @@ def getGeneralInfo(rh):
     outstr += "\nIPL Time: " + ipl
 
     rh.printLn("N", outstr)
-    rh.printSysLog("Exit getHost.getGeneralInfo, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.getGeneralInfo, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -496,8 +517,8 @@ def parseCmdline(rh):
         rh.argPos = 2               # Begin Parsing at 3rd operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit getHost.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit getHost.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
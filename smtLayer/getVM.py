@@ -21,6 +21,7 @@ from smtLayer import generalUtils
 from smtLayer import msgs
 from smtLayer.vmUtils import execCmdThruIUCV, getPerfInfo, invokeSMCLI
 from smtLayer.vmUtils import isLoggedOn
+from zvmsdk import cmdrunner
 
 modId = 'GVM'
 version = "1.0.0"
@@ -94,7 +95,7 @@ def checkIsReachable(rh):
        rs - 0: not reachable, 1: reachable
     """
 
-    rh.printSysLog("Enter getVM.checkIsReachable, userid: " + rh.userid)
+    rh.printSysLog("Enter getVM.checkIsReachable, userid: %s", rh.userid)
 
     strCmd = "echo 'ping'"
     results = execCmdThruIUCV(rh, rh.userid, strCmd)
@@ -114,6 +115,27 @@ def checkIsReachable(rh):
     return 0
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter getVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit getVM.checkRequest, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def doIt(rh):
     """
     Perform the requested function by invoking the subfunction handler.
@@ -145,7 +167,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit getVM.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit getVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -180,8 +202,8 @@ def getConsole(rh):
             msg = results['response']
         rh.updateResults(results)    # Use results from invokeSMCLI
         rh.printLn("ES", msg)
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     # Check whether the reader is online
@@ -194,19 +216,18 @@ def getConsole(rh):
         msg = msgs.msg['0411'][1]
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0411'][0])
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     # We should set class to *, otherwise we will get errors like:
     # vmur: Reader device class does not match spool file class
     cmd = ["sudo", "/sbin/vmcp", "spool reader class *"]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
-        subprocess.check_output(
+        cmdrunner.check_output(
             cmd,
-            close_fds=True,
             stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
         # If we couldn't change the class, that's not fatal
@@ -227,11 +248,10 @@ def getConsole(rh):
     # List the spool files in the reader
     cmd = ["sudo", "/usr/sbin/vmur", "list"]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
-        files = subprocess.check_output(
+        files = cmdrunner.check_output(
             cmd,
-            close_fds=True,
             stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as e:
         # Uh oh, vmur list command failed for some reason
@@ -239,16 +259,16 @@ def getConsole(rh):
                                      strCmd, e.output)
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0408'][0])
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
     except Exception as e:
         # All other exceptions.
         rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
             type(e).__name__, str(e)))
         rh.updateResults(msgs.msg['0421'][0])
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     # Now for each line that contains our user and is a
@@ -269,8 +289,8 @@ def getConsole(rh):
         msg = msgs.msg['0410'][1] % (modId, rh.userid)
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0410'][0])
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     # Output the list
@@ -278,8 +298,7 @@ def getConsole(rh):
                "console logs from %s: %s" % (rh.userid, outstr))
 
     rh.results['overallRC'] = 0
-    rh.printSysLog("Exit getVM.getConsole, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit getVM.getConsole, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -309,8 +328,7 @@ def getDirectory(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit getVM.getDirectory, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit getVM.getDirectory, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -329,14 +347,13 @@ def getStatus(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter getVM.getStatus, userid: " + rh.userid)
+    rh.printSysLog("Enter getVM.getStatus, userid: %s", rh.userid)
 
     results = isLoggedOn(rh, rh.userid)
     if results['rc'] != 0:
         # Uhoh, can't determine if guest is logged on or not
         rh.updateResults(results)
-        rh.printSysLog("Exit getVM.getStatus, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.getStatus, rc: %s", rh.results['overallRC'])
         return rh.results['overallRC']
 
     if results['rs'] == 1:
@@ -355,8 +372,7 @@ def getStatus(rh):
         # Then we can return early
         rh.printLn("N", powerStr)
         rh.updateResults(results)
-        rh.printSysLog("Exit getVM.getStatus, rc: " +
-                       str(rh.results['overallRC']))
+        rh.printSysLog("Exit getVM.getStatus, rc: %s", rh.results['overallRC'])
         return rh.results['overallRC']
 
     if results['rs'] != 1:
@@ -366,8 +382,8 @@ def getStatus(rh):
         if results['overallRC'] != 0:
             # Something went wrong in subroutine, exit
             rh.updateResults(results)
-            rh.printSysLog("Exit getVM.getStatus, rc: " +
-                           str(rh.results['overallRC']))
+            rh.printSysLog("Exit getVM.getStatus, rc: %s",
+                           rh.results['overallRC'])
             return rh.results['overallRC']
         else:
             # Everything went well, response should be good
@@ -387,8 +403,7 @@ def getStatus(rh):
         outStr = powerStr + "\n" + memStr + "\n" + usedMemStr
         outStr += "\n" + procStr + "\n" + timeStr
     rh.printLn("N", outStr)
-    rh.printSysLog("Exit getVM.getStatus, rc: " +
-                   str(rh.results['overallRC']))
+    rh.printSysLog("Exit getVM.getStatus, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -446,8 +461,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit getVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -470,8 +485,7 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit getVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit getVM.parseCmdLine, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
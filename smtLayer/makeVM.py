@@ -79,6 +79,55 @@ keyOpsList = {
      }
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter makeVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    if rh.results['overallRC'] == 0:
+        completeParms(rh)
+
+    rh.printSysLog("Exit makeVM.checkRequest, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def completeParms(rh):
+    """
+    Verify the values of the parms and set the defaults of the omitted ones.
+
+    Input:
+       Request Handle with the parms set
+
+    Output:
+       Request Handle updated with the completed parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    if 'byUsers' in rh.parms and not isinstance(rh.parms['byUsers'], list):
+        users = []
+        for user in rh.parms['byUsers'].split(' '):
+            users.append(user)
+        rh.parms['byUsers'] = []
+        rh.parms['byUsers'].extend(users)
+
+    if rh.subfunction == 'DIRECTORY' and 'maxMemSize' not in rh.parms:
+        rh.parms['maxMemSize'] = rh.parms['priMemSize']
+
+    return rh.results['overallRC']
+
+
 def createVM(rh):
     """
     Create a virtual machine in z/VM.
@@ -132,8 +181,8 @@ def createVM(rh):
     if 'setReservedMem' in rh.parms and (priMem != maxMem):
         reservedSize = getReservedMemSize(rh, priMem, maxMem)
         if rh.results['overallRC'] != 0:
-            rh.printSysLog("Exit makeVM.createVM, rc: " +
-                   str(rh.results['overallRC']))
+            rh.printSysLog("Exit makeVM.createVM, rc: %s",
+                           rh.results['overallRC'])
             return rh.results['overallRC']
         if reservedSize != '0M':
             dirLines.append("COMMAND DEF STOR RESERVED %s" % reservedSize)
@@ -167,8 +216,7 @@ def createVM(rh):
 
     os.remove(tempFile)
 
-    rh.printSysLog("Exit makeVM.createVM, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit makeVM.createVM, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -204,7 +252,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit makeVM.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit makeVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -262,8 +310,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit makeVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit makeVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -286,18 +334,10 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    if 'byUsers' in rh.parms:
-        users = []
-        for user in rh.parms['byUsers'].split(' '):
-            users.append(user)
-        rh.parms['byUsers'] = []
-        rh.parms['byUsers'].extend(users)
-
-    if rh.subfunction == 'DIRECTORY' and 'maxMemSize' not in rh.parms:
-        rh.parms['maxMemSize'] = rh.parms['priMemSize']
+    if rh.results['overallRC'] == 0:
+        completeParms(rh)
 
-    rh.printSysLog("Exit makeVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit makeVM.parseCmdLine, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -419,8 +459,8 @@ def getReservedMemSize(rh, mem, maxMem):
         msg = msgs.msg['0205'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0205'][0])
-        rh.printSysLog("Exit makeVM.parseCmdLine, rc: " +
-            str(rh.results['overallRC']))
+        rh.printSysLog("Exit makeVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return gap
 
     # Convert both size to 'M'
@@ -436,8 +476,8 @@ def getReservedMemSize(rh, mem, maxMem):
         msg = msgs.msg['0206'][1] % (modId, maxMem, mem)
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0206'][0])
-        rh.printSysLog("Exit makeVM.parseCmdLine, rc: " +
-            str(rh.results['overallRC']))
+        rh.printSysLog("Exit makeVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return gap
 
     # The define storage command can support 1-7 digits decimal number
@@ -450,7 +490,7 @@ def getReservedMemSize(rh, mem, maxMem):
     else:
         gap = "%iM" % gapSize
 
-    rh.printSysLog("Exit makeVM.getReservedMemSize, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit makeVM.getReservedMemSize, rc: %s",
+                   rh.results['overallRC'])
 
     return gap
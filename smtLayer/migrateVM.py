@@ -126,8 +126,30 @@ def cancelMigrate(rh):
                                             rh.userid, codes)
                 rh.printLn("ES", msg)
 
-    rh.printSysLog("Exit migrateVM.cancelMigrate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.cancelMigrate, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter migrateVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit migrateVM.checkRequest, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -162,7 +184,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit migrateVM.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -212,8 +234,7 @@ def getStatus(rh):
     else:
         rh.printLn("N", results['response'])
 
-    rh.printSysLog("Exit migrateVM.getStatus, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.getStatus, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -305,8 +326,8 @@ def modifyMigrate(rh):
                                              rh.userid, codes)
                 rh.printLn("ES", msg)
 
-    rh.printSysLog("Exit migrateVM.modifyMigrate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.modifyMigrate, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -386,8 +407,7 @@ def moveVM(rh):
                                              rh.userid, codes)
                 rh.printLn("ES", msg)
 
-    rh.printSysLog("Exit migrateVM.moveVM, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.moveVM, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -412,8 +432,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit migrateVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit migrateVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -436,8 +456,8 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit migrateVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -578,6 +598,6 @@ def testMigrate(rh):
                 msg = msgs.msg['0420'][1] % (modId, "VMRELOCATE Move",
                                              rh.userid, codes)
 
-    rh.printSysLog("Exit migrateVM.testMigrate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit migrateVM.testMigrate, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
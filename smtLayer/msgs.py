@@ -524,6 +524,17 @@ msg = {
         #   and the target system may contain useful information to
         #   identify the failure.  Reinvoke the function after you
         #   correct the problem.
+    '0320': [{'overallRC': 2, 'rc': 8, 'rs': 99},
+            "ULT%s0320E On %s, the result of command %s sent through " +
+            "IUCV is missing. cmd: %s, out: %s",
+            ('SMP', 'USERID', 'INDEX', 'CMD', 'OUTPUT')],
+        # Explain: Several commands were sent to the target system in
+        #   one IUCV request, and the output does not hold the result
+        #   of each command in the order of the commands.
+        # SysAct: Processing of the function terminates.
+        # UserResp: Determine the cause of the failure using the output
+        #   included in the message.  Reinvoke the function after you
+        #   correct the problem.
 
     # General subfunction processing messages
     '0400': [{'overallRC': 4, 'rc': 4, 'rs': 400},
@@ -589,10 +600,11 @@ msg = {
     '0406': [{'overallRC': 4, 'rc': 9, 'rs': 406},
             "ULT%s0406E Failed to punch %s because of VMUR timeout ",
             ('GUT', 'FILE_LOCATION')],
-        # Explain: When punching a file to the reader, the vmur punch
-        #   command is issued up to 5 times with increasing timeouts.
-        #   This error comes after the 5th try if the vmur command
-        #   was still unsuccessful.
+        # Explain: When punching a file to the reader, the punches of the
+        #   process are queued and issued one at a time.  The vmur punch
+        #   command is issued up to 5 times with increasing timeouts
+        #   while another process uses vmur.  This error comes after the
+        #   5th try if the vmur command was still unsuccessful.
         # SysAct:  Processing of the function ends with no action taken.
         # UserResp: This error could be because of another process
         #   also issuing vmur commands at the same time.  Wait a few
@@ -19,7 +19,7 @@ import time
 from smtLayer import generalUtils
 from smtLayer import msgs
 from smtLayer.vmUtils import execCmdThruIUCV, invokeSMCLI
-from smtLayer.vmUtils import isLoggedOn
+from smtLayer.vmUtils import getLoggedOnUsers, isLoggedOn
 from smtLayer.vmUtils import waitForOSState, waitForVMState
 
 modId = 'PVM'
@@ -37,6 +37,7 @@ subfuncHandler = {
     'HELP': ['help', lambda rh: help(rh)],
     'ISREACHABLE': ['checkIsReachable',
         lambda rh: checkIsReachable(rh)],
+    'LOGGEDON': ['getLoggedOn', lambda rh: getLoggedOn(rh)],
     'OFF': ['deactivate', lambda rh: deactivate(rh)],
     'ON': ['activate', lambda rh: activate(rh)],
     'PAUSE': ['pause', lambda rh: pause(rh)],
@@ -76,6 +77,7 @@ keyOpsList = {
     'HELP': {},
     'ISREACHABLE': {
         '--showparms': ['showParms', 0, 0]},
+    'LOGGEDON': {},
     'OFF': {
         '--maxwait': ['maxWait', 1, 1],
         '--poll': ['poll', 1, 1],
@@ -140,7 +142,7 @@ def activate(rh):
        Request Handle updated with the results.
        Return code - 0: ok, non-zero: error
     """
-    rh.printSysLog("Enter powerVM.activate, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.activate, userid: %s", rh.userid)
 
     parms = ["-T", rh.userid]
     smcliResults = invokeSMCLI(rh, "Image_Activate", parms)
@@ -178,8 +180,7 @@ def activate(rh):
         else:
             rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.activate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.activate, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -202,8 +203,7 @@ def checkIsReachable(rh):
        rs - 0: not reachable, 1: reachable
     """
 
-    rh.printSysLog("Enter powerVM.checkIsReachable, userid: " +
-        rh.userid)
+    rh.printSysLog("Enter powerVM.checkIsReachable, userid: %s", rh.userid)
 
     strCmd = "echo 'ping'"
     results = execCmdThruIUCV(rh, rh.userid, strCmd)
@@ -223,6 +223,93 @@ def checkIsReachable(rh):
     return 0
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter powerVM.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    if rh.results['overallRC'] == 0:
+        completeParms(rh)
+
+    rh.printSysLog("Exit powerVM.checkRequest, rc: %s",
+                   rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def completeParms(rh):
+    """
+    Verify the values of the parms and set the defaults of the omitted ones.
+
+    Input:
+       Request Handle with the parms set
+
+    Output:
+       Request Handle updated with the completed parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    waiting = 0
+    if rh.results['overallRC'] == 0:
+        if rh.subfunction == 'WAIT':
+            waiting = 1
+            if rh.parms['desiredState'] not in vmOSUpDownStates:
+                # Desired state is not: down, off, on or up.
+                msg = msgs.msg['0013'][1] % (modId,
+                    rh.parms['desiredState'], ", ".join(vmOSUpDownStates))
+                rh.printLn("ES", msg)
+                rh.updateResults(msgs.msg['0013'][0])
+
+    if (rh.results['overallRC'] == 0 and 'wait' in rh.parms):
+        waiting = 1
+        if 'desiredState' not in rh.parms:
+            if rh.subfunction in ['ON', 'RESET', 'REBOOT']:
+                rh.parms['desiredState'] = 'up'
+            else:
+                # OFF and SOFTOFF default to 'off'.
+                rh.parms['desiredState'] = 'off'
+
+    if rh.results['overallRC'] == 0 and waiting == 1:
+        if rh.subfunction == 'ON' or rh.subfunction == 'RESET':
+            if ('desiredState' not in rh.parms or
+                  rh.parms['desiredState'] not in vmOSUpStates):
+                # Desired state is not: on or up.
+                msg = msgs.msg['0013'][1] % (modId,
+                    rh.parms['desiredState'], ", ".join(vmOSUpStates))
+                rh.printLn("ES", msg)
+                rh.updateResults(msgs.msg['0013'][0])
+
+        if rh.results['overallRC'] == 0:
+            if 'maxWait' not in rh.parms:
+                rh.parms['maxWait'] = 300
+            if 'poll' not in rh.parms:
+                rh.parms['poll'] = 15
+            rh.parms['maxQueries'] = (rh.parms['maxWait'] +
+                rh.parms['poll'] - 1) / rh.parms['poll']
+            # If we had to do some rounding, give a warning
+            # out to the command line user that the wait
+            # won't be what they expected.
+            if rh.parms['maxWait'] % rh.parms['poll'] != 0:
+                msg = msgs.msg['0017'][1] % (modId,
+                    rh.parms['maxWait'], rh.parms['poll'],
+                    rh.parms['maxQueries'] * rh.parms['poll'],
+                    rh.parms['maxQueries'])
+                rh.printLn("W", msg)
+
+    return rh.results['overallRC']
+
+
 def deactivate(rh):
     """
     Deactivate a virtual machine.
@@ -244,8 +331,7 @@ def deactivate(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.deactivate, userid: " +
-        rh.userid)
+    rh.printSysLog("Enter powerVM.deactivate, userid: %s", rh.userid)
 
     parms = ["-T", rh.userid, "-f", "IMMED"]
     results = invokeSMCLI(rh, "Image_Deactivate", parms)
@@ -274,8 +360,7 @@ def deactivate(rh):
         else:
             rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.deactivate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.deactivate, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -311,8 +396,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit powerVM.doIt, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -335,8 +419,7 @@ def getStatus(rh):
           results['rs'] - 1: powered off
     """
 
-    rh.printSysLog("Enter powerVM.getStatus, userid: " +
-        rh.userid)
+    rh.printSysLog("Enter powerVM.getStatus, userid: %s", rh.userid)
 
     results = isLoggedOn(rh, rh.userid)
     if results['overallRC'] != 0:
@@ -349,8 +432,37 @@ def getStatus(rh):
 
     rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.getStatus, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.getStatus, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
+def getLoggedOn(rh):
+    """
+    Get the userids of all the virtual machines logged on to z/VM.
+
+    Input:
+       Request Handle with the following properties:
+          function    - 'POWERVM'
+          subfunction - 'LOGGEDON'
+
+    Output:
+       Request Handle updated with the results.
+       results['overallRC'] - 0: ok, non-zero: error
+       if ok:
+          results['response'] - one line with the userid of each logged on
+                                virtual machine
+    """
+
+    rh.printSysLog("Enter powerVM.getLoggedOn")
+
+    results = getLoggedOnUsers(rh)
+    if results['overallRC'] == 0:
+        for userid in sorted(results.pop('users')):
+            rh.printLn("N", userid)
+
+    rh.updateResults(results)
+
+    rh.printSysLog("Exit powerVM.getLoggedOn, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -408,8 +520,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit powerVM.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit powerVM.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -432,55 +544,11 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    waiting = 0
     if rh.results['overallRC'] == 0:
-        if rh.subfunction == 'WAIT':
-            waiting = 1
-            if rh.parms['desiredState'] not in vmOSUpDownStates:
-                # Desired state is not: down, off, on or up.
-                msg = msgs.msg['0013'][1] % (modId,
-                    rh.parms['desiredState'], ", ".join(vmOSUpDownStates))
-                rh.printLn("ES", msg)
-                rh.updateResults(msgs.msg['0013'][0])
-
-    if (rh.results['overallRC'] == 0 and 'wait' in rh.parms):
-        waiting = 1
-        if 'desiredState' not in rh.parms:
-            if rh.subfunction in ['ON', 'RESET', 'REBOOT']:
-                rh.parms['desiredState'] = 'up'
-            else:
-                # OFF and SOFTOFF default to 'off'.
-                rh.parms['desiredState'] = 'off'
-
-    if rh.results['overallRC'] == 0 and waiting == 1:
-        if rh.subfunction == 'ON' or rh.subfunction == 'RESET':
-            if ('desiredState' not in rh.parms or
-                  rh.parms['desiredState'] not in vmOSUpStates):
-                # Desired state is not: on or up.
-                msg = msgs.msg['0013'][1] % (modId,
-                    rh.parms['desiredState'], ", ".join(vmOSUpStates))
-                rh.printLn("ES", msg)
-                rh.updateResults(msgs.msg['0013'][0])
-
-        if rh.results['overallRC'] == 0:
-            if 'maxWait' not in rh.parms:
-                rh.parms['maxWait'] = 300
-            if 'poll' not in rh.parms:
-                rh.parms['poll'] = 15
-            rh.parms['maxQueries'] = (rh.parms['maxWait'] +
-                rh.parms['poll'] - 1) / rh.parms['poll']
-            # If we had to do some rounding, give a warning
-            # out to the command line user that the wait
-            # won't be what they expected.
-            if rh.parms['maxWait'] % rh.parms['poll'] != 0:
-                msg = msgs.msg['0017'][1] % (modId,
-                    rh.parms['maxWait'], rh.parms['poll'],
-                    rh.parms['maxQueries'] * rh.parms['poll'],
-                    rh.parms['maxQueries'])
-                rh.printLn("W", msg)
+        completeParms(rh)
 
-    rh.printSysLog("Exit powerVM.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.parseCmdLine, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -499,7 +567,7 @@ def pause(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.pause, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.pause, userid: %s", rh.userid)
 
     parms = ["-T", rh.userid, "-k", "PAUSE=YES"]
     results = invokeSMCLI(rh, "Image_Pause", parms)
@@ -508,7 +576,7 @@ def pause(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit powerVM.pause, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.pause, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -535,7 +603,7 @@ def reboot(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.reboot, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.reboot, userid: %s", rh.userid)
 
     strCmd = "shutdown -r now"
     results = execCmdThruIUCV(rh, rh.userid, strCmd)
@@ -562,8 +630,7 @@ def reboot(rh):
         else:
             rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.reboot, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.reboot, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -588,7 +655,7 @@ def reset(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.reset, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.reset, userid: %s", rh.userid)
 
     # Log off the user
     parms = ["-T", rh.userid]
@@ -639,8 +706,7 @@ def reset(rh):
         else:
             rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.reset, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.reset, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -673,6 +739,7 @@ def showInvLines(rh):
         "--maxwait <secs>")
     rh.printLn("N", "                    --poll <secs>")
     rh.printLn("N", "  python " + rh.cmdName + " PowerVM help")
+    rh.printLn("N", "  python " + rh.cmdName + " PowerVM loggedon")
     rh.printLn("N", "  python " + rh.cmdName + " PowerVM version")
     return
 
@@ -694,6 +761,8 @@ def showOperandLines(rh):
     rh.printLn("N", "      isreachable - Determine whether the " +
         "virtual OS in a virtual machine")
     rh.printLn("N", "                    is reachable")
+    rh.printLn("N", "      loggedon    - List the userids of all the " +
+        "virtual machines logged on")
     rh.printLn("N", "      on          - Log on the virtual machine")
     rh.printLn("N", "      off         - Log off the virtual machine")
     rh.printLn("N", "      pause       - Pause a virtual machine")
@@ -763,8 +832,7 @@ def softDeactivate(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.softDeactivate, userid: " +
-        rh.userid)
+    rh.printSysLog("Enter powerVM.softDeactivate, userid: %s", rh.userid)
 
     strCmd = "echo 'ping'"
     iucvResults = execCmdThruIUCV(rh, rh.userid, strCmd)
@@ -778,13 +846,13 @@ def softDeactivate(rh):
         else:
             # Shutdown failed.  Let CP take down the system
             # after we log the results.
-            rh.printSysLog("powerVM.softDeactivate " + rh.userid +
-                " is unreachable. Treating it as already shutdown.")
+            rh.printSysLog("powerVM.softDeactivate %s is unreachable. "
+                           "Treating it as already shutdown.", rh.userid)
     else:
         # Could not ping the machine.  Treat it as a success
         # after we log the results.
-        rh.printSysLog("powerVM.softDeactivate " + rh.userid +
-            " is unreachable. Treating it as already shutdown.")
+        rh.printSysLog("powerVM.softDeactivate %s is unreachable. Treating it "
+                       "as already shutdown.", rh.userid)
 
     # Tell z/VM to log off the system.
     parms = ["-T", rh.userid]
@@ -815,8 +883,8 @@ def softDeactivate(rh):
         else:
             rh.updateResults(waitResults)
 
-    rh.printSysLog("Exit powerVM.softDeactivate, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.softDeactivate, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -835,7 +903,7 @@ def unpause(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.unpause, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.unpause, userid: %s", rh.userid)
 
     parms = ["-T", rh.userid, "-k", "PAUSE=NO"]
 
@@ -845,8 +913,7 @@ def unpause(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit powerVM.unpause, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.unpause, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -869,7 +936,7 @@ def wait(rh):
        Return code - 0: ok, non-zero: error
     """
 
-    rh.printSysLog("Enter powerVM.wait, userid: " + rh.userid)
+    rh.printSysLog("Enter powerVM.wait, userid: %s", rh.userid)
 
     if (rh.parms['desiredState'] == 'off' or
         rh.parms['desiredState'] == 'on'):
@@ -892,5 +959,5 @@ def wait(rh):
     else:
         rh.updateResults(results)
 
-    rh.printSysLog("Exit powerVM.wait, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit powerVM.wait, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
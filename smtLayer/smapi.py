@@ -62,6 +62,27 @@ keyOpsList = {
     }
 
 
+def checkRequest(rh):
+    """
+    Verify a request which was set up by ReqHandle.setRequest instead of
+    being parsed from a command line.
+
+    Input:
+       Request Handle with the subfunction and the parms set
+
+    Output:
+       Request Handle updated with the verified parms.
+       Return code - 0: ok, non-zero: error
+    """
+
+    rh.printSysLog("Enter smapi.checkRequest")
+
+    generalUtils.checkParms(rh, subfuncHandler, posOpsList, keyOpsList)
+
+    rh.printSysLog("Exit smapi.checkRequest, rc: %s", rh.results['overallRC'])
+    return rh.results['overallRC']
+
+
 def doIt(rh):
     """
     Perform the requested function by invoking the subfunction handler.
@@ -93,7 +114,7 @@ def doIt(rh):
     # Call the subfunction handler
     subfuncHandler[rh.subfunction][1](rh)
 
-    rh.printSysLog("Exit smapi.doIt, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit smapi.doIt, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -166,7 +187,7 @@ def invokeSmapiApi(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)    # Use results from invokeSMCLI
 
-    rh.printSysLog("Exit smapi.invokeCmd, rc: " + str(rh.results['overallRC']))
+    rh.printSysLog("Exit smapi.invokeCmd, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -191,8 +212,8 @@ def parseCmdline(rh):
         msg = msgs.msg['0010'][1] % modId
         rh.printLn("ES", msg)
         rh.updateResults(msgs.msg['0010'][0])
-        rh.printSysLog("Exit smapi.parseCmdLine, rc: " +
-            rh.results['overallRC'])
+        rh.printSysLog("Exit smapi.parseCmdLine, rc: %s",
+                       rh.results['overallRC'])
         return rh.results['overallRC']
 
     if rh.totalParms == 2:
@@ -215,8 +236,7 @@ def parseCmdline(rh):
         rh.argPos = 3               # Begin Parsing at 4th operand
         generalUtils.parseCmdline(rh, posOpsList, keyOpsList)
 
-    rh.printSysLog("Exit smapi.parseCmdLine, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit smapi.parseCmdLine, rc: %s", rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -0,0 +1,267 @@
+# Native SMAPI client for Systems Management Ultra Thin Layer
+#
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import struct
+import threading
+
+from smtLayer import dispatcher
+from smtLayer import msgs
+
+from zvmsdk import config
+from zvmsdk import log
+from zvmsdk import tracing
+
+modId = 'SMC'
+version = '1.0.0'         # Version of this script
+
+# Input parameters of the APIs which can be called natively, following the
+# target identifier. Each parameter is described by the smcli option which
+# gives its value and its type:
+#    's' - length prefixed string
+#    'i' - 4 byte integer
+apiParms = {
+    'Image_Activate': [],
+    'Image_Deactivate': [('-f', 's')],
+    }
+
+_pool = None
+_poolLock = threading.Lock()
+_warnedNotConfigured = False
+
+
+class SMAPIError(Exception):
+    pass
+
+
+class SMAPIConnectionPool(object):
+    """
+    Bounded pool of connections to the SMAPI server.
+
+    The SMAPI server ends the connection once it sent the response of a
+    request, so a connection is opened for each request. The pool bounds the
+    number of requests in flight to the SMAPI server, the other callers wait
+    for a connection to be released.
+    """
+
+    def __init__(self, host, port, user, password, size=4, timeout=300):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+
+    def connect(self):
+        return socket.create_connection((self.host, self.port),
+                                        timeout=self.timeout)
+
+    def request(self, api, target, parms):
+        """
+        Send a request to the SMAPI server and wait for its response.
+
+        Input:
+           API name
+           Target identifier
+           List of (type, value) of the API specific parameters
+
+        Output:
+           Tuple of the rc, the rs and the API specific output data.
+        """
+        data = buildRequest(api, self.user, self.password, target, parms)
+        with self.slots:
+            sock = self.connect()
+            try:
+                sock.sendall(data)
+                # The server replies with the request id once it read the
+                # request, then with the output of the API.
+                recvExact(sock, 4)
+                outLen = struct.unpack('!i', recvExact(sock, 4))[0]
+                output = recvExact(sock, outLen)
+            finally:
+                sock.close()
+
+        if outLen < 12:
+            raise SMAPIError("Output of %d bytes is shorter than the "
+                             "response header" % outLen)
+        rc, rs = struct.unpack('!ii', output[4:12])
+        return rc, rs, output[12:]
+
+
+def packString(value):
+    """
+    Encode a string as its 4 byte length followed by its bytes.
+    """
+    if not isinstance(value, bytes):
+        value = value.encode()
+    return struct.pack('!i', len(value)) + value
+
+
+def buildRequest(api, user, password, target, parms):
+    """
+    Build a SMAPI request buffer.
+
+    Input:
+       API name
+       Authenticated userid and its password
+       Target identifier
+       List of (type, value) of the API specific parameters
+
+    Output:
+       Request buffer, starting with the length of the rest of the request.
+    """
+    body = (packString(api) + packString(user) + packString(password) +
+            packString(target))
+    for parmType, value in parms:
+        if parmType == 'i':
+            body += struct.pack('!i', int(value))
+        else:
+            body += packString(value)
+    return struct.pack('!i', len(body)) + body
+
+
+def recvExact(sock, size):
+    """
+    Receive exactly size bytes from the socket.
+    """
+    data = b''
+    while len(data) < size:
+        block = sock.recv(size - len(data))
+        if not block:
+            raise SMAPIError("Connection closed by the SMAPI server after "
+                             "%d of %d bytes" % (len(data), size))
+        data += block
+    return data
+
+
+def getPool():
+    """
+    Get the connection pool to the SMAPI server set up in the [smapi]
+    configuration section.
+    """
+    global _pool
+    with _poolLock:
+        if _pool is None:
+            conf = config.CONF.smapi
+            _pool = SMAPIConnectionPool(conf.host, conf.port, conf.user,
+                                        conf.password, size=conf.pool_size,
+                                        timeout=conf.timeout)
+    return _pool
+
+
+def isNative(api):
+    """
+    Determine whether an API is to be called natively instead of with smcli.
+    """
+    global _warnedNotConfigured
+    if api not in apiParms:
+        return False
+    conf = config.CONF.smapi
+    native = conf.native_apis or ''
+    if api not in [name.strip() for name in native.split(',')]:
+        return False
+    if not (conf.host and conf.user and conf.password):
+        # The TCP/IP listener of the SMAPI server requires credentials,
+        # the APIs are then still called with smcli.
+        if not _warnedNotConfigured:
+            log.LOG.warning("The [smapi] host, user and password options "
+                            "are required to call SMAPI natively, the "
+                            "native_apis are called with smcli")
+            _warnedNotConfigured = True
+        return False
+    return True
+
+
+def parseSmcliParms(api, parms):
+    """
+    Convert the smcli parameters of an API to the SMAPI request parameters.
+
+    Input:
+       API name
+       smcli parameters as an array, e.g. ['-T', 'userid', '-f', 'IMMED']
+
+    Output:
+       Tuple of the target identifier and the list of (type, value) of
+       the API specific parameters.
+    """
+    options = {}
+    words = []
+    for parm in parms:
+        # Some callers pass an option and its value in one parameter
+        words.extend(parm.split(' ', 1) if parm.startswith('-') else [parm])
+    for i in range(0, len(words) - 1, 2):
+        options[words[i]] = words[i + 1]
+
+    apiParmList = []
+    for option, parmType in apiParms[api]:
+        apiParmList.append((parmType, options.get(option, '')))
+    return options.get('-T', ''), apiParmList
+
+
+def invokeSMAPI(rh, api, parms, hideInLog=[]):
+    """
+    Invoke a SMAPI API through the SMAPI server socket.
+
+    Input:
+       Request Handle
+       API name,
+       SMCLI parms as an array
+       (Optional) List of parms (by index) to hide in
+          sysLog by replacing the parm with "<hidden>".
+
+    Output:
+       Dictionary containing the same values as vmUtils.invokeSMCLI:
+          overallRC - overall return code, 0: success, non-zero: failure
+          rc        - RC returned from SMAPI if overallRC = 0.
+          rs        - RS returned from SMAPI if overallRC = 0.
+          errno     - Always 0.
+          response  - Empty on success, an error message otherwise.
+          strError  - Always empty.
+    """
+    logParms = list(parms)
+    for i in hideInLog:
+        logParms[i] = '<hidden>'
+    strCmd = "SMAPI " + api + " " + " ".join(logParms)
+    rh.printSysLog("Enter smapiClient.invokeSMAPI, userid: %s, function: %s, "
+                   "parms: %s", rh.userid, api, logParms)
+
+    results = {
+              'overallRC': 0,
+              'rc': 0,
+              'rs': 0,
+              'errno': 0,
+              'response': '',
+              'strError': '',
+             }
+
+    try:
+        target, apiParmList = parseSmcliParms(api, parms)
+        with dispatcher.getCallLimiter().slot(), tracing.timed('smapi'):
+            rc, rs, output = getPool().request(api, target, apiParmList)
+        results['rc'] = rc
+        results['rs'] = rs
+        if rc != 0:
+            results['overallRC'] = 8
+            results['response'] = msgs.msg['0300'][1] % (modId,
+                    api, results['overallRC'], rc, rs, 0, strCmd, '')
+    except Exception as e:
+        results = dict(msgs.msg['0305'][0])
+        results['response'] = msgs.msg['0305'][1] % (modId, strCmd,
+            type(e).__name__, str(e))
+
+    rh.printSysLog("Exit smapiClient.invokeSMAPI, rc: %s",
+                   results['overallRC'])
+    return results
@@ -14,9 +14,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
 from time import time
 
+from smtLayer import dispatcher
 from smtLayer.ReqHandle import ReqHandle
+from smtLayer import vmUtils
+from zvmsdk import cmdrunner
 from zvmsdk import config
 from zvmsdk import log
 
@@ -42,6 +46,7 @@ class SMT(object):
 
         self.reqIdPrefix = int(time() * 100)
         self.reqCnt = 0           # Number of requests so far
+        self.reqCntLock = threading.Lock()
 
         logger = log.Logger('SMT')
         logger.setup(log_dir=config.CONF.logging.log_dir,
@@ -73,12 +78,18 @@ class SMT(object):
 
         self.captureLogs = True   # Begin capturing & returning Syslog entries
 
-    def request(self, requestData, **kwArgs):
+    def call(self, function, subfunction='', userid='', parms=None,
+             **kwArgs):
         """
-        Process a request.
+        Process a request given as its separate parts, which avoids
+        building a command string for SMT to parse it again.
 
         Input:
-           Request as either a string or a list.
+           Function, e.g. 'PowerVM'
+           Subfunction, e.g. 'softoff'
+           Target userid, empty for the functions which do not have one
+           Dictionary of the parms, keyed by their ReqHandle.parms name,
+              e.g. {'wait': True, 'maxWait': 300, 'poll': 15}
            captureLogs=<True|False>
               Enables or disables log capture per request.
               This overrides the value from SMT.
@@ -90,7 +101,45 @@ class SMT(object):
               for information on the contents of the dictionary.
         """
 
-        self.reqCnt = self.reqCnt + 1
+        rh = self.newReqHandle(**kwArgs)
+
+        rh.setRequest(function, subfunction, userid, parms)
+        if rh.results['overallRC'] == 0:
+            rh.printSysLog("Processing: %s", rh.requestString)
+            dispatcher.getDispatcher().dispatch(rh)
+
+        return rh.results
+
+    def getMetrics(self):
+        """
+        Get the metrics of the request dispatcher, of the SMAPI calls, of
+        the punch queue and of the command runner when it is enabled.
+
+        Output:
+           Dictionary of the metric values by name.
+        """
+
+        metrics = dispatcher.getMetrics()
+        metrics.update(vmUtils.punchQueue.getMetrics())
+        runner = cmdrunner.get_runner()
+        if runner is not None:
+            metrics.update(runner.get_stats())
+        return metrics
+
+    def newReqHandle(self, **kwArgs):
+        """
+        Create the request handle of a new request.
+
+        Input:
+           captureLogs=<True|False> and requestId=<id>, as for request().
+
+        Output:
+           Request handle.
+        """
+
+        with self.reqCntLock:
+            self.reqCnt = self.reqCnt + 1
+            reqCnt = self.reqCnt
 
         # Determine whether the request will be capturing logs
         if 'captureLogs' in kwArgs.keys():
@@ -102,16 +151,35 @@ class SMT(object):
         if 'requestId' in kwArgs.keys():
             requestId = kwArgs['requestId']
         else:
-            requestId = str(self.reqIdPrefix) + str(self.reqCnt)
+            requestId = str(self.reqIdPrefix) + str(reqCnt)
 
-        rh = ReqHandle(
+        return ReqHandle(
             requestId=requestId,
             captureLogs=logFlag,
             smt=self)
 
+    def request(self, requestData, **kwArgs):
+        """
+        Process a request.
+
+        Input:
+           Request as either a string or a list.
+           captureLogs=<True|False>
+              Enables or disables log capture per request.
+              This overrides the value from SMT.
+           requestId=<id> to pass a value for the request Id instead of
+              using one generated by SMT.
+
+        Output:
+           Dictionary containing the results.  See ReqHandle.buildReturnDict()
+              for information on the contents of the dictionary.
+        """
+
+        rh = self.newReqHandle(**kwArgs)
+
         rh.parseCmdline(requestData)
         if rh.results['overallRC'] == 0:
-            rh.printSysLog("Processing: " + rh.requestString)
-            rh.driveFunction()
+            rh.printSysLog("Processing: %s", rh.requestString)
+            dispatcher.getDispatcher().dispatch(rh)
 
         return rh.results
@@ -0,0 +1,97 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from smtLayer import ReqHandle
+from smtLayer.tests.unit import base
+
+
+class SMTReqHandleTestCase(base.SMTTestCase):
+    """Test cases for ReqHandle.py in smtLayer."""
+
+    def _newReqHandle(self):
+        return ReqHandle.ReqHandle(captureLogs=False, smt=mock.Mock())
+
+    def test_setRequest_same_as_parseCmdline(self):
+        parsed = self._newReqHandle()
+        parsed.parseCmdline("PowerVM fakeuid softoff --wait --maxwait 300 "
+                            "--poll 10")
+        rh = self._newReqHandle()
+        rh.setRequest('PowerVM', 'softoff', 'fakeuid',
+                      {'wait': True, 'maxWait': '300', 'poll': 10})
+        self.assertEqual(0, rh.results['overallRC'])
+        self.assertEqual((parsed.function, parsed.subfunction,
+                          parsed.userid, parsed.parms),
+                         (rh.function, rh.subfunction, rh.userid, rh.parms))
+
+    def test_setRequest_positional_parm(self):
+        rh = self._newReqHandle()
+        rh.setRequest('getHost', 'diskpoolspace', parms={'poolName': 'pool'})
+        self.assertEqual(0, rh.results['overallRC'])
+        self.assertEqual({'poolName': 'pool'}, rh.parms)
+
+    def test_setRequest_unknown_function(self):
+        rh = self._newReqHandle()
+        rh.setRequest('fakeFunc', 'status', 'fakeuid')
+        self.assertEqual((4, 4, 7), (rh.results['overallRC'],
+                                     rh.results['rc'], rh.results['rs']))
+
+    def test_setRequest_unknown_subfunction(self):
+        rh = self._newReqHandle()
+        rh.setRequest('PowerVM', 'fakesub', 'fakeuid')
+        self.assertEqual((4, 4, 11), (rh.results['overallRC'],
+                                      rh.results['rc'], rh.results['rs']))
+
+    def test_setRequest_unknown_parm(self):
+        rh = self._newReqHandle()
+        rh.setRequest('PowerVM', 'status', 'fakeuid', {'maxWait': 300})
+        self.assertEqual((4, 4, 5), (rh.results['overallRC'],
+                                     rh.results['rc'], rh.results['rs']))
+
+    def test_setRequest_parm_not_integer(self):
+        rh = self._newReqHandle()
+        rh.setRequest('PowerVM', 'off', 'fakeuid', {'maxWait': 'abc'})
+        self.assertEqual((4, 4, 4), (rh.results['overallRC'],
+                                     rh.results['rc'], rh.results['rs']))
+
+    def test_printSysLog_disabled_does_not_format(self):
+        rh = self._newReqHandle()
+        rh.logDebug = False
+        arg = mock.MagicMock()
+        rh.printSysLog("Enter test.func, parm: %s", arg)
+        self.assertFalse(arg.__str__.called)
+        self.assertEqual([], rh.logRecords)
+
+    @mock.patch('time.time')
+    def test_getLogEntries(self, time):
+        time.side_effect = [10.0, 10.5, 10.75]
+        rh = ReqHandle.ReqHandle(captureLogs=True, smt=mock.Mock(),
+                                 requestId='req1')
+        rh.logDebug = False
+        rh.printSysLog("Enter test.func, userid: %s", 'fakeuid')
+        rh.printSysLog("100% done")
+        rh.printSysLog("Exit test.func, rc: %s", 0)
+        self.assertEqual(["req1: Enter test.func, userid: fakeuid",
+                          "req1: 100% done",
+                          "req1: Exit test.func, rc: 0 (750.000 ms)"],
+                         rh.getLogEntries())
+
+    def test_parseCmdline_captured_logs(self):
+        rh = ReqHandle.ReqHandle(captureLogs=True, smt=mock.Mock(),
+                                 requestId='req1')
+        rh.parseCmdline("PowerVM fakeuid status")
+        self.assertEqual(rh.getLogEntries(), rh.results['logEntries'])
+        self.assertTrue(rh.results['logEntries'][-1].startswith(
+            "req1: Exit ReqHandle.parseCmdline, rc: 0 ("))
@@ -0,0 +1,137 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import mock
+
+from smtLayer import dispatcher
+from smtLayer.tests.unit import base
+
+
+class SMTDispatcherTestCase(base.SMTTestCase):
+    """Test cases for dispatcher.py in smtLayer."""
+
+    def _newReqHandle(self, function, subfunction, userid, driven,
+                      parms=None):
+        rh = mock.Mock()
+        rh.function = function
+        rh.subfunction = subfunction
+        rh.userid = userid
+        rh.parms = parms or {}
+
+        def driveFunction():
+            driven.append(('start', userid))
+            time.sleep(0.05)
+            driven.append(('end', userid))
+
+        rh.driveFunction.side_effect = driveFunction
+        return rh
+
+    def _dispatchAll(self, disp, handles):
+        threads = [threading.Thread(target=disp.dispatch, args=(rh,))
+                   for rh in handles]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+    def test_dispatch_same_userid_serialized(self):
+        disp = dispatcher.Dispatcher()
+        driven = []
+        self._dispatchAll(disp, [
+            self._newReqHandle('CHANGEVM', 'PUNCHFILE', 'USER1', driven),
+            self._newReqHandle('DELETEVM', 'DIRECTORY', 'USER1', driven)])
+        self.assertEqual(['start', 'end', 'start', 'end'],
+                         [step for step, userid in driven])
+        metrics = disp.getMetrics()
+        self.assertEqual(2, metrics['requests_total'])
+        self.assertEqual(0, metrics['requests_active'])
+        self.assertEqual(1, metrics['lock_waits_total'])
+        self.assertEqual(0, metrics['locked_userids'])
+
+    def test_dispatch_different_userids_parallel(self):
+        disp = dispatcher.Dispatcher()
+        driven = []
+        self._dispatchAll(disp, [
+            self._newReqHandle('CHANGEVM', 'PUNCHFILE', 'USER1', driven),
+            self._newReqHandle('DELETEVM', 'DIRECTORY', 'USER2', driven)])
+        self.assertEqual(['start', 'start', 'end', 'end'],
+                         [step for step, userid in driven])
+        self.assertEqual(0, disp.getMetrics()['lock_waits_total'])
+
+    def test_dispatch_queries_not_serialized(self):
+        disp = dispatcher.Dispatcher()
+        driven = []
+        self._dispatchAll(disp, [
+            self._newReqHandle('POWERVM', 'SOFTOFF', 'USER1', driven),
+            self._newReqHandle('POWERVM', 'STATUS', 'USER1', driven),
+            self._newReqHandle('GETVM', 'DIRECTORY', 'USER1', driven)])
+        self.assertEqual(['start', 'start', 'start', 'end', 'end', 'end'],
+                         [step for step, userid in driven])
+
+    def test_dispatch_host_smapi_not_serialized(self):
+        disp = dispatcher.Dispatcher()
+        driven = []
+        self._dispatchAll(disp, [
+            self._newReqHandle('SMAPI', 'API', 'SMTUSER', driven,
+                {'apiName': 'System_Image_Performance_Query'}),
+            self._newReqHandle('SMAPI', 'API', 'SMTUSER', driven,
+                {'apiName': 'Virtual_Network_Vswitch_Query'}),
+            self._newReqHandle('SMAPI', 'API', 'SMTUSER', driven,
+                {'apiName': 'Virtual_Network_Vswitch_Set_Extended'}),
+            self._newReqHandle('SMAPI', 'API', 'NAMELIST', driven,
+                {'apiName': 'Name_List_Add'})])
+        self.assertEqual(['start'] * 4 + ['end'] * 4,
+                         [step for step, userid in driven])
+        self.assertEqual(0, disp.getMetrics()['lock_waits_total'])
+
+    def test_dispatch_guest_smapi_serialized(self):
+        disp = dispatcher.Dispatcher()
+        driven = []
+        self._dispatchAll(disp, [
+            self._newReqHandle('SMAPI', 'API', 'USER1', driven,
+                {'apiName': 'Image_Definition_Update_DM'}),
+            self._newReqHandle('SMAPI', 'API', 'USER1', driven,
+                {'apiName': 'Virtual_Network_Adapter_Create_Extended_DM'})])
+        self.assertEqual(['start', 'end', 'start', 'end'],
+                         [step for step, userid in driven])
+
+    def test_CallLimiter_bounds_calls(self):
+        limiter = dispatcher.CallLimiter(1)
+        active = []
+
+        def call():
+            with limiter.slot():
+                active.append(limiter.getMetrics()['smapi_calls_active'])
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=call) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual([1, 1, 1], active)
+        metrics = limiter.getMetrics()
+        self.assertEqual(3, metrics['smapi_calls_total'])
+        self.assertEqual(2, metrics['smapi_call_waits_total'])
+        self.assertEqual(0, metrics['smapi_calls_active'])
+
+    def test_CallLimiter_unlimited(self):
+        limiter = dispatcher.CallLimiter(0)
+        with limiter.slot():
+            with limiter.slot():
+                self.assertEqual(2,
+                    limiter.getMetrics()['smapi_calls_active'])
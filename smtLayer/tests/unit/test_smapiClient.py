@@ -0,0 +1,174 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import socket
+import struct
+import threading
+
+from smtLayer import ReqHandle
+from smtLayer import smapiClient
+from smtLayer import vmUtils
+from smtLayer.tests.unit import base
+
+
+class FakeSMAPIServer(object):
+    """SMAPI server answering each request with the configured rc and rs."""
+
+    def __init__(self, rc=0, rs=0, data=b''):
+        self.rc = rc
+        self.rs = rs
+        self.data = data
+        self.requests = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        requestId = 0
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except socket.error:
+                return
+            length = struct.unpack('!i', smapiClient.recvExact(conn, 4))[0]
+            self.requests.append(self.parse(
+                smapiClient.recvExact(conn, length)))
+            requestId += 1
+            conn.sendall(struct.pack('!i', requestId))
+            output = struct.pack('!iii', requestId, self.rc,
+                                 self.rs) + self.data
+            conn.sendall(struct.pack('!i', len(output)) + output)
+            conn.close()
+
+    def parse(self, body):
+        fields = []
+        while body:
+            length = struct.unpack('!i', body[:4])[0]
+            fields.append(body[4:4 + length].decode())
+            body = body[4 + length:]
+        return fields
+
+    def close(self):
+        self.sock.close()
+
+
+class SMTSmapiClientTestCase(base.SMTTestCase):
+    """Test cases for smapiClient.py in smtLayer."""
+
+    def setUp(self):
+        super(SMTSmapiClientTestCase, self).setUp()
+        self.rh = ReqHandle.ReqHandle(captureLogs=False)
+        self.rh.userid = 'FAKEUID'
+
+    def _pool(self, server):
+        pool = smapiClient.SMAPIConnectionPool('127.0.0.1', server.port,
+                                               'ADMIN', 'secret', size=2,
+                                               timeout=5)
+        patcher = mock.patch.object(smapiClient, 'getPool',
+                                    return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return pool
+
+    def test_buildRequest(self):
+        data = smapiClient.buildRequest('Image_Deactivate', 'ADMIN', 'pw',
+                                        'FAKEUID', [('s', 'IMMED'),
+                                                    ('i', 5)])
+        body = (b'\x00\x00\x00\x10Image_Deactivate'
+                b'\x00\x00\x00\x05ADMIN\x00\x00\x00\x02pw'
+                b'\x00\x00\x00\x07FAKEUID\x00\x00\x00\x05IMMED'
+                b'\x00\x00\x00\x05')
+        self.assertEqual(struct.pack('!i', len(body)) + body, data)
+
+    def test_parseSmcliParms(self):
+        self.assertEqual(('FAKEUID', [('s', 'IMMED')]),
+                         smapiClient.parseSmcliParms(
+                             'Image_Deactivate', ['-T', 'FAKEUID',
+                                                  '-f IMMED']))
+        self.assertEqual(('FAKEUID', [('s', '')]),
+                         smapiClient.parseSmcliParms(
+                             'Image_Deactivate', ['-T', 'FAKEUID']))
+
+    def test_invokeSMAPI(self):
+        server = FakeSMAPIServer(data=b'\x00\x00\x00\x01')
+        self.addCleanup(server.close)
+        self._pool(server)
+        results = smapiClient.invokeSMAPI(self.rh, 'Image_Deactivate',
+                                          ['-T', 'FAKEUID', '-f', 'IMMED'])
+        self.assertEqual(0, results['overallRC'])
+        self.assertEqual([['Image_Deactivate', 'ADMIN', 'secret', 'FAKEUID',
+                           'IMMED']], server.requests)
+
+    def test_invokeSMAPI_failed(self):
+        server = FakeSMAPIServer(rc=200, rs=12)
+        self.addCleanup(server.close)
+        self._pool(server)
+        results = smapiClient.invokeSMAPI(self.rh, 'Image_Activate',
+                                          ['-T', 'FAKEUID'])
+        self.assertEqual((8, 200, 12), (results['overallRC'], results['rc'],
+                                        results['rs']))
+        self.assertIn('Image_Activate', results['response'])
+
+    def test_invokeSMAPI_connection_error(self):
+        # a port nothing listens on
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        server = mock.Mock(port=sock.getsockname()[1])
+        sock.close()
+        self._pool(server)
+        results = smapiClient.invokeSMAPI(self.rh, 'Image_Activate',
+                                          ['-T', 'FAKEUID'])
+        self.assertEqual((99, 305), (results['overallRC'], results['rc']))
+
+    def _setCredentials(self, host='10.0.0.1', user='SMAPIUSR',
+                        password='secret'):
+        conf = smapiClient.config.CONF.smapi
+        for name, value in (('host', host), ('user', user),
+                            ('password', password)):
+            self.addCleanup(setattr, conf, name, getattr(conf, name))
+            setattr(conf, name, value)
+
+    def test_isNative_not_configured(self):
+        conf = smapiClient.config.CONF.smapi
+        self.addCleanup(setattr, conf, 'native_apis', conf.native_apis)
+        conf.native_apis = 'Image_Activate, Image_Deactivate'
+        self._setCredentials(password='')
+        self.assertFalse(smapiClient.isNative('Image_Activate'))
+
+        self._setCredentials()
+        self.assertTrue(smapiClient.isNative('Image_Activate'))
+        self.assertFalse(smapiClient.isNative('Image_Query_DM'))
+
+    @mock.patch.object(smapiClient, 'invokeSMAPI')
+    @mock.patch('subprocess.check_output')
+    def test_invokeSMCLI_native_api(self, check_output, invokeSMAPI):
+        native = smapiClient.config.CONF.smapi.native_apis
+        self.addCleanup(setattr, smapiClient.config.CONF.smapi,
+                        'native_apis', native)
+        smapiClient.config.CONF.smapi.native_apis = 'Image_Activate'
+        self._setCredentials()
+
+        vmUtils.invokeSMCLI(self.rh, 'Image_Activate', ['-T', 'FAKEUID'])
+        invokeSMAPI.assert_called_once_with(self.rh, 'Image_Activate',
+                                            ['-T', 'FAKEUID'], hideInLog=[])
+        check_output.assert_not_called()
+
+        check_output.return_value = b'0 0 0 (details) None\n'
+        vmUtils.invokeSMCLI(self.rh, 'Image_Deactivate', ['-T', 'FAKEUID'])
+        self.assertTrue(check_output.called)
@@ -48,3 +48,280 @@ class SMTvmUtilsTestCase(base.SMTTestCase):
             exec_cmd.assert_called_once_with(
                 ['sudo', '/opt/zthin/bin/smcli', 'Image_Query_DM',
                  '--addRCheader', '-T', 'fakeuid'], close_fds=True)
+
+    def test_getLoggedOnUsers(self):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        with mock.patch('subprocess.check_output') as exec_cmd:
+            exec_cmd.return_value = (
+                b"FTPSERVE - DSC , TEST0001 - DSC , OPERATOR - 0009\n"
+                b"Test0002 - DSC\n"
+                b"VSM     - TCPIP\n")
+            res = vmUtils.getLoggedOnUsers(rh)
+            exec_cmd.assert_called_once_with(
+                ['sudo', '/sbin/vmcp', '-b', '65536', 'query', 'names'],
+                close_fds=True, stderr=mock.ANY)
+        self.assertEqual(0, res['overallRC'])
+        self.assertEqual(set(['FTPSERVE', 'TEST0001', 'OPERATOR',
+                              'TEST0002', 'VSM']), res['users'])
+
+    def test_getLoggedOnUsers_buffer_too_small(self):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        with mock.patch('subprocess.check_output') as exec_cmd:
+            exec_cmd.side_effect = [
+                vmUtils.CalledProcessError(2, 'vmcp', b'truncated'),
+                b"TEST0001 - DSC , TEST0002 - DSC\n"]
+            res = vmUtils.getLoggedOnUsers(rh)
+            self.assertEqual(
+                ['sudo', '/sbin/vmcp', '-b', '1048576', 'query', 'names'],
+                exec_cmd.call_args[0][0])
+        self.assertEqual(0, res['overallRC'])
+        self.assertEqual(set(['TEST0001', 'TEST0002']), res['users'])
+
+        with mock.patch('subprocess.check_output') as exec_cmd:
+            exec_cmd.side_effect = vmUtils.CalledProcessError(
+                2, 'vmcp', b'truncated')
+            res = vmUtils.getLoggedOnUsers(rh)
+            self.assertEqual(2, exec_cmd.call_count)
+        self.assertEqual((3, 415, 2), (res['overallRC'], res['rc'],
+                                       res['rs']))
+
+    def test_getLoggedOnUsers_failed(self):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        with mock.patch('subprocess.check_output') as exec_cmd:
+            exec_cmd.side_effect = vmUtils.CalledProcessError(
+                1, 'vmcp', b'error')
+            res = vmUtils.getLoggedOnUsers(rh)
+        self.assertEqual((3, 415, 1), (res['overallRC'], res['rc'],
+                                       res['rs']))
+
+    @mock.patch.object(vmUtils, 'queryLoggedOnUsers')
+    def test_VMStatePoller_one_query_per_tick(self, query):
+        query.side_effect = [set(), set(['USER1']), set(['USER1', 'USER2'])]
+        poller = vmUtils.VMStatePoller(minInterval=0.01)
+        results = {}
+
+        def waitFor(userid):
+            results[userid] = poller.wait(userid, 'on', 1, 5)
+
+        threads = [vmUtils.threading.Thread(target=waitFor, args=(u,))
+                   for u in ('user1', 'user2')]
+        # Hold the poller thread until both waiters are registered, so
+        # that the first tick covers both of them.
+        poller.thread = vmUtils.threading.Thread(target=poller.run)
+        for t in threads:
+            t.start()
+        deadline = vmUtils.time.time() + 5
+        with poller.cond:
+            while (len(poller.waiters) < 2 and
+                   vmUtils.time.time() < deadline):
+                poller.cond.wait(0.01)
+            poller.thread.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual({'user1': (True, None), 'user2': (True, None)},
+                         results)
+        self.assertEqual(3, query.call_count)
+        self.assertIsNone(poller.thread)
+
+    @mock.patch.object(vmUtils, 'queryLoggedOnUsers')
+    def test_VMStatePoller_timeout(self, query):
+        query.return_value = set(['USER1'])
+        poller = vmUtils.VMStatePoller(minInterval=0.01)
+        self.assertEqual((False, None), poller.wait('user1', 'off', 0.02, 0.1))
+        self.assertEqual([], poller.waiters)
+
+    @mock.patch.object(vmUtils, 'queryLoggedOnUsers')
+    def test_waitForVMState_query_failed(self, query):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        query.side_effect = vmUtils.CalledProcessError(2, 'vmcp', 'error')
+        res = vmUtils.waitForVMState(rh, 'user1', 'on', maxQueries=2,
+                                     sleepSecs=1)
+        self.assertEqual((3, 415, 2), (res['overallRC'], res['rc'],
+                                       res['rs']))
+
+    @mock.patch.object(vmUtils, 'queryLoggedOnUsers')
+    def test_waitForVMState_off(self, query):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        query.return_value = set(['USER2'])
+        res = vmUtils.waitForVMState(rh, 'user1', 'off', maxQueries=2,
+                                     sleepSecs=1)
+        self.assertEqual(0, res['overallRC'])
+
+    @mock.patch('subprocess.check_output')
+    def test_PunchQueue_serializes_punches(self, exec_cmd):
+        queue = vmUtils.PunchQueue()
+        active = []
+        overlap = []
+
+        def punch(cmd, **kwArgs):
+            active.append(cmd)
+            overlap.append(len(active))
+            vmUtils.time.sleep(0.01)
+            active.remove(cmd)
+            return b'punched'
+
+        exec_cmd.side_effect = punch
+        results = []
+        threads = [vmUtils.threading.Thread(
+                       target=lambda f=f: results.append(queue.punch(
+                           ['vmur', 'punch', f])))
+                   for f in ('f1', 'f2', 'f3')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual([1, 1, 1], overlap)
+        self.assertEqual([b'punched'] * 3, [r[0] for r in results])
+        metrics = queue.getMetrics()
+        self.assertEqual(3, metrics['punches_total'])
+        self.assertEqual(0, metrics['punch_queue_depth'])
+        self.assertIsNone(queue.thread)
+
+    @mock.patch.object(vmUtils.time, 'sleep')
+    @mock.patch('subprocess.check_output')
+    def test_PunchQueue_retries_other_process(self, exec_cmd, sleep):
+        busy = vmUtils.CalledProcessError(
+            1, 'vmur', b'A concurrent instance of vmur is already active')
+        exec_cmd.side_effect = [busy, busy, b'punched']
+        out, error, waited = vmUtils.PunchQueue().punch(['vmur'])
+        self.assertEqual((b'punched', None), (out, error))
+        self.assertEqual([mock.call(1), mock.call(2)], sleep.call_args_list)
+
+    @mock.patch.object(vmUtils.time, 'sleep')
+    @mock.patch('subprocess.check_output')
+    def test_punch2reader_vmur_busy(self, exec_cmd, sleep):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        exec_cmd.side_effect = vmUtils.CalledProcessError(
+            1, 'vmur', b'A concurrent instance of vmur is already active')
+        vmUtils.punch2reader(rh, 'user1', '/tmp/file', 'X')
+        self.assertEqual((4, 9, 406), (rh.results['overallRC'],
+                                       rh.results['rc'], rh.results['rs']))
+        self.assertEqual(5, exec_cmd.call_count)
+
+    @mock.patch('subprocess.check_output')
+    def test_punch2reader_vmur_failed(self, exec_cmd):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        exec_cmd.side_effect = vmUtils.CalledProcessError(
+            1, 'vmur', b'invalid file')
+        vmUtils.punch2reader(rh, 'user1', '/tmp/file', 'X')
+        self.assertEqual(401, rh.results['rs'])
+        self.assertEqual(1, exec_cmd.call_count)
+
+    @mock.patch.object(vmUtils.uuid, 'uuid4')
+    @mock.patch('subprocess.check_output')
+    def test_execCmdsThruIUCV(self, exec_cmd, uuid4):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        uuid4.return_value.hex = 'abc'
+        exec_cmd.return_value = (b'/root\n\nSMTCMDabc 0 0\n'
+                                 b'no such file\n\nSMTCMDabc 1 2\n')
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', ['pwd', 'ls x'],
+                                       stopOnError=True)
+        self.assertEqual(0, res['overallRC'])
+        self.assertEqual([{'rc': 0, 'response': '/root\n'},
+                          {'rc': 2, 'response': 'no such file\n'}],
+                         res['cmdResults'])
+        script = exec_cmd.call_args[0][0][3]
+        self.assertEqual(1, exec_cmd.call_count)
+        self.assertIn("(pwd) 2>&1; rc=$?; printf '\\nSMTCMDabc 0 %d\\n' $rc; "
+                      "[ $rc -eq 0 ] || exit 0; (ls x) 2>&1", script)
+
+    @mock.patch.object(vmUtils.uuid, 'uuid4')
+    @mock.patch('subprocess.check_output')
+    def test_execCmdsThruIUCV_missing_result(self, exec_cmd, uuid4):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        uuid4.return_value.hex = 'abc'
+        # the second command ended the script
+        exec_cmd.return_value = b'/root\n\nSMTCMDabc 0 0\n'
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', ['pwd', 'exit', 'ls'])
+        self.assertEqual((2, 8, 99), (res['overallRC'], res['rc'],
+                                      res['rs']))
+        self.assertIn('ULTVMU0320E', res['response'])
+        self.assertNotIn('cmdResults', res)
+
+        # the output of the first command holds a marker line
+        exec_cmd.return_value = (b'\nSMTCMDabc 1 0\n\nSMTCMDabc 0 0\n'
+                                 b'\nSMTCMDabc 1 0\n')
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', ['cat x', 'ls'])
+        self.assertEqual(2, res['overallRC'])
+
+        # the commands following a failed command are not run
+        exec_cmd.return_value = b'no such file\n\nSMTCMDabc 0 2\n'
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', ['ls x', 'pwd'],
+                                       stopOnError=True)
+        self.assertEqual(0, res['overallRC'])
+        self.assertEqual([{'rc': 2, 'response': 'no such file\n'}],
+                         res['cmdResults'])
+
+    def test_splitIUCVScript(self):
+        steps = ['a' * 400, 'b' * 400, 'c' * 400, 'd' * 1000, 'e']
+        self.assertEqual([(0, 2), (2, 3), (3, 4), (4, 5)],
+                         vmUtils.splitIUCVScript(steps))
+        self.assertEqual([], vmUtils.splitIUCVScript([]))
+
+    @mock.patch.object(vmUtils.uuid, 'uuid4')
+    @mock.patch('subprocess.check_output')
+    def test_execCmdsThruIUCV_split(self, exec_cmd, uuid4):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        uuid4.return_value.hex = 'abc'
+        cmds = ['echo %s' % ('x' * 300) for i in range(4)]
+        exec_cmd.side_effect = [
+            b'out0\n\nSMTCMDabc 0 0\nout1\n\nSMTCMDabc 1 0\n',
+            b'out2\n\nSMTCMDabc 2 1\n']
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', cmds, stopOnError=True)
+        self.assertEqual(0, res['overallRC'])
+        self.assertEqual([0, 0, 1], [r['rc'] for r in res['cmdResults']])
+        self.assertEqual('out2\n', res['cmdResults'][2]['response'])
+        # the last command is not sent after the failed one
+        self.assertEqual(2, exec_cmd.call_count)
+        for call in exec_cmd.call_args_list:
+            self.assertLessEqual(len(call[0][0][3]), vmUtils.iucvMaxCmdLen)
+        self.assertIn("(%s) 2>&1" % cmds[2],
+                      exec_cmd.call_args_list[1][0][0][3])
+
+    @mock.patch('subprocess.check_output')
+    def test_execCmdsThruIUCV_iucv_failed(self, exec_cmd):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        exec_cmd.side_effect = vmUtils.CalledProcessError(
+            4, 'iucvclnt', b'Return code 4, Reason code 101.')
+        res = vmUtils.execCmdsThruIUCV(rh, 'user1', ['pwd', 'ls'])
+        self.assertEqual((2, 4, 101), (res['overallRC'], res['rc'],
+                                       res['rs']))
+        self.assertNotIn('cmdResults', res)
+
+    @mock.patch.object(vmUtils.time, 'sleep')
+    @mock.patch.object(vmUtils, 'execCmdThruIUCV')
+    def test_setDevicesState_retries_pending(self, iucv, sleep):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        iucv.side_effect = [
+            {'overallRC': 0, 'rc': 0, 'rs': 0,
+             'response': '0100 0\n0101 1 Device busy'},
+            {'overallRC': 0, 'rc': 0, 'rs': 0, 'response': '0101 0'}]
+        res = vmUtils.setDevicesState(rh, 'user1', ['100', '0101'], False)
+        self.assertEqual(0, res['overallRC'])
+        self.assertIn('for d in 0100 0101;', iucv.call_args_list[0][0][2])
+        self.assertIn('for d in 0101;', iucv.call_args_list[1][0][2])
+        sleep.assert_called_once_with(0.1)
+
+    @mock.patch.object(vmUtils.time, 'sleep')
+    @mock.patch.object(vmUtils, 'execCmdThruIUCV')
+    def test_setDevicesState_timeout(self, iucv, sleep):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        iucv.return_value = {'overallRC': 0, 'rc': 0, 'rs': 0,
+                             'response': '0100 1 Device not found'}
+        res = vmUtils.setDevicesState(rh, 'user1', ['100'], True,
+                                      timeout=0)
+        self.assertEqual((2, 8, 1), (res['overallRC'], res['rc'],
+                                     res['rs']))
+        self.assertIn('Device not found', res['response'])
+        sleep.assert_not_called()
+
+    @mock.patch.object(vmUtils, 'execCmdThruIUCV')
+    def test_disableEnableDisk_iucv_failed(self, iucv):
+        rh = ReqHandle.ReqHandle(captureLogs=False)
+        iucv.return_value = {'overallRC': 2, 'rc': 4, 'rs': 101,
+                             'response': 'IUCV socket error'}
+        res = vmUtils.disableEnableDisk(rh, 'user1', '100', '-d')
+        self.assertEqual(iucv.return_value, res)
+        self.assertIn('chccwdev -d $d', iucv.call_args[0][2])
@@ -14,16 +14,38 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import re
 import subprocess
 from subprocess import CalledProcessError
+import threading
 import time
+import uuid
 
+from smtLayer import dispatcher
 from smtLayer import msgs
+from smtLayer import smapiClient
+
+from zvmsdk import cmdrunner
+from zvmsdk import tracing
 
 modId = 'VMU'
 version = '1.0.0'         # Version of this script
 
+# Max length of a command sent through IUCV. The IUCV server of the virtual
+# machine reads the client userid, its version and the command into a 1024
+# bytes buffer, then appends "  2>&1; echo iucvcmdrc=$?" to the command.
+iucvMaxCmdLen = 960
+
+queryNamesCmd = ["sudo", "/sbin/vmcp", "query", "names"]
+# Response buffer sizes of 'vmcp query names', the default buffer of vmcp
+# only holds about 480 logged on users. The query is run again with the
+# largest buffer vmcp supports when the response does not fit.
+queryNamesBufSize = 65536
+queryNamesMaxBufSize = 1048576
+# vmcp exit code when the response was truncated to the buffer size
+vmcpBufferTooSmallRC = 2
+
 
 def disableEnableDisk(rh, userid, vaddr, option):
     """
@@ -43,37 +65,97 @@ def disableEnableDisk(rh, userid, vaddr, option):
           results   - possible error message from the IUCV transmission.
     """
 
-    rh.printSysLog("Enter vmUtils.disableEnableDisk, userid: " + userid +
-        " addr: " + vaddr + " option: " + option)
+    rh.printSysLog("Enter vmUtils.disableEnableDisk, userid: %s addr: %s "
+                   "option: %s", userid, vaddr, option)
 
-    results = {
-              'overallRC': 0,
-              'rc': 0,
-              'rs': 0,
-              'response': ''
-             }
+    results = setDevicesState(rh, userid, [vaddr], option == '-e')
+
+    rh.printSysLog("Exit vmUtils.disableEnableDisk, rc: %s",
+                   results['overallRC'])
+    return results
 
+
+def setDevicesState(rh, userid, vaddrs, online, timeout=420,
+                    maxInterval=15):
     """
-    Can't guarantee the success of online/offline disk, need to wait
-    Until it's done because we may detach the disk after -d option
-    or use the disk after the -e option
+    Bring devices of a virtual machine online or offline and wait until
+    they are in that state.
+
+    Each try sends a single command through IUCV which reads the online
+    state of all the pending devices from sysfs and issues chccwdev only
+    for the devices which are not yet in the wanted state.  A device which
+    Linux does not know about is offline.  The tries are spaced with an
+    exponential backoff, from 0.1 second up to maxInterval seconds, until
+    the overall timeout.
+
+    Input:
+       Request Handle
+       Userid of the virtual machine
+       List of virtual addresses of the devices
+       True to bring the devices online, False to bring them offline
+       (Optional) Seconds to wait for all the devices
+       (Optional) Maximum seconds between two tries
+
+    Output:
+       Dictionary containing the following:
+          overallRC - overall return code, 0: success, non-zero: failure
+          rc        - rc from the IUCV transmission, 8 when chccwdev
+                      still failed at the timeout.
+          rs        - rs from the IUCV transmission or the rc of the
+                      failed chccwdev.
+          response  - possible error message.
     """
-    for secs in [0.1, 0.4, 1, 1.5, 3, 7, 15, 32, 30, 30,
-                60, 60, 60, 60, 60]:
-        strCmd = "sudo /sbin/chccwdev " + option + " " + vaddr + " 2>&1"
+
+    rh.printSysLog("Enter vmUtils.setDevicesState, userid: %s addrs: %s "
+                   "online: %s", userid, vaddrs, online)
+
+    state = '1' if online else '0'
+    option = '-e' if online else '-d'
+    pending = list(vaddrs)
+    failed = {}
+    deadline = time.time() + timeout
+    interval = 0.1
+    while True:
+        strCmd = ("for d in %s; do "
+                  "s=$(cat /sys/bus/ccw/devices/0.0.$d/online 2>/dev/null); "
+                  "if [ \"${s:-0}\" = %s ]; then echo \"$d 0\"; else "
+                  "out=$(sudo /sbin/chccwdev %s $d 2>&1); "
+                  "echo \"$d $? \"$out; fi; done" %
+                  (' '.join(v.lower().zfill(4) for v in pending), state,
+                   option))
         results = execCmdThruIUCV(rh, userid, strCmd)
-        if results['overallRC'] == 0:
+        if results['overallRC'] != 0:
             break
-        elif (results['overallRC'] == 2 and results['rc'] == 8 and
-            results['rs'] == 1 and option == '-d'):
-            # Linux does not know about the disk being disabled.
-            # Ok, nothing to do.  Treat this as a success.
-            results = {'overallRC': 0, 'rc': 0, 'rs': 0, 'response': ''}
+
+        # Each device gives a line with its address, the rc of chccwdev
+        # and its output.
+        failed = {}
+        for line in results['response'].splitlines():
+            words = line.split(None, 2)
+            if len(words) >= 2 and words[1] != '0':
+                failed[words[0]] = (int(words[1]), ' '.join(words[2:]))
+        pending = [v for v in pending if v.lower().zfill(4) in failed]
+        results = {'overallRC': 0, 'rc': 0, 'rs': 0, 'response': ''}
+        if not pending:
             break
-        time.sleep(secs)
 
-    rh.printSysLog("Exit vmUtils.disableEnableDisk, rc: " +
-        str(results['overallRC']))
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            vaddr = pending[0].lower().zfill(4)
+            results = dict(msgs.msg['0316'][0])
+            results['rs'] = failed[vaddr][0]
+            results['response'] = msgs.msg['0316'][1] % (modId, userid,
+                "chccwdev %s %s" % (option, ' '.join(pending)),
+                results['rc'], results['rs'], failed[vaddr][1])
+            break
+        rh.printSysLog("Devices %s are not %s yet, retrying in %s seconds",
+                       pending, 'online' if online else 'offline',
+                       min(interval, remaining))
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, maxInterval)
+
+    rh.printSysLog("Exit vmUtils.setDevicesState, rc: %s",
+                   results['overallRC'])
     return results
 
 
@@ -103,14 +185,14 @@ def execCmdThruIUCV(rh, userid, strCmd, hideInLog=[]):
           response dictionary element that is returned.
     """
     if len(hideInLog) == 0:
-        rh.printSysLog("Enter vmUtils.execCmdThruIUCV, userid: " +
-                       userid + " cmd: " + strCmd)
+        rh.printSysLog("Enter vmUtils.execCmdThruIUCV, userid: %s cmd: %s",
+                       userid, strCmd)
     else:
         logCmd = strCmd.split(' ')
         for i in hideInLog:
             logCmd[i] = '<hidden>'
-        rh.printSysLog("Enter vmUtils.execCmdThruIUCV, userid: " +
-                       userid + " cmd: " + ' '.join(logCmd))
+        rh.printSysLog("Enter vmUtils.execCmdThruIUCV, userid: %s cmd: %s",
+                       userid, ' '.join(logCmd))
 
     iucvpath = '/opt/zthin/bin/IUCV/'
     results = {
@@ -126,10 +208,10 @@ def execCmdThruIUCV(rh, userid, strCmd, hideInLog=[]):
            userid,
            strCmd]
     try:
-        results['response'] = subprocess.check_output(
-                cmd,
-                stderr=subprocess.STDOUT,
-                close_fds=True)
+        with tracing.timed('iucv'):
+            results['response'] = cmdrunner.check_output(
+                    cmd,
+                    stderr=subprocess.STDOUT)
         if isinstance(results['response'], bytes):
             results['response'] = bytes.decode(results['response'])
     except CalledProcessError as e:
@@ -198,8 +280,122 @@ def execCmdThruIUCV(rh, userid, strCmd, hideInLog=[]):
             type(e).__name__, str(e))
         results['response'] = msg
 
-    rh.printSysLog("Exit vmUtils.execCmdThruIUCV, rc: " +
-                   str(results['rc']))
+    rh.printSysLog("Exit vmUtils.execCmdThruIUCV, rc: %s", results['rc'])
+    return results
+
+
+def splitIUCVScript(steps, separator='; '):
+    """
+    Split the steps of a shell script into scripts which fit in one IUCV
+    request.
+
+    Input:
+       List of the script steps
+       (Optional) Separator of the steps in a script
+
+    Output:
+       List of (first, end) index ranges of the steps of each script.
+       A step longer than the limit is sent alone.
+    """
+    ranges = []
+    first = 0
+    length = 0
+    for i in range(len(steps)):
+        step = steps[i]
+        stepLen = len(step if isinstance(step, bytes) else
+                      step.encode('utf-8'))
+        if i > first and length + len(separator) + stepLen > iucvMaxCmdLen:
+            ranges.append((first, i))
+            first = i
+            length = 0
+        if i > first:
+            length += len(separator)
+        length += stepLen
+    if first < len(steps):
+        ranges.append((first, len(steps)))
+    return ranges
+
+
+def execCmdsThruIUCV(rh, userid, cmds, stopOnError=False):
+    """
+    Send several commands to a virtual machine using as few IUCV requests
+    as possible.
+
+    The commands are sent as shell scripts which follow the output of each
+    command with a marker line holding the return code of the command.
+    The commands are split into several scripts when they do not fit in
+    the command buffer of the IUCV server of the virtual machine.
+
+    Input:
+       Request Handle
+       Userid of the target virtual machine
+       List of command strings to send
+       (Optional) True to stop at the first command which fails.
+
+    Output:
+       Dictionary containing the same values as execCmdThruIUCV and, when
+       overallRC is 0:
+          cmdResults - List with a dictionary for each command which was
+                       run, in the order of the commands:
+                          rc       - Return code of the command
+                          response - Output of the command
+       The overallRC is 2 when the result of a command which should have
+       been run is missing from the output.
+    """
+    rh.printSysLog("Enter vmUtils.execCmdsThruIUCV, userid: %s cmds: %s",
+                   userid, cmds)
+
+    marker = 'SMTCMD' + uuid.uuid4().hex
+    steps = []
+    for i in range(len(cmds)):
+        # The subshell keeps a command which exits from ending the script.
+        step = ("(%s) 2>&1; rc=$?; printf '\\n%s %d %%d\\n' $rc" %
+                (cmds[i], marker, i))
+        if stopOnError:
+            step += "; [ $rc -eq 0 ] || exit 0"
+        steps.append(step)
+
+    results = {
+              'overallRC': 0,
+              'rc': 0,
+              'rs': 0,
+              'errno': 0,
+              'response': [],
+             }
+    cmdResults = []
+    for first, end in splitIUCVScript(steps):
+        results = execCmdThruIUCV(rh, userid, '; '.join(steps[first:end]))
+        if results['overallRC'] != 0:
+            break
+        output = results['response']
+        start = 0
+        for match in re.finditer(r'\n%s (\d+) (\d+)(?:\n|$)' % marker,
+                                 output):
+            if int(match.group(1)) != len(cmdResults):
+                break
+            cmdResults.append({
+                'rc': int(match.group(2)),
+                'response': output[start:match.start()],
+                })
+            start = match.end()
+
+        count = len(cmdResults)
+        if stopOnError and count > first and cmdResults[-1]['rc'] != 0:
+            # The following commands are not run
+            break
+        if count < end:
+            # A command ended the script, or the output of a command held
+            # a marker line out of order.
+            results.update(msgs.msg['0320'][0])
+            results['response'] = msgs.msg['0320'][1] % (
+                modId, userid, count, cmds[count], output)
+            break
+
+    if results['overallRC'] == 0:
+        results['response'] = ''
+        results['cmdResults'] = cmdResults
+
+    rh.printSysLog("Exit vmUtils.execCmdsThruIUCV, rc: %s", results['rc'])
     return results
 
 
@@ -219,15 +415,15 @@ def getPerfInfo(rh, useridlist):
           errno     - Errno returned from SMCLI if overallRC = 0.
           response  - Stripped and reformatted output of the SMCLI command.
     """
-    rh.printSysLog("Enter vmUtils.getPerfInfo, userid: " + useridlist)
+    rh.printSysLog("Enter vmUtils.getPerfInfo, userid: %s", useridlist)
     parms = ["-T", rh.userid,
              "-c", "1"]
     results = invokeSMCLI(rh, "Image_Performance_Query", parms)
     if results['overallRC'] != 0:
         # SMCLI failed.
         rh.printLn("ES", results['response'])
-        rh.printSysLog("Exit vmUtils.getPerfInfo, rc: " +
-                       str(results['overallRC']))
+        rh.printSysLog("Exit vmUtils.getPerfInfo, rc: %s",
+                       results['overallRC'])
         return results
 
     lines = results['response'].split("\n")
@@ -264,8 +460,7 @@ def getPerfInfo(rh, useridlist):
         procstr = "Processors: %s\n" % totalCpu
         timestr = "CPU Used Time: %i sec\n" % usedTime
         results['response'] = memstr + usedmemstr + procstr + timestr
-    rh.printSysLog("Exit vmUtils.getPerfInfo, rc: " +
-                   str(results['rc']))
+    rh.printSysLog("Exit vmUtils.getPerfInfo, rc: %s", results['rc'])
     return results
 
 
@@ -289,9 +484,9 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
           response  - Output of the SMCLI command.
     """
 
-    rh.printSysLog("Enter vmUtils.installFS, userid: " + rh.userid +
-        ", vaddr: " + str(vaddr) + ", mode: " + mode + ", file system: " +
-        fileSystem + ", disk type: " + diskType)
+    rh.printSysLog("Enter vmUtils.installFS, userid: %s, vaddr: %s, mode: %s, "
+                   "file system: %s, disk type: %s", rh.userid, vaddr, mode,
+                   fileSystem, diskType)
 
     results = {
               'overallRC': 0,
@@ -310,7 +505,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
            vaddr,
            mode]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
         out = subprocess.check_output(cmd, close_fds=True)
         if isinstance(out, bytes):
@@ -362,7 +557,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
             "-d", "cdl",
             "-v", device]
         strCmd = ' '.join(cmd)
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             out = subprocess.check_output(cmd, close_fds=True)
             if isinstance(out, bytes):
@@ -385,7 +580,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
         # Settle the devices so we can do the partition.
         strCmd = ("which udevadm &> /dev/null && " +
             "udevadm settle || udevsettle")
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             subprocess.check_output(
                 strCmd,
@@ -412,7 +607,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
         # Prepare the partition with fdasd
         cmd = ["sudo", "/sbin/fdasd", "-a", device]
         strCmd = ' '.join(cmd)
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             out = subprocess.check_output(cmd,
                 stderr=subprocess.STDOUT, close_fds=True)
@@ -435,8 +630,8 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
         # Delete the existing partition in case the disk already
         # has a partition in it.
         cmd = "sudo /sbin/fdisk " + device + " << EOF\nd\nw\nEOF"
-        rh.printSysLog("Invoking: sudo /sbin/fdsik " + device +
-            " << EOF\\nd\\nw\\nEOF ")
+        rh.printSysLog("Invoking: sudo /sbin/fdsik %s << EOF\\nd\\nw\\nEOF ",
+                       device)
         try:
             out = subprocess.check_output(cmd,
                 stderr=subprocess.STDOUT,
@@ -460,8 +655,8 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
     if results['overallRC'] == 0 and diskType == "9336":
         # Prepare the partition with fdisk
         cmd = "sudo /sbin/fdisk " + device + " << EOF\nn\np\n1\n\n\nw\nEOF"
-        rh.printSysLog("Invoking: sudo /sbin/fdisk " + device +
-            " << EOF\\nn\\np\\n1\\n\\n\\nw\\nEOF")
+        rh.printSysLog("Invoking: sudo /sbin/fdisk %s << "
+                       "EOF\\nn\\np\\n1\\n\\n\\nw\\nEOF", device)
         try:
             # Sometimes the table is not ready: sleep and retry
             try_num = 0
@@ -472,15 +667,13 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
                         stderr=subprocess.STDOUT,
                         close_fds=True,
                         shell=True)
-                    rh.printSysLog("Run `%s` successfully." % cmd)
+                    rh.printSysLog("Run `%s` successfully.", cmd)
                     break
                 except CalledProcessError as e:
                     if sleep_secs > 0:
-                        rh.printSysLog("Num %d try `%s` failed ("
-                                       "retry after %s seconds): "
-                                       "rc=%d msg=%s" % (
-                                        try_num, cmd, sleep_secs,
-                                        e.returncode, e.output))
+                        rh.printSysLog("Num %d try `%s` failed (retry after "
+                                       "%s seconds): rc=%d msg=%s", try_num,
+                                       cmd, sleep_secs, e.returncode, e.output)
                         time.sleep(sleep_secs)
                     else:
                         raise
@@ -503,7 +696,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
         # Settle the devices so we can do the partition.
         strCmd = ("which udevadm &> /dev/null && " +
             "udevadm settle || udevsettle")
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             subprocess.check_output(
                 strCmd,
@@ -535,7 +728,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
             else:
                 cmd = ["sudo", "mkfs", "-F", "-t", fileSystem, device]
             strCmd = ' '.join(cmd)
-            rh.printSysLog("Invoking: " + strCmd)
+            rh.printSysLog("Invoking: %s", strCmd)
             try:
                 # Sometimes the device is not ready: sleep and retry
                 try_num = 0
@@ -544,15 +737,14 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
                     try:
                         out = subprocess.check_output(cmd,
                             stderr=subprocess.STDOUT, close_fds=True)
-                        rh.printSysLog("Run `%s` successfully." % strCmd)
+                        rh.printSysLog("Run `%s` successfully.", strCmd)
                         break
                     except CalledProcessError as e:
                         if sleep_secs > 0:
-                            rh.printSysLog("Num %d try `%s` failed ("
-                                           "retry after %s seconds): "
-                                           "rc=%d msg=%s" % (
+                            rh.printSysLog("Num %d try `%s` failed (retry "
+                                           "after %s seconds): rc=%d msg=%s",
                                            try_num, strCmd, sleep_secs,
-                                           e.returncode, e.output))
+                                           e.returncode, e.output)
                             time.sleep(sleep_secs)
                         else:
                             raise
@@ -583,7 +775,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
                rh.userid,
                vaddr]
         strCmd = ' '.join(cmd)
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             out = subprocess.check_output(cmd, close_fds=True)
             if isinstance(out, bytes):
@@ -601,7 +793,7 @@ def installFS(rh, vaddr, mode, fileSystem, diskType):
             results = msgs.msg['0421'][0]
             rh.updateResults(results)
 
-    rh.printSysLog("Exit vmUtils.installFS, rc: " + str(results['rc']))
+    rh.printSysLog("Exit vmUtils.installFS, rc: %s", results['rc'])
     return results
 
 
@@ -629,18 +821,21 @@ def invokeSMCLI(rh, api, parms, hideInLog=[]):
          do not do not contain words that represent valid integer
          values or contain too few words then one or more error
          messages are generated. THIS SHOULD NEVER OCCUR !!!!
+       - The APIs listed in the [smapi] native_apis configuration option
+         are sent to the SMAPI server by smapiClient instead.
     """
+    if smapiClient.isNative(api):
+        return smapiClient.invokeSMAPI(rh, api, parms, hideInLog=hideInLog)
+
     if len(hideInLog) == 0:
-        rh.printSysLog("Enter vmUtils.invokeSMCLI, userid: " +
-                       rh.userid + ", function: " + api +
-                       ", parms: " + str(parms))
+        rh.printSysLog("Enter vmUtils.invokeSMCLI, userid: %s, function: %s, "
+                       "parms: %s", rh.userid, api, parms)
     else:
         logParms = parms
         for i in hideInLog:
             logParms[i] = '<hidden>'
-        rh.printSysLog("Enter vmUtils.invokeSMCLI, userid: " +
-               rh.userid + ", function: " + api +
-               ", parms: " + str(logParms))
+        rh.printSysLog("Enter vmUtils.invokeSMCLI, userid: %s, function: %s, "
+                       "parms: %s", rh.userid, api, logParms)
     goodHeader = False
 
     results = {
@@ -659,8 +854,8 @@ def invokeSMCLI(rh, api, parms, hideInLog=[]):
     cmd.append('--addRCheader')
 
     try:
-        smcliResp = subprocess.check_output(cmd + parms,
-            close_fds=True)
+        with dispatcher.getCallLimiter().slot(), tracing.timed('smcli'):
+            smcliResp = cmdrunner.check_output(cmd + parms)
         if isinstance(smcliResp, bytes):
             smcliResp = bytes.decode(smcliResp, errors='replace')
 
@@ -751,11 +946,21 @@ def invokeSMCLI(rh, api, parms, hideInLog=[]):
         results['response'] = msgs.msg['0305'][1] % (modId, strCmd,
             type(e).__name__, str(e))
 
-    rh.printSysLog("Exit vmUtils.invokeSMCLI, rc: " +
-        str(results['overallRC']))
+    rh.printSysLog("Exit vmUtils.invokeSMCLI, rc: %s", results['overallRC'])
     return results
 
 
+def isVmurConcurrent(output):
+    """
+    Determine whether vmur failed because another instance of vmur is
+    using the punch.
+    """
+    to_find = "A concurrent instance of vmur is already active"
+    if isinstance(output, bytes):
+        to_find = to_find.encode()
+    return output is not None and output.find(to_find) != -1
+
+
 def isLoggedOn(rh, userid):
     """
     Determine whether a virtual machine is logged on.
@@ -774,7 +979,7 @@ def isLoggedOn(rh, userid):
                       1: if we determined it is logged off.
     """
 
-    rh.printSysLog("Enter vmUtils.isLoggedOn, userid: " + userid)
+    rh.printSysLog("Enter vmUtils.isLoggedOn, userid: %s", userid)
 
     results = {
               'overallRC': 0,
@@ -784,7 +989,7 @@ def isLoggedOn(rh, userid):
 
     cmd = ["sudo", "/sbin/vmcp", "query", "user", userid]
     strCmd = ' '.join(cmd)
-    rh.printSysLog("Invoking: " + strCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
     try:
         subprocess.check_output(
             cmd,
@@ -808,12 +1013,283 @@ def isLoggedOn(rh, userid):
         rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
             type(e).__name__, str(e)))
 
-    rh.printSysLog("Exit vmUtils.isLoggedOn, overallRC: " +
-        str(results['overallRC']) + " rc: " + str(results['rc']) +
-        " rs: " + str(results['rs']))
+    rh.printSysLog("Exit vmUtils.isLoggedOn, overallRC: %s rc: %s rs: %s",
+                   results['overallRC'], results['rc'], results['rs'])
+    return results
+
+
+def queryLoggedOnUsers():
+    """
+    Run 'vmcp query names' and parse its output.
+
+    Output:
+       Set of the userids, in upper case, that are logged on.
+       CalledProcessError is raised if the command fails.
+    """
+    for bufSize in (queryNamesBufSize, queryNamesMaxBufSize):
+        cmd = queryNamesCmd[:2] + ["-b", str(bufSize)] + queryNamesCmd[2:]
+        try:
+            out = subprocess.check_output(
+                cmd,
+                close_fds=True,
+                stderr=subprocess.STDOUT)
+            break
+        except CalledProcessError as e:
+            if (e.returncode != vmcpBufferTooSmallRC or
+                    bufSize == queryNamesMaxBufSize):
+                raise
+    if isinstance(out, bytes):
+        out = bytes.decode(out)
+
+    # The output has several 'USERID - TERMINAL' entries per line,
+    # separated by commas.
+    users = set()
+    for line in out.splitlines():
+        for entry in line.split(','):
+            words = entry.split()
+            if len(words) >= 2 and words[1].startswith('-'):
+                users.add(words[0].upper())
+    return users
+
+
+def getLoggedOnUsers(rh):
+    """
+    Get the userids of all the virtual machines logged on with one query.
+
+    Input:
+       Request Handle
+
+    Output:
+       Dictionary containing the following:
+          overallRC - overall return code, 0: success, non-zero: failure
+          rc        - 0: if we got the list.  Otherwise, it is the
+                        error return code from the commands issued.
+          rs        - Based on rc value.
+          users     - Set of the userids, in upper case, that are logged on.
+    """
+
+    rh.printSysLog("Enter vmUtils.getLoggedOnUsers")
+
+    results = {
+              'overallRC': 0,
+              'rc': 0,
+              'rs': 0,
+              'users': set(),
+             }
+
+    strCmd = ' '.join(queryNamesCmd)
+    rh.printSysLog("Invoking: %s", strCmd)
+    try:
+        results['users'] = queryLoggedOnUsers()
+    except CalledProcessError as e:
+        rh.printLn("ES", msgs.msg['0415'][1] % (modId, strCmd,
+            e.returncode, e.output))
+        results = dict(msgs.msg['0415'][0])
+        results['rs'] = e.returncode
+    except Exception as e:
+        # All other exceptions.
+        results = dict(msgs.msg['0421'][0])
+        rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
+            type(e).__name__, str(e)))
+
+    rh.printSysLog("Exit vmUtils.getLoggedOnUsers, overallRC: %s rc: %s "
+                   "rs: %s", results['overallRC'], results['rc'],
+                   results['rs'])
     return results
 
 
+class VMStatePoller(object):
+    """
+    Poller shared by the waits for virtual machines to log on or off.
+
+    The waiters register with the poller, whose thread checks all of them
+    with one 'vmcp query names' per tick and wakes each waiter as soon as
+    its virtual machine is in the desired state. The interval between the
+    ticks starts at minInterval when a waiter registers or is satisfied and
+    doubles, up to the smallest sleep duration of the waiters, while the
+    virtual machines are still changing state. The thread ends when no
+    waiter is left.
+    """
+
+    def __init__(self, minInterval=1):
+        self.minInterval = minInterval
+        self.interval = minInterval
+        self.cond = threading.Condition()
+        self.waiters = []
+        self.thread = None
+
+    def wait(self, userid, desiredState, sleepSecs, timeout):
+        """
+        Wait for the virtual machine to go into the indicated state.
+
+        Input:
+           userid whose state is to be monitored
+           Desired state, 'on' or 'off'
+           Maximum sleep duration between the checks
+           Maximum time to wait for the desired state, in seconds
+
+        Output:
+           Tuple of whether the state was reached and the exception raised
+           by the query of the logged on users, if any.
+        """
+        waiter = {
+            'userid': userid.upper(),
+            'on': desiredState == 'on',
+            'sleepSecs': sleepSecs,
+            'done': False,
+            'error': None,
+            }
+        deadline = time.time() + timeout
+        with self.cond:
+            self.waiters.append(waiter)
+            self.interval = self.minInterval
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='VMStatePoller')
+                self.thread.daemon = True
+                self.thread.start()
+            else:
+                # Check the new waiter without waiting for the next tick
+                self.cond.notify_all()
+            try:
+                while not waiter['done']:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+            finally:
+                self.waiters.remove(waiter)
+        return waiter['done'] and waiter['error'] is None, waiter['error']
+
+    def run(self):
+        while True:
+            with self.cond:
+                waiters = [w for w in self.waiters if not w['done']]
+                if not waiters:
+                    self.thread = None
+                    return
+
+            try:
+                users = queryLoggedOnUsers()
+                error = None
+            except Exception as e:
+                users = set()
+                error = e
+
+            with self.cond:
+                for waiter in waiters:
+                    if error is not None:
+                        waiter['error'] = error
+                        waiter['done'] = True
+                    elif (waiter['userid'] in users) == waiter['on']:
+                        waiter['done'] = True
+                        self.interval = self.minInterval
+                self.cond.notify_all()
+
+                pending = [w for w in self.waiters if not w['done']]
+                if pending:
+                    interval = self.interval
+                    self.interval = min(interval * 2,
+                                        min(w['sleepSecs'] for w in pending))
+                    self.cond.wait(interval)
+
+
+vmStatePoller = VMStatePoller()
+
+
+class PunchQueue(object):
+    """
+    Queue of the files to punch with the virtual punch of this virtual
+    machine.
+
+    vmur fails when another instance of vmur is using the punch, so the
+    thread of the queue punches the files of the process one at a time, in
+    the order they were queued, instead of retrying after a sleep. Only
+    the punches of other processes can still make vmur fail, those punches
+    are retried after retrySecs. The thread ends when the queue is empty.
+    """
+
+    retrySecs = [1, 2, 3, 5]
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.jobs = collections.deque()
+        self.thread = None
+        self.punches = 0
+        self.waitTime = 0.0
+        self.maxWaitTime = 0.0
+
+    def punch(self, cmd):
+        """
+        Queue a vmur punch command and wait for it to be run.
+
+        Input:
+           vmur punch command as a list
+
+        Output:
+           Tuple of the output of the command, the exception it raised if
+           any, and the seconds it waited in the queue.
+        """
+        job = {
+            'cmd': cmd,
+            'queued': time.time(),
+            'done': threading.Event(),
+            'output': None,
+            'error': None,
+            'waited': 0,
+            }
+        with self.cond:
+            self.jobs.append(job)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='PunchQueue')
+                self.thread.daemon = True
+                self.thread.start()
+        job['done'].wait()
+        tracing.add_timing('punch_queue', job['waited'])
+        return job['output'], job['error'], job['waited']
+
+    def run(self):
+        while True:
+            with self.cond:
+                if not self.jobs:
+                    self.thread = None
+                    return
+                job = self.jobs.popleft()
+                job['waited'] = time.time() - job['queued']
+                self.punches += 1
+                self.waitTime += job['waited']
+                self.maxWaitTime = max(self.maxWaitTime, job['waited'])
+
+            for secs in self.retrySecs + [None]:
+                try:
+                    job['output'] = subprocess.check_output(job['cmd'],
+                        close_fds=True, stderr=subprocess.STDOUT)
+                    job['error'] = None
+                    break
+                except CalledProcessError as e:
+                    job['error'] = e
+                    if secs is None or not isVmurConcurrent(e.output):
+                        break
+                    time.sleep(secs)
+                except Exception as e:
+                    job['error'] = e
+                    break
+            job['done'].set()
+
+    def getMetrics(self):
+        with self.cond:
+            return {
+                'punches_total': self.punches,
+                'punch_queue_depth': len(self.jobs),
+                'punch_queue_wait_seconds_total': self.waitTime,
+                'punch_queue_wait_seconds_max': self.maxWaitTime,
+                }
+
+
+punchQueue = PunchQueue()
+
+
 def punch2reader(rh, userid, fileLoc, spoolClass):
     """
     Punch a file to a virtual reader of the specified virtual machine.
@@ -838,37 +1314,26 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
     # Punch to the current user intially and then change the spool class.
     cmd = ["sudo", "/usr/sbin/vmur", "punch", "-r", fileLoc]
     strCmd = ' '.join(cmd)
-    for secs in [1, 2, 3, 5, 10]:
-        rh.printSysLog("Invoking: " + strCmd)
-        try:
-            results['response'] = subprocess.check_output(cmd,
-                                        close_fds=True,
-                                        stderr=subprocess.STDOUT)
-            if isinstance(results['response'], bytes):
-                results['response'] = bytes.decode(results['response'])
-            results['rc'] = 0
-            rh.updateResults(results)
-            break
-        except CalledProcessError as e:
-            results['response'] = e.output
-            # Check if we have concurrent instance of vmur active
-            to_find = "A concurrent instance of vmur is already active"
-            to_find = to_find.encode()
-            if results['response'].find(to_find) == -1:
-                # Failure in VMUR punch update the rc
-                results['rc'] = 7
-                break
-            else:
-                # if concurrent vmur is active try after sometime
-                rh.printSysLog("Punch in use. Retrying after " +
-                               str(secs) + " seconds")
-                time.sleep(secs)
-        except Exception as e:
-            # All other exceptions.
-            rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
-                type(e).__name__, str(e)))
-            results = msgs.msg['0421'][0]
-            rh.updateResults(results)
+    rh.printSysLog("Invoking: %s", strCmd)
+    out, error, waited = punchQueue.punch(cmd)
+    rh.printSysLog("Punch waited %.3f seconds in the punch queue", waited)
+    if error is None:
+        if isinstance(out, bytes):
+            out = bytes.decode(out)
+        results['response'] = out
+        results['rc'] = 0
+        rh.updateResults(results)
+    elif isinstance(error, CalledProcessError):
+        results['response'] = error.output
+        if not isVmurConcurrent(error.output):
+            # Failure in VMUR punch update the rc
+            results['rc'] = 7
+    else:
+        # All other exceptions.
+        rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
+            type(error).__name__, str(error)))
+        results = msgs.msg['0421'][0]
+        rh.updateResults(results)
 
     if results['rc'] == 7:
         # Failure while issuing vmur command (For eg: invalid file given)
@@ -889,7 +1354,7 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
         cmd = ["sudo", "vmcp", "change", "rdr", str(spoolId[0]), "class",
                spoolClass]
         strCmd = " ".join(cmd)
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             results['response'] = subprocess.check_output(cmd,
                                         close_fds=True,
@@ -907,7 +1372,7 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
             # Delete the punched file from current userid
             cmd = ["sudo", "vmcp", "purge", "rdr", spoolId[0]]
             strCmd = " ".join(cmd)
-            rh.printSysLog("Invoking: " + strCmd)
+            rh.printSysLog("Invoking: %s", strCmd)
             try:
                 results['response'] = subprocess.check_output(cmd,
                                             close_fds=True,
@@ -939,7 +1404,7 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
         cmd = ["sudo", "vmcp", "transfer", "*", "rdr", str(spoolId[0]), "to",
                 userid, "rdr"]
         strCmd = " ".join(cmd)
-        rh.printSysLog("Invoking: " + strCmd)
+        rh.printSysLog("Invoking: %s", strCmd)
         try:
             results['response'] = subprocess.check_output(cmd,
                                         close_fds=True,
@@ -957,7 +1422,7 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
             # Transfer failed so delete the punched file from current userid
             cmd = ["sudo", "vmcp", "purge", "rdr", spoolId[0]]
             strCmd = " ".join(cmd)
-            rh.printSysLog("Invoking: " + strCmd)
+            rh.printSysLog("Invoking: %s", strCmd)
             try:
                 results['response'] = subprocess.check_output(cmd,
                                             close_fds=True,
@@ -982,8 +1447,8 @@ def punch2reader(rh, userid, fileLoc, spoolClass):
                 type(e).__name__, str(e)))
             rh.updateResults(msgs.msg['0421'][0])
 
-    rh.printSysLog("Exit vmUtils.punch2reader, rc: " +
-        str(rh.results['overallRC']))
+    rh.printSysLog("Exit vmUtils.punch2reader, rc: %s",
+                   rh.results['overallRC'])
     return rh.results['overallRC']
 
 
@@ -1010,17 +1475,20 @@ def waitForOSState(rh, userid, desiredState, maxQueries=90, sleepSecs=5):
 
     """
 
-    rh.printSysLog("Enter vmUtils.waitForOSState, userid: " + userid +
-                           " state: " + desiredState +
-                           " maxWait: " + str(maxQueries) +
-                           " sleepSecs: " + str(sleepSecs))
+    rh.printSysLog("Enter vmUtils.waitForOSState, userid: %s state: %s "
+                   "maxWait: %s sleepSecs: %s", userid, desiredState,
+                   maxQueries, sleepSecs)
 
     results = {}
 
     strCmd = "echo 'ping'"
     stateFnd = False
 
-    for i in range(1, maxQueries + 1):
+    # Check often at first, then back off to sleepSecs between the
+    # checks, within the same overall wait time.
+    deadline = time.time() + maxQueries * sleepSecs
+    interval = min(1, sleepSecs)
+    while True:
         results = execCmdThruIUCV(rh, rh.userid, strCmd)
         if results['overallRC'] == 0:
             if desiredState == 'up':
@@ -1031,8 +1499,11 @@ def waitForOSState(rh, userid, desiredState, maxQueries=90, sleepSecs=5):
                 stateFnd = True
                 break
 
-        if i < maxQueries:
-            time.sleep(sleepSecs)
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, sleepSecs)
 
     if stateFnd is True:
         results = {
@@ -1046,8 +1517,7 @@ def waitForOSState(rh, userid, desiredState, maxQueries=90, sleepSecs=5):
             desiredState, maxWait))
         results = msgs.msg['0413'][0]
 
-    rh.printSysLog("Exit vmUtils.waitForOSState, rc: " +
-        str(results['overallRC']))
+    rh.printSysLog("Exit vmUtils.waitForOSState, rc: %s", results['overallRC'])
     return results
 
 
@@ -1072,55 +1542,27 @@ def waitForVMState(rh, userid, desiredState, maxQueries=90, sleepSecs=5):
 
     """
 
-    rh.printSysLog("Enter vmUtils.waitForVMState, userid: " + userid +
-                           " state: " + desiredState +
-                           " maxWait: " + str(maxQueries) +
-                           " sleepSecs: " + str(sleepSecs))
+    rh.printSysLog("Enter vmUtils.waitForVMState, userid: %s state: %s "
+                   "maxWait: %s sleepSecs: %s", userid, desiredState,
+                   maxQueries, sleepSecs)
 
     results = {}
 
-    cmd = ["sudo", "/sbin/vmcp", "query", "user", userid]
-    strCmd = " ".join(cmd)
-    stateFnd = False
-
-    for i in range(1, maxQueries + 1):
-        rh.printSysLog("Invoking: " + strCmd)
-        try:
-            out = subprocess.check_output(
-                cmd,
-                close_fds=True,
-                stderr=subprocess.STDOUT)
-            if isinstance(out, bytes):
-                out = bytes.decode(out)
-            if desiredState == 'on':
-                stateFnd = True
-                break
-        except CalledProcessError as e:
-            match = re.search('(^HCP\w\w\w045E|^HCP\w\w\w361E)', e.output)
-            if match:
-                # Logged off
-                if desiredState == 'off':
-                    stateFnd = True
-                    break
-            else:
-                # Abnormal failure
-                out = e.output
-                rh.printLn("ES", msgs.msg['0415'][1] % (modId, strCmd,
-                    e.returncode, out))
-                results = msgs.msg['0415'][0]
-                results['rs'] = e.returncode
-                break
-        except Exception as e:
-            # All other exceptions.
-            rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
-                type(e).__name__, str(e)))
-            results = msgs.msg['0421'][0]
-
-        if i < maxQueries:
-            # Sleep a bit before looping.
-            time.sleep(sleepSecs)
-
-    if stateFnd is True:
+    strCmd = " ".join(queryNamesCmd)
+    stateFnd, error = vmStatePoller.wait(userid, desiredState, sleepSecs,
+                                         maxQueries * sleepSecs)
+    if isinstance(error, CalledProcessError):
+        # Abnormal failure
+        rh.printLn("ES", msgs.msg['0415'][1] % (modId, strCmd,
+            error.returncode, error.output))
+        results = dict(msgs.msg['0415'][0])
+        results['rs'] = error.returncode
+    elif error is not None:
+        # All other exceptions.
+        rh.printLn("ES", msgs.msg['0421'][1] % (modId, strCmd,
+            type(error).__name__, str(error)))
+        results = dict(msgs.msg['0421'][0])
+    elif stateFnd is True:
         results = {
                 'overallRC': 0,
                 'rc': 0,
@@ -1132,8 +1574,7 @@ def waitForVMState(rh, userid, desiredState, maxQueries=90, sleepSecs=5):
             desiredState, maxWait))
         results = msgs.msg['0414'][0]
 
-    rh.printSysLog("Exit vmUtils.waitForVMState, rc: " +
-        str(results['overallRC']))
+    rh.printSysLog("Exit vmUtils.waitForVMState, rc: %s", results['overallRC'])
     return results
 
 
@@ -1155,7 +1596,7 @@ def purgeReader(rh):
     Note:
 
     """
-    rh.printSysLog("Enter vmUtils.purgeRDR, userid: " + rh.userid)
+    rh.printSysLog("Enter vmUtils.purgeRDR, userid: %s", rh.userid)
     results = {'overallRC': 0,
                'rc': 0,
                'rs': 0,
@@ -1169,6 +1610,5 @@ def purgeReader(rh):
         rh.printLn("ES", results['response'])
         rh.updateResults(results)
 
-    rh.printSysLog("Exit vmUtils.purgeReader, rc: " +
-                   str(results['overallRC']))
+    rh.printSysLog("Exit vmUtils.purgeReader, rc: %s", results['overallRC'])
     return results
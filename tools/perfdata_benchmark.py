@@ -0,0 +1,123 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the cost of parsing an image performance query response of many
+guests and of getting the integer values of all the guests, with the
+keyword parser used before and with the columnar parser.
+
+The response is synthetic. Run it from the top of the source tree:
+
+    PYTHONPATH=. python tools/perfdata_benchmark.py [guests] [iterations]
+"""
+
+import sys
+import timeit
+
+from zvmsdk import perfdata
+from zvmsdk import utils as zvmutils
+
+
+IPQ_KWS = {
+    'userid': "Guest name:",
+    'guest_cpus': "Guest CPUs:",
+    'used_cpu_time': "Used CPU time:",
+    'elapsed_cpu_time': "Elapsed time:",
+    'min_cpu_count': "Minimum CPU count:",
+    'max_cpu_limit': "Max CPU limit:",
+    'samples_cpu_in_use': "Samples CPU in use:",
+    'samples_cpu_delay': "Samples CPU delay:",
+    'used_memory': "Used memory:",
+    'max_memory': "Max memory:",
+    'min_memory': "Minimum memory:",
+    'shared_memory': "Shared memory:",
+}
+
+
+def _response(guests):
+    lines = []
+    for i in range(guests):
+        lines.extend([
+            'Virtual server ID: guest%04d' % i,
+            'Record version: "1"',
+            'Guest flags: "0"',
+            'Used CPU time: "%d uS"' % (646609178 + i),
+            'Elapsed time: "%d uS"' % (596837441984 + i),
+            'Minimum memory: "0 KB"',
+            'Max memory: "2097152 KB"',
+            'Shared memory: "302180 KB"',
+            'Used memory: "%d KB"' % (302180 + i),
+            'Active CPUs in CEC: "44"',
+            'Logical CPUs in VM: "6"',
+            'Guest CPUs: "2"',
+            'Minimum CPU count: "2"',
+            'Max CPU limit: "10000"',
+            'Processor share: "100"',
+            'Samples CPU in use: "371"',
+            ',Samples CPU delay: "116"',
+            'Samples page wait: "0"',
+            'Samples idle: "596331"',
+            'Samples other: "12"',
+            'Samples total: "596830"',
+            'Guest name: "GST%05d"' % i,
+            ''])
+    return lines
+
+
+def _keyword_parse(lines):
+    pi_dict = {}
+    for rpi in ('\n'.join(lines)).split("\n\n"):
+        try:
+            pi = zvmutils.translate_response_to_dict(rpi, IPQ_KWS)
+        except Exception:
+            continue
+        for k, v in pi.items():
+            pi[k] = v.strip('" ')
+        if pi.get('userid') is not None:
+            pi_dict[pi['userid']] = pi
+    return pi_dict
+
+
+def _keyword_stats(data):
+    return dict((uid, perfdata.get_stats(dict(record)))
+                for uid, record in data.items())
+
+
+def _columnar_stats(data):
+    return dict((uid, perfdata.get_stats(record))
+                for uid, record in data.items())
+
+
+def main():
+    guests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    lines = _response(guests)
+    keyword = _keyword_parse(lines)
+    columnar = perfdata.parse_performance_data(lines)
+    assert keyword == columnar
+    assert _keyword_stats(keyword) == _columnar_stats(columnar)
+
+    print('%d guests, milliseconds per response' % guests)
+    print('%-10s %10s %10s' % ('parser', 'parse', 'stats'))
+    for name, parse, stats, data in (
+            ('keyword', _keyword_parse, _keyword_stats, keyword),
+            ('columnar', perfdata.parse_performance_data, _columnar_stats,
+             columnar)):
+        parse_time = timeit.timeit(lambda: parse(lines), number=number)
+        stats_time = timeit.timeit(lambda: stats(data), number=number)
+        print('%-10s %10.2f %10.2f' % (name, parse_time * 1e3 / number,
+                                       stats_time * 1e3 / number))
+
+
+if __name__ == '__main__':
+    main()
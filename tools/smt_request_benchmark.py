@@ -0,0 +1,68 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the cost of setting up SMT requests from command strings and
+from their separate parts.
+
+Only the request set up is timed, the requests are not driven. Run it from
+the top of the source tree:
+
+    PYTHONPATH=. python tools/smt_request_benchmark.py [iterations]
+"""
+
+import logging
+import sys
+import timeit
+
+from smtLayer.ReqHandle import ReqHandle
+
+
+REQUESTS = [
+    ("PowerVM fakeuid status", ('PowerVM', 'status', 'fakeuid', None)),
+    ("PowerVM fakeuid softoff --wait --maxwait 300 --poll 10",
+     ('PowerVM', 'softoff', 'fakeuid',
+      {'wait': True, 'maxWait': 300, 'poll': 10})),
+    ("getvm fakeuid directory", ('getvm', 'directory', 'fakeuid', None)),
+    ("getHost diskpoolspace POOL1",
+     ('getHost', 'diskpoolspace', '', {'poolName': 'POOL1'})),
+]
+
+
+class _Daemon(object):
+    logger = logging.getLogger('smt_request_benchmark')
+
+
+def _parse(requestData):
+    rh = ReqHandle(captureLogs=False, smt=_Daemon)
+    rh.parseCmdline(requestData)
+
+
+def _set(parts):
+    rh = ReqHandle(captureLogs=False, smt=_Daemon)
+    rh.setRequest(*parts)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print('%-56s %10s %10s' % ('request', 'parse(us)', 'set(us)'))
+    for requestData, parts in REQUESTS:
+        parse = timeit.timeit(lambda: _parse(requestData), number=number)
+        setup = timeit.timeit(lambda: _set(parts), number=number)
+        print('%-56s %10.2f %10.2f' % (requestData,
+                                       parse * 1e6 / number,
+                                       setup * 1e6 / number))
+
+
+if __name__ == '__main__':
+    main()
@@ -141,6 +141,17 @@ def req_guest_inspect_stats(start_index, *args, **kwargs):
     return url, body
 
 
+def req_guest_get_power_state_list(start_index, *args, **kwargs):
+    if type(args[start_index]) is str:
+        url = '/guests/power_state?userid=%s' % args[start_index]
+    else:
+        userids = ','.join(args[start_index])
+        url = '/guests/power_state?userid=%s' % userids
+    body = None
+
+    return url, body
+
+
 def req_guest_inspect_vnics(start_index, *args, **kwargs):
     if type(args[start_index]) is str:
         url = '/guests/interfacestats?userid=%s' % args[start_index]
@@ -152,6 +163,51 @@ def req_guest_inspect_vnics(start_index, *args, **kwargs):
     return url, body
 
 
+def req_guest_inspect_vnics_delta(start_index, *args, **kwargs):
+    if type(args[start_index]) is str:
+        url = '/guests/interfacestats/delta?userid=%s' % args[start_index]
+    else:
+        userids = ','.join(args[start_index])
+        url = '/guests/interfacestats/delta?userid=%s' % userids
+    body = None
+
+    return url, body
+
+
+def req_guest_inspect_history(start_index, *args, **kwargs):
+    if type(args[start_index]) is str:
+        url = '/guests/history?userid=%s' % args[start_index]
+    else:
+        userids = ','.join(args[start_index])
+        url = '/guests/history?userid=%s' % userids
+    metrics = kwargs.get('metrics', None)
+    if metrics:
+        url += '&metrics=%s' % ','.join(metrics)
+    window = kwargs.get('window', None)
+    if window:
+        url += '&window=%s' % window
+    body = None
+
+    return url, body
+
+
+def req_guest_inspect_archive(start_index, *args, **kwargs):
+    if type(args[start_index]) is str:
+        url = '/guests/archive?userid=%s' % args[start_index]
+    else:
+        userids = ','.join(args[start_index])
+        url = '/guests/archive?userid=%s' % userids
+    start = kwargs.get('start', None)
+    if start is not None:
+        url += '&start=%s' % start
+    end = kwargs.get('end', None)
+    if end is not None:
+        url += '&end=%s' % end
+    body = None
+
+    return url, body
+
+
 def req_guests_get_nic_info(start_index, *args, **kwargs):
     url = '/guests/nics'
     # process appends in GET method
@@ -353,6 +409,23 @@ def req_guest_get_power_state(start_index, *args, **kwargs):
     return url, body
 
 
+def req_guest_get_events(start_index, *args, **kwargs):
+    url = '/events'
+    if len(args) > start_index:
+        last_event_id = args[start_index]
+    else:
+        last_event_id = kwargs.get('last_event_id', None)
+    query = []
+    if last_event_id is not None:
+        query.append('last_event_id=%s' % last_event_id)
+    if kwargs.get('timeout'):
+        query.append('timeout=%s' % kwargs['timeout'])
+    if query:
+        url += '?' + '&'.join(query)
+    body = None
+    return url, body
+
+
 def req_guest_create_disks(start_index, *args, **kwargs):
     url = '/guests/%s/disks'
     body = {'disk_info': {'disk_list': args[start_index]}}
@@ -407,6 +480,12 @@ def req_host_diskpool_get_info(start_index, *args, **kwargs):
     return url, body
 
 
+def req_metrics_get(start_index, *args, **kwargs):
+    url = '/metrics'
+    body = None
+    return url, body
+
+
 def req_image_import(start_index, *args, **kwargs):
     url = '/images'
     body = {'image': {'image_name': args[start_index],
@@ -547,6 +626,21 @@ DATABASE = {
         'args_required': 1,
         'params_path': 0,
         'request': req_guest_inspect_vnics},
+    'guest_inspect_vnics_delta': {
+        'method': 'GET',
+        'args_required': 1,
+        'params_path': 0,
+        'request': req_guest_inspect_vnics_delta},
+    'guest_inspect_history': {
+        'method': 'GET',
+        'args_required': 1,
+        'params_path': 0,
+        'request': req_guest_inspect_history},
+    'guest_inspect_archive': {
+        'method': 'GET',
+        'args_required': 1,
+        'params_path': 0,
+        'request': req_guest_inspect_archive},
     'guests_get_nic_info': {
         'method': 'GET',
         'args_required': 0,
@@ -687,6 +781,16 @@ DATABASE = {
         'args_required': 1,
         'params_path': 1,
         'request': req_guest_get_power_state},
+    'guest_get_power_state_list': {
+        'method': 'GET',
+        'args_required': 1,
+        'params_path': 0,
+        'request': req_guest_get_power_state_list},
+    'guest_get_events': {
+        'method': 'GET',
+        'args_required': 0,
+        'params_path': 0,
+        'request': req_guest_get_events},
     'guest_create_disks': {
         'method': 'POST',
         'args_required': 2,
@@ -727,6 +831,11 @@ DATABASE = {
         'args_required': 0,
         'params_path': 0,
         'request': req_host_diskpool_get_info},
+    'metrics_get': {
+        'method': 'GET',
+        'args_required': 0,
+        'params_path': 0,
+        'request': req_metrics_get},
     'image_import': {
         'method': 'POST',
         'args_required': 3,
@@ -955,6 +1064,12 @@ class RESTClient(object):
             response = self.api_request(url, method, body=body,
                                         headers=headers)
 
+            if (api_name == 'metrics_get' and response.status_code == 200 and
+                'text/plain' in response.headers.get('Content-Type', '')):
+                # The metrics are returned in the Prometheus text format
+                return {'overallRC': 0, 'modID': None, 'rc': 0, 'rs': 0,
+                        'output': response.text, 'errmsg': ''}
+
             # change response to SDK format
             resp, body_iter = self._process_rest_response(response)
 
@@ -16,6 +16,8 @@
 import json
 import six
 import socket
+import threading
+import time
 
 
 SDKCLIENT_MODID = 110
@@ -37,6 +39,33 @@ INVALID_API_ERROR = [{'overallRC': 400, 'modID': SDKCLIENT_MODID, 'rc': 400},
                      "Invalid API name"
                      ]
 
+# Request id sent with the API calls of the current thread, and the phase
+# timings returned by the SDK server for them.
+_TRACE = threading.local()
+
+
+def set_request_id(request_id):
+    """Send request_id with the API calls made by the current thread.
+
+    The SDK server then returns the time spent in each phase of the calls,
+    which are accumulated and returned by get_timings(). Pass None to stop
+    sending the request id.
+    """
+    _TRACE.request_id = request_id
+    _TRACE.timings = {}
+
+
+def get_timings():
+    """Get the phase timings, in seconds, of the current thread calls."""
+    return dict(getattr(_TRACE, 'timings', None) or {})
+
+
+def _add_timings(timings):
+    if getattr(_TRACE, 'timings', None) is None:
+        return
+    for phase, seconds in timings.items():
+        _TRACE.timings[phase] = _TRACE.timings.get(phase, 0) + seconds
+
 
 class SDKSocketClient(object):
 
@@ -68,6 +97,7 @@ class SDKSocketClient(object):
                    'string, type: %s specified.') % type(func)
             return self._construct_api_name_error(msg)
 
+        start = time.time()
         # Create client socket
         try:
             cs = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -86,7 +116,12 @@ class SDKSocketClient(object):
                                                     error=six.text_type(err))
 
             # Prepare the data to be sent and switch to bytes if needed
-            api_data = json.dumps((func, api_args, api_kwargs))
+            request_id = getattr(_TRACE, 'request_id', None)
+            if request_id is None:
+                api_data = json.dumps((func, api_args, api_kwargs))
+            else:
+                api_data = json.dumps((func, api_args, api_kwargs,
+                                       {'request_id': request_id}))
             api_data = api_data.encode()
 
             # Send the API call data to SDK server
@@ -136,6 +171,10 @@ class SDKSocketClient(object):
         # data
         if return_blocks:
             results = json.loads(''.join(return_blocks))
+            trace = results.pop('trace', None)
+            if trace:
+                _add_timings(trace.get('timings', {}))
+                _add_timings({'sdkserver': time.time() - start})
         else:
             results = self._construct_socket_error(4)
         return results
@@ -22,6 +22,7 @@ from zvmsdk import exception
 from zvmsdk import hostops
 from zvmsdk import imageops
 from zvmsdk import log
+from zvmsdk import metrics
 from zvmsdk import monitor
 from zvmsdk import networkops
 from zvmsdk import vmops
@@ -76,6 +77,7 @@ class SDKAPI(object):
         self._networkops = networkops.get_networkops()
         self._imageops = imageops.get_imageops()
         self._monitor = monitor.get_monitor()
+        self._state_watcher = monitor.get_state_watcher()
         self._volumeop = volumeop.get_volumeop()
         self._GuestDbOperator = database.GuestDbOperator()
         self._NetworkDbOperator = database.NetworkDbOperator()
@@ -182,6 +184,24 @@ class SDKAPI(object):
         with zvmutils.log_and_reraise_sdkbase_error(action):
             return self._vmops.get_power_state(userid)
 
+    @check_guest_exist()
+    def guest_get_power_state_list(self, userid_list):
+        """Returns the power state of several guests.
+
+        All the guests are queried with a single request to z/VM, which
+        is much cheaper than calling guest_get_power_state for each guest.
+
+        :param userid_list: a single userid string or a list of guest
+               userids
+        :returns: dictionary of the power state, on or off, of each guest
+                  e.g. {'USERID1': 'on', 'USERID2': 'off'}
+        """
+        if not isinstance(userid_list, list):
+            userid_list = [userid_list]
+        action = "get power state of guests '%s'" % userid_list
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return self._vmops.get_power_state_list(userid_list)
+
     @check_guest_exist()
     def guest_get_info(self, userid):
         """Get the status of a virtual machine.
@@ -211,12 +231,29 @@ class SDKAPI(object):
     def host_get_info(self):
         """ Retrieve host information including host, memory, disk etc.
 
+        The information is cached and refreshed in the background every
+        host_info_refresh_interval seconds.
+
         :returns: Dictionary describing resources
         """
         action = "get host information"
         with zvmutils.log_and_reraise_sdkbase_error(action):
             return self._hostops.get_info()
 
+    def metrics_get(self):
+        """Get the metrics of the guests, of the host and of the SDK.
+
+        The metrics of the guests are rendered from the monitor data, which
+        is queried for all the guests at once, and the metrics of the SDK
+        include the API request durations and the SMT, SMAPI and command
+        counters.
+
+        :returns: the metrics in the Prometheus text exposition format
+        """
+        action = "get the metrics"
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return metrics.generate()
+
     def host_diskpool_get_info(self, disk_pool=None):
         """ Retrieve diskpool information.
         :param str disk_pool: the disk pool info. It use ':' to separate
@@ -517,6 +554,7 @@ class SDKAPI(object):
             with zvmutils.log_and_reraise_sdkbase_error(action):
                 self._GuestDbOperator.add_guest_registered(userid, meta,
                                                              net_set)
+            monitor.get_namelist_mirror().add(userid)
 
             # We need to query and add vswitch to the database.
             # The result got by get_definition_info is like:
@@ -571,6 +609,7 @@ class SDKAPI(object):
             action = "delete guest '%s' from database" % userid
             with zvmutils.log_and_reraise_sdkbase_error(action):
                 self._GuestDbOperator.delete_guest_by_userid(userid)
+            monitor.get_namelist_mirror().remove(userid)
             LOG.info("Guest %s deregistered." % userid)
 
     @check_guest_exist()
@@ -1137,6 +1176,170 @@ class SDKAPI(object):
         with zvmutils.log_and_reraise_sdkbase_error(action):
             return self._monitor.inspect_vnics(userid_list)
 
+    @check_guest_exist()
+    def guest_inspect_vnics_delta(self, userid_list):
+        """Get the deltas of the vnics statistics of the guest virtual
+        machines between the last two refreshes of the vnics data
+
+        :param userid_list: a single userid string or a list of guest userids
+        :returns: dictionary describing the vnics statistics deltas of the
+                  vm in the form
+                  {'UID1':
+                  [{
+                  'vswitch_name': xx,
+                  'nic_vdev': xx,
+                  'interval': xx,
+                  'reset': xx,
+                  'nic_fr_rx': xx,
+                  'nic_fr_tx': xx,
+                  'nic_fr_rx_dsc': xx,
+                  'nic_fr_tx_dsc': xx,
+                  'nic_fr_rx_err': xx,
+                  'nic_fr_tx_err': xx,
+                  'nic_rx': xx,
+                  'nic_tx': xx
+                  },
+                  ]
+                  }
+                  'interval' is the number of seconds between the two
+                  samples, 'reset' is True when the counters of the nic
+                  restarted from 0 in between, the deltas are then the
+                  counters since the reset.
+                  for the guests that are shutdown or not exist, and the
+                  nics only sampled once, no data returned in the dictionary
+        """
+        if not isinstance(userid_list, list):
+            userid_list = [userid_list]
+        action = ("get the vnics statistics deltas of guest '%s'" %
+                  str(userid_list))
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return self._monitor.inspect_vnics_delta(userid_list)
+
+    @check_guest_exist()
+    def guest_inspect_history(self, userid_list, metrics=None, window=None):
+        """Get the deltas and rates of the cpu, memory and vnics metrics of
+        the guests over their recent samples
+
+        A sample of the metrics of all the guests is kept each time the
+        monitor data is refreshed, up to history_size samples per guest.
+
+        :param userid_list: a single userid string or a list of guest userids
+        :param metrics: list of the metric names to return, None for all of
+               used_cpu_time_us, elapsed_cpu_time_us, samples_cpu_in_use,
+               samples_cpu_delay, guest_cpus, used_mem_kb, nic_rx, nic_tx,
+               nic_fr_rx, nic_fr_tx, nic_fr_rx_dsc, nic_fr_tx_dsc,
+               nic_fr_rx_err and nic_fr_tx_err, the vnics metrics being the
+               sums over all the vnics of the guest
+        :param window: only use the samples of the last window seconds,
+               None to use all the kept samples
+        :returns: dictionary in the form
+                  {'UID1':
+                  {'cpumem':
+                   {'samples': xx,
+                    'start': xx,
+                    'end': xx,
+                    'interval': xx,
+                    'metrics':
+                    {'used_cpu_time_us': {'last': xx, 'delta': xx,
+                                          'rate': xx},
+                     'used_mem_kb': {'last': xx, 'min': xx, 'max': xx,
+                                     'avg': xx},
+                     }
+                    },
+                   'vnics': {...}
+                   }
+                  }
+                  the counters have their delta over the samples and their
+                  rate per second, which is None with a single sample,
+                  the gauges used_mem_kb and guest_cpus their last, min, max
+                  and avg values. For the guests without samples, no data
+                  returned in the dictionary
+        """
+        if not isinstance(userid_list, list):
+            userid_list = [userid_list]
+        action = "get the metrics history of guest '%s'" % str(userid_list)
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return self._monitor.inspect_history(userid_list, metrics=metrics,
+                                                 window=window)
+
+    def guest_inspect_archive(self, userid_list, start=None, end=None):
+        """Get the archived cpu and memory samples of the guest virtual
+        machines
+
+        Each refresh of the cpu and memory data of the guests appends a
+        sample of each guest to the archive when archive_dir is set. The
+        guests are not required to exist anymore, so that the samples of
+        the deleted guests can still be read.
+
+        :param userid_list: a single userid string or a list of guest userids
+        :param int start: time in seconds since the epoch of the first
+               samples, None for the start of the day of end, in UTC
+        :param int end: time in seconds since the epoch of the last
+               samples, None for the newest archived samples
+        :returns: dictionary in the form
+                  {'UID1':
+                  [{
+                  'timestamp': xx,
+                  'guest_cpus': xx,
+                  'used_cpu_time_us': xx,
+                  'elapsed_cpu_time_us': xx,
+                  'min_cpu_count': xx,
+                  'max_cpu_limit': xx,
+                  'samples_cpu_in_use': xx,
+                  'samples_cpu_delay': xx,
+                  'used_mem_kb': xx,
+                  'max_mem_kb': xx,
+                  'min_mem_kb': xx,
+                  'shared_mem_kb': xx
+                  },
+                  ]
+                  }
+                  the samples of each guest are in time order. For the
+                  guests without samples in the range, no data returned
+                  in the dictionary. At most archive_query_max_samples
+                  samples are returned, plus the other samples of the
+                  second of the last one, the next samples are then got
+                  with start set to the following second
+        """
+        if not isinstance(userid_list, list):
+            userid_list = [userid_list]
+        action = ("get the archived samples of guest '%s'" %
+                  str(userid_list))
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return self._monitor.inspect_archive(userid_list, start=start,
+                                                 end=end)
+
+    def guest_get_events(self, last_event_id=None, timeout=0):
+        """Get the power state and lifecycle events of the guests.
+
+        The guests are watched by a background thread which queries the
+        power state of all the guests at once every event_poll_interval
+        seconds.
+
+        :param int last_event_id: id of the last event already received,
+               None to only get the events that happen from now on
+        :param int timeout: seconds to wait for an event when there is none
+               yet, 0 to return immediately
+        :returns: dictionary in the form
+                  {'last_event_id': xx,
+                   'missed': False,
+                   'events': [{'id': xx,
+                               'timestamp': xx,
+                               'userid': 'UID1',
+                               'event': 'power_state',
+                               'power_state': 'on',
+                               'previous_power_state': 'off'},
+                              ]
+                  }
+                  event is one of power_state | guest_added | guest_removed,
+                  missed is True when some events after last_event_id are
+                  not available anymore, the power state of the guests
+                  should then be queried again.
+        """
+        action = "get guest events"
+        with zvmutils.log_and_reraise_sdkbase_error(action):
+            return self._state_watcher.get_events(last_event_id, timeout)
+
     @check_guest_exist(check_index=1)
     def vswitch_grant_user(self, vswitch_name, userid):
         """Set vswitch to grant user
@@ -0,0 +1,286 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Archive of the cpu and memory samples of the guests.
+
+Each refresh of the cpu and memory metering data appends one sample per
+guest to the archive file of the day, in UTC. A sample is a fixed-width
+binary record of the userid, the time of the sample and the integer values
+of the guest in the order of perfdata.STATS_KEYS. The files are only
+appended to, so their records are in time order and the queries find the
+records of a time range by a binary search through mmap, without parsing
+any text. The files older than archive_retention_days are removed when the
+file of a new day is created.
+"""
+
+import calendar
+import datetime
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from zvmsdk import config
+from zvmsdk import exception
+from zvmsdk import log
+from zvmsdk import perfdata
+
+
+_ARCHIVE = None
+_LOCK = threading.Lock()
+CONF = config.CONF
+LOG = log.LOG
+
+_MAGIC = b'ZVMMARC1'
+# Magic, size of the records and number of values per record
+_HEADER = struct.Struct('<8sII')
+# Userid, time of the sample and values of the guest
+_RECORD = struct.Struct('<8sd%dq' % len(perfdata.STATS_KEYS))
+_TIMESTAMP = struct.Struct('<d')
+_TIMESTAMP_OFFSET = 8
+_USERID_SIZE = 8
+
+_FILE_NAME = 'cpumem-%s.arc'
+_FILE_RE = re.compile(r'^cpumem-(\d{8})\.arc$')
+_DAY_FORMAT = '%Y%m%d'
+
+
+def get_archive():
+    global _ARCHIVE
+    with _LOCK:
+        if _ARCHIVE is None:
+            _ARCHIVE = MeteringArchive()
+    return _ARCHIVE
+
+
+def _pack_userid(userid):
+    return userid.upper().encode('ascii')[:_USERID_SIZE].ljust(
+        _USERID_SIZE, b'\0')
+
+
+def _get_day(timestamp):
+    return datetime.datetime.utcfromtimestamp(timestamp).date()
+
+
+class MeteringArchive(object):
+    """Append-only archive of the cpu and memory samples of the guests,
+    one file per day under the archive_dir directory.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._day = None
+
+    def _get_path(self):
+        return self._path or CONF.monitor.archive_dir
+
+    def enabled(self):
+        return bool(self._get_path())
+
+    def _get_file(self, day):
+        return os.path.join(self._get_path(),
+                            _FILE_NAME % day.strftime(_DAY_FORMAT))
+
+    def _list_files(self):
+        """Get the archive files by day."""
+        path = self._get_path()
+        if not os.path.isdir(path):
+            return {}
+        files = {}
+        for name in os.listdir(path):
+            match = _FILE_RE.match(name)
+            if match is None:
+                continue
+            try:
+                day = datetime.datetime.strptime(match.group(1),
+                                                 _DAY_FORMAT).date()
+            except ValueError:
+                continue
+            files[day] = os.path.join(path, name)
+        return files
+
+    def append(self, data, timestamp=None):
+        """Append a sample of each guest of the cpu and memory data.
+
+        :param data: the performance data of the guests by userid.
+        :param timestamp: the time of the samples, now by default.
+        :returns: the number of appended samples.
+        """
+        values = []
+        for userid, record in data.items():
+            try:
+                stats = perfdata.get_stats(record)
+            except exception.SDKInternalError as err:
+                LOG.warning("Skipped the archive sample of %s: %s" %
+                            (userid, err))
+                continue
+            values.append((_pack_userid(userid),
+                           [stats[key] for key in perfdata.STATS_KEYS]))
+        if not values:
+            return 0
+
+        with self._lock:
+            # The time is taken under the lock so that the records of a
+            # file stay in time order
+            if timestamp is None:
+                timestamp = time.time()
+            day = _get_day(timestamp)
+            if day != self._day:
+                self._rotate(day)
+            records = b''.join(_RECORD.pack(userid, timestamp, *stats)
+                               for userid, stats in values)
+            self._write(self._get_file(day), records)
+        return len(values)
+
+    def _rotate(self, day):
+        path = self._get_path()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._day = day
+        self.prune(day)
+
+    def _write(self, path, records):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with open(path, 'ab') as f:
+            if size < _HEADER.size:
+                # A new file, or one whose header was not completely
+                # written
+                f.truncate(0)
+                f.write(_HEADER.pack(_MAGIC, _RECORD.size,
+                                     len(perfdata.STATS_KEYS)))
+            else:
+                # Drop the partial record of an interrupted write, which
+                # would shift all the following records
+                extra = (size - _HEADER.size) % _RECORD.size
+                if extra:
+                    f.truncate(size - extra)
+            f.write(records)
+
+    def prune(self, today=None):
+        """Remove the files older than archive_retention_days.
+
+        :returns: the number of removed files.
+        """
+        retention = CONF.monitor.archive_retention_days
+        if retention <= 0:
+            return 0
+        if today is None:
+            today = _get_day(time.time())
+        oldest = today - datetime.timedelta(days=retention - 1)
+        removed = 0
+        for day, path in self._list_files().items():
+            if day < oldest:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError as err:
+                    LOG.warning("Failed to remove the metering archive "
+                                "%s: %s" % (path, err))
+        return removed
+
+    def query(self, uid_list=None, start=None, end=None):
+        """Read the samples of the guests in a time range.
+
+        At most archive_query_max_samples samples are returned, the oldest
+        ones of the range along with the other samples of the same last
+        second, so that the next samples are queried from the following
+        second.
+
+        :param uid_list: list of guest userids, None for all the guests
+        :param start: time of the first samples, None for the start of the
+                      day of end in UTC
+        :param end: time of the last samples, None for the newest ones
+        :returns: a dict of the samples of the guests by userid, in time
+                  order, each with its 'timestamp' and the values keyed
+                  like ZVMMonitor.inspect_stats
+        """
+        userids = None
+        if uid_list is not None:
+            userids = dict((_pack_userid(uid), uid) for uid in uid_list)
+        if start is None:
+            day = _get_day(end if end is not None else time.time())
+            start = calendar.timegm(day.timetuple())
+        first_day = _get_day(start)
+        last_day = _get_day(end) if end is not None else None
+        result = {}
+        remaining = CONF.monitor.archive_query_max_samples
+        last_second = None
+        files = self._list_files()
+        for day in sorted(files):
+            if day < first_day or (last_day is not None and day > last_day):
+                continue
+            samples = self._read(files[day], userids, start, end)
+            try:
+                for userid, sample in samples:
+                    second = int(sample['timestamp'])
+                    if last_second is not None and second != last_second:
+                        return result
+                    result.setdefault(userid, []).append(sample)
+                    remaining -= 1
+                    if remaining <= 0 and last_second is None:
+                        last_second = second
+            finally:
+                samples.close()
+        return result
+
+    def _read(self, path, userids, start, end):
+        """Generate the (userid, sample) of a file in the time range."""
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            count = (size - _HEADER.size) // _RECORD.size
+            if count <= 0:
+                return
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if _HEADER.unpack_from(m, 0) != (_MAGIC, _RECORD.size,
+                                             len(perfdata.STATS_KEYS)):
+                LOG.warning("Skipped the metering archive %s of an unknown "
+                            "format" % path)
+                return
+            index = self._bisect(m, count, start)
+            for index in range(index, count):
+                offset = _HEADER.size + index * _RECORD.size
+                if end is not None and _TIMESTAMP.unpack_from(
+                        m, offset + _TIMESTAMP_OFFSET)[0] > end:
+                    break
+                packed_userid = m[offset:offset + _USERID_SIZE]
+                if userids is not None and packed_userid not in userids:
+                    continue
+                record = _RECORD.unpack_from(m, offset)
+                if userids is not None:
+                    userid = userids[packed_userid]
+                else:
+                    userid = packed_userid.rstrip(b'\0').decode('ascii')
+                sample = dict(zip(perfdata.STATS_KEYS, record[2:]))
+                sample['timestamp'] = record[1]
+                yield userid, sample
+        finally:
+            m.close()
+
+    @staticmethod
+    def _bisect(m, count, start):
+        """Get the index of the first record of the time start."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            offset = (_HEADER.size + middle * _RECORD.size +
+                      _TIMESTAMP_OFFSET)
+            if _TIMESTAMP.unpack_from(m, offset)[0] < start:
+                low = middle + 1
+            else:
+                high = middle
+        return low
@@ -0,0 +1,137 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run the z/VM commands of the process.
+
+check_output runs a command with subprocess in the calling thread, or in
+the asyncio command runner of cmdrunner_async when the
+[zvm] max_concurrent_commands option is set. The command runner requires
+Python 3.8 or later, on older versions the commands always run in the
+calling thread.
+"""
+
+import subprocess
+import sys
+import threading
+
+import six
+
+from zvmsdk import config
+from zvmsdk import log
+
+
+CONF = config.CONF
+LOG = log.LOG
+
+_RUNNER = None
+_LOCK = threading.Lock()
+_WARNED = False
+
+
+class CommandTimeoutError(Exception):
+    """The command did not end in time and was killed."""
+
+    def __init__(self, cmd, timeout):
+        self.cmd = cmd
+        self.timeout = timeout
+        super(CommandTimeoutError, self).__init__(
+            "Command '%s' timed out after %s seconds" %
+            (' '.join(cmd), timeout))
+
+
+def get_runner():
+    """Get the command runner of the process, None when it is disabled by
+    the [zvm] max_concurrent_commands option or not supported by this
+    version of Python.
+    """
+    global _RUNNER
+    limit = CONF.zvm.max_concurrent_commands
+    if not limit or limit <= 0:
+        return None
+    if sys.version_info < (3, 8):
+        # Before Python 3.8 the default asyncio child watcher has to be
+        # attached to a loop of the main thread, the runner loop runs in
+        # its own thread and could not start any command.
+        global _WARNED
+        if not _WARNED:
+            LOG.warning("The command runner requires Python 3.8 or later, "
+                        "max_concurrent_commands is ignored")
+            _WARNED = True
+        return None
+    with _LOCK:
+        if _RUNNER is None:
+            # Only imported when enabled, the module is Python 3 only
+            from zvmsdk import cmdrunner_async
+            _RUNNER = cmdrunner_async.CommandRunner(limit)
+    return _RUNNER
+
+
+def _check_output_with_timer(cmd, timeout, **kwargs):
+    # subprocess.check_output has no timeout before Python 3.3, the
+    # command is killed by a timer instead.
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, close_fds=True,
+                            **kwargs)
+    killed = []
+
+    def kill():
+        if proc.poll() is None:
+            try:
+                proc.kill()
+                killed.append(True)
+            except OSError:
+                # The process already ended
+                pass
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        output, _err = proc.communicate()
+    finally:
+        timer.cancel()
+    if killed:
+        raise CommandTimeoutError(cmd, timeout)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output)
+    return output
+
+
+def check_output(cmd, stderr=None, timeout=None):
+    """Run a command and return its output.
+
+    The command runs in the command runner when it is enabled, otherwise
+    with subprocess in the calling thread. The default timeout is the
+    [zvm] command_timeout option.
+
+    :raises subprocess.CalledProcessError: when the command fails.
+    :raises CommandTimeoutError: when the command timed out.
+    """
+    if timeout is None:
+        timeout = CONF.zvm.command_timeout
+    runner = get_runner()
+    if runner is not None:
+        return runner.check_output(cmd, stderr=stderr, timeout=timeout)
+
+    kwargs = {}
+    if stderr is not None:
+        kwargs['stderr'] = stderr
+    if not timeout:
+        return subprocess.check_output(cmd, close_fds=True, **kwargs)
+    if not six.PY3:
+        return _check_output_with_timer(cmd, timeout, **kwargs)
+    try:
+        return subprocess.check_output(cmd, close_fds=True, timeout=timeout,
+                                       **kwargs)
+    except subprocess.TimeoutExpired:
+        raise CommandTimeoutError(cmd, timeout)
@@ -0,0 +1,165 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Run the z/VM commands of the process from one asyncio event loop.
+
+The commands are started by an event loop running in its own thread, so
+that any number of commands can be in flight without a thread waiting for
+each of them. The number of commands running at the same time is bounded,
+the commands beyond it wait in the loop for a running command to end.
+
+Callers either submit a command and get a future of its result, which can
+be cancelled, or call check_output which waits for the result like
+subprocess.check_output does.
+
+This module requires Python 3.8 or later, whose default child watcher
+gets the exit of the commands started by a loop of any thread. It is only
+imported by cmdrunner.get_runner when the [zvm] max_concurrent_commands
+option is set.
+"""
+
+import asyncio
+import subprocess
+import threading
+
+from zvmsdk.cmdrunner import CommandTimeoutError
+
+
+class CommandRunner(object):
+    """Run commands from an event loop with a bounded concurrency."""
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._slots = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started = 0
+        self._running = 0
+        self._waiting = 0
+        self._timeouts = 0
+        self._cancels = 0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    # The semaphore is bound to the loop which created it
+                    self._slots = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run_loop,
+                                                name='CommandRunner')
+                self._thread.daemon = True
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    async def run(self, cmd, stderr=None, timeout=None):
+        """Run a command in the loop of the runner.
+
+        :param cmd:     the command as a list of arguments.
+        :param stderr:  subprocess.STDOUT to merge the error output with
+                        the output, None to leave it to the process.
+        :param timeout: seconds after which the command is killed, None or
+                        0 to wait until it ends.
+        :returns:       tuple of the return code and the output bytes.
+        """
+        with self._lock:
+            self._waiting += 1
+        try:
+            await self._slots.acquire()
+        except asyncio.CancelledError:
+            with self._lock:
+                self._cancels += 1
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        try:
+            with self._lock:
+                self._started += 1
+                self._running += 1
+            # A command cancelled while it is started is killed by asyncio
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=subprocess.PIPE, stderr=stderr, close_fds=True)
+            try:
+                output, _err = await asyncio.wait_for(proc.communicate(),
+                                                      timeout or None)
+            except asyncio.TimeoutError:
+                self._kill(proc)
+                await proc.wait()
+                with self._lock:
+                    self._timeouts += 1
+                raise CommandTimeoutError(cmd, timeout)
+            except asyncio.CancelledError:
+                self._kill(proc)
+                await proc.wait()
+                raise
+            return proc.returncode, output
+        except asyncio.CancelledError:
+            with self._lock:
+                self._cancels += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _kill(proc):
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            # The process already ended
+            pass
+
+    def submit(self, cmd, stderr=None, timeout=None):
+        """Start a command and return a concurrent.futures.Future of its
+        (return code, output) tuple.
+
+        Cancelling the future kills the command.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self.run(cmd, stderr=stderr, timeout=timeout), loop)
+
+    def check_output(self, cmd, stderr=None, timeout=None):
+        """Run a command and wait for its output, as subprocess.check_output
+        does.
+
+        :raises subprocess.CalledProcessError: when the command fails.
+        :raises CommandTimeoutError: when the command timed out.
+        """
+        rc, output = self.submit(cmd, stderr=stderr, timeout=timeout).result()
+        if rc != 0:
+            raise subprocess.CalledProcessError(rc, cmd, output)
+        return output
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'commands_total': self._started,
+                'commands_running': self._running,
+                'commands_waiting': self._waiting,
+                'command_timeouts_total': self._timeouts,
+                'command_cancels_total': self._cancels,
+                'command_limit': self.max_concurrency,
+                }
@@ -213,6 +213,127 @@ The length of namelist must no longer than 64.
         default='22',
         help='''
 The port number of remotehost sshd.
+'''),
+    Opt('max_concurrent_commands',
+        section='zvm',
+        default=0,
+        opt_type='int',
+        help='''
+The max number of z/VM commands, such as smcli, vmcp or iucvclnt, run
+concurrently by this process.
+
+When set, the commands are run by an asyncio event loop instead of a thread
+waiting for each command, and the commands beyond this number wait for a
+running command to end. The default is 0, which runs each command in the
+thread of its caller without limiting the number of commands.
+The command runner requires Python 3.8 or later, this option is ignored on
+older versions of Python.
+'''),
+    Opt('command_timeout',
+        section='zvm',
+        default=0,
+        opt_type='int',
+        help='''
+The seconds after which a z/VM command which did not end is killed.
+
+The default is 0, which waits for the commands until they end.
+'''),
+    Opt('host_info_refresh_interval',
+        section='zvm',
+        default=60,
+        opt_type='int',
+        help='''
+Interval in seconds between two refreshes of the cached host info.
+
+The host info is queried by the first host info call, then refreshed once
+per interval by a background thread, and the host info calls return the
+cached info. When the cached info is older than three intervals, e.g. the
+refreshes failed, the host info call queries it again. When this value is
+below or equal to zero, each host info call queries the host info.
+'''),
+    # smapi options
+    Opt('native_apis',
+        section='smapi',
+        default='',
+        help='''
+Comma separated list of the SMAPI APIs called through the SMAPI server
+socket instead of the smcli command.
+
+Calling SMAPI directly saves the sudo, fork and exec of smcli for each call.
+Only the APIs in this list are called directly, and only if they are
+supported by the native client (Image_Activate and Image_Deactivate), the
+other ones are still called with smcli. The default is an empty string,
+all the APIs are called with smcli.
+
+smcli reaches the SMAPI server over an AF_IUCV socket, which requires no
+credentials. Python has no portable AF_IUCV support, so the native client
+uses the TCP/IP listener of the SMAPI server instead, which authenticates
+each request with the host, user and password options of this section.
+Until all three are set, the APIs are still called with smcli.
+
+Sample value:
+    Image_Activate,Image_Deactivate
+'''),
+    Opt('host',
+        section='smapi',
+        default='',
+        help='''
+The IP address the SMAPI server listens on for TCP/IP requests.
+
+The SMAPI TCP/IP listener usually does not run on the local host, set it to
+the address configured for the SMAPI server of the z/VM system.
+'''),
+    Opt('port',
+        section='smapi',
+        default=44444,
+        opt_type='int',
+        help='''
+The port the SMAPI server listens on for TCP/IP requests.
+'''),
+    Opt('user',
+        section='smapi',
+        default='',
+        help='''
+The z/VM userid the SMAPI requests are authenticated with.
+
+It must be authorized to call the native_apis on the managed guests.
+'''),
+    Opt('password',
+        section='smapi',
+        default='',
+        help='''
+The password of the SMAPI user.
+
+It is stored in plain text, make sure this configuration file is only
+readable by the user running the z/VM Cloud Connector.
+'''),
+    Opt('pool_size',
+        section='smapi',
+        default=4,
+        opt_type='int',
+        help='''
+The max number of concurrent connections to the SMAPI server.
+
+Requests beyond this number wait for a connection to be released.
+'''),
+    Opt('max_concurrent_calls',
+        section='smapi',
+        default=0,
+        opt_type='int',
+        help='''
+The max number of SMAPI calls made concurrently by this process.
+
+It covers both the smcli calls and the calls through the SMAPI server
+socket, and should match the number of requests the SMAPI server can handle
+in parallel. Calls beyond this number wait for a running call to end. The
+default is 0, which does not limit the calls.
+'''),
+    Opt('timeout',
+        section='smapi',
+        default=300,
+        opt_type='int',
+        help='''
+Timeout in seconds of a SMAPI request sent through the SMAPI server socket.
 '''),
     # image options
     Opt('sdk_image_repository',
@@ -237,6 +358,32 @@ Directory to store sdk imported or exported files.
 SDK file repository to store the imported files and the files that will be
 exported, the imported files will be put into <file_repository>/imported
 the files to be exported will be put into <file_repository>/exported
+    '''),
+    Opt('chunk_size',
+        section='file',
+        default=1048576,
+        opt_type='int',
+        help='''
+Size in bytes of each chunk read when a file is imported or exported.
+
+A larger chunk size means less iterations when importing or exporting large
+files such as disk images, at the cost of more memory per request. When the
+wsgi server provides wsgi.file_wrapper (e.g. uwsgi, which uses sendfile),
+whole file exports are sent by the server without reading the file in
+python, this value is then passed to the wrapper as block size.
+    '''),
+    Opt('upload_session_ttl',
+        section='file',
+        default=86400,
+        opt_type='int',
+        help='''
+Time in seconds after which an incomplete file import session expires.
+
+The data received by a file import session is kept until the last part of
+the file is received, so that the upload can be resumed. The data of the
+sessions which did not receive any part for this time is removed by the
+next file import. When this value is below or equal to zero, the data of
+the incomplete sessions is never removed.
     '''),
     # network options
     Opt('my_ip',
@@ -304,6 +451,189 @@ will be disabled and each inspect call will need to call the backend
 utilities to get the inspected guest's monitor data.
         '''
         ),
+    Opt('cache_size',
+        section='monitor',
+        default=10000,
+        opt_type='int',
+        help='''
+The maximum number of guests whose monitor data is cached.
+
+When more guests are cached, the data of the least recently inspected
+guests is dropped from the cache. This value should be above the number of
+guests of the host, otherwise the dropped guests are queried again by the
+next inspect call. When this value is below or equal to zero, the cache
+is not bounded.
+        '''
+        ),
+    Opt('partial_refresh_percent',
+        section='monitor',
+        default=10,
+        opt_type='int',
+        help='''
+The percentage of cache misses below which only the missed guests are
+queried.
+
+When an inspect call misses the cpu and memory data of some guests in the
+cache, and the number of these guests is at most this percentage of the
+guests in the cache, only the data of these guests is queried and merged
+in the cache. Otherwise the data of all the guests is queried at once.
+When this value is below or equal to zero, the data of all the guests is
+always queried.
+        '''
+        ),
+    Opt('vnics_vswitches',
+        section='monitor',
+        default='*',
+        help='''
+The vswitches whose nic statistics are queried by a vnics refresh.
+
+'*' queries all the vswitches of the host at once. 'registered' queries
+only the vswitches which the nics of the SDK managed guests are coupled
+to, one query per vswitch. Otherwise, a comma separated list of the names
+of the vswitches to query.
+        '''
+        ),
+    Opt('collect_interval',
+        section='monitor',
+        default=0,
+        opt_type='int',
+        help='''
+Interval in seconds between two refreshes of the metering collector.
+
+When this value is above zero, a background collector thread refreshes the
+cpu, memory and vnic metering data of all the guests once per interval, and
+the inspect calls are always served from the last collected data, so that
+no inspect call waits for the backend utilities, except the first ones
+which wait for the first collection. The age of the returned data is given
+by the cpumem_age and vnics_age phases of the Server-Timing header.
+
+When this value is below or equal to zero, the collector is disabled and
+the data is refreshed as described by cache_interval.
+        '''
+        ),
+    Opt('history_size',
+        section='monitor',
+        default=60,
+        opt_type='int',
+        help='''
+The number of metering samples kept for each guest.
+
+A sample of the cpu, memory and vnic counters of each guest is recorded
+each time the metering data is refreshed, by the collector or by the
+inspect calls, and the guest metrics history API computes their deltas
+and rates over the kept samples. The memory used by the history of a guest
+is bounded by this number of samples.
+
+When this value is below or equal to zero, no history is kept.
+        '''
+        ),
+    Opt('archive_dir',
+        section='monitor',
+        default='',
+        help='''
+Directory of the archive of the guest cpu and memory samples.
+
+When set, each refresh of the cpu and memory metering data of the guests,
+by the collector or by the inspect calls, appends a sample of each guest to
+the archive file of the day in this directory, so that the samples can be
+queried long after they were refreshed, e.g. for capacity planning. The
+samples are fixed-width binary records, about 100 bytes per guest and
+refresh. Set collect_interval to sample the guests at a regular interval.
+When this value is empty, nothing is archived.
+        '''
+        ),
+    Opt('archive_retention_days',
+        section='monitor',
+        default=90,
+        opt_type='int',
+        help='''
+The number of days of samples kept in the metering archive.
+
+The archive files of older days are removed when the file of a new day is
+created. When this value is below or equal to zero, the files are never
+removed.
+        '''
+        ),
+    Opt('archive_query_max_samples',
+        section='monitor',
+        default=10000,
+        opt_type='int',
+        help='''
+The max number of samples returned by one query of the metering archive.
+
+A query gets the oldest samples of its time range up to this number, plus
+the other samples of the last second, the next samples are then queried
+from the following second.
+        '''
+        ),
+    Opt('namelist_resync_interval',
+        section='monitor',
+        default=3600,
+        opt_type='int',
+        help='''
+Interval in seconds between two checks of the SMAPI namelist.
+
+The monitor keeps a copy of the namelist through which the performance
+data of the guests is queried. The copy is reconciled with the namelist
+when the SDK server starts and kept up to date when guests are created,
+deleted, registered or deregistered, so that the namelist is not queried
+for each metering refresh. Once per interval, the next metering refresh
+queries the namelist and reconciles the copy again if the namelist was
+changed outside of the SDK.
+
+When this value is below or equal to zero, the namelist is only queried
+when the SDK server starts.
+        '''
+        ),
+    Opt('event_poll_interval',
+        section='monitor',
+        default=10,
+        opt_type='int',
+        help='''
+Interval in seconds between two power state queries of the guest watcher.
+
+The guest watcher is started by the first guest events request. It queries
+the power state of all the guests with a single command per interval and
+records the power state changes, guest creations and deletions as events
+which clients receive through the /events REST API.
+
+When this value is below or equal to zero, guest events are disabled.
+        '''
+        ),
+    Opt('event_buffer_size',
+        section='monitor',
+        default=1000,
+        opt_type='int',
+        help='''
+The max number of guest events kept by the guest watcher.
+
+A client which falls behind by more than this number of events is told that
+it missed some events and should query the guests power state again.
+        '''
+        ),
+    Opt('event_wait_timeout',
+        section='monitor',
+        default=60,
+        opt_type='int',
+        help='''
+The max time in seconds a guest events request waits for a new event.
+        '''
+        ),
+    Opt('max_event_subscribers',
+        section='monitor',
+        default=8,
+        opt_type='int',
+        help='''
+The max number of concurrent guest events requests of a wsgi process.
+
+An event stream holds a thread of the wsgi server for as long as its client
+is connected, and a guest events request holds a thread of the wsgi server
+and a worker of the SDK server while it waits for a new event. The requests
+received when this number of requests are running are rejected, so that
+the other REST requests can still be handled. This value should stay well
+below the threads of a wsgi process.
+        '''
+        ),
     # wsgi options
     # this option is used when sending http request
     # to sdk wsgi, default to none so no token validation
@@ -351,6 +681,23 @@ Admin-token in order to get a user-token from zvm sdk, and the user-token
 will be used to validate request before user-token expire.
 '''
         ),
+    Opt('metrics_auth',
+        section='wsgi',
+        default='auth',
+        opt_type='str',
+        help='''
+Whether the /metrics API needs a token when auth is used.
+
+Prometheus can't get and refresh the token of the REST API, so it can only
+scrape /metrics when auth is 'none', or when this option is 'none'. The
+[sdkserver] metrics_port exporter, which never needs a token, can be used
+instead.
+
+Possible value:
+'auth': /metrics needs a token like the other APIs when auth is 'auth'
+'none': /metrics never needs a token
+''',
+        ),
     Opt('max_concurrent_deploy_capture',
         section='wsgi',
         default=20,
@@ -360,9 +707,43 @@ The max total number of concurrent deploy and capture requests allowed in a
 single z/VM Cloud Connector process.
 
 If more requests than this value are revieved concurrently, the z/VM Cloud
-Connector would reject the requests and return error to avoid resource
-exhaustion.
+Connector would queue the extra requests, or reject them and return error
+when the queue is full, to avoid resource exhaustion. See
+max_deploy_capture_queue_size.
 .
+'''
+        ),
+    Opt('max_deploy_capture_queue_size',
+        section='wsgi',
+        default=4,
+        opt_type='int',
+        help='''
+The max number of deploy and capture requests waiting to be handled.
+
+When max_concurrent_deploy_capture requests are already being handled, new
+deploy and capture requests wait in a queue and are handled in order of
+their priority, then of their arrival, once a running request finishes.
+Requests received when the queue is full are rejected.
+
+A waiting request holds a thread of the wsgi server, and the other REST
+requests can't be handled once all the threads are held. When running in
+uwsgi, this value is capped to a quarter of the threads of a process.
+
+Set this to 0 to reject requests immediately as soon as
+max_concurrent_deploy_capture is reached.
+'''
+        ),
+    Opt('deploy_capture_queue_timeout',
+        section='wsgi',
+        default=300,
+        opt_type='int',
+        help='''
+The max time a deploy or capture request waits in queue, in seconds.
+
+A request that can't be handled within this time is rejected with the
+queue position it got when it was received.
+When this value is 0, a request waits until it is handled, holding a thread
+of the wsgi server meanwhile.
 '''
         ),
     # Daemon server options
@@ -411,6 +792,19 @@ The maximum number of worker thread in SDK server to handle client requests.
 
 These worker threads would work concurrently to handle requests from client.
 This value should be adjusted according to the system resource and workload.
+'''
+        ),
+    Opt('metrics_port',
+        section='sdkserver',
+        opt_type='int',
+        default=0,
+        help='''
+The port of the metrics exporter of the SDK server.
+
+When this value is above zero, the SDK server also serves the metrics of
+the guests, of the host and of the SDK in the Prometheus text format on
+http://bind_addr:metrics_port/metrics, so that they can be scraped without
+the REST server. The same metrics are served by the /metrics REST API.
 '''
         ),
     # database options
@@ -12,6 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import threading
+import time
 
 from zvmsdk import config
 from zvmsdk import constants as const
@@ -34,11 +37,77 @@ def get_hostops():
 
 
 class HOSTOps(object):
+    """Host operations.
+
+    The host info is cached when the host_info_refresh_interval option is
+    above zero. The first get_info call queries it, then a background
+    thread refreshes it once per interval, so that get_info does not wait
+    for the backend utilities.
+    """
+    # The cached info is returned while the refresher keeps it younger than
+    # this number of intervals, otherwise, e.g. when the refreshes fail,
+    # get_info queries it again and raises the errors to its callers.
+    _MAX_AGE_INTERVALS = 3
 
     def __init__(self):
         self._smtclient = smtclient.get_smtclient()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._info = None
+        self._refreshed_at = 0
+        self._refresher = None
+        self._refresher_lock = threading.Lock()
 
     def get_info(self):
+        interval = CONF.zvm.host_info_refresh_interval
+        if interval <= 0:
+            return self._query_info()
+
+        self._start_refresher()
+        with self._lock:
+            if self._is_fresh(interval):
+                return copy.deepcopy(self._info)
+        # The concurrent callers and the refresher wait for one query
+        with self._load_lock:
+            with self._lock:
+                if self._is_fresh(interval):
+                    return copy.deepcopy(self._info)
+            return self.refresh()
+
+    def _is_fresh(self, interval):
+        return (self._info is not None and
+                time.time() - self._refreshed_at <=
+                interval * self._MAX_AGE_INTERVALS)
+
+    def refresh(self):
+        """Query the host info and update the cached info.
+
+        :returns: the updated host info
+        """
+        host_info = self._query_info()
+        with self._lock:
+            self._info = host_info
+            self._refreshed_at = time.time()
+            return copy.deepcopy(self._info)
+
+    def _start_refresher(self):
+        with self._refresher_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._run_refresher, name='HostInfoRefresher')
+                self._refresher.daemon = True
+                self._refresher.start()
+
+    def _run_refresher(self):
+        while True:
+            time.sleep(CONF.zvm.host_info_refresh_interval)
+            try:
+                with self._load_lock:
+                    self.refresh()
+            except Exception as err:
+                LOG.error("Failed to refresh the host info: %s" % err)
+
+    def _query_info(self):
         inv_info = self._smtclient.get_host_info()
         host_info = {}
 
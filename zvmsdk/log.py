@@ -17,6 +17,7 @@ import logging
 import os
 
 from zvmsdk import config
+from zvmsdk import tracing
 
 
 class Logger():
@@ -48,8 +49,10 @@ class Logger():
 
         # set the formate of the handler
         formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] %(message)s', '%Y-%m-%d %H:%M:%S')
+            '[%(asctime)s] [%(levelname)s] [%(request_id)s] %(message)s',
+            '%Y-%m-%d %H:%M:%S')
         fh.setFormatter(formatter)
+        fh.addFilter(tracing.RequestIdFilter())
 
         # add handler in the logger
         self.logger.addHandler(fh)
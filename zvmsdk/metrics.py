@@ -0,0 +1,389 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Expose the metrics of the guests, of the host and of the SDK itself in
+the Prometheus text format.
+
+The guest metrics are rendered from the metering data of the monitor, which
+is queried for all the guests at once, so that a scrape costs at most one
+query per metering type whatever the number of guests. The metrics are
+served by the /metrics REST API and, when [sdkserver] metrics_port is set,
+by a standalone exporter in the SDK server.
+"""
+
+import math
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from zvmsdk import config
+from zvmsdk import hostops
+from zvmsdk import log
+from zvmsdk import monitor
+from zvmsdk import smtclient
+
+
+CONF = config.CONF
+LOG = log.LOG
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds of the buckets of the request duration histogram
+REQUEST_BUCKETS = (0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800)
+
+# Name, type, help, key in the metering data and scale of the guest metrics
+_CPUMEM_METRICS = (
+    ('zvm_guest_cpus', 'gauge', 'Number of virtual CPUs of the guest.',
+     'guest_cpus', 1),
+    ('zvm_guest_cpu_used_seconds_total', 'counter',
+     'CPU time used by the guest.', 'used_cpu_time_us', 1e-6),
+    ('zvm_guest_cpu_elapsed_seconds_total', 'counter',
+     'Time elapsed since the guest logged on.', 'elapsed_cpu_time_us',
+     1e-6),
+    ('zvm_guest_cpu_samples_in_use_total', 'counter',
+     'Samples where a virtual CPU of the guest was running.',
+     'samples_cpu_in_use', 1),
+    ('zvm_guest_cpu_samples_delay_total', 'counter',
+     'Samples where a virtual CPU of the guest was waiting to run.',
+     'samples_cpu_delay', 1),
+    ('zvm_guest_min_cpu_count', 'gauge',
+     'Minimum number of CPUs of the guest.', 'min_cpu_count', 1),
+    ('zvm_guest_max_cpu_limit', 'gauge', 'CPU limit of the guest.',
+     'max_cpu_limit', 1),
+    ('zvm_guest_memory_used_bytes', 'gauge', 'Memory used by the guest.',
+     'used_mem_kb', 1024),
+    ('zvm_guest_memory_max_bytes', 'gauge', 'Maximum memory of the guest.',
+     'max_mem_kb', 1024),
+    ('zvm_guest_memory_min_bytes', 'gauge', 'Minimum memory of the guest.',
+     'min_mem_kb', 1024),
+    ('zvm_guest_memory_shared_bytes', 'gauge',
+     'Shared memory of the guest.', 'shared_mem_kb', 1024),
+    )
+
+_NIC_METRICS = (
+    ('zvm_guest_nic_receive_bytes_total', 'Bytes received by the vNIC.',
+     'nic_rx'),
+    ('zvm_guest_nic_transmit_bytes_total', 'Bytes sent by the vNIC.',
+     'nic_tx'),
+    ('zvm_guest_nic_receive_frames_total', 'Frames received by the vNIC.',
+     'nic_fr_rx'),
+    ('zvm_guest_nic_transmit_frames_total', 'Frames sent by the vNIC.',
+     'nic_fr_tx'),
+    ('zvm_guest_nic_receive_discarded_frames_total',
+     'Received frames discarded by the vNIC.', 'nic_fr_rx_dsc'),
+    ('zvm_guest_nic_transmit_discarded_frames_total',
+     'Frames to send discarded by the vNIC.', 'nic_fr_tx_dsc'),
+    ('zvm_guest_nic_receive_errors_total',
+     'Received frames in error on the vNIC.', 'nic_fr_rx_err'),
+    ('zvm_guest_nic_transmit_errors_total',
+     'Frames to send in error on the vNIC.', 'nic_fr_tx_err'),
+    )
+
+_HOST_METRICS = (
+    ('zvm_host_cpus', 'Number of CPUs of the host LPAR.', 'vcpus', 1),
+    ('zvm_host_cpus_used', 'Number of CPUs used in the host LPAR.',
+     'vcpus_used', 1),
+    ('zvm_host_memory_bytes', 'Memory of the host LPAR.', 'memory_mb',
+     1024 ** 2),
+    ('zvm_host_memory_used_bytes', 'Memory used in the host LPAR.',
+     'memory_mb_used', 1024 ** 2),
+    ('zvm_diskpool_bytes', 'Size of the disk pool.', 'disk_total',
+     1024 ** 3),
+    ('zvm_diskpool_used_bytes', 'Space used in the disk pool.', 'disk_used',
+     1024 ** 3),
+    ('zvm_diskpool_available_bytes', 'Space available in the disk pool.',
+     'disk_available', 1024 ** 3),
+    )
+
+_REQUEST_STATS = None
+_GAUGES = {}
+_LOCK = threading.Lock()
+
+
+class MetricFamily(object):
+    """The samples of one metric."""
+
+    def __init__(self, name, type, help):
+        self.name = name
+        self.type = type
+        self.help = help
+        self.samples = []
+
+    def add(self, value, suffix='', **labels):
+        self.samples.append((self.name + suffix, labels, value))
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _escape_help(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _scale(value, scale):
+    if scale < 1:
+        # Divide by the number of sub-units, so that 6185838 us gives
+        # 6.185838 seconds rather than a rounding error of it
+        return value / round(1 / scale)
+    return value * scale
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return repr(value)
+    return str(int(value))
+
+
+def render(families):
+    """Render the metric families in the Prometheus text format."""
+    lines = []
+    for family in families:
+        if not family.samples:
+            continue
+        lines.append('# HELP %s %s' % (family.name,
+                                          _escape_help(family.help)))
+        lines.append('# TYPE %s %s' % (family.name, family.type))
+        for name, labels, value in family.samples:
+            if labels:
+                name += '{%s}' % ','.join(
+                    '%s="%s"' % (k, _escape(labels[k]))
+                    for k in sorted(labels))
+            lines.append('%s %s' % (name, _format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats(object):
+    """Count and time the API requests served by the SDK server."""
+
+    def __init__(self, buckets=REQUEST_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._apis = {}
+        self._queue_wait = 0.0
+
+    def observe(self, api, seconds, failed=False, queued=0):
+        with self._lock:
+            stats = self._apis.get(api)
+            if stats is None:
+                stats = self._apis[api] = {
+                    'count': 0, 'errors': 0, 'sum': 0.0,
+                    'buckets': [0] * len(self.buckets)}
+            stats['count'] += 1
+            stats['sum'] += seconds
+            if failed:
+                stats['errors'] += 1
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+            self._queue_wait += queued
+
+    def collect(self):
+        duration = MetricFamily('zvm_sdk_request_duration_seconds',
+                                'histogram',
+                                'Time spent to handle the API requests.')
+        errors = MetricFamily('zvm_sdk_request_errors_total', 'counter',
+                              'API requests which failed.')
+        queue_wait = MetricFamily('zvm_sdk_request_queue_wait_seconds_total',
+                                  'counter',
+                                  'Time the API requests waited for a '
+                                  'worker.')
+        with self._lock:
+            for api in sorted(self._apis):
+                stats = self._apis[api]
+                for bound, count in zip(self.buckets, stats['buckets']):
+                    duration.add(count, '_bucket', api=api,
+                                 le=_format_value(float(bound)))
+                duration.add(stats['count'], '_bucket', api=api, le='+Inf')
+                duration.add(stats['sum'], '_sum', api=api)
+                duration.add(stats['count'], '_count', api=api)
+                errors.add(stats['errors'], api=api)
+            queue_wait.add(self._queue_wait)
+        return [duration, errors, queue_wait]
+
+
+def get_request_stats():
+    global _REQUEST_STATS
+    with _LOCK:
+        if _REQUEST_STATS is None:
+            _REQUEST_STATS = RequestStats()
+    return _REQUEST_STATS
+
+
+def register_gauge(name, help, func):
+    """Expose the value returned by func when the metrics are collected."""
+    with _LOCK:
+        _GAUGES[name] = (help, func)
+
+
+def _collect_cpumem(families):
+    data, age = monitor.get_monitor().get_metering_data('cpumem')
+    age_family = MetricFamily('zvm_guest_cpumem_age_seconds', 'gauge',
+                              'Age of the cpu and memory data of the '
+                              'guests.')
+    age_family.add(age)
+    families.append(age_family)
+    cpumem_families = [MetricFamily(name, type, help)
+                       for name, type, help, _key, _scale in _CPUMEM_METRICS]
+    families.extend(cpumem_families)
+    for userid in sorted(data):
+        try:
+            stats = monitor.ZVMMonitor.parse_cpumem(data[userid])
+        except Exception as err:
+            LOG.warning("Skipped the metrics of guest %s: %s" % (userid, err))
+            continue
+        for family, metric in zip(cpumem_families, _CPUMEM_METRICS):
+            family.add(_scale(stats[metric[3]], metric[4]), userid=userid)
+
+
+def _collect_vnics(families):
+    data, age = monitor.get_monitor().get_metering_data('vnics')
+    age_family = MetricFamily('zvm_guest_vnics_age_seconds', 'gauge',
+                              'Age of the vNIC data of the guests.')
+    age_family.add(age)
+    families.append(age_family)
+    nic_families = [MetricFamily(name, 'counter', help)
+                    for name, help, _key in _NIC_METRICS]
+    families.extend(nic_families)
+    for userid in sorted(data):
+        for nic in data[userid]:
+            for family, metric in zip(nic_families, _NIC_METRICS):
+                family.add(nic[metric[2]], userid=userid,
+                           vswitch=nic['vswitch_name'], vdev=nic['nic_vdev'])
+
+
+def _collect_host(families):
+    host_info = hostops.get_hostops().get_info()
+    info = MetricFamily('zvm_host_info', 'gauge',
+                        'Information about the z/VM host.')
+    info.add(1, zvm_host=host_info['zvm_host'],
+             hypervisor_hostname=host_info['hypervisor_hostname'],
+             hypervisor_version=host_info['hypervisor_version'])
+    families.append(info)
+    pool = CONF.zvm.disk_pool.split(':')[1]
+    for name, help, key, scale in _HOST_METRICS:
+        family = MetricFamily(name, 'gauge', help)
+        if name.startswith('zvm_diskpool'):
+            family.add(host_info[key] * scale, pool=pool)
+        else:
+            family.add(host_info[key] * scale)
+        families.append(family)
+
+
+def _collect_sdk(families):
+    families.extend(get_request_stats().collect())
+    with _LOCK:
+        gauges = sorted(_GAUGES.items())
+    for name, (help, func) in gauges:
+        family = MetricFamily(name, 'gauge', help)
+        family.add(func())
+        families.append(family)
+
+    cache_families = {}
+    cache_stats = monitor.get_monitor().get_cache_stats()
+    for ctype in sorted(cache_stats):
+        for key in sorted(cache_stats[ctype]):
+            family = cache_families.get(key)
+            if family is None:
+                type = 'counter' if key.endswith('_total') else 'gauge'
+                family = cache_families[key] = MetricFamily(
+                    'zvm_metering_cache_' + key, type,
+                    'Metering cache metric %s.' % key)
+                families.append(family)
+            family.add(cache_stats[ctype][key], type=ctype)
+
+    smt_metrics = smtclient.get_smtclient().get_smt_metrics()
+    for key in sorted(smt_metrics):
+        type = 'counter' if key.endswith('_total') else 'gauge'
+        family = MetricFamily('zvm_smt_' + key, type,
+                              'SMT metric %s.' % key)
+        family.add(smt_metrics[key])
+        families.append(family)
+
+
+def collect():
+    """Collect the metrics of the guests, of the host and of the SDK.
+
+    A source which fails is skipped and reported by the zvm_scrape_error
+    metric, the others are still collected.
+    """
+    families = []
+    scrape_error = MetricFamily('zvm_scrape_error', 'gauge',
+                                'Whether collecting the metrics of a source '
+                                'failed.')
+    scrape_duration = MetricFamily('zvm_scrape_duration_seconds', 'gauge',
+                                   'Time spent to collect the metrics of a '
+                                   'source.')
+    for source, func in (('cpumem', _collect_cpumem),
+                         ('vnics', _collect_vnics),
+                         ('host', _collect_host),
+                         ('sdk', _collect_sdk)):
+        start = time.time()
+        failed = 0
+        try:
+            func(families)
+        except Exception as err:
+            LOG.error("Failed to collect the %s metrics: %s" % (source, err))
+            failed = 1
+        scrape_error.add(failed, source=source)
+        scrape_duration.add(time.time() - start, source=source)
+    families.extend([scrape_error, scrape_duration])
+    return families
+
+
+def generate():
+    """Get the metrics in the Prometheus text format."""
+    return render(collect())
+
+
+class _ExporterHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = generate().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOG.debug("Metrics exporter: %s - %s" %
+                  (self.address_string(), format % args))
+
+
+class _ExporterServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def start_exporter(host, port):
+    """Serve GET /metrics on the given address from a background thread.
+
+    :returns: the HTTP server
+    """
+    server = _ExporterServer((host, port), _ExporterHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name='MetricsExporter')
+    thread.daemon = True
+    thread.start()
+    return server
@@ -12,15 +12,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import array
+import collections
+import hashlib
 import threading
 import time
 
+from zvmsdk import archive
 from zvmsdk import config
+from zvmsdk import database
+from zvmsdk import exception
 from zvmsdk import log
+from zvmsdk import perfdata
 from zvmsdk import smtclient
+from zvmsdk import tracing
 from zvmsdk import utils as zvmutils
 
 _MONITOR = None
+_STATE_WATCHER = None
+_NAMELIST_MIRROR = None
+_LOCK = threading.Lock()
 CONF = config.CONF
 LOG = log.LOG
 
@@ -32,14 +43,60 @@ def get_monitor():
     return _MONITOR
 
 
+def get_state_watcher():
+    global _STATE_WATCHER
+    if _STATE_WATCHER is None:
+        _STATE_WATCHER = GuestStateWatcher()
+    return _STATE_WATCHER
+
+
+def get_namelist_mirror():
+    global _NAMELIST_MIRROR
+    with _LOCK:
+        if _NAMELIST_MIRROR is None:
+            _NAMELIST_MIRROR = NamelistMirror()
+    return _NAMELIST_MIRROR
+
+
 class ZVMMonitor(object):
-    """Monitor support for ZVM"""
+    """Monitor support for ZVM
+
+    When the collector is enabled by the collect_interval option, a
+    background thread refreshes the metering data of all the guests once
+    per interval and the inspect calls are always served from the last
+    snapshot, whatever its age. Otherwise the data is refreshed by the
+    inspect call which finds it expired in the cache.
+    """
     _TYPES = ('cpumem', 'vnics')
+    # Metrics kept in the history of each guest, by type. The counters keep
+    # growing while the guest is logged on, the gauges are instant values.
+    _HISTORY_COUNTERS = {
+        'cpumem': ('used_cpu_time_us', 'elapsed_cpu_time_us',
+                   'samples_cpu_in_use', 'samples_cpu_delay'),
+        'vnics': ('nic_rx', 'nic_tx', 'nic_fr_rx', 'nic_fr_tx',
+                  'nic_fr_rx_dsc', 'nic_fr_tx_dsc', 'nic_fr_rx_err',
+                  'nic_fr_tx_err'),
+        }
+    _HISTORY_GAUGES = {
+        'cpumem': ('guest_cpus', 'used_mem_kb'),
+        'vnics': (),
+        }
 
     def __init__(self):
         self._cache = MeteringCache(self._TYPES)
         self._smtclient = smtclient.get_smtclient()
         self._namelist = zvmutils.get_namelist()
+        self._namelist_mirror = get_namelist_mirror()
+        self._collector = None
+        self._collector_lock = threading.Lock()
+        self._history = dict((t, {}) for t in self._TYPES)
+        self._history_lock = threading.Lock()
+        self._archive = archive.get_archive()
+        # Last counters of each nic by (userid, vswitch name, vdev) and the
+        # deltas of the nics since their previous sample by userid
+        self._nic_samples = {}
+        self._nic_deltas = {}
+        self._nic_lock = threading.Lock()
 
     def inspect_stats(self, uid_list):
         cpumem_data = self._get_inspect_data('cpumem', uid_list)
@@ -47,35 +104,14 @@ class ZVMMonitor(object):
         stats_data = {}
         for uid in uid_list:
             if uid in cpumem_data:
-                with zvmutils.expect_invalid_resp_data():
-                    user_data = cpumem_data[uid]
-                    guest_cpus = int(user_data['guest_cpus'])
-                    used_cpu_time = user_data['used_cpu_time']
-                    used_cpu_time = int(used_cpu_time.partition(' ')[0])
-                    elapsed_cpu_time = int(
-                        user_data['elapsed_cpu_time'].partition(' ')[0])
-                    used_mem = int(user_data['used_memory'].partition(' ')[0])
-                    max_mem = int(user_data['max_memory'].partition(' ')[0])
-                    min_mem = int(user_data['min_memory'].partition(' ')[0])
-                    shared_mem = int(
-                        user_data['shared_memory'].partition(' ')[0])
-
-                stats_data[uid] = {
-                    'guest_cpus': guest_cpus,
-                    'used_cpu_time_us': used_cpu_time,
-                    'elapsed_cpu_time_us': elapsed_cpu_time,
-                    'min_cpu_count': int(user_data['min_cpu_count']),
-                    'max_cpu_limit': int(user_data['max_cpu_limit']),
-                    'samples_cpu_in_use': int(user_data['samples_cpu_in_use']),
-                    'samples_cpu_delay': int(user_data['samples_cpu_delay']),
-                    'used_mem_kb': used_mem,
-                    'max_mem_kb': max_mem,
-                    'min_mem_kb': min_mem,
-                    'shared_mem_kb': shared_mem
-                    }
+                stats_data[uid] = self.parse_cpumem(cpumem_data[uid])
 
         return stats_data
 
+    @staticmethod
+    def parse_cpumem(user_data):
+        return perfdata.get_stats(user_data)
+
     def inspect_vnics(self, uid_list):
         vnics = self._get_inspect_data('vnics', uid_list)
         # construct and return final result
@@ -87,12 +123,212 @@ class ZVMMonitor(object):
 
         return target_vnics
 
+    def inspect_vnics_delta(self, uid_list):
+        """Get the deltas of the nic counters of the guests between the
+        last two refreshes of the vnics data.
+
+        :param uid_list: list of guest userids
+        :returns: a dict of the nic deltas by userid, each with the
+                  'vswitch_name', 'nic_vdev', the 'interval' in seconds
+                  between the two samples, whether the counters were
+                  'reset' in between and the delta of each counter. A nic
+                  which was only sampled once has no delta yet.
+        """
+        self._get_inspect_data('vnics', uid_list)
+        result = {}
+        with self._nic_lock:
+            for uid in uid_list:
+                deltas = self._nic_deltas.get(uid.upper())
+                if deltas:
+                    result[uid] = [dict(delta) for delta in deltas]
+        return result
+
+    def inspect_history(self, uid_list, metrics=None, window=None):
+        """Get the deltas and rates of the metrics of the guests over their
+        recent samples.
+
+        :param uid_list: list of guest userids
+        :param metrics: names of the metrics to return, None for all
+        :param window: only use the samples of the last window seconds,
+                       None to use all the kept samples
+        :returns: a dict of the 'cpumem' and 'vnics' summaries by userid,
+                  each with the number of 'samples', the 'start' and 'end'
+                  times of the samples, the 'interval' between them and
+                  the 'metrics' values. Counters have their 'last' value,
+                  their 'delta' and their 'rate' per second, gauges their
+                  'last', 'min', 'max' and 'avg' values.
+        """
+        if CONF.monitor.history_size <= 0:
+            raise exception.SDKFunctionNotImplementError(
+                func='guest metrics history, history_size is 0')
+        names = {}
+        for type in self._TYPES:
+            for metric in (self._HISTORY_COUNTERS[type] +
+                           self._HISTORY_GAUGES[type]):
+                names[metric] = type
+        if metrics is None:
+            metrics = list(names)
+        unknown = [m for m in metrics if m not in names]
+        if unknown:
+            raise exception.SDKInvalidInputFormat(
+                msg="Unknown metrics %s, valid metrics are %s" %
+                (', '.join(unknown), ', '.join(sorted(names))))
+        since = time.time() - window if window else 0
+
+        result = {}
+        with self._history_lock:
+            for uid in uid_list:
+                uid_data = {}
+                for type in self._TYPES:
+                    history = self._history[type].get(uid.upper())
+                    type_metrics = [m for m in metrics if names[m] == type]
+                    if history is None or not type_metrics:
+                        continue
+                    summary = history.summarize(
+                        type_metrics, self._HISTORY_COUNTERS[type], since)
+                    if summary is not None:
+                        uid_data[type] = summary
+                if uid_data:
+                    result[uid] = uid_data
+        return result
+
+    def inspect_archive(self, uid_list, start=None, end=None):
+        """Get the archived cpu and memory samples of the guests.
+
+        :param uid_list: list of guest userids
+        :param start: time of the first samples, None for the start of the
+                      day of end in UTC
+        :param end: time of the last samples, None for the newest ones
+        :returns: a dict of the samples by userid, in time order, each with
+                  its 'timestamp' and the values keyed like inspect_stats,
+                  limited to about archive_query_max_samples samples
+        """
+        if not self._archive.enabled():
+            raise exception.SDKFunctionNotImplementError(
+                func='guest metering archive, archive_dir is not set')
+        return self._archive.query(uid_list, start=start, end=end)
+
+    def _archive_samples(self, data):
+        if not self._archive.enabled():
+            return
+        # The metering data is still returned when it can't be archived
+        try:
+            self._archive.append(data)
+        except (IOError, OSError) as err:
+            LOG.error("Failed to archive the cpumem metering data: %s" % err)
+
+    def _record_history(self, type, data, partial=False):
+        size = CONF.monitor.history_size
+        if size <= 0:
+            return
+        metrics = self._HISTORY_COUNTERS[type] + self._HISTORY_GAUGES[type]
+        now = time.time()
+        with self._history_lock:
+            histories = self._history[type]
+            # The counters of a guest which is not reported anymore, e.g.
+            # logged off, restart from 0 the next time it logs on.
+            if not partial:
+                for uid in set(histories) - set(data):
+                    del histories[uid]
+            for uid, user_data in data.items():
+                try:
+                    if type == 'cpumem':
+                        values = self.parse_cpumem(user_data)
+                    else:
+                        values = dict((m, sum(nic[m] for nic in user_data))
+                                      for m in metrics)
+                except exception.SDKInternalError as err:
+                    LOG.warning("Skipped the %s history sample of %s: %s" %
+                                (type, uid, err))
+                    continue
+                history = histories.get(uid)
+                if history is None or history.size != size:
+                    history = histories[uid] = MetricHistory(metrics, size)
+                history.append(now, values)
+
     def _cache_enabled(self):
         return CONF.monitor.cache_interval > 0
 
+    def _collector_enabled(self):
+        return CONF.monitor.collect_interval > 0
+
+    def _start_collector(self):
+        with self._collector_lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._run_collector,
+                                                   name='MeteringCollector')
+                self._collector.daemon = True
+                self._collector.start()
+
+    def _run_collector(self):
+        while True:
+            self.collect()
+            time.sleep(CONF.monitor.collect_interval)
+
+    def collect(self):
+        """Refresh the metering data of all the types once."""
+        for type in self._TYPES:
+            try:
+                self._refresh(type)
+            except Exception as err:
+                LOG.error("Failed to collect the %s metering data: %s" %
+                          (type, err))
+
+    def _collect_type(self, type, uid_list=[]):
+        if type == 'cpumem':
+            return self._update_cpumem_data(uid_list)
+        elif type == 'vnics':
+            return self._update_nic_data()
+
+    def _refresh(self, type, max_age=0, uid_list=[]):
+        """Refresh the cached data of a type unless it is younger than
+        max_age, see MeteringCache.load.
+
+        :returns: tuple of the data by userid and the time of its refresh
+        """
+        return self._cache.load(
+            type, lambda: self._collect_type(type, uid_list),
+            max_age=max_age)
+
+    def _get_snapshot_data(self, type):
+        self._start_collector()
+        # Only the data of the first readers is queried, the collector
+        # refreshes it afterwards
+        data, timestamp = self._refresh(type, max_age=None)
+        age = time.time() - timestamp
+        tracing.add_timing('%s_age' % type, age)
+        return data, age
+
+    def get_metering_data(self, type):
+        """Get the metering data of all the guests.
+
+        The data is the last snapshot of the collector when it is enabled,
+        otherwise the cached data, which is refreshed for all the guests at
+        once when it expired.
+
+        :param type: 'cpumem' or 'vnics'
+        :returns: tuple of the data by userid and its age in seconds
+        """
+        if self._collector_enabled():
+            return self._get_snapshot_data(type)
+        if not self._cache_enabled():
+            return self._collect_type(type), 0
+
+        data, timestamp = self._refresh(
+            type, max_age=CONF.monitor.cache_interval)
+        return data, time.time() - timestamp
+
+    def get_cache_stats(self):
+        """Get the statistics of the metering cache by type."""
+        return self._cache.get_stats()
+
     def _get_inspect_data(self, type, uid_list):
+        if self._collector_enabled():
+            return self._get_snapshot_data(type)[0]
+
         inspect_data = {}
-        update_needed = False
+        missed = []
+        logged_on = None
         for uid in uid_list:
             if not zvmutils.valid_userid(uid):
                 continue
@@ -100,50 +336,91 @@ class ZVMMonitor(object):
             if cache_data is not None:
                 inspect_data[uid] = cache_data
             else:
-                if self._smtclient.get_power_state(uid) == 'on':
-                    update_needed = True
-                    inspect_data = {}
-                    break
+                # Query the power state of all the guests at once on the
+                # first cache miss
+                if logged_on is None:
+                    logged_on = self._smtclient.get_logged_on_users()
+                if uid.upper() in logged_on:
+                    missed.append(uid)
 
         # If all data are found in cache, just return
-        if not update_needed:
+        if not missed:
             return inspect_data
 
         # Call client to query latest data
-        rdata = {}
-        if type == 'cpumem':
-            rdata = self._update_cpumem_data(uid_list)
-        elif type == 'vnics':
-            rdata = self._update_nic_data()
-
+        if not self._cache_enabled():
+            return self._collect_type(type, uid_list)
+        if self._partial_refresh_wanted(type, missed):
+            inspect_data.update(self._refresh_guests(type, missed))
+            return inspect_data
+        # The concurrent misses wait for one query of all the guests
+        return self._refresh(type, uid_list=uid_list)[0]
+
+    def _partial_refresh_wanted(self, type, missed):
+        # Only the cpu and memory data can be queried for some guests, the
+        # vnic data is always queried for all the configured vswitches.
+        if type != 'cpumem':
+            return False
+        percent = CONF.monitor.partial_refresh_percent
+        return len(missed) * 100 <= percent * self._cache.count(type)
+
+    def _refresh_guests(self, type, uid_list):
+        """Query the data of the given guests only and merge it in the
+        cache.
+        """
+        rdata = self._smtclient.image_performance_query(uid_list)
+        self._record_history(type, rdata, partial=True)
+        self._archive_samples(rdata)
+        self._cache.merge(type, rdata)
         return rdata
 
     def _update_cpumem_data(self, uid_list):
+        # The guests are added to the namelist when they are created or
+        # registered, the namelist is only queried by the periodic resync.
+        self._namelist_mirror.sync()
+        self._namelist_mirror.add_missing(uid_list)
 
-        namelist_uids = self._smtclient.namelist_query(self._namelist)
-        sdk_managed_uids = self._smtclient.get_vm_list()
-        mis_uids = list((set(uid_list) -
-                     set(namelist_uids)).intersection(set(sdk_managed_uids)))
-
-        for muid in mis_uids:
-            self._smtclient.namelist_add(self._namelist, muid)
-
-        rdata = {}
-        if self._cache_enabled():
-            rdata = self._smtclient.system_image_performance_query(
-                self._namelist)
-            self._cache.refresh('cpumem', rdata)
-        else:
-            rdata = self._smtclient.system_image_performance_query(
-                self._namelist)
+        rdata = self._smtclient.system_image_performance_query(
+            self._namelist)
+        self._record_history('cpumem', rdata)
+        self._archive_samples(rdata)
 
         return rdata
 
+    def _get_vswitch_names(self):
+        vswitches = CONF.monitor.vnics_vswitches.strip()
+        if vswitches == '*':
+            return None
+        if vswitches == 'registered':
+            switches = database.NetworkDbOperator().switch_select_table()
+            return sorted(set(switch['switch'] for switch in switches
+                              if switch['switch']))
+        return [name.strip().upper() for name in vswitches.split(',')
+                if name.strip()]
+
+    def _query_vswitches(self):
+        query = self._smtclient.virtual_network_vswitch_query_byte_stats
+        names = self._get_vswitch_names()
+        if names is None:
+            return query()['vswitches']
+        vswitches = []
+        for name in names:
+            try:
+                vsw_dict = query(name)
+            except exception.SDKSMTRequestFailed as err:
+                # e.g. the vswitch was deleted, the other vswitches are
+                # still reported
+                LOG.warning("Failed to query the nics of vswitch %s: %s" %
+                            (name, err))
+                continue
+            vswitches.extend(vsw_dict['vswitches'])
+        return vswitches
+
     def _update_nic_data(self):
         nics = {}
-        vsw_dict = self._smtclient.virtual_network_vswitch_query_byte_stats()
+        vswitches = self._query_vswitches()
         with zvmutils.expect_invalid_resp_data():
-            for vsw in vsw_dict['vswitches']:
+            for vsw in vswitches:
                 for nic in vsw['nics']:
                     userid = nic['userid']
                     nic_entry = {
@@ -161,50 +438,450 @@ class ZVMMonitor(object):
                         nics[userid] = [nic_entry]
                     else:
                         nics[userid].append(nic_entry)
-        # Update cache if enabled
-        if self._cache_enabled():
-            self._cache.refresh('vnics', nics)
+        self._record_history('vnics', nics)
+        self._update_nic_deltas(nics)
 
         return nics
 
+    def _update_nic_deltas(self, nics):
+        counters = self._HISTORY_COUNTERS['vnics']
+        now = time.time()
+        samples = {}
+        deltas = {}
+        with self._nic_lock:
+            for userid, nic_list in nics.items():
+                for nic in nic_list:
+                    key = (userid, nic['vswitch_name'], nic['nic_vdev'])
+                    values = tuple(nic[c] for c in counters)
+                    samples[key] = (now, values)
+                    previous = self._nic_samples.get(key)
+                    if previous is None:
+                        continue
+                    # All the counters of a nic restart from 0 when it is
+                    # recoupled or its guest logs on again, so the delta
+                    # since the reset is the current value.
+                    reset = any(value < last for value, last in
+                                zip(values, previous[1]))
+                    delta = {'vswitch_name': nic['vswitch_name'],
+                             'nic_vdev': nic['nic_vdev'],
+                             'interval': now - previous[0],
+                             'reset': reset}
+                    for counter, value, last in zip(counters, values,
+                                                    previous[1]):
+                        delta[counter] = value if reset else value - last
+                    deltas.setdefault(userid, []).append(delta)
+            # The nics which are not reported anymore are forgotten
+            self._nic_samples = samples
+            self._nic_deltas = deltas
+
+
+class NamelistMirror(object):
+    """In-memory copy of the SMAPI namelist of the monitored guests.
+
+    The performance data of the guests is queried through the namelist.
+    The copy is reconciled with the namelist and with the SDK managed
+    guests once, then kept up to date by the guest create, delete, register
+    and deregister calls, so that the namelist does not need to be queried
+    for each metering refresh. Every namelist_resync_interval seconds, a
+    checksum of the namelist is compared with the checksum of the copy and
+    the copy is reconciled again when they differ, e.g. when the namelist
+    was changed outside of the SDK.
+    """
+
+    def __init__(self):
+        self._smtclient = smtclient.get_smtclient()
+        self._namelist = zvmutils.get_namelist()
+        self._lock = threading.Lock()
+        self._userids = None
+        self._checksum = None
+        self._synced_at = 0
+
+    @staticmethod
+    def _get_checksum(userids):
+        return hashlib.sha1(
+            ' '.join(sorted(userids)).encode('utf-8')).hexdigest()
+
+    def _query(self):
+        return set(uid.strip().upper() for uid in
+                   self._smtclient.namelist_query(self._namelist,
+                                                  ignore_errors=False)
+                   if uid.strip())
+
+    def _reconcile(self, namelist):
+        """Add the managed guests missing from the namelist and set the
+        copy, unless a guest could not be added.
+
+        :returns: whether the copy was set.
+        """
+        managed = set(uid.upper() for uid in self._smtclient.get_vm_list())
+        failed = []
+        for uid in sorted(managed - namelist):
+            try:
+                self._smtclient.namelist_add(self._namelist, uid,
+                                             ignore_errors=False)
+            except exception.SDKSMTRequestFailed as err:
+                LOG.warning("Failed to add %s to namelist %s: %s" %
+                            (uid, self._namelist, err))
+                failed.append(uid)
+        if failed:
+            return False
+        self._userids = namelist | managed
+        self._checksum = self._get_checksum(self._userids)
+        self._synced_at = time.time()
+        return True
+
+    def sync(self):
+        """Reconcile the copy if it never was, or check it against the
+        namelist when the resync interval expired.
+
+        When the namelist can't be queried or a guest can't be added to
+        it, e.g. SMAPI is not ready yet, the copy is left as it is and the
+        next sync tries again.
+        """
+        interval = CONF.monitor.namelist_resync_interval
+        with self._lock:
+            try:
+                if self._userids is None:
+                    if self._reconcile(self._query()):
+                        LOG.info("Namelist %s reconciled with %d guests" %
+                                 (self._namelist, len(self._userids)))
+                elif (interval > 0 and
+                      time.time() - self._synced_at >= interval):
+                    namelist = self._query()
+                    if self._get_checksum(namelist) != self._checksum:
+                        LOG.warning("Namelist %s changed outside of the "
+                                    "SDK, reconciling it" % self._namelist)
+                        self._reconcile(namelist)
+                    else:
+                        self._synced_at = time.time()
+            except exception.SDKSMTRequestFailed as err:
+                LOG.warning("Failed to query namelist %s, it is queried "
+                            "again at the next sync: %s" %
+                            (self._namelist, err))
+
+    def get_userids(self):
+        with self._lock:
+            return set(self._userids or ())
+
+    def add(self, userid):
+        with self._lock:
+            try:
+                self._smtclient.namelist_add(self._namelist, userid,
+                                             ignore_errors=False)
+            except exception.SDKSMTRequestFailed as err:
+                # The guest is added again by the next refresh inspecting
+                # it, or by the next reconciliation
+                LOG.warning("Failed to add %s to namelist %s: %s" %
+                            (userid, self._namelist, err))
+                return
+            if self._userids is not None:
+                self._userids.add(userid.upper())
+                self._checksum = self._get_checksum(self._userids)
+
+    def remove(self, userid):
+        with self._lock:
+            self._smtclient.namelist_remove(self._namelist, userid)
+            if self._userids is not None:
+                self._userids.discard(userid.upper())
+                self._checksum = self._get_checksum(self._userids)
+
+    def add_missing(self, userids):
+        """Add the given SDK managed guests which are not in the namelist."""
+        missing = set(uid.upper() for uid in userids) - self.get_userids()
+        if missing:
+            managed = set(uid.upper() for uid in self._smtclient.get_vm_list())
+            for uid in sorted(missing & managed):
+                self.add(uid)
+
+
+class MetricHistory(object):
+    """Fixed size history of the metric samples of one guest.
+
+    The samples are kept in a ring of array columns, one for the sample
+    times and one per metric, so that the memory used by a guest does not
+    grow with the number of samples.
+    """
+
+    def __init__(self, metrics, size):
+        self.metrics = metrics
+        self.size = size
+        self.count = 0
+        self.times = array.array('d', [0.0] * size)
+        self.columns = dict((m, array.array('q', [0] * size))
+                            for m in metrics)
+
+    def append(self, timestamp, values):
+        index = self.count % self.size
+        self.times[index] = timestamp
+        for metric in self.metrics:
+            self.columns[metric][index] = values[metric]
+        self.count += 1
+
+    def _indexes(self, since):
+        """Get the indexes of the samples taken since the given time, from
+        the oldest to the newest.
+        """
+        first = max(0, self.count - self.size)
+        indexes = [i % self.size for i in range(first, self.count)]
+        return [i for i in indexes if self.times[i] >= since]
+
+    def summarize(self, metrics, counters, since=0):
+        """Summarize the samples of the metrics taken since the given time.
+
+        :returns: the summary described by ZVMMonitor.inspect_history, None
+                  when there's no sample
+        """
+        indexes = self._indexes(since)
+        if not indexes:
+            return None
+        start = self.times[indexes[0]]
+        end = self.times[indexes[-1]]
+        interval = end - start
+        summary = {'samples': len(indexes),
+                   'start': start,
+                   'end': end,
+                   'interval': interval,
+                   'metrics': {}}
+        for metric in metrics:
+            column = self.columns[metric]
+            values = [column[i] for i in indexes]
+            if metric in counters:
+                delta = 0
+                for previous, value in zip(values, values[1:]):
+                    # A counter which went down was reset, e.g. by a
+                    # restart of the guest, and counted from 0 since.
+                    delta += value - previous if value >= previous else value
+                summary['metrics'][metric] = {
+                    'last': values[-1],
+                    'delta': delta,
+                    'rate': delta / interval if interval > 0 else None}
+            else:
+                summary['metrics'][metric] = {
+                    'last': values[-1],
+                    'min': min(values),
+                    'max': max(values),
+                    'avg': float(sum(values)) / len(values)}
+        return summary
+
+
+class GuestStateWatcher(object):
+    """Watch power state and lifecycle changes of the SDK managed guests.
+
+    A single background thread lists the logged on users with one query per
+    event_poll_interval, compares them with the previous poll and records
+    each transition as an event. Subscribers fetch the events recorded after
+    the last one they have seen with get_events().
+    """
+
+    def __init__(self):
+        self._smtclient = smtclient.get_smtclient()
+        self._cond = threading.Condition(threading.Lock())
+        self._events = collections.deque(
+            maxlen=CONF.monitor.event_buffer_size)
+        # Event ids keep increasing across restarts of the SDK server, any
+        # id below the starting one is from before a restart and detected
+        # as missed.
+        self._start_id = int(time.time() * 1000)
+        self._last_id = self._start_id
+        self._states = None
+        self._thread = None
+
+    def _start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='GuestStateWatcher')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as err:
+                LOG.error("Failed to poll guest power states: %s" % err)
+            time.sleep(CONF.monitor.event_poll_interval)
+
+    def poll(self):
+        """Query the guests states once and record the changes."""
+        userids = self._smtclient.get_vm_list()
+        logged_on = self._smtclient.get_logged_on_users()
+        states = dict((uid, 'on' if uid in logged_on else 'off')
+                      for uid in userids)
+
+        with self._cond:
+            previous = self._states
+            self._states = states
+            # The first poll only gets the initial states
+            if previous is None:
+                return
+
+            now = time.time()
+            changed = False
+            for uid in sorted(set(previous) | set(states)):
+                old_state = previous.get(uid)
+                new_state = states.get(uid)
+                if old_state == new_state:
+                    continue
+                if old_state is None:
+                    event = 'guest_added'
+                elif new_state is None:
+                    event = 'guest_removed'
+                else:
+                    event = 'power_state'
+                self._last_id += 1
+                self._events.append({'id': self._last_id,
+                                     'timestamp': now,
+                                     'userid': uid,
+                                     'event': event,
+                                     'power_state': new_state,
+                                     'previous_power_state': old_state})
+                changed = True
+            if changed:
+                self._cond.notify_all()
+
+    def _get_events_after(self, last_event_id):
+        oldest_id = self._events[0]['id'] if self._events else None
+        if (last_event_id > self._last_id or
+                last_event_id < self._start_id or
+                (oldest_id is not None and last_event_id < oldest_id - 1)):
+            # Events were dropped from the buffer or the id is from before
+            # a restart, the caller has to query the states again.
+            return True, list(self._events)
+        return False, [e for e in self._events if e['id'] > last_event_id]
+
+    def get_events(self, last_event_id=None, timeout=0):
+        """Get the events recorded after last_event_id.
+
+        :param last_event_id: id of the last event the caller has seen,
+                              None to only get the events recorded from now
+        :param timeout: max seconds to wait for a new event when there's
+                        none yet, limited by event_wait_timeout
+        :returns: a dict with the list of 'events', the 'last_event_id' to
+                  pass to the next call and 'missed' which is True when
+                  some events are not available anymore
+        """
+        if CONF.monitor.event_poll_interval <= 0:
+            raise exception.SDKFunctionNotImplementError(
+                func='guest events, event_poll_interval is 0')
+        self._start()
+
+        timeout = min(max(timeout or 0, 0), CONF.monitor.event_wait_timeout)
+        deadline = time.time() + timeout
+        with self._cond:
+            if last_event_id is None:
+                last_event_id = self._last_id
+            while True:
+                missed, events = self._get_events_after(last_event_id)
+                remaining = deadline - time.time()
+                if events or missed or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            return {'last_event_id': self._last_id,
+                    'missed': missed,
+                    'events': events}
 
-class MeteringCache(object):
-    """Cache for metering data."""
 
-    def __init__(self, types):
+class MeteringCache(object):
+    """LRU bounded cache for metering data, with a time to live per entry.
+
+    The entries are grouped by type, each type holding the data of the
+    guests by userid. The entries of a type are refreshed all at once by
+    load, which calls the loader of only one thread at a time: the threads
+    asking for the same type meanwhile wait for it and use its data. The
+    least recently used entries of a type are dropped once it holds more
+    than capacity entries.
+
+    :param types: the cache types.
+    :param ttl: seconds an entry is valid, None for the [monitor]
+                cache_interval option.
+    :param capacity: maximum number of entries of each type, None for the
+                     [monitor] cache_size option, 0 for no limit.
+    """
+
+    _STATS = ('hits_total', 'misses_total', 'loads_total',
+              'load_waits_total', 'partial_loads_total', 'evictions_total')
+
+    def __init__(self, types, ttl=None, capacity=None):
         self._cache = {}
         self._types = types
+        self._ttl = ttl
+        self._capacity = capacity
         self._lock = threading.RLock()
         self._reset(types)
 
     def _reset(self, types):
         with zvmutils.acquire_lock(self._lock):
             for type in types:
-                self._cache[type] = {'expiration': time.time(),
-                                    'data': {},
-                                    }
+                self._cache[type] = {'timestamp': None,
+                                     'generation': 0,
+                                     'data': collections.OrderedDict(),
+                                     'load_lock': threading.Lock(),
+                                     'stats': dict.fromkeys(self._STATS, 0),
+                                     }
+
+    @property
+    def ttl(self):
+        if self._ttl is None:
+            return CONF.monitor.cache_interval
+        return self._ttl
+
+    @property
+    def capacity(self):
+        if self._capacity is None:
+            return CONF.monitor.cache_size
+        return self._capacity
 
     def _get_ctype_cache(self, ctype):
         return self._cache[ctype]
 
-    def set(self, ctype, key, data):
+    def set(self, ctype, key, data, timestamp=None):
         """Set or update cache content.
 
         :param ctype: cache type
         :param key: the key to be set value
         :param data: cache data
+        :param timestamp: time the data was got, now by default
         """
+        if timestamp is None:
+            timestamp = time.time()
         with zvmutils.acquire_lock(self._lock):
             target_cache = self._get_ctype_cache(ctype)
-            target_cache['data'][key] = data
+            entries = target_cache['data']
+            entries.pop(key, None)
+            entries[key] = (data, timestamp)
+            capacity = self.capacity
+            while capacity > 0 and len(entries) > capacity:
+                entries.popitem(last=False)
+                target_cache['stats']['evictions_total'] += 1
 
     def get(self, ctype, key):
         with zvmutils.acquire_lock(self._lock):
             target_cache = self._get_ctype_cache(ctype)
-            if(time.time() > target_cache['expiration']):
+            entry = target_cache['data'].get(key)
+            if entry is None or time.time() > entry[1] + self.ttl:
+                target_cache['stats']['misses_total'] += 1
                 return None
-            else:
-                return target_cache['data'].get(key, None)
+            # Move the entry to the end as the most recently used one
+            entries = target_cache['data']
+            entries[key] = entries.pop(key)
+            target_cache['stats']['hits_total'] += 1
+            return entry[0]
+
+    def _get_snapshot(self, target_cache):
+        data = dict((k, v[0]) for k, v in target_cache['data'].items())
+        return data, target_cache['timestamp']
+
+    def get_snapshot(self, ctype):
+        """Get all the cached data of a type, even when it is expired.
+
+        :param ctype: cache type
+        :returns: tuple of the data dict and the time of its last refresh,
+                  which is None when the data was never refreshed
+        """
+        with zvmutils.acquire_lock(self._lock):
+            return self._get_snapshot(self._get_ctype_cache(ctype))
 
     def delete(self, ctype, key):
         with zvmutils.acquire_lock(self._lock):
@@ -215,16 +892,78 @@ class MeteringCache(object):
     def clear(self, ctype='all'):
         with zvmutils.acquire_lock(self._lock):
             if ctype == 'all':
-                self._reset()
+                self._reset(self._types)
             else:
                 target_cache = self._get_ctype_cache(ctype)
-                target_cache['data'] = {}
+                target_cache['data'] = collections.OrderedDict()
 
     def refresh(self, ctype, data):
         with zvmutils.acquire_lock(self._lock):
             self.clear(ctype)
             target_cache = self._get_ctype_cache(ctype)
-            target_cache['expiration'] = (time.time() +
-                                            float(CONF.monitor.cache_interval))
+            target_cache['timestamp'] = time.time()
+            target_cache['generation'] += 1
+            for (k, v) in data.items():
+                self.set(ctype, k, v, timestamp=target_cache['timestamp'])
+
+    def merge(self, ctype, data):
+        """Set the data of some keys of a type, got by a partial load,
+        without changing the time of the last refresh of the type.
+        """
+        timestamp = time.time()
+        with zvmutils.acquire_lock(self._lock):
             for (k, v) in data.items():
-                self.set(ctype, k, v)
+                self.set(ctype, k, v, timestamp=timestamp)
+            self._get_ctype_cache(ctype)['stats']['partial_loads_total'] += 1
+
+    def count(self, ctype):
+        """Get the number of entries of a type, even expired."""
+        with zvmutils.acquire_lock(self._lock):
+            return len(self._get_ctype_cache(ctype)['data'])
+
+    def load(self, ctype, loader, max_age=None):
+        """Get all the data of a type, refreshed with loader when it was
+        never refreshed or its last refresh is older than max_age.
+
+        Only one thread calls the loader of a type at a time. A thread
+        which waited for the loader of another one uses the data it got
+        rather than calling its own, whatever max_age.
+
+        :param ctype: cache type
+        :param loader: function returning all the data of the type
+        :param max_age: maximum age in seconds of the data, None to refresh
+                        only data which was never refreshed, 0 to refresh
+                        it anyway
+        :returns: tuple of the data dict and the time of its last refresh
+        """
+        with zvmutils.acquire_lock(self._lock):
+            target_cache = self._get_ctype_cache(ctype)
+            timestamp = target_cache['timestamp']
+            if timestamp is not None and (
+                    max_age is None or time.time() - timestamp < max_age):
+                return self._get_snapshot(target_cache)
+            generation = target_cache['generation']
+
+        with target_cache['load_lock']:
+            with zvmutils.acquire_lock(self._lock):
+                if target_cache['generation'] != generation:
+                    target_cache['stats']['load_waits_total'] += 1
+                    return self._get_snapshot(target_cache)
+            data = loader()
+            with zvmutils.acquire_lock(self._lock):
+                self.refresh(ctype, data)
+                target_cache['stats']['loads_total'] += 1
+                return self._get_snapshot(target_cache)
+
+    def get_stats(self):
+        """Get the number of entries, the hits, misses, loads, waits for
+        the load of another thread, partial loads and evictions of each
+        type.
+        """
+        stats = {}
+        with zvmutils.acquire_lock(self._lock):
+            for ctype in self._types:
+                target_cache = self._get_ctype_cache(ctype)
+                stats[ctype] = dict(target_cache['stats'],
+                                    entries=len(target_cache['data']))
+        return stats
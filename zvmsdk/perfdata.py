@@ -0,0 +1,198 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Parse the responses of the Image_Performance_Query and
+System_Image_Performance_Query APIs into columns.
+
+The response of a query of thousands of guests is parsed in one pass over
+its lines, the values of the guests are kept in one integer array per
+field. The result maps the userids to records which give the values in the
+format of the response, e.g. '6185838 uS', when they are read, and their
+integer values by stats without parsing them again.
+"""
+
+import array
+
+from zvmsdk import utils as zvmutils
+
+try:
+    from collections import abc as collections_abc
+except ImportError:
+    import collections as collections_abc
+
+
+# Label in the response, key in the records, key in the stats and unit of
+# the fields
+_FIELDS = (
+    ('Guest CPUs', 'guest_cpus', 'guest_cpus', ''),
+    ('Used CPU time', 'used_cpu_time', 'used_cpu_time_us', 'uS'),
+    ('Elapsed time', 'elapsed_cpu_time', 'elapsed_cpu_time_us', 'uS'),
+    ('Minimum CPU count', 'min_cpu_count', 'min_cpu_count', ''),
+    ('Max CPU limit', 'max_cpu_limit', 'max_cpu_limit', ''),
+    ('Samples CPU in use', 'samples_cpu_in_use', 'samples_cpu_in_use', ''),
+    ('Samples CPU delay', 'samples_cpu_delay', 'samples_cpu_delay', ''),
+    ('Used memory', 'used_memory', 'used_mem_kb', 'KB'),
+    ('Max memory', 'max_memory', 'max_mem_kb', 'KB'),
+    ('Minimum memory', 'min_memory', 'min_mem_kb', 'KB'),
+    ('Shared memory', 'shared_memory', 'shared_mem_kb', 'KB'),
+    )
+
+_USERID_LABEL = 'Guest name'
+
+KEYS = ('userid',) + tuple(field[1] for field in _FIELDS)
+STATS_KEYS = tuple(field[2] for field in _FIELDS)
+
+
+def get_stats(record):
+    """Get the integer values of a record in the format of the response.
+
+    :raises SDKInternalError: when a value is missing or invalid.
+    """
+    if isinstance(record, PerformanceRecord):
+        return record.stats()
+    with zvmutils.expect_invalid_resp_data():
+        return dict((stats_key, int(record[key].partition(' ')[0]))
+                    for _label, key, stats_key, _unit in _FIELDS)
+
+
+class PerformanceRecord(collections_abc.Mapping):
+    """The performance data of one guest, read from the columns."""
+
+    __slots__ = ('_data', '_row')
+
+    def __init__(self, data, row):
+        self._data = data
+        self._row = row
+
+    def _raw(self):
+        return self._data._raw.get(self._row)
+
+    def __getitem__(self, key):
+        raw = self._raw()
+        if raw is not None:
+            return raw[key]
+        if key == 'userid':
+            return self._data.userids[self._row]
+        column = self._data.KEY_COLUMNS[key]
+        value = self._data.columns[column][self._row]
+        unit = _FIELDS[column][3]
+        return '%d %s' % (value, unit) if unit else str(value)
+
+    def __iter__(self):
+        raw = self._raw()
+        return iter(raw if raw is not None else KEYS)
+
+    def __len__(self):
+        raw = self._raw()
+        return len(raw if raw is not None else KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def stats(self):
+        """Get the integer values of the guest, keyed like
+        ZVMMonitor.inspect_stats.
+
+        :raises SDKInternalError: when a value of the guest is missing or
+                                  invalid.
+        """
+        raw = self._raw()
+        if raw is not None:
+            return get_stats(raw)
+        row = self._row
+        return dict(zip(STATS_KEYS,
+                        [column[row] for column in self._data.columns]))
+
+
+class PerformanceData(dict):
+    """The performance data of the guests of a query, by userid.
+
+    The values of the guests are kept in the columns, one array of integers
+    per field in the order of _FIELDS, a guest being a row of them. A guest
+    whose values are missing or are not integers in the expected unit is
+    kept as a row of raw values instead, which are parsed when they are
+    read like before.
+    """
+
+    KEY_COLUMNS = dict((field[1], i) for i, field in enumerate(_FIELDS))
+
+    def __init__(self):
+        super(PerformanceData, self).__init__()
+        self.userids = []
+        self.columns = [array.array('q') for field in _FIELDS]
+        self._raw = {}
+
+    def _add(self, userid, values, raw):
+        row = len(self.userids)
+        self.userids.append(userid)
+        if values is None:
+            self._raw[row] = raw
+            values = [0] * len(_FIELDS)
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        self[userid] = PerformanceRecord(self, row)
+
+
+def _parse_value(value, unit):
+    number, _sep, value_unit = value.partition(' ')
+    number = int(number)
+    if value_unit != unit or abs(number) >= 1 << 63:
+        raise ValueError(value)
+    return number
+
+
+def parse_performance_data(lines):
+    """Parse the response lines of an image performance query.
+
+    The records of the guests are separated by empty lines. A record
+    without a guest name, e.g. the one of a guest which is logged off, is
+    skipped.
+
+    :param lines: the lines of the response.
+    :returns: PerformanceData of the guests of the response.
+    """
+    data = PerformanceData()
+    raw = {}
+    for line in '\n'.join(lines).split('\n'):
+        if line:
+            label, sep, value = line.partition(':')
+            if sep:
+                raw[label.strip(' ,')] = value.strip().strip('" ')
+            continue
+        if raw:
+            _add_record(data, raw)
+            raw = {}
+    if raw:
+        _add_record(data, raw)
+    return data
+
+
+def _add_record(data, raw):
+    userid = raw.get(_USERID_LABEL)
+    if userid is None:
+        return
+    values = []
+    try:
+        for label, _key, _stats_key, unit in _FIELDS:
+            values.append(_parse_value(raw[label], unit))
+    except (KeyError, ValueError):
+        values = None
+    record = {'userid': userid}
+    if values is None:
+        # Keep the values of the guest as they are, like the parser
+        # of the response did before
+        for label, key, _stats_key, _unit in _FIELDS:
+            if label in raw:
+                record[key] = raw[label]
+    data._add(userid, values, record)
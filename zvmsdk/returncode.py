@@ -329,6 +329,11 @@ errors = {
                         'rc': 503},
                        {1: "Max concurrent deploy/capture requests received, "
                         "request is rejected. %(req)s",
+                        2: "Deploy/capture request timed out after waiting "
+                        "%(wait)s seconds in queue at position %(pos)s, "
+                        "request is rejected. %(req)s",
+                        3: "Max %(max)s guest event subscribers reached, "
+                        "request is rejected.",
                         },
                        "z/VM Cloud Connector service is unavailable"
                        ],
@@ -18,13 +18,17 @@ import six
 import socket
 import sys
 import threading
+import time
 import traceback
 
 from zvmsdk import api
 from zvmsdk import config
 from zvmsdk import exception
 from zvmsdk import log
+from zvmsdk import metrics
+from zvmsdk import monitor
 from zvmsdk import returncode
+from zvmsdk import tracing
 
 if six.PY3:
     import queue as Queue
@@ -108,11 +112,14 @@ class SDKServer(object):
             self.log_debug("(%s:%s) Results sent back to client successfully."
                            % (addr[0], addr[1]))
 
-    def serve_API(self, client, addr):
+    def serve_API(self, client, addr, queued_at=None):
         """ Read client request and call target SDK API"""
         self.log_debug("(%s:%s) Handling new request from client." %
                        (addr[0], addr[1]))
         results = None
+        trace = None
+        func_name = None
+        start = time.time()
         try:
             data = client.recv(4096)
             data = bytes.decode(data)
@@ -126,13 +133,20 @@ class SDKServer(object):
                 return
             api_data = json.loads(data)
 
-            # API_data should be in the form [funcname, args_list, kwargs_dict]
-            if not isinstance(api_data, list) or len(api_data) != 3:
+            # API_data should be in the form [funcname, args_list,
+            # kwargs_dict], optionally followed by the trace context
+            if not isinstance(api_data, list) or len(api_data) not in (3, 4):
                 msg = ("(%s:%s) SDK server got wrong input: '%s' from client."
                        % (addr[0], addr[1], data))
                 results = self.construct_internal_error(msg)
                 return
 
+            if len(api_data) == 4:
+                trace = api_data.pop() or {}
+            tracing.start_request(trace and trace.get('request_id'))
+            if queued_at is not None:
+                tracing.add_timing('queue', time.time() - queued_at)
+
             # Check called API is supported by SDK
             (func_name, api_args, api_kwargs) = api_data
             self.log_debug("(%s:%s) Request func: %s, args: %s, kwargs: %s" %
@@ -147,7 +161,8 @@ class SDKServer(object):
                 return
 
             # invoke target API function
-            return_data = api_func(*api_args, **api_kwargs)
+            with tracing.timed('api'):
+                return_data = api_func(*api_args, **api_kwargs)
         except exception.SDKBaseException as e:
             self.log_error("(%s:%s) %s" % (addr[0], addr[1],
                                            traceback.format_exc()))
@@ -180,9 +195,18 @@ class SDKServer(object):
                        'rc': 0, 'rs': 0,
                        'errmsg': '',
                        'output': return_data}
+        if func_name is not None:
+            metrics.get_request_stats().observe(
+                func_name, time.time() - start,
+                failed=results['overallRC'] != 0,
+                queued=start - queued_at if queued_at is not None else 0)
         # Send back the final results
         try:
             if results is not None:
+                if trace is not None:
+                    results['trace'] = {
+                        'request_id': tracing.get_request_id(),
+                        'timings': tracing.get_timings()}
                 self.send_results(client, addr, results)
         except Exception as e:
             # This should not happen in normal case.
@@ -195,6 +219,7 @@ class SDKServer(object):
             self.log_debug("(%s:%s) Finish handling request, closing "
                            "socket." % (addr[0], addr[1]))
             client.close()
+            tracing.end_request()
 
     def worker_loop(self):
         # The worker thread would continuously fetch request from queue
@@ -203,7 +228,8 @@ class SDKServer(object):
             try:
                 # This get() function raise Empty exception when there's no
                 # available item in queue
-                clt_socket, clt_addr = self.request_queue.get(block=False)
+                clt_socket, clt_addr, queued_at = self.request_queue.get(
+                    block=False)
             except Queue.Empty:
                 self.log_debug("No more item in request queue, worker will "
                                "exit now.")
@@ -213,7 +239,7 @@ class SDKServer(object):
                                "%s. Worker will exit now." % repr(err))
                 break
             else:
-                self.serve_API(clt_socket, clt_addr)
+                self.serve_API(clt_socket, clt_addr, queued_at)
                 self.request_queue.task_done()
 
     def setup(self):
@@ -242,6 +268,34 @@ class SDKServer(object):
         server_sock.listen(5)
         self.log_info("SDK server now listening")
 
+        metrics.register_gauge('zvm_sdk_request_queue_depth',
+                               'API requests waiting for a worker.',
+                               self.request_queue.qsize)
+        if CONF.sdkserver.metrics_port > 0:
+            try:
+                metrics.start_exporter(CONF.sdkserver.bind_addr,
+                                       CONF.sdkserver.metrics_port)
+            except socket.error as msg:
+                self.log_error("Failed to start the metrics exporter on "
+                               "port %d, reason: %s" %
+                               (CONF.sdkserver.metrics_port, msg))
+            else:
+                self.log_info("Metrics exporter now listening on port %d" %
+                              CONF.sdkserver.metrics_port)
+
+        # Reconcile the namelist in the background, the first metering
+        # refresh waits for it.
+        thread = threading.Thread(target=self.sync_namelist,
+                                  name='NamelistSync')
+        thread.daemon = True
+        thread.start()
+
+    def sync_namelist(self):
+        try:
+            monitor.get_namelist_mirror().sync()
+        except Exception as err:
+            self.log_error("Failed to reconcile the namelist: %s" % err)
+
     def run(self):
         # Keep running in a loop to handle client connections
         while True:
@@ -251,7 +305,7 @@ class SDKServer(object):
                                                            addr[1]))
             # This put() function would be blocked here until there's
             # a slot in the queue
-            self.request_queue.put((conn, addr))
+            self.request_queue.put((conn, addr, time.time()))
             thread_count = threading.active_count()
             if thread_count <= CONF.sdkserver.max_worker_count:
                 thread = threading.Thread(target=self.worker_loop)
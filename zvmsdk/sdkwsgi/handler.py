@@ -18,10 +18,12 @@ import webob
 from zvmsdk import exception
 from zvmsdk import log
 from zvmsdk.sdkwsgi import util
+from zvmsdk.sdkwsgi.handlers import event
 from zvmsdk.sdkwsgi.handlers import file
 from zvmsdk.sdkwsgi.handlers import guest
 from zvmsdk.sdkwsgi.handlers import host
 from zvmsdk.sdkwsgi.handlers import image
+from zvmsdk.sdkwsgi.handlers import metrics
 from zvmsdk.sdkwsgi.handlers import tokens
 from zvmsdk.sdkwsgi.handlers import version
 from zvmsdk.sdkwsgi.handlers import volume
@@ -44,9 +46,21 @@ ROUTE_LIST = (
     ('/guests/stats', {
         'GET': guest.guest_get_stats
     }),
+    ('/guests/power_state', {
+        'GET': guest.guest_get_power_state_list
+    }),
+    ('/guests/history', {
+        'GET': guest.guest_get_history
+    }),
+    ('/guests/archive', {
+        'GET': guest.guest_get_archive
+    }),
     ('/guests/interfacestats', {
         'GET': guest.guest_get_interface_stats
     }),
+    ('/guests/interfacestats/delta', {
+        'GET': guest.guest_get_interface_stats_delta
+    }),
     ('/guests/nics', {
         'GET': guest.guests_get_nic_info
     }),
@@ -86,12 +100,18 @@ ROUTE_LIST = (
         'DELETE': guest.guest_delete_disks,
         'PUT': guest.guest_config_disks,
     }),
+    ('/events', {
+        'GET': event.event_get,
+    }),
     ('/host', {
         'GET': host.host_get_info,
     }),
     ('/host/diskpool', {
         'GET': host.host_get_disk_info,
     }),
+    ('/metrics', {
+        'GET': metrics.metrics_get,
+    }),
     ('/images', {
         'POST': image.image_create,
         'GET': image.image_query
@@ -0,0 +1,154 @@
+# Copyright 2017,2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Handler for the guest events of the sdk API."""
+
+import json
+
+from zvmconnector import connector
+from zvmsdk import config
+from zvmsdk import exception
+from zvmsdk import log
+from zvmsdk import returncode
+from zvmsdk.sdkwsgi.handlers import tokens
+from zvmsdk.sdkwsgi.schemas import event
+from zvmsdk.sdkwsgi import util
+from zvmsdk.sdkwsgi import validation
+from zvmsdk import utils
+
+
+_EVENTACTION = None
+CONF = config.CONF
+LOG = log.LOG
+
+EVENT_STREAM_TYPE = 'text/event-stream'
+
+
+class EventAction(object):
+
+    def __init__(self):
+        self.client = connector.ZVMConnector(connection_type='socket',
+                                             ip_addr=CONF.sdkserver.bind_addr,
+                                             port=CONF.sdkserver.bind_port)
+        # Each subscriber holds a wsgi thread, and also a worker of the sdk
+        # server while it waits for events
+        self.subscribers = util.AdmissionQueue(
+            CONF.monitor.max_event_subscribers)
+
+    def subscribe(self):
+        """Admit a new subscriber.
+
+        Return None when admitted, otherwise the error info to return.
+        """
+        admitted, _ = self.subscribers.acquire()
+        if admitted:
+            return None
+
+        error_def = returncode.errors['serviceUnavail']
+        info = dict(error_def[0])
+        err_msg = error_def[1][3] % {
+            'max': CONF.monitor.max_event_subscribers}
+        info.update({'rs': 3,
+                     'errmsg': err_msg,
+                     'output': ''})
+        LOG.error(err_msg)
+        return info
+
+    def unsubscribe(self):
+        self.subscribers.release()
+
+    @validation.query_schema(event.query)
+    def get_events(self, req, last_event_id, timeout, stream=False):
+        last_event_id = _to_int(last_event_id)
+        timeout = _to_int(timeout) or 0
+        if stream:
+            return self._stream_events(last_event_id)
+        info = self.client.send_request('guest_get_events',
+                                        last_event_id=last_event_id,
+                                        timeout=timeout)
+        return info
+
+    def _stream_events(self, last_event_id):
+        """Yield the events in Server-Sent Events format until the client
+        goes away.
+        """
+        while True:
+            info = self.client.send_request(
+                'guest_get_events', last_event_id=last_event_id,
+                timeout=CONF.monitor.event_wait_timeout)
+            if info['overallRC'] != 0:
+                yield utils.to_utf8('event: error\ndata: %s\n\n' %
+                                    json.dumps(info))
+                return
+
+            output = info['output']
+            if output['missed']:
+                yield b'event: missed\ndata: {}\n\n'
+            for evt in output['events']:
+                yield utils.to_utf8('id: %d\nevent: %s\ndata: %s\n\n' %
+                                    (evt['id'], evt['event'],
+                                     json.dumps(evt)))
+            if not output['events'] and not output['missed']:
+                # keep the connection alive and detect closed clients
+                yield b': keepalive\n\n'
+            last_event_id = output['last_event_id']
+
+
+def get_action():
+    global _EVENTACTION
+    if _EVENTACTION is None:
+        _EVENTACTION = EventAction()
+    return _EVENTACTION
+
+
+def _to_int(value):
+    return int(value) if value else None
+
+
+@util.SdkWsgify
+@tokens.validate
+def event_get(req):
+    stream = EVENT_STREAM_TYPE in req.headers.get('Accept', '')
+    last_event_id = req.GET.get('last_event_id')
+    timeout = req.GET.get('timeout')
+    if stream and 'Last-Event-ID' in req.headers:
+        # set by the browsers when they reconnect an event stream
+        last_event_id = req.headers['Last-Event-ID'].strip()
+        if not last_event_id.isdigit():
+            raise exception.ValidationError(
+                detail='Invalid Last-Event-ID header: %s' % last_event_id)
+
+    action = get_action()
+    info = action.subscribe()
+    if info is None:
+        try:
+            info = action.get_events(req, last_event_id, timeout,
+                                     stream=stream)
+        except Exception:
+            action.unsubscribe()
+            raise
+        if stream:
+            # the subscriber leaves when the client closes the stream
+            req.response.content_type = EVENT_STREAM_TYPE
+            req.response.cache_control = 'no-cache'
+            req.response.app_iter = util.ClosingIterator(
+                info, action.unsubscribe)
+            return req.response
+        action.unsubscribe()
+
+    info_json = json.dumps(info)
+    req.response.status = util.get_http_code_from_sdk_return(info)
+    req.response.body = utils.to_utf8(info_json)
+    req.response.content_type = 'application/json'
+    return req.response
@@ -18,11 +18,15 @@ import six
 import json
 import hashlib
 import os
+import re
+import threading
+import time
 import uuid
+import webob.byterange
+import webob.exc
 
 from zvmsdk import config
 from zvmsdk import constants as const
-from zvmsdk import exception
 from zvmsdk import log
 from zvmsdk import returncode
 from zvmsdk import utils
@@ -33,6 +37,11 @@ _FILEACTION = None
 CONF = config.CONF
 LOG = log.LOG
 CHUNKSIZE = 4096
+# Max number of chunks read but not hashed yet during file import
+HASH_QUEUE_SIZE = 8
+SESSION_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Suffix of the file of an upload session until the upload is complete
+SESSION_PART_SUFFIX = '.part'
 
 
 INVALID_CONTENT_TYPE = {
@@ -57,22 +66,39 @@ class FileAction(object):
     def __init__(self):
         self._pathutils = utils.PathUtils()
 
-    def file_import(self, fileobj):
+    def file_import(self, fileobj, content_length=None, session=None,
+                    content_range=None):
+        """Save the imported file into the file repository.
+
+        :param content_length: the size of the file when known, used to
+                               preallocate the target file
+        :param session: name of the upload session, the file is then
+                        uploaded in one or more parts described by
+                        content_range and only checksummed when complete
+        :param content_range: the webob ContentRange of the part uploaded
+                              in the session
+        """
+        target_fpath = None
         try:
             importDir = self._pathutils.create_file_repository(
                     const.FILE_TYPE['IMPORT'])
+            self._expire_sessions(importDir)
+            if session is not None:
+                target_fpath = '/'.join([importDir, session])
+                return self._import_session_part(fileobj, target_fpath,
+                                                 content_range)
+
             fname = str(uuid.uuid1())
             target_fpath = '/'.join([importDir, fname])
 
             # The following steps save the imported file into sdkserver
             checksum = hashlib.md5()
-            bytes_written = 0
-
             with open(target_fpath, 'wb') as f:
-                for buf in fileChunkReadable(fileobj, CHUNKSIZE):
-                    bytes_written += len(buf)
-                    checksum.update(buf)
-                    f.write(buf)
+                if content_length:
+                    _preallocate(f, content_length)
+                bytes_written = _write_chunks(fileobj, f, checksum)
+                if content_length and bytes_written < content_length:
+                    f.truncate(bytes_written)
 
             checksum_hex = checksum.hexdigest()
 
@@ -91,49 +117,175 @@ class FileAction(object):
                        'output': return_data}
 
         except OSError as err:
+            if session is None and target_fpath is not None:
+                self._pathutils.clean_temp_folder(target_fpath)
             msg = ("File import error: %s, please check access right to "
                    "specified file or folder" % six.text_type(err))
             LOG.error(msg)
-            results = FILE_OPERATION_ERROR
+            results = dict(FILE_OPERATION_ERROR)
             results.update({'rs': 1, 'errmsg': msg, 'output': ''})
         except Exception as err:
-            # Cleanup the file from file repository
-            self._pathutils.clean_temp_folder(target_fpath)
+            # Cleanup the file from file repository, the parts of a session
+            # are kept so that the upload can be resumed
+            if session is None and target_fpath is not None:
+                self._pathutils.clean_temp_folder(target_fpath)
             msg = ("Exception happened during file import: %s" %
                    six.text_type(err))
             LOG.error(msg)
-            results = FILE_OPERATION_ERROR
+            results = dict(FILE_OPERATION_ERROR)
             results.update({'rs': 1, 'errmsg': msg, 'output': ''})
 
         return results
 
-    def file_export(self, fpath):
+    def _expire_sessions(self, importDir):
+        """Remove the data of the upload sessions not completed and not
+        updated for upload_session_ttl seconds.
+        """
+        ttl = CONF.file.upload_session_ttl
+        if ttl <= 0:
+            return
+        expired = time.time() - ttl
+        for fname in os.listdir(importDir):
+            if not fname.endswith(SESSION_PART_SUFFIX):
+                continue
+            fpath = '/'.join([importDir, fname])
+            try:
+                if os.path.getmtime(fpath) < expired:
+                    LOG.info("Removing the data of the expired file import "
+                             "session %s" % fname[:-len(SESSION_PART_SUFFIX)])
+                    os.remove(fpath)
+            except OSError as err:
+                # e.g. completed or removed by another request
+                LOG.debug("Failed to expire the file import session file "
+                          "%s: %s" % (fpath, six.text_type(err)))
+
+    def _import_session_part(self, fileobj, target_fpath, content_range):
+        # The data is written to a part file, renamed to the target file when
+        # the upload is complete, so that the abandoned uploads can be
+        # expired. The part file only contains contiguous data received from
+        # byte 0, so its size is the offset to resume the upload from.
+        part_fpath = target_fpath + SESSION_PART_SUFFIX
+        if os.path.exists(part_fpath):
+            received = os.path.getsize(part_fpath)
+        elif os.path.exists(target_fpath):
+            # A complete upload, e.g. its last part is sent again
+            received = os.path.getsize(target_fpath)
+        else:
+            received = 0
+
+        start = 0
+        total = None
+        if content_range is not None:
+            start = content_range.start
+            total = content_range.length
+
+        if start is not None:
+            if start > received:
+                msg = ("File import session expects data from byte %d, "
+                       "got data from byte %d" % (received, start))
+                LOG.error(msg)
+                return _invalid_request(msg)
+
+            expected = None
+            if content_range is not None:
+                expected = content_range.stop - start
+            if received and not os.path.exists(part_fpath):
+                os.rename(target_fpath, part_fpath)
+            mode = 'r+b' if received else 'wb'
+            with open(part_fpath, mode) as f:
+                f.seek(start)
+                bytes_written = _write_chunks(fileobj, f)
+                if expected is not None and bytes_written != expected:
+                    # Drop the data of the part so that the upload is
+                    # resumed from the same offset
+                    f.truncate(received)
+            if expected is not None and bytes_written != expected:
+                if not received:
+                    os.remove(part_fpath)
+                msg = ("File import session expects %d bytes from byte %d, "
+                       "got %d bytes" % (expected, start, bytes_written))
+                LOG.error(msg)
+                return _invalid_request(msg)
+            received = max(received, start + bytes_written)
+            LOG.debug("Wrote %(bytes_written)d bytes from byte %(start)d "
+                      "to %(target)s" % {'bytes_written': bytes_written,
+                                         'start': start,
+                                         'target': part_fpath})
+
+        complete = total is None or received >= total
+        checksum_hex = ''
+        if complete:
+            if os.path.exists(part_fpath):
+                os.rename(part_fpath, target_fpath)
+            checksum = hashlib.md5()
+            with open(target_fpath, 'rb') as f:
+                for buf in fileChunkIter(f, CONF.file.chunk_size):
+                    checksum.update(buf)
+            checksum_hex = checksum.hexdigest()
+
+        return_data = {'filesize_in_bytes': received,
+                       'dest_url': 'file://' + target_fpath,
+                       'md5sum': checksum_hex,
+                       'complete': complete}
+        return {'overallRC': 0, 'modID': None,
+                'rc': 0, 'rs': 0,
+                'errmsg': '',
+                'output': return_data}
+
+    def file_export(self, fpath, byte_range=None, file_wrapper=None):
+        """Prepare the iterator to send the file back.
+
+        :param byte_range: the webob Range of the request, None to export
+                           the whole file
+        :param file_wrapper: the wsgi.file_wrapper of the wsgi server, used
+                             to send the whole file without reading it
+                             through python, eg. with sendfile
+        :returns: a dict when error happened, otherwise a tuple of
+                  (file_iter, content_range, file_size), content_range is
+                  a (start, stop) tuple or None for the whole file
+        """
         try:
             if not os.path.exists(fpath):
                 msg = ("The specific file %s for export does not exist" %
                        fpath)
                 LOG.error(msg)
-                results = FILE_OPERATION_ERROR
+                results = dict(FILE_OPERATION_ERROR)
                 results.update({'rs': 2,
                     'errmsg': msg, 'output': ''})
                 return results
 
-            offset = 0
-            file_size = os.path.getsize(fpath)
             # image_size here is the image_size in bytes
-
-            file_iter = iter(get_data(fpath,
-                                      offset=offset,
-                                      file_size=file_size))
-
-            return file_iter
-
-        except exception as err:
+            file_size = os.path.getsize(fpath)
+            content_range = None
+            if byte_range is not None:
+                content_range = byte_range.range_for_length(file_size)
+                if content_range is None:
+                    raise webob.exc.HTTPRequestRangeNotSatisfiable(
+                        headers={'Content-Range': 'bytes */%d' % file_size})
+
+            chunk_size = CONF.file.chunk_size
+            if content_range is None and file_wrapper is not None:
+                return (file_wrapper(open(fpath, 'rb'), chunk_size),
+                        None, file_size)
+
+            if content_range is None:
+                offset, length = 0, file_size
+            else:
+                offset = content_range[0]
+                length = content_range[1] - content_range[0]
+            file_iter = iter(chunkedFile(fpath,
+                                         file_offset=offset,
+                                         file_chunk_size=chunk_size,
+                                         file_partial_length=length))
+
+            return (file_iter, content_range, file_size)
+
+        except (OSError, IOError) as err:
             msg = ("Exception happened during file export with error %s " %
                    six.text_type(err))
             LOG.error(msg)
-            results = FILE_OPERATION_ERROR.update({'rs': 2, 'errmsg': msg,
-                                                   'output': ''})
+            results = dict(FILE_OPERATION_ERROR)
+            results.update({'rs': 2, 'errmsg': msg, 'output': ''})
             return results
 
 
@@ -147,16 +299,21 @@ def get_action():
 @util.SdkWsgify
 @tokens.validate
 def file_import(request):
-    def _import(file_obj):
+    def _import(file_obj, content_length, session, content_range):
         action = get_action()
-        return action.file_import(file_obj)
+        return action.file_import(file_obj, content_length=content_length,
+                                  session=session,
+                                  content_range=content_range)
 
     # Check if the request content type is valid
     content_type = request.content_type
     info = _content_type_validation(content_type)
+    if not info:
+        session, content_range, info = _upload_session_validation(request)
     if not info:
         file_obj = request.body_file
-        info = _import(file_obj)
+        info = _import(file_obj, request.content_length, session,
+                       content_range)
 
     info_json = json.dumps(info)
     request.response.body = utils.to_utf8(info_json)
@@ -176,16 +333,62 @@ def _content_type_validation(content_type):
     return results
 
 
+def _invalid_request(msg):
+    results = dict(INVALID_CONTENT_TYPE)
+    results.update({'errmsg': msg})
+    return results
+
+
+def _upload_session_validation(request):
+    session = request.headers.get('X-Upload-Session')
+    content_range = request.headers.get('Content-Range')
+    if session is None:
+        if content_range is not None:
+            msg = ('Content-Range is only supported for file import with '
+                   'the X-Upload-Session header')
+            LOG.error(msg)
+            return None, None, _invalid_request(msg)
+        return None, None, {}
+
+    if not SESSION_NAME_RE.match(session):
+        msg = ('Invalid upload session name %s, it should contain 1 to 64 '
+               'letters, digits, "-" or "_"' % session)
+        LOG.error(msg)
+        return None, None, _invalid_request(msg)
+
+    if content_range is not None:
+        content_range = webob.byterange.ContentRange.parse(content_range)
+        if content_range is None:
+            msg = ('Invalid Content-Range %s found for file import' %
+                   request.headers['Content-Range'])
+            LOG.error(msg)
+            return None, None, _invalid_request(msg)
+        if (content_range.start is not None and
+                request.content_length is not None and
+                request.content_length !=
+                content_range.stop - content_range.start):
+            msg = ('Content-Range %s does not match the Content-Length %d '
+                   'found for file import' %
+                   (request.headers['Content-Range'],
+                    request.content_length))
+            LOG.error(msg)
+            return None, None, _invalid_request(msg)
+
+    return session, content_range, {}
+
+
 @util.SdkWsgify
 @tokens.validate
 def file_export(request):
-    def _export(fpath):
+    def _export(fpath, byte_range, file_wrapper):
         action = get_action()
-        return action.file_export(fpath)
+        return action.file_export(fpath, byte_range=byte_range,
+                                  file_wrapper=file_wrapper)
 
     body = util.extract_json(request.body)
     fpath = body['source_file']
-    results = _export(fpath)
+    results = _export(fpath, request.range,
+                      request.environ.get('wsgi.file_wrapper'))
 
     # if results is dict, means error happened.
     if isinstance(results, dict):
@@ -196,15 +399,74 @@ def file_export(request):
         request.response.content_type = 'application/json'
         return request.response
 
-    # Result contains (image_iter, md5sum, image_size)
+    # Result contains (file_iter, content_range, file_size)
     else:
+        file_iter, content_range, file_size = results
         request.response.headers['Content-Type'] = 'application/octet-stream'
-        request.response.app_iter = results
-        request.response.status_int = 200
+        request.response.headers['Accept-Ranges'] = 'bytes'
+        request.response.app_iter = file_iter
+        if content_range is None:
+            request.response.content_length = file_size
+            request.response.status_int = 200
+        else:
+            start, stop = content_range
+            request.response.content_length = stop - start
+            request.response.content_range = (start, stop, file_size)
+            request.response.status_int = 206
 
         return request.response
 
 
+def _preallocate(f, size):
+    """Allocate the disk space of a file to be written up front."""
+    if not hasattr(os, 'posix_fallocate'):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError as err:
+        # Not all file systems support it, the file is then simply
+        # extended while written.
+        LOG.debug("Failed to preallocate %d bytes for file import: %s" %
+                  (size, six.text_type(err)))
+
+
+def _hash_chunks(chunks, checksum):
+    while True:
+        buf = chunks.get()
+        if buf is None:
+            break
+        checksum.update(buf)
+
+
+def _write_chunks(file_obj, f, checksum=None):
+    """Write the chunks read from file_obj to f, return the bytes written.
+
+    When checksum is given, it is updated by a separate thread so that
+    hashing overlaps with the disk writes.
+    """
+    bytes_written = 0
+    chunk_size = CONF.file.chunk_size
+    if checksum is None:
+        for buf in fileChunkReadable(file_obj, chunk_size):
+            f.write(buf)
+            bytes_written += len(buf)
+        return bytes_written
+
+    chunks = six.moves.queue.Queue(maxsize=HASH_QUEUE_SIZE)
+    hasher = threading.Thread(target=_hash_chunks, args=(chunks, checksum))
+    hasher.daemon = True
+    hasher.start()
+    try:
+        for buf in fileChunkReadable(file_obj, chunk_size):
+            chunks.put(buf)
+            f.write(buf)
+            bytes_written += len(buf)
+    finally:
+        chunks.put(None)
+        hasher.join()
+    return bytes_written
+
+
 def fileChunkReadable(file_obj, chunk_size=65536):
     """
     Return a readable iterator with a reader yielding chunks of
@@ -235,25 +497,12 @@ def fileChunkIter(file_object, file_chunk_size=65536):
             break
 
 
-def get_data(file_path, offset=0, file_size=None):
-    data = chunkedFile(file_path,
-                       file_offset=offset,
-                       file_chunk_size=CHUNKSIZE,
-                       file_partial_length=file_size)
-    return get_chunk_data_iterator(data)
-
-
-def get_chunk_data_iterator(data):
-    for chunk in data:
-        yield chunk
-
-
 class chunkedFile(object):
     """
     Send iterator to wsgi server so that it can iterate over a large file
     """
 
-    def __init__(self, file_path, file_offset=0, file_chunk_size=4096,
+    def __init__(self, file_path, file_offset=0, file_chunk_size=CHUNKSIZE,
                  file_partial_length=None):
         self.file_path = file_path
         self.file_chunk_size = file_chunk_size
@@ -261,7 +510,7 @@ class chunkedFile(object):
         self.file_partial = self.file_partial_length is not None
         self.file_object = open(self.file_path, 'rb')
         if file_offset:
-            self.file_pointer.seek(file_offset)
+            self.file_object.seek(file_offset)
 
     def __iter__(self):
         """Return an iterator over the large file."""
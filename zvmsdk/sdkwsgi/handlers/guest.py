@@ -16,7 +16,6 @@
 
 import json
 import six
-import threading
 import webob.exc
 
 from zvmconnector import connector
@@ -115,12 +114,37 @@ class VMHandler(object):
                                         userid_list)
         return info
 
+    @validation.query_schema(guest.userid_list_array_query)
+    def get_power_state_list(self, req, userid_list):
+        info = self.client.send_request('guest_get_power_state_list',
+                                        userid_list)
+        return info
+
     @validation.query_schema(guest.userid_list_array_query)
     def inspect_vnics(self, req, userid_list):
         info = self.client.send_request('guest_inspect_vnics',
                                         userid_list)
         return info
 
+    @validation.query_schema(guest.userid_list_array_query)
+    def inspect_vnics_delta(self, req, userid_list):
+        info = self.client.send_request('guest_inspect_vnics_delta',
+                                        userid_list)
+        return info
+
+    @validation.query_schema(guest.history_query)
+    def inspect_history(self, req, userid_list, metrics, window):
+        info = self.client.send_request('guest_inspect_history',
+                                        userid_list, metrics=metrics,
+                                        window=window)
+        return info
+
+    @validation.query_schema(guest.archive_query)
+    def inspect_archive(self, req, userid_list, start, end):
+        info = self.client.send_request('guest_inspect_archive',
+                                        userid_list, start=start, end=end)
+        return info
+
     # @validation.query_schema(guest.nic_DB_info)
     # FIXME: the above validation will fail with "'dict' object has no
     # attribute 'dict_of_lists'"
@@ -222,8 +246,50 @@ class VMAction(object):
         self.client = connector.ZVMConnector(connection_type='socket',
                                              ip_addr=CONF.sdkserver.bind_addr,
                                              port=CONF.sdkserver.bind_port)
-        self.dd_semaphore = threading.BoundedSemaphore(
-            value=CONF.wsgi.max_concurrent_deploy_capture)
+        self.dd_queue = util.AdmissionQueue(
+            CONF.wsgi.max_concurrent_deploy_capture,
+            max_waiting=util.cap_queue_waiters(
+                CONF.wsgi.max_deploy_capture_queue_size),
+            timeout=CONF.wsgi.deploy_capture_queue_timeout)
+
+    def _dd_admit(self, request_info, priority):
+        """Wait for a deploy/capture slot.
+
+        Return None when admitted, otherwise the error info to return.
+        """
+        admitted, position = self.dd_queue.acquire(priority=priority)
+        if admitted:
+            if position:
+                LOG.debug("WSGI request admitted from queue position %d. %s"
+                          % (position, request_info))
+            return None
+
+        error_def = returncode.errors['serviceUnavail']
+        info = dict(error_def[0])
+        if position is None:
+            rs = 1
+            err_msg = error_def[1][1] % {'req': request_info}
+        else:
+            rs = 2
+            err_msg = error_def[1][2] % {
+                'wait': CONF.wsgi.deploy_capture_queue_timeout,
+                'pos': position, 'req': request_info}
+        info.update({'rs': rs,
+                     'errmsg': err_msg,
+                     'output': ''})
+        LOG.error(err_msg)
+        return info
+
+    def _dd_release(self, request_info):
+        try:
+            self.dd_queue.release()
+            LOG.debug("WSGI request finished, %s. "
+                      "Resource released." % request_info)
+        except Exception as err:
+            err_msg = ("Failed to release deploy/capture resource in WSGI. "
+                       "Error: %s, request info: %s" %
+                       (six.text_type(err), request_info))
+            LOG.error(err_msg)
 
     def start(self, userid, body):
         info = self.client.send_request('guest_start', userid)
@@ -346,6 +412,7 @@ class VMAction(object):
         vdev = body.get('vdev', None)
         hostname = body.get('hostname', None)
         skipdiskcopy = body.get('skipdiskcopy', False)
+        priority = body.get('priority', 0)
 
         request_info = ("action: 'deploy', userid: %(userid)s,"
                         "transportfiles: %(trans)s, remotehost: %(remote)s,"
@@ -356,16 +423,8 @@ class VMAction(object):
                          'skipdiskcopy': skipdiskcopy,
                          })
 
-        info = None
-        dd_allowed = self.dd_semaphore.acquire(blocking=False)
-        if not dd_allowed:
-            error_def = returncode.errors['serviceUnavail']
-            info = error_def[0]
-            err_msg = error_def[1][1] % {'req': request_info}
-            info.update({'rs': 1,
-                         'errmsg': err_msg,
-                         'output': ''})
-            LOG.error(err_msg)
+        info = self._dd_admit(request_info, priority)
+        if info is not None:
             return info
 
         try:
@@ -377,15 +436,7 @@ class VMAction(object):
                                             vdev=vdev, hostname=hostname,
                                             skipdiskcopy=skipdiskcopy)
         finally:
-            try:
-                self.dd_semaphore.release()
-                LOG.debug("WSGI deploy request finished, %s."
-                          "Resource released." % request_info)
-            except Exception as err:
-                err_msg = ("Failed to release deploy resource in WSGI."
-                           "Error: %s, request info: %s" %
-                           (six.text_type(err), request_info))
-                LOG.error(err_msg)
+            self._dd_release(request_info)
 
         return info
 
@@ -395,6 +446,7 @@ class VMAction(object):
 
         capture_type = body.get('capture_type', 'rootonly')
         compress_level = body.get('compress_level', 6)
+        priority = body.get('priority', 0)
 
         request_info = ("action: 'capture', userid: %(userid)s,"
                         "image name: %(image)s, capture type: %(cap)s,"
@@ -402,16 +454,8 @@ class VMAction(object):
                         {'userid': userid, 'image': image_name,
                          'cap': capture_type, 'level': compress_level
                          })
-        info = None
-        capture_allowed = self.dd_semaphore.acquire(blocking=False)
-        if not capture_allowed:
-            error_def = returncode.errors['serviceUnavail']
-            info = error_def[0]
-            err_msg = error_def[1][1] % {'req': request_info}
-            info.update({'rs': 1,
-                         'errmsg': err_msg,
-                         'output': ''})
-            LOG.error(err_msg)
+        info = self._dd_admit(request_info, priority)
+        if info is not None:
             return info
 
         try:
@@ -421,15 +465,7 @@ class VMAction(object):
                                             capture_type=capture_type,
                                             compress_level=compress_level)
         finally:
-            try:
-                self.dd_semaphore.release()
-                LOG.debug("WSGI capture request finished, %s."
-                          "Resource released." % request_info)
-            except Exception as err:
-                err_msg = ("Failed to release capture resource in WSGI."
-                           "Error: %s, request info: %s" %
-                           (six.text_type(err), request_info))
-                LOG.error(err_msg)
+            self._dd_release(request_info)
 
         return info
 
@@ -727,6 +763,26 @@ def guest_get_stats(req):
     return req.response
 
 
+@util.SdkWsgify
+@tokens.validate
+def guest_get_power_state_list(req):
+
+    userid_list = _get_userid_list(req)
+
+    def _guest_get_power_state_list(req, userid_list):
+        action = get_handler()
+        return action.get_power_state_list(req, userid_list)
+
+    info = _guest_get_power_state_list(req, userid_list)
+
+    info_json = json.dumps(info)
+    req.response.status = util.get_http_code_from_sdk_return(info,
+        additional_handler=util.handle_not_found)
+    req.response.body = utils.to_utf8(info_json)
+    req.response.content_type = 'application/json'
+    return req.response
+
+
 @util.SdkWsgify
 @tokens.validate
 def guest_get_interface_stats(req):
@@ -747,6 +803,77 @@ def guest_get_interface_stats(req):
     return req.response
 
 
+@util.SdkWsgify
+@tokens.validate
+def guest_get_interface_stats_delta(req):
+
+    userid_list = _get_userid_list(req)
+
+    def _guest_get_interface_stats_delta(req, userid_list):
+        action = get_handler()
+        return action.inspect_vnics_delta(req, userid_list)
+
+    info = _guest_get_interface_stats_delta(req, userid_list)
+
+    info_json = json.dumps(info)
+    req.response.status = util.get_http_code_from_sdk_return(info,
+        additional_handler=util.handle_not_found)
+    req.response.body = utils.to_utf8(info_json)
+    req.response.content_type = 'application/json'
+    return req.response
+
+
+@util.SdkWsgify
+@tokens.validate
+def guest_get_history(req):
+
+    userid_list = _get_userid_list(req)
+
+    def _guest_get_history(req, userid_list, metrics, window):
+        action = get_handler()
+        return action.inspect_history(req, userid_list, metrics, window)
+
+    metrics = req.GET.get('metrics')
+    if metrics is not None:
+        metrics = [m for m in metrics.replace(' ', '').split(',') if m]
+    window = req.GET.get('window')
+    window = int(window) if window and window.isdigit() else None
+
+    info = _guest_get_history(req, userid_list, metrics, window)
+
+    info_json = json.dumps(info)
+    req.response.status = util.get_http_code_from_sdk_return(info,
+        additional_handler=util.handle_not_found)
+    req.response.body = utils.to_utf8(info_json)
+    req.response.content_type = 'application/json'
+    return req.response
+
+
+@util.SdkWsgify
+@tokens.validate
+def guest_get_archive(req):
+
+    userid_list = _get_userid_list(req)
+
+    def _guest_get_archive(req, userid_list, start, end):
+        action = get_handler()
+        return action.inspect_archive(req, userid_list, start, end)
+
+    start = req.GET.get('start')
+    start = int(start) if start and start.isdigit() else None
+    end = req.GET.get('end')
+    end = int(end) if end and end.isdigit() else None
+
+    info = _guest_get_archive(req, userid_list, start, end)
+
+    info_json = json.dumps(info)
+    req.response.status = util.get_http_code_from_sdk_return(info,
+        additional_handler=util.handle_not_found)
+    req.response.body = utils.to_utf8(info_json)
+    req.response.content_type = 'application/json'
+    return req.response
+
+
 @util.SdkWsgify
 @tokens.validate
 def guests_get_nic_info(req):
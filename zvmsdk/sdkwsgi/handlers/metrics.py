@@ -0,0 +1,73 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Handler for the metrics of the sdk API."""
+
+import json
+
+from zvmconnector import connector
+from zvmsdk import config
+from zvmsdk import log
+from zvmsdk import metrics
+from zvmsdk.sdkwsgi.handlers import tokens
+from zvmsdk.sdkwsgi import util
+from zvmsdk import utils
+
+
+_METRICSACTION = None
+CONF = config.CONF
+LOG = log.LOG
+
+
+class MetricsAction(object):
+
+    def __init__(self):
+        self.client = connector.ZVMConnector(connection_type='socket',
+                                             ip_addr=CONF.sdkserver.bind_addr,
+                                             port=CONF.sdkserver.bind_port)
+
+    def get(self):
+        info = self.client.send_request('metrics_get')
+        return info
+
+
+def get_action():
+    global _METRICSACTION
+    if _METRICSACTION is None:
+        _METRICSACTION = MetricsAction()
+    return _METRICSACTION
+
+
+@util.SdkWsgify
+def metrics_get(req):
+    # Prometheus can't refresh a token, so /metrics may be exempted from
+    # the token validation of the other APIs
+    if CONF.wsgi.metrics_auth.lower() == 'none':
+        return _metrics_get(req)
+    return tokens.validate(_metrics_get)(req)
+
+
+def _metrics_get(req):
+    action = get_action()
+    info = action.get()
+    if info['overallRC'] != 0:
+        info_json = json.dumps(info)
+        req.response.status = util.get_http_code_from_sdk_return(info)
+        req.response.body = utils.to_utf8(info_json)
+        req.response.content_type = 'application/json'
+        return req.response
+
+    req.response.body = utils.to_utf8(info['output'])
+    req.response.headers['Content-Type'] = metrics.CONTENT_TYPE
+    return req.response
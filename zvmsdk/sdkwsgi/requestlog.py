@@ -15,16 +15,28 @@
 """Simple middleware for request logging."""
 
 import logging
+import time
 
+from zvmconnector import socketclient
 from zvmsdk import log
 from zvmsdk.sdkwsgi import util
+from zvmsdk import tracing
 
 LOG = log.LOG
 
 
+def _end_request():
+    socketclient.set_request_id(None)
+    tracing.end_request()
+
+
 class RequestLog(object):
     """WSGI Middleware to write a simple request log to.
 
+    It also mints the request id, or accepts the one from the X-Request-Id
+    header, sends it with the calls to the SDK server and returns it along
+    with the timings of the request phases in the response headers.
+
     Borrowed from Paste Translogger
     """
 
@@ -36,13 +48,37 @@ class RequestLog(object):
         self.application = application
 
     def __call__(self, environ, start_response):
-        LOG.debug('Starting request: %s "%s %s"',
-                  environ['REMOTE_ADDR'], environ['REQUEST_METHOD'],
-                  util.get_request_uri(environ))
-        return self._log_and_call(environ, start_response)
+        request_id = tracing.start_request(
+            environ.get('HTTP_X_REQUEST_ID'))
+        socketclient.set_request_id(request_id)
+        wrapped_files = []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            def _file_wrapper(*args, **kwargs):
+                wrapped = file_wrapper(*args, **kwargs)
+                wrapped_files.append(wrapped)
+                return wrapped
+            environ['wsgi.file_wrapper'] = _file_wrapper
+        try:
+            LOG.debug('Starting request: %s "%s %s"',
+                      environ['REMOTE_ADDR'], environ['REQUEST_METHOD'],
+                      util.get_request_uri(environ))
+            app_iter = self._log_and_call(environ, start_response)
+        except Exception:
+            _end_request()
+            raise
+        if any(app_iter is wrapped for wrapped in wrapped_files):
+            # The server only sends the file, eg. with sendfile, when it
+            # gets back the object of its file_wrapper.
+            _end_request()
+            return app_iter
+        # The response body may still call the SDK server while it is
+        # iterated, the context is cleared when the server closes it.
+        return util.ClosingIterator(app_iter, _end_request)
 
     def _log_and_call(self, environ, start_response):
         req_uri = util.get_request_uri(environ)
+        start = time.time()
 
         def _local_response(status, headers, exc_info=None):
             size = None
@@ -50,6 +86,13 @@ class RequestLog(object):
                 if name.lower() == 'content-length':
                     size = value
 
+            timings = socketclient.get_timings()
+            timings['wsgi'] = time.time() - start
+            headers.append((tracing.REQUEST_ID_HEADER,
+                            tracing.get_request_id()))
+            headers.append(('Server-Timing',
+                            tracing.format_server_timing(timings)))
+
             self._write_log(environ, req_uri, status, size, headers,
                             exc_info)
             return start_response(status, headers, exc_info)
@@ -197,6 +197,7 @@ deploy = {
         'vdev': parameter_types.vdev,
         'hostname': parameter_types.hostname,
         'skipdiskcopy': parameter_types.boolean,
+        'priority': parameter_types.request_priority,
     },
     'required': ['image'],
     'additionalProperties': False,
@@ -209,6 +210,7 @@ capture = {
         'image': parameter_types.name,
         'capture_type': parameter_types.capture_type,
         'compress_level': parameter_types.compress_level,
+        'priority': parameter_types.request_priority,
     },
     'required': ['image'],
     'additionalProperties': False,
@@ -270,6 +272,29 @@ userid_list_array_query = {
     'additionalProperties': False
 }
 
+history_query = {
+    'type': 'object',
+    'properties': {
+        'userid': parameter_types.userid_list_array,
+        'metrics': parameter_types.single_param(parameter_types.metric_list),
+        'window': parameter_types.single_param(
+            parameter_types.non_negative_integer),
+    },
+    'additionalProperties': False
+}
+
+archive_query = {
+    'type': 'object',
+    'properties': {
+        'userid': parameter_types.userid_list_array,
+        'start': parameter_types.single_param(
+            parameter_types.non_negative_integer),
+        'end': parameter_types.single_param(
+            parameter_types.non_negative_integer),
+    },
+    'additionalProperties': False
+}
+
 nic_DB_info = {
     'type': 'object',
     'properties': {
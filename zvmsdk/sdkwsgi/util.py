@@ -12,8 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import heapq
+import itertools
 import json
 import six
+import threading
+import time
 
 import webob
 from webob.dec import wsgify
@@ -241,3 +245,129 @@ class SdkWsgify(wsgify):
                 'errmsg': explanation}
             exc.text = six.text_type(json.dumps(fault_data))
             raise exc
+
+
+class ClosingIterator(object):
+    """Wrap the app_iter of a response to call on_close when closed."""
+
+    def __init__(self, app_iter, on_close):
+        self._app_iter = app_iter
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self._app_iter, 'close'):
+                self._app_iter.close()
+        finally:
+            self._on_close()
+
+
+def get_wsgi_threads():
+    """Get the number of threads of a process of the wsgi server, None
+    when it is unknown.
+    """
+    try:
+        import uwsgi
+    except ImportError:
+        return None
+    threads = uwsgi.opt.get('threads')
+    if isinstance(threads, bytes):
+        threads = threads.decode()
+    try:
+        return int(threads)
+    except (TypeError, ValueError):
+        return None
+
+
+def cap_queue_waiters(max_waiting):
+    """Cap the number of waiters of an AdmissionQueue to a quarter of the
+    threads of the wsgi server, as each waiter holds a thread.
+    """
+    threads = get_wsgi_threads()
+    if threads is None:
+        return max_waiting
+    return min(max_waiting, threads // 4)
+
+
+class AdmissionQueue(object):
+    """Bounded admission queue for long running requests.
+
+    At most max_active requests are admitted at the same time, the others
+    wait in a queue of at most max_waiting entries. Waiters are admitted
+    by priority (higher first) and in FIFO order for the same priority.
+    A waiter that can't be admitted within timeout seconds gives up, a
+    timeout of 0 or less waits until the waiter is admitted. The waiters
+    block their thread, see cap_queue_waiters.
+    """
+
+    def __init__(self, max_active, max_waiting=0, timeout=0):
+        self._max_active = max_active
+        self._max_waiting = max_waiting
+        self._timeout = timeout
+        self._cond = threading.Condition(threading.Lock())
+        self._active = 0
+        self._waiting = []
+        self._counter = itertools.count()
+
+    def acquire(self, priority=0):
+        """Wait until the caller is admitted.
+
+        :returns: a tuple (admitted, position). position is the queue
+                  position the request got when it was enqueued, 0 when
+                  it was admitted immediately and None when it was
+                  rejected because the queue is full.
+        """
+        with self._cond:
+            if self._active < self._max_active and not self._waiting:
+                self._active += 1
+                return (True, 0)
+
+            if len(self._waiting) >= self._max_waiting:
+                return (False, None)
+
+            entry = (-priority, next(self._counter))
+            heapq.heappush(self._waiting, entry)
+            position = sorted(self._waiting).index(entry) + 1
+            LOG.debug("Request queued at position %d, %d active, "
+                      "%d waiting", position, self._active,
+                      len(self._waiting))
+
+            deadline = None
+            if self._timeout > 0:
+                deadline = time.time() + self._timeout
+            while True:
+                if (self._waiting[0] == entry and
+                    self._active < self._max_active):
+                    heapq.heappop(self._waiting)
+                    self._active += 1
+                    # the next waiter may also be admitted
+                    self._cond.notify_all()
+                    return (True, position)
+
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return (False, position)
+                self._cond.wait(remaining)
+
+    def release(self):
+        with self._cond:
+            if self._active <= 0:
+                raise ValueError("AdmissionQueue released too many times")
+            self._active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'active': self._active,
+                    'waiting': len(self._waiting),
+                    'max_active': self._max_active,
+                    'max_waiting': self._max_waiting}
@@ -281,6 +281,11 @@ userid_list_array = {
     'type': 'array'
 }
 
+metric_list = {
+    'type': 'string',
+    'pattern': '^(\s*\w+\s*)(,\s*\w+\s*)*$'
+}
+
 file_type = {
     'type': 'string',
     'enum': ['ext2', 'ext3', 'ext4', 'xfs', 'none']
@@ -426,6 +431,12 @@ compress_level = {
     'pattern': '^[0-9]$'
 }
 
+request_priority = {
+    'type': 'integer',
+    'minimum': -10,
+    'maximum': 10
+}
+
 user_vlan_id = {
     'type': 'object',
     'properties': {
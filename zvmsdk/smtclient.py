@@ -39,7 +39,9 @@ from zvmsdk import constants as const
 from zvmsdk import database
 from zvmsdk import exception
 from zvmsdk import log
+from zvmsdk import perfdata
 from zvmsdk import returncode
+from zvmsdk import tracing
 from zvmsdk import utils as zvmutils
 
 
@@ -74,8 +76,32 @@ class SMTClient(object):
         self._ImageDbOperator = database.ImageDbOperator()
 
     def _request(self, requestData):
+        return self._send_request(self._smt.request, lambda: requestData,
+                                  requestData)
+
+    def _call(self, function, subfunction, userid='', parms=None):
+        """Send a request to SMT without building a command string for it
+        to parse again.
+        """
+        def _get_request_data():
+            # Only built for the error message of a failed request
+            requestData = ' '.join(word for word in (function, userid,
+                                                     subfunction) if word)
+            if parms:
+                requestData += ' %s' % parms
+            return requestData
+
+        return self._send_request(self._smt.call, _get_request_data,
+                                  function, subfunction, userid, parms)
+
+    def _send_request(self, send, get_request_data, *args):
+        kwargs = {}
+        request_id = tracing.get_request_id()
+        if request_id is not None:
+            kwargs['requestId'] = request_id
         try:
-            results = self._smt.request(requestData)
+            with tracing.timed('smt'):
+                results = send(*args, **kwargs)
         except Exception as err:
             LOG.error('SMT internal parse encounter error')
             raise exception.SDKInternalError(msg=err, modID='smt')
@@ -108,7 +134,7 @@ class SMTClient(object):
                                                     results=results)
             else:
                 msg = ("SMT request failed. RequestData: '%s', Results: '%s'"
-                       % (requestData, str(results)))
+                       % (get_request_data(), str(results)))
                 raise exception.SDKSMTRequestFailed(results, msg)
         return results
 
@@ -365,14 +391,20 @@ class SMTClient(object):
     def get_power_state(self, userid):
         """Get power status of a z/VM instance."""
         LOG.debug('Querying power stat of %s' % userid)
-        requestData = "PowerVM " + userid + " status"
         action = "query power state of '%s'" % userid
         with zvmutils.log_and_reraise_smt_request_failed(action):
-            results = self._request(requestData)
+            results = self._call('PowerVM', 'status', userid)
         with zvmutils.expect_invalid_resp_data(results):
             status = results['response'][0].partition(': ')[2]
         return status
 
+    def get_logged_on_users(self):
+        """Get the set of userids logged on to z/VM with a single query."""
+        action = "query logged on users"
+        with zvmutils.log_and_reraise_smt_request_failed(action):
+            results = self._call('PowerVM', 'loggedon')
+        return set(results['response'])
+
     def _check_power_state(self, userid, action):
         # Get the vm status
         power_state = self.get_power_state(userid)
@@ -386,62 +418,56 @@ class SMTClient(object):
 
     def guest_start(self, userid):
         """Power on VM."""
-        requestData = "PowerVM " + userid + " on"
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'on', userid)
 
     def guest_stop(self, userid, **kwargs):
         """Power off VM."""
-        requestData = "PowerVM " + userid + " off"
-
+        parms = {}
         if 'timeout' in kwargs.keys() and kwargs['timeout']:
-            requestData += ' --maxwait ' + str(kwargs['timeout'])
+            parms['maxWait'] = kwargs['timeout']
         if 'poll_interval' in kwargs.keys() and kwargs['poll_interval']:
-            requestData += ' --poll ' + str(kwargs['poll_interval'])
+            parms['poll'] = kwargs['poll_interval']
 
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'off', userid, parms)
 
     def guest_softstop(self, userid, **kwargs):
         """Power off VM gracefully, it will call shutdown os then
             deactivate vm"""
-        requestData = "PowerVM " + userid + " softoff --wait"
+        parms = {'wait': True}
         if 'timeout' in kwargs.keys() and kwargs['timeout']:
-            requestData += ' --maxwait ' + str(kwargs['timeout'])
+            parms['maxWait'] = kwargs['timeout']
         else:
-            requestData += ' --maxwait ' + str(CONF.guest.softstop_timeout)
+            parms['maxWait'] = CONF.guest.softstop_timeout
 
         if 'poll_interval' in kwargs.keys() and kwargs['poll_interval']:
-            requestData += ' --poll ' + str(kwargs['poll_interval'])
+            parms['poll'] = kwargs['poll_interval']
         else:
-            requestData += ' --poll ' + str(CONF.guest.softstop_interval)
+            parms['poll'] = CONF.guest.softstop_interval
 
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'softoff', userid, parms)
 
     def guest_pause(self, userid):
         self._check_power_state(userid, 'pause')
 
-        requestData = "PowerVM " + userid + " pause"
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'pause', userid)
 
     def guest_unpause(self, userid):
         self._check_power_state(userid, 'unpause')
 
-        requestData = "PowerVM " + userid + " unpause"
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'unpause', userid)
 
     def guest_reboot(self, userid):
-        requestData = ' '.join(("PowerVM", userid, "reboot"))
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'reboot', userid)
 
     def guest_reset(self, userid):
-        requestData = ' '.join(("PowerVM", userid, "reset"))
         with zvmutils.log_and_reraise_smt_request_failed():
-            self._request(requestData)
+            self._call('PowerVM', 'reset', userid)
 
     def live_migrate_move(self, userid, destination, parms):
         """ moves the specified virtual machine, while it continues to run,
@@ -948,14 +974,21 @@ class SMTClient(object):
 
     def _guest_get_os_version(self, userid):
         os_version = ''
-        release_file = self.execute_cmd(userid, 'ls /etc/*-release')
+        # Read all the release files in one request, the files which do
+        # not exist on the guest give a non-zero rc.
+        cmds = ['ls /etc/*-release', 'cat /etc/os-release',
+                'cat /etc/redhat-release', 'cat /etc/SuSE-release',
+                'cat /etc/system-release']
+        outputs = [output for (rc, output) in
+                   self.execute_cmds(userid, cmds)]
+        release_file = outputs[0]
         if '/etc/os-release' in release_file:
             # Parse os-release file, part of the output looks like:
             # NAME="Red Hat Enterprise Linux Server"
             # ID="rhel"
             # VERSION_ID="7.0"
 
-            release_info = self.execute_cmd(userid, 'cat /etc/os-release')
+            release_info = outputs[1]
             release_dict = {}
             for item in release_info:
                 if item:
@@ -972,7 +1005,7 @@ class SMTClient(object):
             # The output looks like:
             # "Red Hat Enterprise Linux Server release 6.7 (Santiago)"
             distro = 'rhel'
-            release_info = self.execute_cmd(userid, 'cat /etc/redhat-release')
+            release_info = outputs[2]
             distro_version = release_info[0].split()[6]
             os_version = ''.join((distro, distro_version))
             return os_version
@@ -982,7 +1015,7 @@ class SMTClient(object):
             # VERSION = 11
             # PATCHLEVEL = 3
             distro = 'sles'
-            release_info = self.execute_cmd(userid, 'cat /etc/SuSE-release')
+            release_info = outputs[3]
             LOG.debug('OS release info is %s' % release_info)
             release_version = '.'.join((release_info[1].split('=')[1].strip(),
                                      release_info[2].split('=')[1].strip()))
@@ -993,7 +1026,7 @@ class SMTClient(object):
             # the output looks like:
             # "Red Hat Enterprise Linux Server release 6.7 (Santiago)"
             distro = 'rhel'
-            release_info = self.execute_cmd(userid, 'cat /etc/system-release')
+            release_info = outputs[4]
             distro_version = release_info[0].split()[6]
             os_version = ''.join((distro, distro_version))
             return os_version
@@ -1026,13 +1059,25 @@ class SMTClient(object):
                 else:
                     root_device = root_device_info
 
-            root_device_node = self.execute_cmd(userid, 'readlink -f %s' %
-                                                root_device)[0]
-            # Get device node vdev by node name
-            cmd = ('cat /proc/dasd/devices | grep -i "is %s" ' %
-                    root_device_node.split('/')[-1].rstrip(string.digits))
-            result = self.execute_cmd(userid, cmd)[0]
-            root_device_vdev = result.split()[0][4:8]
+            # Resolve the device node and list the dasd devices in one
+            # request, then get the device node vdev by node name
+            cmds = ['readlink -f %s' % root_device, 'cat /proc/dasd/devices']
+            outputs = self.execute_cmds(userid, cmds, stop_on_error=True)
+            for index in range(len(cmds)):
+                msg = self._get_cmd_error(cmds, outputs, index)
+                if msg is None and not outputs[index][1]:
+                    msg = "Command '%s' got no output" % cmds[index]
+                if msg is not None:
+                    self._raise_cmd_failed(userid, outputs, index, msg)
+            root_device_node = outputs[0][1][0]
+            node_name = root_device_node.split('/')[-1].rstrip(string.digits)
+            result = [line for line in outputs[1][1]
+                      if ('is %s ' % node_name) in line.lower()]
+            if not result:
+                msg = ("Device node %s of the root device %s is not found in "
+                       "/proc/dasd/devices" % (root_device_node, root_device))
+                self._raise_cmd_failed(userid, outputs, 1, msg)
+            root_device_vdev = result[0].split()[0][4:8]
             capture_devices.append(root_device_vdev)
             return capture_devices
         else:
@@ -1162,42 +1207,7 @@ class SMTClient(object):
         with zvmutils.log_and_reraise_smt_request_failed(action):
             results = self._request(rd)
 
-        ipq_kws = {
-            'userid': "Guest name:",
-            'guest_cpus': "Guest CPUs:",
-            'used_cpu_time': "Used CPU time:",
-            'elapsed_cpu_time': "Elapsed time:",
-            'min_cpu_count': "Minimum CPU count:",
-            'max_cpu_limit': "Max CPU limit:",
-            'samples_cpu_in_use': "Samples CPU in use:",
-            'samples_cpu_delay': "Samples CPU delay:",
-            'used_memory': "Used memory:",
-            'max_memory': "Max memory:",
-            'min_memory': "Minimum memory:",
-            'shared_memory': "Shared memory:",
-        }
-
-        pi_dict = {}
-        pi = {}
-        rpi_list = ('\n'.join(results['response'])).split("\n\n")
-        for rpi in rpi_list:
-            try:
-                pi = zvmutils.translate_response_to_dict(rpi, ipq_kws)
-            except exception.SDKInternalError as err:
-                emsg = err.format_message()
-                # when there is only one userid queried and this userid is
-                # in 'off'state, the smcli will only returns the queried
-                # userid number, no valid performance info returned.
-                if(emsg.__contains__("No value matched with keywords.")):
-                    continue
-                else:
-                    raise err
-            for k, v in pi.items():
-                pi[k] = v.strip('" ')
-            if pi.get('userid') is not None:
-                pi_dict[pi['userid']] = pi
-
-        return pi_dict
+        return perfdata.parse_performance_data(results['response'])
 
     def system_image_performance_query(self, namelist):
         """Call System_Image_Performance_Query to get guest current status.
@@ -1212,60 +1222,34 @@ class SMTClient(object):
         with zvmutils.log_and_reraise_smt_request_failed(action):
             results = self._request(rd)
 
-        ipq_kws = {
-            'userid': "Guest name:",
-            'guest_cpus': "Guest CPUs:",
-            'used_cpu_time': "Used CPU time:",
-            'elapsed_cpu_time': "Elapsed time:",
-            'min_cpu_count': "Minimum CPU count:",
-            'max_cpu_limit': "Max CPU limit:",
-            'samples_cpu_in_use': "Samples CPU in use:",
-            'samples_cpu_delay': "Samples CPU delay:",
-            'used_memory': "Used memory:",
-            'max_memory': "Max memory:",
-            'min_memory': "Minimum memory:",
-            'shared_memory': "Shared memory:",
-        }
-
-        pi_dict = {}
-        pi = {}
-        rpi_list = ('\n'.join(results['response'])).split("\n\n")
-        for rpi in rpi_list:
-            try:
-                pi = zvmutils.translate_response_to_dict(rpi, ipq_kws)
-            except exception.SDKInternalError as err:
-                emsg = err.format_message()
-                # when there is only one userid queried and this userid is
-                # in 'off'state, the smcli will only returns the queried
-                # userid number, no valid performance info returned.
-                if(emsg.__contains__("No value matched with keywords.")):
-                    continue
-                else:
-                    raise err
-            for k, v in pi.items():
-                pi[k] = v.strip('" ')
-            if pi.get('userid') is not None:
-                pi_dict[pi['userid']] = pi
-
-        return pi_dict
+        return perfdata.parse_performance_data(results['response'])
 
-    def virtual_network_vswitch_query_byte_stats(self):
+    def virtual_network_vswitch_query_byte_stats(self, switch_name='*'):
+        """Query the byte statistics of the nics of a vswitch, or of all
+        the vswitches when switch_name is '*'.
+        """
         smt_userid = zvmutils.get_smt_userid()
         rd = ' '.join((
             "SMAPI %s API Virtual_Network_Vswitch_Query_Byte_Stats" %
             smt_userid,
             "--operands",
             '-T "%s"' % smt_userid,
-            '-k "switch_name=*"'
+            '-k "switch_name=%s"' % switch_name
             ))
         action = "query vswitch usage info"
         with zvmutils.log_and_reraise_smt_request_failed(action):
             results = self._request(rd)
         return self._parse_vswitch_inspect_data(results['response'])
 
+    def get_smt_metrics(self):
+        """Get the metrics of the SMT request dispatcher, SMAPI calls,
+        punch queue and command runner of the process.
+        """
+        return self._smt.getMetrics()
+
     def get_host_info(self):
         with zvmutils.log_and_reraise_smt_request_failed():
-            results = self._request("getHost general")
+            results = self._call('getHost', 'general')
         host_info = zvmutils.translate_response_to_dict(
             '\n'.join(results['response']), const.RINV_HOST_KEYWORDS)
 
@@ -1273,7 +1257,8 @@ class SMTClient(object):
 
     def get_diskpool_info(self, pool):
         with zvmutils.log_and_reraise_smt_request_failed():
-            results = self._request("getHost diskpoolspace %s" % pool)
+            results = self._call('getHost', 'diskpoolspace',
+                                 parms={'poolName': pool})
         dp_info = zvmutils.translate_response_to_dict(
             '\n'.join(results['response']), const.DISKPOOL_KEYWORDS)
 
@@ -1557,7 +1542,7 @@ class SMTClient(object):
 
     def get_user_direct(self, userid):
         with zvmutils.log_and_reraise_smt_request_failed():
-            results = self._request("getvm %s directory" % userid)
+            results = self._call('getvm', 'directory', userid)
         return results.get('response', [])
 
     def _delete_nic_active_exception(self, error, userid, vdev):
@@ -1985,6 +1970,48 @@ class SMTClient(object):
         ret = results['response']
         return ret
 
+    def execute_cmds(self, userid, cmds, stop_on_error=False):
+        """Run several commands on the guest with a single iucv request.
+
+        Return the list of (rc, output lines) of the commands which were
+        run. When stop_on_error is set, the commands following a failed
+        command are not run.
+        """
+        parms = {'cmds': cmds}
+        if stop_on_error:
+            parms['stopOnError'] = True
+        with zvmutils.log_and_reraise_smt_request_failed(action='execute '
+        'commands on vm via iucv channel'):
+            results = self._call('CMDVM', 'CMDS', userid, parms)
+
+        return [(res['rc'], res['response'].splitlines())
+                for res in results['cmdResults']]
+
+    def _get_cmd_error(self, cmds, results, index):
+        """Get the error message of a command run by execute_cmds, or None
+        when the command succeeded.
+        """
+        if index >= len(results):
+            return ("Command '%s' was not run" % cmds[index])
+        rc, output = results[index]
+        if rc == 0:
+            return None
+        return ("Command '%s' failed with rc %d, output: %s" %
+                (cmds[index], rc, '\n'.join(output)))
+
+    def _raise_cmd_failed(self, userid, results, index, msg):
+        """Raise the error of a command run by execute_cmds, like
+        execute_cmd does when its command fails.
+        """
+        rc = results[index][0] if index < len(results) else 0
+        msg = ("Failed to execute commands on vm %s via iucv channel: %s" %
+               (userid, msg))
+        LOG.error(msg)
+        raise exception.SDKSMTRequestFailed({'overallRC': 2, 'rc': 8,
+                                             'rs': rc, 'errno': 0,
+                                             'strError': '',
+                                             'response': []}, msg)
+
     def execute_cmd_direct(self, userid, cmdStr):
         """"cmdVM."""
         requestData = 'cmdVM ' + userid + ' CMD \'' + cmdStr + '\''
@@ -2967,18 +2994,23 @@ class SMTClient(object):
             # log as warning and ignore namelist operation failures
             LOG.warning(six.text_type(err))
 
-    def namelist_add(self, namelist, userid):
+    def namelist_add(self, namelist, userid, ignore_errors=True):
         rd = ''.join(("SMAPI %s API Name_List_Add " % namelist,
                       "--operands -n %s" % userid))
-        self._request_with_error_ignored(rd)
+        if ignore_errors:
+            self._request_with_error_ignored(rd)
+        else:
+            self._request(rd)
 
     def namelist_remove(self, namelist, userid):
         rd = ''.join(("SMAPI %s API Name_List_Remove " % namelist,
                       "--operands -n %s" % userid))
         self._request_with_error_ignored(rd)
 
-    def namelist_query(self, namelist):
+    def namelist_query(self, namelist, ignore_errors=True):
         rd = "SMAPI %s API Name_List_Query" % namelist
+        if not ignore_errors:
+            return self._request(rd)['response']
         resp = self._request_with_error_ignored(rd)
         if resp is not None:
             return resp['response']
@@ -3142,14 +3174,19 @@ class SMTClient(object):
             active_free.sort()
             active_new = active_free[0:count - active_count]
             # Do live resize
-            # Define new cpus
-            cmd_str = "vmcp def cpu " + ' '.join(active_new)
+            # Define new cpus and rescan them in Linux layer to hot-plug
+            # them, in one request
+            cmds = ["vmcp def cpu " + ' '.join(active_new), "chcpu -r"]
             try:
-                self.execute_cmd(userid, cmd_str)
-            except exception.SDKSMTRequestFailed as err1:
+                results = self.execute_cmds(userid, cmds, stop_on_error=True)
+                err1 = self._get_cmd_error(cmds, results, 0)
+            except exception.SDKSMTRequestFailed as err:
+                results = []
+                err1 = err.format_message()
+            if err1 is not None:
                 # rollback and return
                 msg1 = ("Define cpu of guest: '%s' to active failed with . "
-                       "error: %s." % (userid, err1.format_message()))
+                       "error: %s." % (userid, err1))
                 # Start to do rollback
                 if action == 0:
                     LOG.error(msg1)
@@ -3182,14 +3219,12 @@ class SMTClient(object):
                                  "successfully." % userid)
                 # Finally raise the exception
                 raise exception.SDKGuestOperationError(
-                    rs=7, userid=userid, err=err1.format_message())
+                    rs=7, userid=userid, err=err1)
         # Activate successfully, rescan in Linux layer to hot-plug new cpus
         LOG.info("Added new CPUs to active configuration of guest '%s'" %
                  userid)
-        try:
-            self.execute_cmd(userid, "chcpu -r")
-        except exception.SDKSMTRequestFailed as err:
-            msg = err.format_message()
+        msg = self._get_cmd_error(cmds, results, 1)
+        if msg is not None:
             LOG.error("Rescan cpus to hot-plug new defined cpus for guest: "
                       "'%s' failed with error: %s. No rollback is done and you"
                       "may need to check the status and restart the guest to "
@@ -3437,13 +3472,21 @@ class SMTClient(object):
             # Do live resize. update memory size
             increase_size = size - active_size
             # Step1: Define new standby storage
-            cmd_str = ("vmcp def storage standby %sM" % increase_size)
+            # Step 2: Online new memory
+            # Both steps are run in one request, step 2 is not run when
+            # step 1 failed.
+            cmds = ["vmcp def storage standby %sM" % increase_size,
+                    "chmem -e %sM" % increase_size]
             try:
-                self.execute_cmd(userid, cmd_str)
+                results = self.execute_cmds(userid, cmds, stop_on_error=True)
+                err = self._get_cmd_error(cmds, results, 0)
             except exception.SDKSMTRequestFailed as e:
+                results = []
+                err = e.format_message()
+            if err is not None:
                 # rollback and return
                 msg = ("Define standby memory of guest: '%s' failed with "
-                       "error: %s." % (userid, e.format_message()))
+                       "error: %s." % (userid, err))
                 LOG.error(msg)
                 # Start to do rollback
                 if action == 1:
@@ -3453,16 +3496,13 @@ class SMTClient(object):
                 # Finally, raise the error and exit
                 raise exception.SDKGuestOperationError(rs=11,
                                                        userid=userid,
-                                                       err=e.format_message())
+                                                       err=err)
 
-            # Step 2: Online new memory
-            cmd_str = ("chmem -e %sM" % increase_size)
-            try:
-                self.execute_cmd(userid, cmd_str)
-            except exception.SDKSMTRequestFailed as err1:
+            err1 = self._get_cmd_error(cmds, results, 1)
+            if err1 is not None:
                 # rollback and return
                 msg1 = ("Online memory of guest: '%s' failed with "
-                       "error: %s." % (userid, err1.format_message()))
+                       "error: %s." % (userid, err1))
                 LOG.error(msg1)
                 # Start to do rollback
                 LOG.info("Start to do revert.")
@@ -3481,7 +3521,7 @@ class SMTClient(object):
                     self._revert_user_direct(userid, user_direct)
                 # Finally raise the exception
                 raise exception.SDKGuestOperationError(
-                    rs=7, userid=userid, err=err1.format_message())
+                    rs=7, userid=userid, err=err1)
 
         LOG.info("Live resize memory for guest: '%s' finished successfully."
                  % userid)
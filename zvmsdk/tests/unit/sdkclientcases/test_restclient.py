@@ -138,6 +138,58 @@ class RESTClientTestCase(unittest.TestCase):
                                    data=body, headers=header,
                                    verify=False)
 
+    @mock.patch.object(requests, 'request')
+    @mock.patch('zvmconnector.restclient.RESTClient._get_token')
+    def test_guest_inspect_vnics_delta(self, get_token, request):
+        method = 'GET'
+        url = '/guests/interfacestats/delta?userid=%s' % self.fake_userid
+        body = None
+        header = self.headers
+        full_uri = self.base_url + url
+        request.return_value = self.response
+        get_token.return_value = self._tmp_token()
+
+        self.client.call("guest_inspect_vnics_delta", self.fake_userid)
+        request.assert_called_with(method, full_uri,
+                                   data=body, headers=header,
+                                   verify=False)
+
+    @mock.patch.object(requests, 'request')
+    @mock.patch('zvmconnector.restclient.RESTClient._get_token')
+    def test_guest_inspect_history(self, get_token, request):
+        method = 'GET'
+        url = ('/guests/history?userid=%s&metrics=nic_rx,nic_tx&window=300'
+               % self.fake_userid)
+        body = None
+        header = self.headers
+        full_uri = self.base_url + url
+        request.return_value = self.response
+        get_token.return_value = self._tmp_token()
+
+        self.client.call("guest_inspect_history", self.fake_userid,
+                         metrics=['nic_rx', 'nic_tx'], window=300)
+        request.assert_called_with(method, full_uri,
+                                   data=body, headers=header,
+                                   verify=False)
+
+    @mock.patch.object(requests, 'request')
+    @mock.patch('zvmconnector.restclient.RESTClient._get_token')
+    def test_guest_inspect_archive(self, get_token, request):
+        method = 'GET'
+        url = ('/guests/archive?userid=%s&start=0&end=1538352000'
+               % self.fake_userid)
+        body = None
+        header = self.headers
+        full_uri = self.base_url + url
+        request.return_value = self.response
+        get_token.return_value = self._tmp_token()
+
+        self.client.call("guest_inspect_archive", self.fake_userid,
+                         start=0, end=1538352000)
+        request.assert_called_with(method, full_uri,
+                                   data=body, headers=header,
+                                   verify=False)
+
     @mock.patch.object(requests, 'request')
     @mock.patch('zvmconnector.restclient.RESTClient._get_token')
     def test_guests_get_nic_info(self, get_token, request):
@@ -627,6 +679,26 @@ class RESTClientTestCase(unittest.TestCase):
         # wait host_diskpool_get_info bug fixed
         pass
 
+    @mock.patch.object(requests, 'request')
+    @mock.patch('zvmconnector.restclient.RESTClient._get_token')
+    def test_metrics_get(self, get_token, request):
+        method = 'GET'
+        url = '/metrics'
+        body = None
+        header = self.headers
+        full_uri = self.base_url + url
+        response = mock.Mock(status_code=200, text='zvm_host_info 1\n')
+        response.headers = {'Content-Type': 'text/plain; version=0.0.4'}
+        request.return_value = response
+        get_token.return_value = self._tmp_token()
+
+        results = self.client.call("metrics_get")
+        request.assert_called_with(method, full_uri,
+                                   data=body, headers=header,
+                                   verify=False)
+        self.assertEqual(0, results['overallRC'])
+        self.assertEqual('zvm_host_info 1\n', results['output'])
+
     @mock.patch.object(requests, 'request')
     @mock.patch('zvmconnector.restclient.RESTClient._get_token')
     def test_image_import(self, get_token, request):
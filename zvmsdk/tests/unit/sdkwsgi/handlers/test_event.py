@@ -0,0 +1,116 @@
+# Copyright 2017,2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import mock
+import unittest
+import webob
+
+from zvmsdk import exception
+from zvmsdk.sdkwsgi.handlers import event
+from zvmsdk.sdkwsgi import util
+
+
+EVENT = {'id': 11, 'timestamp': 1000.0, 'userid': 'USERID1',
+         'event': 'power_state', 'power_state': 'on',
+         'previous_power_state': 'off'}
+
+
+def _events_info(events, last_event_id=10, missed=False):
+    return {'overallRC': 0, 'rc': 0, 'rs': 0, 'modID': None, 'errmsg': '',
+            'output': {'last_event_id': last_event_id, 'missed': missed,
+                       'events': events}}
+
+
+class HandlersEventTest(unittest.TestCase):
+
+    def setUp(self):
+        self.action = event.EventAction()
+        self.action.client = mock.Mock()
+        patcher = mock.patch.object(event, 'get_action',
+                                    return_value=self.action)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, url, headers=None):
+        req = webob.Request.blank(url, headers=headers or {})
+        req.environ['wsgiorg.routing_args'] = ((), {})
+        return req.get_response(event.event_get)
+
+    def test_event_get(self):
+        info = _events_info([EVENT], last_event_id=11)
+        self.action.client.send_request.return_value = info
+        resp = self._request('/events?last_event_id=10&timeout=5')
+        self.action.client.send_request.assert_called_once_with(
+            'guest_get_events', last_event_id=10, timeout=5)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(info, json.loads(resp.body.decode('utf-8')))
+
+    def test_event_get_invalid_query(self):
+        self.assertRaises(exception.ValidationError, self._request,
+                          '/events?last_event_id=abc')
+        self.action.client.send_request.assert_not_called()
+
+    def test_event_get_stream(self):
+        self.action.client.send_request.side_effect = [
+            _events_info([EVENT], last_event_id=11),
+            _events_info([], last_event_id=11),
+            {'overallRC': 1, 'rc': 1, 'rs': 0, 'modID': None,
+             'errmsg': 'failed', 'output': ''}]
+        resp = self._request('/events', headers={
+            'Accept': 'text/event-stream', 'Last-Event-ID': '10'})
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual('text/event-stream', resp.content_type)
+
+        frames = resp.body.decode('utf-8').split('\n\n')
+        self.assertEqual('id: 11\nevent: power_state\ndata: %s' %
+                         json.dumps(EVENT), frames[0])
+        self.assertEqual(': keepalive', frames[1])
+        self.assertTrue(frames[2].startswith('event: error\n'))
+        calls = self.action.client.send_request.call_args_list
+        self.assertEqual(10, calls[0][1]['last_event_id'])
+        self.assertEqual(11, calls[1][1]['last_event_id'])
+        # closing the stream releases the subscriber
+        self.assertEqual(0, self.action.subscribers.stats()['active'])
+
+    def test_event_get_stream_invalid_header(self):
+        self.assertRaises(exception.ValidationError, self._request,
+                          '/events', headers={
+                              'Accept': 'text/event-stream',
+                              'Last-Event-ID': 'abc'})
+
+    def test_event_get_max_subscribers(self):
+        self.action.subscribers = util.AdmissionQueue(1)
+        self.action.client.send_request.return_value = _events_info([])
+        stream = self._request('/events', headers={
+            'Accept': 'text/event-stream'})
+        self.assertEqual(200, stream.status_int)
+
+        # the stream is still open, the next subscriber is rejected
+        resp = self._request('/events?timeout=5')
+        self.assertEqual(503, resp.status_int)
+        info = json.loads(resp.body.decode('utf-8'))
+        self.assertEqual(503, info['overallRC'])
+        self.assertEqual(3, info['rs'])
+        self.action.client.send_request.assert_not_called()
+
+        stream.app_iter.close()
+        resp = self._request('/events?timeout=5')
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(0, self.action.subscribers.stats()['active'])
+
+    def test_event_get_failed_unsubscribe(self):
+        self.action.client.send_request.side_effect = ValueError()
+        self.assertRaises(ValueError, self._request, '/events')
+        self.assertEqual(0, self.action.subscribers.stats()['active'])
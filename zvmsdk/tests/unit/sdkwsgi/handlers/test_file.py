@@ -0,0 +1,261 @@
+# Copyright 2017,2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import io
+import json
+import mock
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import webob
+import webob.exc
+
+from zvmsdk.sdkwsgi.handlers import file
+
+
+FILE_DATA = b'0123456789' * 100
+
+
+class HandlersFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fpath = os.path.join(self.tmpdir, 'exported')
+        with open(self.fpath, 'wb') as f:
+            f.write(FILE_DATA)
+        self.action = file.FileAction()
+
+        self.importdir = os.path.join(self.tmpdir, 'imported')
+        os.mkdir(self.importdir)
+        patcher = mock.patch.object(self.action._pathutils,
+                                    'create_file_repository',
+                                    return_value=self.importdir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _import_request(self, data, headers=None):
+        req = webob.Request.blank('/files', method='PUT', body=data,
+                                  headers=headers or {})
+        req.content_type = 'application/octet-stream'
+        return req
+
+    def _import_output(self, req):
+        with mock.patch.object(file, 'get_action',
+                               return_value=self.action):
+            resp = req.get_response(file.file_import)
+        return resp.status_int, json.loads(resp.body.decode('utf-8'))
+
+    @mock.patch.object(file, 'CONF')
+    def test_file_import(self, conf):
+        conf.file.chunk_size = 64
+        conf.file.upload_session_ttl = 0
+        results = self.action.file_import(io.BytesIO(FILE_DATA),
+                                          content_length=len(FILE_DATA))
+        output = results['output']
+        self.assertEqual(len(FILE_DATA), output['filesize_in_bytes'])
+        self.assertEqual(hashlib.md5(FILE_DATA).hexdigest(),
+                         output['md5sum'])
+        with open(output['dest_url'][len('file://'):], 'rb') as f:
+            self.assertEqual(FILE_DATA, f.read())
+
+    def test_file_import_shorter_than_content_length(self):
+        results = self.action.file_import(io.BytesIO(FILE_DATA),
+                                          content_length=4096)
+        fpath = results['output']['dest_url'][len('file://'):]
+        self.assertEqual(len(FILE_DATA), os.path.getsize(fpath))
+
+    def test_file_import_request_session(self):
+        session = {'X-Upload-Session': 'session-1'}
+        headers = dict(session, **{'Content-Range': 'bytes 0-599/1000'})
+        status, info = self._import_output(
+            self._import_request(FILE_DATA[:600], headers))
+        self.assertEqual(200, status)
+        self.assertFalse(info['output']['complete'])
+        self.assertEqual(600, info['output']['filesize_in_bytes'])
+        self.assertEqual('', info['output']['md5sum'])
+        self.assertEqual(['session-1.part'], os.listdir(self.importdir))
+
+        # query where to resume from
+        headers = dict(session, **{'Content-Range': 'bytes */1000'})
+        status, info = self._import_output(
+            self._import_request(b'', headers))
+        self.assertEqual(600, info['output']['filesize_in_bytes'])
+
+        headers = dict(session, **{'Content-Range': 'bytes 500-999/1000'})
+        status, info = self._import_output(
+            self._import_request(FILE_DATA[500:], headers))
+        self.assertEqual(200, status)
+        self.assertTrue(info['output']['complete'])
+        self.assertEqual(1000, info['output']['filesize_in_bytes'])
+        self.assertEqual(hashlib.md5(FILE_DATA).hexdigest(),
+                         info['output']['md5sum'])
+        self.assertEqual(
+            'file://' + os.path.join(self.importdir, 'session-1'),
+            info['output']['dest_url'])
+        self.assertEqual(['session-1'], os.listdir(self.importdir))
+
+        # the last part sent again
+        status, info = self._import_output(
+            self._import_request(FILE_DATA[500:], headers))
+        self.assertEqual(200, status)
+        self.assertTrue(info['output']['complete'])
+        self.assertEqual(hashlib.md5(FILE_DATA).hexdigest(),
+                         info['output']['md5sum'])
+        self.assertEqual(['session-1'], os.listdir(self.importdir))
+
+    def test_file_import_request_session_gap(self):
+        headers = {'X-Upload-Session': 'session-1',
+                   'Content-Range': 'bytes 100-199/1000'}
+        status, info = self._import_output(
+            self._import_request(FILE_DATA[100:200], headers))
+        self.assertEqual(400, status)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.importdir, 'session-1')))
+
+    def test_file_import_request_session_length_mismatch(self):
+        headers = {'X-Upload-Session': 'session-1',
+                   'Content-Range': 'bytes 0-599/1000'}
+        status, info = self._import_output(
+            self._import_request(FILE_DATA[:500], headers))
+        self.assertEqual(400, status)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.importdir, 'session-1')))
+
+    def test_file_import_session_part_length_mismatch(self):
+        target = os.path.join(self.importdir, 'session-1.part')
+        with open(target, 'wb') as f:
+            f.write(FILE_DATA[:300])
+        content_range = webob.byterange.ContentRange(300, 600, 1000)
+        results = self.action.file_import(io.BytesIO(FILE_DATA[300:500]),
+                                          session='session-1',
+                                          content_range=content_range)
+        self.assertEqual(1, results['rs'])
+        self.assertEqual(300, os.path.getsize(target))
+
+    def test_file_import_expire_sessions(self):
+        for fname in ('session-1.part', 'session-2.part', 'session-3'):
+            with open(os.path.join(self.importdir, fname), 'wb') as f:
+                f.write(FILE_DATA)
+        # session-1 is not updated since more than upload_session_ttl
+        old = time.time() - file.CONF.file.upload_session_ttl - 1
+        for fname in ('session-1.part', 'session-3'):
+            os.utime(os.path.join(self.importdir, fname), (old, old))
+
+        results = self.action.file_import(io.BytesIO(FILE_DATA))
+        self.assertEqual(0, results['overallRC'])
+        fname = os.path.basename(results['output']['dest_url'])
+        self.assertEqual(sorted([fname, 'session-2.part', 'session-3']),
+                         sorted(os.listdir(self.importdir)))
+
+    @mock.patch.object(file, '_write_chunks')
+    def test_file_import_oserror_cleanup(self, write_chunks):
+        write_chunks.side_effect = OSError(28, 'No space left on device')
+        with mock.patch.object(self.action._pathutils,
+                               'clean_temp_folder') as clean:
+            results = self.action.file_import(io.BytesIO(FILE_DATA),
+                                              content_length=len(FILE_DATA))
+        self.assertEqual(1, results['rs'])
+        clean.assert_called_once_with(
+            os.path.join(self.importdir, os.listdir(self.importdir)[0]))
+
+    def test_file_import_request_invalid_session(self):
+        headers = {'X-Upload-Session': '../session'}
+        status, info = self._import_output(
+            self._import_request(FILE_DATA, headers))
+        self.assertEqual(400, status)
+
+    def test_file_import_request_range_without_session(self):
+        headers = {'Content-Range': 'bytes 0-999/1000'}
+        status, info = self._import_output(
+            self._import_request(FILE_DATA, headers))
+        self.assertEqual(400, status)
+
+    def _export_request(self, fpath, **kwargs):
+        req = webob.Request.blank('/files', method='POST', **kwargs)
+        req.body = json.dumps({'source_file': fpath}).encode('utf-8')
+        return req
+
+    def test_file_export_whole_file(self):
+        results = self.action.file_export(self.fpath)
+        file_iter, content_range, file_size = results
+        self.assertIsNone(content_range)
+        self.assertEqual(len(FILE_DATA), file_size)
+        self.assertEqual(FILE_DATA, b''.join(file_iter))
+
+    @mock.patch.object(file, 'CONF')
+    def test_file_export_with_file_wrapper(self, conf):
+        conf.file.chunk_size = 512
+        wrapper = mock.Mock()
+        results = self.action.file_export(self.fpath, file_wrapper=wrapper)
+        self.assertEqual((wrapper.return_value, None, len(FILE_DATA)),
+                         results)
+        fileobj, chunk_size = wrapper.call_args[0]
+        self.assertEqual(512, chunk_size)
+        self.assertEqual(FILE_DATA, fileobj.read())
+        fileobj.close()
+
+    def test_file_export_range(self):
+        byte_range = webob.byterange.Range(100, 350)
+        wrapper = mock.Mock()
+        results = self.action.file_export(self.fpath, byte_range=byte_range,
+                                          file_wrapper=wrapper)
+        file_iter, content_range, file_size = results
+        wrapper.assert_not_called()
+        self.assertEqual((100, 350), content_range)
+        self.assertEqual(FILE_DATA[100:350], b''.join(file_iter))
+
+    def test_file_export_range_not_satisfiable(self):
+        byte_range = webob.byterange.Range(2000, None)
+        self.assertRaises(webob.exc.HTTPRequestRangeNotSatisfiable,
+                          self.action.file_export, self.fpath,
+                          byte_range=byte_range)
+
+    def test_file_export_not_exist(self):
+        results = self.action.file_export(self.fpath + '.notexist')
+        self.assertEqual(2, results['rs'])
+
+    def test_file_export_request_range(self):
+        req = self._export_request(self.fpath,
+                                   headers={'Range': 'bytes=990-'})
+        resp = req.get_response(file.file_export)
+        self.assertEqual(206, resp.status_int)
+        self.assertEqual('bytes 990-999/1000', resp.headers['Content-Range'])
+        self.assertEqual('bytes', resp.headers['Accept-Ranges'])
+        self.assertEqual(FILE_DATA[990:], resp.body)
+
+    def test_file_export_request_range_not_satisfiable(self):
+        req = self._export_request(self.fpath,
+                                   headers={'Range': 'bytes=2000-'})
+        resp = req.get_response(file.file_export)
+        self.assertEqual(416, resp.status_int)
+        self.assertEqual('bytes */1000', resp.headers['Content-Range'])
+        self.assertEqual(416, json.loads(resp.body.decode('utf-8'))['rs'])
+
+    def test_file_export_not_exist_keeps_error_template(self):
+        self.action.file_export(self.fpath + '.notexist')
+        self.assertEqual(1, file.FILE_OPERATION_ERROR['rs'])
+        self.assertEqual('', file.FILE_OPERATION_ERROR['errmsg'])
+
+    def test_file_export_request_whole_file(self):
+        req = self._export_request(self.fpath)
+        resp = req.get_response(file.file_export)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(len(FILE_DATA), resp.content_length)
+        self.assertEqual(FILE_DATA, resp.body)
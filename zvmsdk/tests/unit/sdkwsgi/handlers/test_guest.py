@@ -510,6 +510,61 @@ class GuestActionsTest(SDKWSGITest):
         mock_action.assert_called_once_with("guest_capture", FAKE_USERID,
             "image1", capture_type="rootonly", compress_level=6)
 
+    @mock.patch.object(util, 'wsgi_path_item')
+    @mock.patch('zvmconnector.connector.ZVMConnector.send_request')
+    def test_guest_deploy_with_priority(self, mock_action, mock_userid):
+        self.req.body = """{"action": "deploy",
+                            "image": "image1",
+                            "priority": 5}"""
+        mock_action.return_value = ''
+        mock_userid.return_value = FAKE_USERID
+
+        with mock.patch.object(util.AdmissionQueue, 'acquire') as acquire:
+            acquire.return_value = (True, 0)
+            guest.guest_action(self.req)
+            acquire.assert_called_once_with(priority=5)
+        mock_action.assert_called_once_with('guest_deploy', FAKE_USERID,
+            'image1', remotehost=None, transportfiles=None,
+            vdev=None, hostname=None, skipdiskcopy=False)
+
+    @mock.patch.object(util, 'wsgi_path_item')
+    def test_guest_deploy_invalid_priority(self, mock_userid):
+        self.req.body = """{"action": "deploy",
+                            "image": "image1",
+                            "priority": 11}"""
+        mock_userid.return_value = FAKE_USERID
+
+        self.assertRaises(exception.ValidationError, guest.guest_action,
+                          self.req)
+
+    @mock.patch.object(util, 'wsgi_path_item')
+    @mock.patch('zvmconnector.connector.ZVMConnector.send_request')
+    def test_guest_capture_queue_timeout(self, mock_action, mock_userid):
+        self.req.body = """{"action": "capture",
+                            "image": "image1"}"""
+        mock_userid.return_value = FAKE_USERID
+
+        with mock.patch.object(util.AdmissionQueue, 'acquire') as acquire:
+            acquire.return_value = (False, 3)
+            guest.guest_action(self.req)
+        mock_action.assert_not_called()
+        self.assertEqual(503, self.req.response.status)
+        self.assertIn('"rs": 2', self.req.response.body.decode())
+
+    @mock.patch.object(util, 'wsgi_path_item')
+    @mock.patch('zvmconnector.connector.ZVMConnector.send_request')
+    def test_guest_capture_queue_full(self, mock_action, mock_userid):
+        self.req.body = """{"action": "capture",
+                            "image": "image1"}"""
+        mock_userid.return_value = FAKE_USERID
+
+        with mock.patch.object(util.AdmissionQueue, 'acquire') as acquire:
+            acquire.return_value = (False, None)
+            guest.guest_action(self.req)
+        mock_action.assert_not_called()
+        self.assertEqual(503, self.req.response.status)
+        self.assertIn('"rs": 1', self.req.response.body.decode())
+
 
 class HandlersGuestTest(SDKWSGITest):
 
@@ -925,6 +980,14 @@ class HandlersGuestTest(SDKWSGITest):
         guest.guest_get_stats(self.req)
         mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST)
 
+    @mock.patch.object(guest.VMHandler, 'get_power_state_list')
+    def test_guest_get_power_state_list(self, mock_get):
+        self.req.GET = FakeReqGet()
+        mock_get.return_value = '{}'
+
+        guest.guest_get_power_state_list(self.req)
+        mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST)
+
     @mock.patch.object(guest.VMHandler, 'inspect_vnics')
     def test_guest_get_interface_stats(self, mock_get):
         self.req.GET = FakeReqGet()
@@ -933,6 +996,35 @@ class HandlersGuestTest(SDKWSGITest):
         guest.guest_get_interface_stats(self.req)
         mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST)
 
+    @mock.patch.object(guest.VMHandler, 'inspect_vnics_delta')
+    def test_guest_get_interface_stats_delta(self, mock_get):
+        self.req.GET = FakeReqGet()
+        mock_get.return_value = '{}'
+
+        guest.guest_get_interface_stats_delta(self.req)
+        mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST)
+
+    @mock.patch.object(guest.VMHandler, 'inspect_history')
+    def test_guest_get_history(self, mock_get):
+        self.req.GET = {'userid': FAKE_USERID_LIST_STR,
+                        'metrics': 'nic_rx, used_mem_kb',
+                        'window': '300'}
+        mock_get.return_value = '{}'
+
+        guest.guest_get_history(self.req)
+        mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST,
+                                         ['nic_rx', 'used_mem_kb'], 300)
+
+    @mock.patch.object(guest.VMHandler, 'inspect_archive')
+    def test_guest_get_archive(self, mock_get):
+        self.req.GET = {'userid': FAKE_USERID_LIST_STR,
+                        'start': '1538352000'}
+        mock_get.return_value = '{}'
+
+        guest.guest_get_archive(self.req)
+        mock_get.assert_called_once_with(self.req, FAKE_USERID_LIST,
+                                         1538352000, None)
+
     def mock_get_userid_vdev(self, env, param):
         if param == 'userid':
             return FAKE_USERID
@@ -0,0 +1,79 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import mock
+import unittest
+import webob
+
+from zvmsdk import config
+from zvmsdk import exception
+from zvmsdk.sdkwsgi.handlers import metrics
+
+
+class HandlersMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.action = metrics.MetricsAction()
+        self.action.client = mock.Mock()
+        patcher = mock.patch.object(metrics, 'get_action',
+                                    return_value=self.action)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self):
+        req = webob.Request.blank('/metrics')
+        req.environ['wsgiorg.routing_args'] = ((), {})
+        return req.get_response(metrics.metrics_get)
+
+    def test_metrics_get(self):
+        self.action.client.send_request.return_value = {
+            'overallRC': 0, 'rc': 0, 'rs': 0, 'modID': None, 'errmsg': '',
+            'output': 'zvm_host_info 1\n'}
+        resp = self._request()
+        self.action.client.send_request.assert_called_once_with(
+            'metrics_get')
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual('text/plain; version=0.0.4; charset=utf-8',
+                         resp.headers['Content-Type'])
+        self.assertEqual(b'zvm_host_info 1\n', resp.body)
+
+    def test_metrics_get_failed(self):
+        info = {'overallRC': 4, 'rc': 4, 'rs': 1, 'modID': None,
+                'errmsg': 'failed', 'output': ''}
+        self.action.client.send_request.return_value = info
+        resp = self._request()
+        self.assertEqual(500, resp.status_int)
+        self.assertEqual('application/json', resp.content_type)
+        self.assertEqual(info, json.loads(resp.body.decode('utf-8')))
+
+    def _set_wsgi_conf(self, opt, value):
+        old = getattr(config.CONF.wsgi, opt)
+        setattr(config.CONF.wsgi, opt, value)
+        self.addCleanup(setattr, config.CONF.wsgi, opt, old)
+
+    def test_metrics_get_token_needed(self):
+        self._set_wsgi_conf('auth', 'auth')
+        self.assertRaises(exception.ZVMUnauthorized, self._request)
+        self.action.client.send_request.assert_not_called()
+
+    def test_metrics_get_token_not_needed(self):
+        self._set_wsgi_conf('auth', 'auth')
+        self._set_wsgi_conf('metrics_auth', 'none')
+        self.action.client.send_request.return_value = {
+            'overallRC': 0, 'rc': 0, 'rs': 0, 'modID': None, 'errmsg': '',
+            'output': 'zvm_host_info 1\n'}
+        resp = self._request()
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(b'zvm_host_info 1\n', resp.body)
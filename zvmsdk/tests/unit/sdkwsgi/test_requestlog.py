@@ -0,0 +1,121 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+import webob
+import wsgiref.util
+
+from zvmconnector import socketclient
+from zvmsdk.sdkwsgi.handlers import file as handlers_file
+from zvmsdk.sdkwsgi import requestlog
+from zvmsdk import tracing
+
+
+class RequestLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.seen = {}
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        @webob.dec.wsgify
+        def app(req):
+            self.seen['request_id'] = tracing.get_request_id()
+            self.seen['client_id'] = getattr(socketclient._TRACE,
+                                             'request_id', None)
+            socketclient._add_timings({'api': 0.02, 'smcli': 0.01})
+            return webob.Response(body=b'ok')
+
+        self.app = requestlog.RequestLog(app)
+
+    def test_request_id_from_header(self):
+        req = webob.Request.blank('/guests', remote_addr='10.0.0.1',
+                                  headers={'X-Request-Id': 'client-1'})
+        resp = req.get_response(self.app)
+        self.assertEqual('client-1', resp.headers['X-Request-Id'])
+        self.assertEqual('client-1', self.seen['request_id'])
+        self.assertEqual('client-1', self.seen['client_id'])
+        timing = resp.headers['Server-Timing']
+        self.assertIn('api;dur=20.0', timing)
+        self.assertIn('smcli;dur=10.0', timing)
+        self.assertIn('wsgi;dur=', timing)
+        # the context is cleared once the response body is sent
+        self.assertEqual(b'ok', resp.body)
+        self.assertIsNone(tracing.get_request_id())
+        self.assertIsNone(socketclient._TRACE.request_id)
+
+    def test_request_id_generated(self):
+        req = webob.Request.blank('/guests', remote_addr='10.0.0.1')
+        resp = req.get_response(self.app)
+        self.assertTrue(resp.headers['X-Request-Id'].startswith('req-'))
+        self.assertEqual(resp.headers['X-Request-Id'],
+                         self.seen['request_id'])
+        self.assertEqual(b'ok', resp.body)
+        self.assertIsNone(tracing.get_request_id())
+
+    def test_context_cleared_on_close(self):
+        seen = []
+
+        def body():
+            seen.append(tracing.get_request_id())
+            yield b'ok'
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return body()
+
+        environ = webob.Request.blank(
+            '/guests', remote_addr='10.0.0.1',
+            headers={'X-Request-Id': 'client-2'}).environ
+        app_iter = requestlog.RequestLog(app)(environ, mock.Mock())
+        self.assertEqual('client-2', tracing.get_request_id())
+        self.assertEqual([b'ok'], list(app_iter))
+        self.assertEqual(['client-2'], seen)
+        self.assertEqual('client-2', socketclient._TRACE.request_id)
+        app_iter.close()
+        self.assertIsNone(tracing.get_request_id())
+        self.assertIsNone(socketclient._TRACE.request_id)
+
+    def test_context_cleared_on_error(self):
+        def app(environ, start_response):
+            raise ValueError()
+
+        environ = webob.Request.blank('/guests',
+                                      remote_addr='10.0.0.1').environ
+        self.assertRaises(ValueError, requestlog.RequestLog(app), environ,
+                          mock.Mock())
+        self.assertIsNone(tracing.get_request_id())
+
+    def test_file_wrapper_not_wrapped(self):
+        fpath = os.path.join(self.tmpdir, 'exported')
+        with open(fpath, 'wb') as f:
+            f.write(b'0123456789')
+        req = webob.Request.blank(
+            '/files', method='POST', remote_addr='10.0.0.1',
+            environ={'wsgi.file_wrapper': wsgiref.util.FileWrapper})
+        req.body = json.dumps({'source_file': fpath}).encode('utf-8')
+        start_response = mock.Mock()
+        app = requestlog.RequestLog(handlers_file.file_export)
+        app_iter = app(req.environ, start_response)
+        try:
+            self.assertIsInstance(app_iter, wsgiref.util.FileWrapper)
+            self.assertEqual('200 OK', start_response.call_args[0][0])
+            self.assertIsNone(tracing.get_request_id())
+        finally:
+            app_iter.close()
@@ -12,6 +12,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+import threading
+import time
 import unittest
 
 from zvmsdk.sdkwsgi import util
@@ -57,3 +60,82 @@ class SDKWsgiUtilsTestCase(unittest.TestCase):
         ret = util.get_http_code_from_sdk_return(msg,
             additional_handler=util.handle_already_exists)
         self.assertEqual(500, ret)
+
+
+class AdmissionQueueTestCase(unittest.TestCase):
+
+    def test_acquire_immediately(self):
+        queue = util.AdmissionQueue(2, max_waiting=1, timeout=1)
+        self.assertEqual((True, 0), queue.acquire())
+        self.assertEqual((True, 0), queue.acquire())
+        self.assertEqual(2, queue.stats()['active'])
+        queue.release()
+        queue.release()
+        self.assertEqual(0, queue.stats()['active'])
+
+    def test_acquire_queue_full(self):
+        queue = util.AdmissionQueue(1, max_waiting=0, timeout=1)
+        self.assertEqual((True, 0), queue.acquire())
+        self.assertEqual((False, None), queue.acquire())
+
+    def test_acquire_timeout(self):
+        queue = util.AdmissionQueue(1, max_waiting=1, timeout=0.01)
+        self.assertEqual((True, 0), queue.acquire())
+        self.assertEqual((False, 1), queue.acquire())
+        self.assertEqual(0, queue.stats()['waiting'])
+
+    def test_acquire_no_timeout(self):
+        queue = util.AdmissionQueue(1, max_waiting=1, timeout=0)
+        self.assertEqual((True, 0), queue.acquire())
+        admitted = []
+        t = threading.Thread(target=lambda: admitted.append(queue.acquire()))
+        t.start()
+        while queue.stats()['waiting'] < 1:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        self.assertEqual([], admitted)
+        queue.release()
+        t.join()
+        self.assertEqual([(True, 1)], admitted)
+
+    def test_release_too_many_times(self):
+        queue = util.AdmissionQueue(1)
+        self.assertRaises(ValueError, queue.release)
+
+    def test_acquire_by_priority_then_fifo(self):
+        queue = util.AdmissionQueue(1, max_waiting=3, timeout=10)
+        queue.acquire()
+        admitted = []
+
+        def _waiter(name, priority):
+            queue.acquire(priority=priority)
+            admitted.append(name)
+            queue.release()
+
+        threads = []
+        for name, priority in (('low1', 0), ('low2', 0), ('high', 5)):
+            t = threading.Thread(target=_waiter, args=(name, priority))
+            t.start()
+            threads.append(t)
+            while queue.stats()['waiting'] < len(threads):
+                time.sleep(0.001)
+
+        queue.release()
+        for t in threads:
+            t.join()
+        self.assertEqual(['high', 'low1', 'low2'], admitted)
+
+
+class WsgiThreadsTestCase(unittest.TestCase):
+
+    def test_cap_queue_waiters(self):
+        fake_uwsgi = mock.Mock(opt={'threads': b'32'})
+        with mock.patch.dict('sys.modules', uwsgi=fake_uwsgi):
+            self.assertEqual(32, util.get_wsgi_threads())
+            self.assertEqual(8, util.cap_queue_waiters(100))
+            self.assertEqual(4, util.cap_queue_waiters(4))
+
+    def test_cap_queue_waiters_not_uwsgi(self):
+        with mock.patch.dict('sys.modules', uwsgi=None):
+            self.assertIsNone(util.get_wsgi_threads())
+            self.assertEqual(100, util.cap_queue_waiters(100))
@@ -151,6 +151,41 @@ class SDKAPITestCase(base.SDKTestCase):
         self.api.guest_inspect_stats(self.userid)
         inspect_stats.assert_called_once_with([self.userid])
 
+    @mock.patch("zvmsdk.vmops.VMOps.get_power_state_list")
+    def test_guest_get_power_state_list(self, get_power_state_list):
+        self.api.guest_get_power_state_list(['userid1', 'userid2'])
+        get_power_state_list.assert_called_once_with(['USERID1', 'USERID2'])
+
+    @mock.patch("zvmsdk.vmops.VMOps.get_power_state_list")
+    def test_guest_get_power_state_list_single(self, get_power_state_list):
+        self.api.guest_get_power_state_list('userid1')
+        get_power_state_list.assert_called_once_with(['USERID1'])
+
+    @mock.patch("zvmsdk.monitor.ZVMMonitor.inspect_history")
+    def test_guest_inspect_history(self, inspect_history):
+        self.api.guest_inspect_history(self.userid, metrics=['nic_rx'],
+                                       window=300)
+        inspect_history.assert_called_once_with([self.userid],
+                                                metrics=['nic_rx'],
+                                                window=300)
+
+    @mock.patch("zvmsdk.monitor.ZVMMonitor.inspect_archive")
+    def test_guest_inspect_archive(self, inspect_archive):
+        self.api.guest_inspect_archive(self.userid, start=1538352000)
+        inspect_archive.assert_called_once_with([self.userid],
+                                                start=1538352000, end=None)
+
+    @mock.patch("zvmsdk.metrics.generate")
+    def test_metrics_get(self, generate):
+        generate.return_value = 'zvm_host_info 1\n'
+        self.assertEqual('zvm_host_info 1\n', self.api.metrics_get())
+        generate.assert_called_once_with()
+
+    @mock.patch("zvmsdk.monitor.GuestStateWatcher.get_events")
+    def test_guest_get_events(self, get_events):
+        self.api.guest_get_events(last_event_id=10, timeout=5)
+        get_events.assert_called_once_with(10, 5)
+
     @mock.patch("zvmsdk.monitor.ZVMMonitor.inspect_vnics")
     def test_guest_inspect_vnics_list(self, inspect_vnics):
         self.api.guest_inspect_vnics(self.userid_list)
@@ -161,6 +196,11 @@ class SDKAPITestCase(base.SDKTestCase):
         self.api.guest_inspect_vnics(self.userid)
         inspect_vnics.assert_called_once_with([self.userid])
 
+    @mock.patch("zvmsdk.monitor.ZVMMonitor.inspect_vnics_delta")
+    def test_guest_inspect_vnics_delta(self, inspect_vnics_delta):
+        self.api.guest_inspect_vnics_delta(self.userid)
+        inspect_vnics_delta.assert_called_once_with([self.userid])
+
     @mock.patch("zvmsdk.vmops.VMOps.guest_stop")
     def test_guest_stop(self, gs):
         self.api.guest_stop(self.userid)
@@ -278,12 +318,13 @@ class SDKAPITestCase(base.SDKTestCase):
         self.api.volume_detach(connection_info)
         mock_detach.assert_called_once_with(connection_info)
 
+    @mock.patch("zvmsdk.monitor.NamelistMirror.add")
     @mock.patch("zvmsdk.utils.check_userid_exist")
     @mock.patch("zvmsdk.vmops.VMOps.get_definition_info")
     @mock.patch("zvmsdk.database.GuestDbOperator.add_guest_registered")
     @mock.patch("zvmsdk.database.NetworkDbOperator.switch_add_record")
     def test_guest_register(self, networkdb_add, guestdb_reg,
-                              get_def_info, chk_usr):
+                              get_def_info, chk_usr, namelist_add):
         networkdb_add.return_value = ''
         guestdb_reg.return_value = ''
         info = {}
@@ -314,6 +355,7 @@ class SDKAPITestCase(base.SDKTestCase):
         guestdb_reg.assert_called_once_with(self.userid, 'rhel7', '1')
         get_def_info.assert_called_once_with(self.userid)
         chk_usr.assert_called_once_with(self.userid)
+        namelist_add.assert_called_once_with(self.userid)
 
     @mock.patch("zvmsdk.utils.check_userid_exist")
     @mock.patch("zvmsdk.vmops.VMOps.get_definition_info")
@@ -345,11 +387,13 @@ class SDKAPITestCase(base.SDKTestCase):
                           self.api.guest_register,
                           self.userid, meta_data, net_set, port_macs)
 
+    @mock.patch("zvmsdk.monitor.NamelistMirror.remove")
     @mock.patch("zvmsdk.utils.check_userid_exist")
     @mock.patch("zvmsdk.database.NetworkDbOperator."
                 "switch_delete_record_for_userid")
     @mock.patch("zvmsdk.database.GuestDbOperator.delete_guest_by_userid")
-    def test_guest_deregister(self, guestdb_del, networkdb_del, chk_usr):
+    def test_guest_deregister(self, guestdb_del, networkdb_del, chk_usr,
+                              namelist_remove):
         guestdb_del.return_value = ''
         networkdb_del.return_value = ''
         chk_usr.return_value = True
@@ -357,3 +401,4 @@ class SDKAPITestCase(base.SDKTestCase):
         guestdb_del.assert_called_once_with(self.userid)
         networkdb_del.assert_called_once_with(self.userid)
         chk_usr.assert_called_once_with(self.userid)
+        namelist_remove.assert_called_once_with(self.userid)
@@ -0,0 +1,159 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import os
+import shutil
+import tempfile
+
+from zvmsdk import archive
+from zvmsdk import perfdata
+from zvmsdk.tests.unit import base
+
+
+# 2018-10-01 00:00:00 UTC
+DAY1 = 1538352000
+
+CPUMEM_RESPONSE = [
+    'Guest name: USERID1',
+    'Guest CPUs: 1',
+    'Used CPU time: "6185838 uS"',
+    'Elapsed time: "35232895 uS"',
+    'Minimum CPU count: 2',
+    'Max CPU limit: 10000',
+    'Samples CPU in use: 0',
+    'Samples CPU delay: 0',
+    'Used memory: "290232 KB"',
+    'Max memory: "2097152 KB"',
+    'Minimum memory: "0 KB"',
+    'Shared memory: "5222192 KB"',
+    '',
+    'Guest name: USERID2',
+    'Guest CPUs: 3',
+    'Used CPU time: "14293629 uS"',
+    'Elapsed time: "4868976371 uS"',
+    'Minimum CPU count: 3',
+    'Max CPU limit: 10000',
+    'Samples CPU in use: 0',
+    'Samples CPU delay: 0',
+    'Used memory: "305020 KB"',
+    'Max memory: "2097152 KB"',
+    'Minimum memory: "0 KB"',
+    'Shared memory: "5222190 KB"',
+    ]
+
+
+class MeteringArchiveTestCase(base.SDKTestCase):
+
+    def setUp(self):
+        super(MeteringArchiveTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.archive = archive.MeteringArchive(self.path)
+        self.data = perfdata.parse_performance_data(CPUMEM_RESPONSE)
+
+    def _files(self):
+        return sorted(os.listdir(self.path))
+
+    def test_append_query(self):
+        self.assertEqual(2, self.archive.append(self.data, DAY1 + 60))
+        self.archive.append(self.data, DAY1 + 120)
+        self.archive.append(self.data, DAY1 + 86400 + 60)
+        self.assertEqual(['cpumem-20181001.arc', 'cpumem-20181002.arc'],
+                         self._files())
+        self.assertEqual(16 + 2 * 2 * 104, os.path.getsize(
+            os.path.join(self.path, 'cpumem-20181001.arc')))
+
+        result = self.archive.query(start=DAY1)
+        self.assertEqual(['USERID1', 'USERID2'], sorted(result))
+        self.assertEqual([DAY1 + 60, DAY1 + 120, DAY1 + 86400 + 60],
+                         [s['timestamp'] for s in result['USERID1']])
+        sample = dict(self.data['USERID2'].stats(), timestamp=DAY1 + 60)
+        self.assertEqual(sample, result['USERID2'][0])
+
+        result = self.archive.query(['userid1'], start=DAY1 + 61,
+                                    end=DAY1 + 86400 + 60)
+        self.assertEqual(['userid1'], list(result))
+        self.assertEqual([DAY1 + 120, DAY1 + 86400 + 60],
+                         [s['timestamp'] for s in result['userid1']])
+        self.assertEqual({}, self.archive.query(['USERID1'],
+                                                start=DAY1 + 121,
+                                                end=DAY1 + 86400))
+
+    @mock.patch.object(archive.time, 'time')
+    def test_query_default_start(self, time):
+        self.archive.append(self.data, DAY1 + 60)
+        self.archive.append(self.data, DAY1 + 86400 + 60)
+        time.return_value = DAY1 + 86400 + 120
+        result = self.archive.query(['USERID1'])
+        self.assertEqual([DAY1 + 86400 + 60],
+                         [s['timestamp'] for s in result['USERID1']])
+
+        result = self.archive.query(['USERID1'], end=DAY1 + 120)
+        self.assertEqual([DAY1 + 60],
+                         [s['timestamp'] for s in result['USERID1']])
+
+    def test_query_max_samples(self):
+        self.addCleanup(base.set_conf, 'monitor',
+                        'archive_query_max_samples',
+                        archive.CONF.monitor.archive_query_max_samples)
+        base.set_conf('monitor', 'archive_query_max_samples', 3)
+        for i in range(3):
+            self.archive.append(self.data, DAY1 + 60 * i + 0.5)
+        self.archive.append(self.data, DAY1 + 86400)
+
+        # the samples of the last second are all returned
+        result = self.archive.query(start=DAY1)
+        self.assertEqual([DAY1 + 0.5, DAY1 + 60.5],
+                         [s['timestamp'] for s in result['USERID1']])
+        self.assertEqual([DAY1 + 0.5, DAY1 + 60.5],
+                         [s['timestamp'] for s in result['USERID2']])
+
+        result = self.archive.query(start=DAY1 + 61)
+        self.assertEqual([DAY1 + 120.5, DAY1 + 86400],
+                         [s['timestamp'] for s in result['USERID1']])
+
+    def test_append_invalid_record(self):
+        data = {'USERID1': self.data['USERID1'],
+                'USERID3': {'userid': 'USERID3', 'guest_cpus': 'x'}}
+        self.assertEqual(1, self.archive.append(data, DAY1))
+        self.assertEqual(['USERID1'], list(self.archive.query(start=DAY1)))
+
+    def test_append_after_partial_record(self):
+        self.archive.append(self.data, DAY1)
+        path = os.path.join(self.path, 'cpumem-20181001.arc')
+        with open(path, 'ab') as f:
+            f.write(b'USER')
+        self.archive.append(self.data, DAY1 + 60)
+        self.assertEqual(16 + 4 * 104, os.path.getsize(path))
+        self.assertEqual(2, len(self.archive.query(start=DAY1)['USERID2']))
+
+    def test_query_unknown_format(self):
+        with open(os.path.join(self.path, 'cpumem-20181001.arc'), 'wb') as f:
+            f.write(b'\0' * 200)
+        self.assertEqual({}, self.archive.query(start=DAY1))
+
+    def test_prune(self):
+        self.addCleanup(base.set_conf, 'monitor', 'archive_retention_days',
+                        archive.CONF.monitor.archive_retention_days)
+        base.set_conf('monitor', 'archive_retention_days', 2)
+        for day in range(3):
+            self.archive.append(self.data, DAY1 + day * 86400)
+        # The file of the first day is removed with the file of the third
+        self.assertEqual(['cpumem-20181002.arc', 'cpumem-20181003.arc'],
+                         self._files())
+
+        base.set_conf('monitor', 'archive_retention_days', 0)
+        self.archive.append(self.data, DAY1 + 10 * 86400)
+        self.assertEqual(3, len(self._files()))
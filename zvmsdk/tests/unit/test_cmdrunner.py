@@ -0,0 +1,176 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import six
+import subprocess
+import sys
+import time
+import unittest
+
+from zvmsdk import cmdrunner
+from zvmsdk.tests.unit import base
+
+RUNNER_SUPPORTED = sys.version_info >= (3, 8)
+if RUNNER_SUPPORTED:
+    from zvmsdk import cmdrunner_async
+
+
+@unittest.skipUnless(RUNNER_SUPPORTED,
+                     'the command runner requires Python 3.8')
+class CommandRunnerTestCase(base.SDKTestCase):
+
+    def setUp(self):
+        super(CommandRunnerTestCase, self).setUp()
+        self.runner = cmdrunner_async.CommandRunner(2)
+
+    def _wait_stats(self, name, value):
+        deadline = time.time() + 10
+        while self.runner.get_stats()[name] != value:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_check_output(self):
+        cmd = ['sh', '-c', 'echo out; echo err >&2']
+        output = self.runner.check_output(cmd, stderr=subprocess.STDOUT)
+        self.assertEqual(b'out\nerr\n', output)
+        stats = self.runner.get_stats()
+        self.assertEqual(1, stats['commands_total'])
+        self.assertEqual(0, stats['commands_running'])
+        self.assertEqual(2, stats['command_limit'])
+
+    def test_check_output_failed(self):
+        cmd = ['sh', '-c', 'echo failed; exit 3']
+        try:
+            self.runner.check_output(cmd)
+        except subprocess.CalledProcessError as err:
+            self.assertEqual(3, err.returncode)
+            self.assertEqual(cmd, err.cmd)
+            self.assertEqual(b'failed\n', err.output)
+        else:
+            self.fail('CalledProcessError not raised')
+
+    def test_check_output_timeout(self):
+        start = time.time()
+        self.assertRaises(cmdrunner.CommandTimeoutError,
+                          self.runner.check_output, ['sleep', '30'],
+                          timeout=0.2)
+        self.assertLess(time.time() - start, 10)
+        stats = self.runner.get_stats()
+        self.assertEqual(1, stats['command_timeouts_total'])
+        self.assertEqual(0, stats['commands_running'])
+
+    def test_submit_cancel(self):
+        future = self.runner.submit(['sleep', '30'])
+        self._wait_stats('commands_running', 1)
+        future.cancel()
+        self._wait_stats('command_cancels_total', 1)
+        self._wait_stats('commands_running', 0)
+
+    def test_concurrency_bound(self):
+        futures = [self.runner.submit(['sleep', '0.3']) for i in range(3)]
+        self._wait_stats('commands_running', 2)
+        self._wait_stats('commands_waiting', 1)
+        for future in futures:
+            self.assertEqual((0, b''), future.result())
+        stats = self.runner.get_stats()
+        self.assertEqual(3, stats['commands_total'])
+        self.assertEqual(0, stats['commands_waiting'])
+
+
+class CheckOutputTestCase(base.SDKTestCase):
+
+    def setUp(self):
+        super(CheckOutputTestCase, self).setUp()
+        self.addCleanup(base.set_conf, 'zvm', 'max_concurrent_commands',
+                        base.CONF.zvm.max_concurrent_commands)
+        self.addCleanup(base.set_conf, 'zvm', 'command_timeout',
+                        base.CONF.zvm.command_timeout)
+        base.set_conf('zvm', 'max_concurrent_commands', 0)
+        base.set_conf('zvm', 'command_timeout', 0)
+
+    @mock.patch.object(subprocess, 'check_output')
+    def test_check_output_no_runner(self, check_output):
+        check_output.return_value = b'out'
+        self.assertIsNone(cmdrunner.get_runner())
+        self.assertEqual(b'out', cmdrunner.check_output(['ls']))
+        check_output.assert_called_once_with(['ls'], close_fds=True)
+
+    def test_check_output_with_timer(self):
+        self.assertEqual(b'out\n', cmdrunner._check_output_with_timer(
+            ['sh', '-c', 'echo out'], 5))
+        self.assertRaises(subprocess.CalledProcessError,
+                          cmdrunner._check_output_with_timer,
+                          ['sh', '-c', 'exit 3'], 5)
+        start = time.time()
+        self.assertRaises(cmdrunner.CommandTimeoutError,
+                          cmdrunner._check_output_with_timer,
+                          ['sleep', '30'], 0.2)
+        self.assertLess(time.time() - start, 10)
+
+    @mock.patch.object(cmdrunner.sys, 'version_info', (3, 7, 16))
+    @mock.patch.object(cmdrunner, '_RUNNER', None)
+    def test_get_runner_unsupported(self):
+        base.set_conf('zvm', 'max_concurrent_commands', 8)
+        self.assertIsNone(cmdrunner.get_runner())
+
+    @mock.patch.object(cmdrunner.sys, 'version_info', (2, 7, 18))
+    @mock.patch.object(six, 'PY3', False)
+    @mock.patch.object(cmdrunner, '_check_output_with_timer')
+    def test_check_output_py2(self, check_output_with_timer):
+        base.set_conf('zvm', 'max_concurrent_commands', 8)
+        base.set_conf('zvm', 'command_timeout', 5)
+        check_output_with_timer.return_value = b'out'
+        self.assertIsNone(cmdrunner.get_runner())
+        self.assertEqual(b'out', cmdrunner.check_output(
+            ['ls'], stderr=subprocess.STDOUT))
+        check_output_with_timer.assert_called_once_with(
+            ['ls'], 5, stderr=subprocess.STDOUT)
+
+    @unittest.skipUnless(six.PY3, 'subprocess has no timeout on Python 2')
+    @mock.patch.object(subprocess, 'check_output')
+    def test_check_output_no_runner_timeout(self, check_output):
+        base.set_conf('zvm', 'command_timeout', 5)
+        check_output.side_effect = subprocess.TimeoutExpired(['ls'], 5)
+        self.assertRaises(cmdrunner.CommandTimeoutError,
+                          cmdrunner.check_output, ['ls'],
+                          stderr=subprocess.STDOUT)
+        check_output.assert_called_once_with(['ls'], close_fds=True,
+                                             timeout=5,
+                                             stderr=subprocess.STDOUT)
+
+    @unittest.skipUnless(RUNNER_SUPPORTED,
+                         'the command runner requires Python 3.8')
+    @mock.patch.object(cmdrunner, '_RUNNER', None)
+    def test_check_output_runner_command(self):
+        base.set_conf('zvm', 'max_concurrent_commands', 2)
+        base.set_conf('zvm', 'command_timeout', 60)
+        self.assertIsNotNone(cmdrunner.get_runner())
+        self.assertEqual(b'out\n', cmdrunner.check_output(['echo', 'out']))
+        self.assertRaises(subprocess.CalledProcessError,
+                          cmdrunner.check_output, ['false'])
+
+    @unittest.skipUnless(RUNNER_SUPPORTED,
+                         'the command runner requires Python 3.8')
+    @mock.patch.object(cmdrunner, '_RUNNER', None)
+    @mock.patch('zvmsdk.cmdrunner_async.CommandRunner.check_output')
+    def test_check_output_runner(self, check_output):
+        base.set_conf('zvm', 'max_concurrent_commands', 8)
+        base.set_conf('zvm', 'command_timeout', 60)
+        check_output.return_value = b'out'
+        self.assertEqual(b'out', cmdrunner.check_output(['ls']))
+        check_output.assert_called_once_with(['ls'], stderr=None, timeout=60)
+        runner = cmdrunner.get_runner()
+        self.assertEqual(8, runner.max_concurrency)
+        self.assertIs(runner, cmdrunner.get_runner())
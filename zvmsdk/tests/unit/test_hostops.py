@@ -23,7 +23,8 @@ CONF = config.CONF
 
 class SDKHostOpsTestCase(base.SDKTestCase):
     def setUp(self):
-        self._hostops = hostops.get_hostops()
+        self._hostops = hostops.HOSTOps()
+        self._hostops._start_refresher = mock.Mock()
 
     @mock.patch("zvmsdk.hostops.HOSTOps.diskpool_get_info")
     @mock.patch("zvmsdk.smtclient.SMTClient.get_host_info")
@@ -57,6 +58,70 @@ class SDKHostOpsTestCase(base.SDKTestCase):
         self.assertEqual(host_info['hypervisor_version'], 610)
         self.assertEqual(host_info['disk_total'], 406105)
 
+    def _mock_query_info(self):
+        self._hostops._query_info = mock.Mock()
+        self._hostops._query_info.return_value = {
+            'zcc_userid': 'FAKEUSER', 'zvm_host': 'FAKENODE',
+            'cpu_info': {'architecture': 's390x', 'cec_model': '2097'},
+            'hypervisor_type': 'zvm', 'hypervisor_version': 610,
+            'hypervisor_hostname': 'fakenode',
+            'ipl_time': 'IPL at 03/13/14 21:43:12 EDT',
+            'vcpus': 10, 'vcpus_used': 10,
+            'memory_mb': 16384.0, 'memory_mb_used': 8192.0,
+            'disk_total': 406105, 'disk_used': 367263,
+            'disk_available': 38843}
+        return self._hostops._query_info
+
+    @mock.patch("zvmsdk.hostops.time.time")
+    def test_get_info_cached(self, time):
+        query_info = self._mock_query_info()
+        time.return_value = 1000
+        host_info = self._hostops.get_info()
+        host_info['cpu_info']['cec_model'] = 'changed'
+        time.return_value = 1000 + 3 * CONF.zvm.host_info_refresh_interval
+        self.assertEqual(query_info.return_value, self._hostops.get_info())
+        query_info.assert_called_once_with()
+        self._hostops._start_refresher.assert_called_with()
+
+        # The refreshes failed, the info is queried again
+        time.return_value += 1
+        self._hostops.get_info()
+        self.assertEqual(2, query_info.call_count)
+
+    def test_get_info_not_cached(self):
+        self.addCleanup(base.set_conf, 'zvm', 'host_info_refresh_interval',
+                        CONF.zvm.host_info_refresh_interval)
+        base.set_conf('zvm', 'host_info_refresh_interval', 0)
+        query_info = self._mock_query_info()
+        self._hostops.get_info()
+        self._hostops.get_info()
+        self.assertEqual(2, query_info.call_count)
+        self._hostops._start_refresher.assert_not_called()
+
+    def test_refresh(self):
+        query_info = self._mock_query_info()
+        info = dict(query_info.return_value)
+        self._hostops.refresh()
+        query_info.return_value = dict(info, memory_mb_used=10240.0,
+                                       disk_available=30000)
+        host_info = self._hostops.refresh()
+        self.assertEqual(query_info.return_value, host_info)
+        self.assertEqual(query_info.return_value, self._hostops.get_info())
+        self.assertEqual(2, query_info.call_count)
+
+    @mock.patch("zvmsdk.hostops.time.sleep")
+    def test_run_refresher_waits_for_query(self, sleep):
+        # The refresher does not query the info while a get_info caller
+        # is querying it
+        sleep.side_effect = [None, SystemExit]
+        refresh = mock.Mock(
+            side_effect=lambda: self.assertTrue(
+                self._hostops._load_lock.locked()))
+        self._hostops.refresh = refresh
+        self.assertRaises(SystemExit, self._hostops._run_refresher)
+        refresh.assert_called_once_with()
+        self.assertFalse(self._hostops._load_lock.locked())
+
     @mock.patch("zvmsdk.smtclient.SMTClient.get_diskpool_info")
     def test_get_diskpool_info(self, get_diskpool_info):
         get_diskpool_info.return_value = {
@@ -0,0 +1,162 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from zvmsdk import exception
+from zvmsdk import metrics
+from zvmsdk.tests.unit import base
+
+
+CPUMEM_DATA = {
+    'USERID1': {
+        'userid': 'USERID1',
+        'guest_cpus': '2',
+        'used_cpu_time': '6185838 uS',
+        'elapsed_cpu_time': '35232895 uS',
+        'min_cpu_count': '2',
+        'max_cpu_limit': '10000',
+        'samples_cpu_in_use': '3',
+        'samples_cpu_delay': '1',
+        'used_memory': '290232 KB',
+        'max_memory': '2097152 KB',
+        'min_memory': '0 KB',
+        'shared_memory': '5222192 KB',
+        },
+    }
+
+VNICS_DATA = {
+    'USERID1': [
+        {'vswitch_name': 'TESTVSW1', 'nic_vdev': '0600',
+         'nic_rx': 103024058, 'nic_tx': 102030890,
+         'nic_fr_rx': 573952, 'nic_fr_tx': 548780,
+         'nic_fr_rx_dsc': 0, 'nic_fr_tx_dsc': 0,
+         'nic_fr_rx_err': 0, 'nic_fr_tx_err': 4},
+        ],
+    }
+
+HOST_INFO = {
+    'vcpus': 6, 'vcpus_used': 6, 'memory_mb': 51200.0,
+    'memory_mb_used': 1024.0, 'hypervisor_type': 'zvm',
+    'hypervisor_version': 640, 'hypervisor_hostname': 'TESTHOST',
+    'cpu_info': {'cec_model': '2817', 'architecture': 's390x'},
+    'zvm_host': 'TESTHOST', 'ipl_time': 'IPL at 11/14/17 10:47:44 EST',
+    'disk_total': 406105, 'disk_used': 367263, 'disk_available': 38842,
+    }
+
+
+class RenderTestCase(base.SDKTestCase):
+
+    def test_render(self):
+        family = metrics.MetricFamily('zvm_test', 'gauge', 'A "test".\n')
+        family.add(1.5, userid='USERID1', path='c:\\"x"')
+        family.add(2.0)
+        empty = metrics.MetricFamily('zvm_empty', 'gauge', 'Empty.')
+        self.assertEqual('# HELP zvm_test A "test".\\n\n'
+                         '# TYPE zvm_test gauge\n'
+                         'zvm_test{path="c:\\\\\\"x\\"",userid="USERID1"} '
+                         '1.5\n'
+                         'zvm_test 2\n',
+                         metrics.render([family, empty]))
+
+    def test_request_stats(self):
+        stats = metrics.RequestStats(buckets=(0.1, 1))
+        stats.observe('guest_list', 0.05, queued=0.5)
+        stats.observe('guest_list', 0.5, failed=True, queued=0.25)
+        text = metrics.render(stats.collect())
+        self.assertIn('zvm_sdk_request_duration_seconds_bucket'
+                      '{api="guest_list",le="0.1"} 1\n', text)
+        self.assertIn('zvm_sdk_request_duration_seconds_bucket'
+                      '{api="guest_list",le="1"} 2\n', text)
+        self.assertIn('zvm_sdk_request_duration_seconds_bucket'
+                      '{api="guest_list",le="+Inf"} 2\n', text)
+        self.assertIn('zvm_sdk_request_duration_seconds_sum'
+                      '{api="guest_list"} 0.55\n', text)
+        self.assertIn('zvm_sdk_request_duration_seconds_count'
+                      '{api="guest_list"} 2\n', text)
+        self.assertIn('zvm_sdk_request_errors_total{api="guest_list"} 1\n',
+                      text)
+        self.assertIn('zvm_sdk_request_queue_wait_seconds_total 0.75\n',
+                      text)
+
+
+class CollectTestCase(base.SDKTestCase):
+
+    def setUp(self):
+        super(CollectTestCase, self).setUp()
+        self.monitor = mock.Mock()
+        self.monitor.get_metering_data.side_effect = lambda type: {
+            'cpumem': (CPUMEM_DATA, 12.0),
+            'vnics': (VNICS_DATA, 3.0)}[type]
+        self.monitor.get_cache_stats.return_value = {
+            'cpumem': {'hits_total': 5, 'entries': 1},
+            'vnics': {'hits_total': 2, 'entries': 1}}
+        self.hostops = mock.Mock()
+        self.hostops.get_info.return_value = HOST_INFO
+        self.smtclient = mock.Mock()
+        self.smtclient.get_smt_metrics.return_value = {
+            'requests_total': 7, 'requests_running': 1}
+        for target, value in (('zvmsdk.monitor.get_monitor', self.monitor),
+                              ('zvmsdk.hostops.get_hostops', self.hostops),
+                              ('zvmsdk.smtclient.get_smtclient',
+                               self.smtclient)):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(metrics, '_GAUGES', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_generate(self):
+        metrics.register_gauge('zvm_sdk_request_queue_depth',
+                               'API requests waiting.', lambda: 3)
+        text = metrics.generate()
+        self.assertIn('zvm_guest_cpumem_age_seconds 12\n', text)
+        self.assertIn('zvm_guest_cpus{userid="USERID1"} 2\n', text)
+        self.assertIn('# TYPE zvm_guest_cpu_used_seconds_total counter\n',
+                      text)
+        self.assertIn('zvm_guest_cpu_used_seconds_total{userid="USERID1"} '
+                      '6.185838\n', text)
+        self.assertIn('zvm_guest_memory_used_bytes{userid="USERID1"} '
+                      '297197568\n', text)
+        self.assertIn('zvm_guest_nic_transmit_errors_total{userid="USERID1",'
+                      'vdev="0600",vswitch="TESTVSW1"} 4\n', text)
+        self.assertIn('zvm_host_info{hypervisor_hostname="TESTHOST",'
+                      'hypervisor_version="640",zvm_host="TESTHOST"} 1\n',
+                      text)
+        self.assertIn('zvm_host_memory_bytes 53687091200\n', text)
+        self.assertIn('zvm_diskpool_available_bytes{pool="%s"} %d\n' %
+                      (base.CONF.zvm.disk_pool.split(':')[1],
+                       38842 * 1024 ** 3), text)
+        self.assertIn('zvm_sdk_request_queue_depth 3\n', text)
+        self.assertIn('# TYPE zvm_smt_requests_total counter\n', text)
+        self.assertIn('zvm_smt_requests_running 1\n', text)
+        self.assertIn('# TYPE zvm_metering_cache_hits_total counter\n'
+                      'zvm_metering_cache_hits_total{type="cpumem"} 5\n'
+                      'zvm_metering_cache_hits_total{type="vnics"} 2\n',
+                      text)
+        for source in ('cpumem', 'vnics', 'host', 'sdk'):
+            self.assertIn('zvm_scrape_error{source="%s"} 0\n' % source, text)
+        self.monitor.get_metering_data.assert_has_calls(
+            [mock.call('cpumem'), mock.call('vnics')])
+        self.assertEqual(2, self.monitor.get_metering_data.call_count)
+
+    def test_generate_source_failed(self):
+        self.hostops.get_info.side_effect = exception.SDKInternalError(
+            msg='failed')
+        text = metrics.generate()
+        self.assertIn('zvm_scrape_error{source="host"} 1\n', text)
+        self.assertIn('zvm_scrape_error{source="cpumem"} 0\n', text)
+        self.assertNotIn('zvm_host_info', text)
+        self.assertIn('zvm_guest_cpus{userid="USERID1"} 2\n', text)
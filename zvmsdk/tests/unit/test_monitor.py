@@ -13,7 +13,10 @@
 #    under the License.
 
 import mock
+import threading
+import time
 
+from zvmsdk import exception
 from zvmsdk import monitor
 from zvmsdk.tests.unit import base
 
@@ -143,10 +146,13 @@ INST_NICS_SAMPLE2 = [
 
 class SDKMonitorTestCase(base.SDKTestCase):
     def setUp(self):
+        patcher = mock.patch.object(monitor, '_NAMELIST_MIRROR', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
         self._monitor = monitor.ZVMMonitor()
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._cache_enabled")
     def test_private_get_inspect_data_cache_hit_single(self, cache_enabled,
                                                        get_ps, cache_get):
@@ -163,7 +169,7 @@ class SDKMonitorTestCase(base.SDKTestCase):
         cache_enabled.assert_not_called()
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._cache_enabled")
     def test_private_get_inspect_data_cache_hit_multi(self, cache_enabled,
                                                        get_ps, cache_get):
@@ -186,19 +192,19 @@ class SDKMonitorTestCase(base.SDKTestCase):
         cache_enabled.assert_not_called()
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._update_cpumem_data")
     def test_private_get_inspect_data_cache_miss_single(self,
                                                         update_cpumem_data,
                                                         get_ps, cache_get):
         cache_get.return_value = None
-        get_ps.return_value = 'on'
+        get_ps.return_value = set(['USERID1'])
         update_cpumem_data.return_value = {
             'USERID1': CPUMEM_SAMPLE1,
             'USERID2': CPUMEM_SAMPLE2
             }
         rdata = self._monitor._get_inspect_data('cpumem', ['userid1'])
-        get_ps.assert_called_once_with('userid1')
+        get_ps.assert_called_once_with()
         update_cpumem_data.assert_called_once_with(['userid1'])
         self.assertEqual(sorted(rdata.keys()), sorted(['USERID1', 'USERID2']))
         self.assertEqual(sorted(rdata['USERID1'].keys()),
@@ -208,7 +214,7 @@ class SDKMonitorTestCase(base.SDKTestCase):
         self.assertEqual(rdata['USERID1']['used_memory'], '290232 KB')
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._update_cpumem_data")
     def test_private_get_inspect_data_cache_miss_multi(self,
                                                         update_cpumem_data,
@@ -227,14 +233,14 @@ class SDKMonitorTestCase(base.SDKTestCase):
             'min_memory': '0 KB',
             'shared_memory': '4222192 KB',
             }, None]
-        get_ps.return_value = 'on'
+        get_ps.return_value = set(['USERID2'])
         update_cpumem_data.return_value = {
             'USERID1': CPUMEM_SAMPLE1,
             'USERID2': CPUMEM_SAMPLE2
             }
         rdata = self._monitor._get_inspect_data('cpumem',
                                                 ['userid1', 'userid2'])
-        get_ps.assert_called_once_with('userid2')
+        get_ps.assert_called_once_with()
         update_cpumem_data.assert_called_once_with(['userid1', 'userid2'])
         self.assertEqual(sorted(rdata.keys()), sorted(['USERID1', 'USERID2']))
         self.assertEqual(sorted(rdata['USERID1'].keys()),
@@ -245,38 +251,96 @@ class SDKMonitorTestCase(base.SDKTestCase):
         self.assertEqual(rdata['USERID1']['shared_memory'], '5222192 KB')
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._update_cpumem_data")
     def test_private_get_inspect_data_guest_off(self,
                                                 update_cpumem_data,
                                                 get_ps, cache_get):
         cache_get.return_value = None
-        get_ps.return_value = 'off'
+        get_ps.return_value = set(['USERID2'])
         rdata = self._monitor._get_inspect_data('cpumem',
                                                 ['userid1'])
-        get_ps.assert_called_once_with('userid1')
+        get_ps.assert_called_once_with()
         update_cpumem_data.assert_not_called()
         self.assertEqual(rdata, {})
 
     @mock.patch("zvmsdk.monitor.MeteringCache.get")
-    @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._update_nic_data")
     def test_private_get_inspect_data_vnics(self,
                                             update_nic_data,
                                             get_ps, cache_get):
         cache_get.return_value = None
-        get_ps.return_value = 'on'
+        get_ps.return_value = set(['USERID1'])
         update_nic_data.return_value = {'USERID1': INST_NICS_SAMPLE1,
                                         'USERID2': INST_NICS_SAMPLE2
                                         }
         rdata = self._monitor._get_inspect_data('vnics',
                                                 ['USERID1'])
-        get_ps.assert_called_once_with('USERID1')
+        get_ps.assert_called_once_with()
         update_nic_data.assert_called_once_with()
         self.assertEqual(rdata, {'USERID1': INST_NICS_SAMPLE1,
                                  'USERID2': INST_NICS_SAMPLE2
                                  })
 
+    def _fill_cache(self, count):
+        self._monitor._cache.refresh('cpumem', dict(
+            ('USERID%d' % i, CPUMEM_SAMPLE1) for i in range(1, count + 1)))
+
+    @mock.patch("zvmsdk.smtclient.SMTClient.image_performance_query")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
+    @mock.patch("zvmsdk.monitor.ZVMMonitor._update_cpumem_data")
+    def test_private_get_inspect_data_partial_refresh(self,
+                                                      update_cpumem_data,
+                                                      get_ps, ipq):
+        self._fill_cache(20)
+        timestamp = self._monitor._cache.get_snapshot('cpumem')[1]
+        get_ps.return_value = set(['USERID1', 'USERID21'])
+        ipq.return_value = {'USERID21': CPUMEM_SAMPLE2}
+        rdata = self._monitor._get_inspect_data('cpumem',
+                                                ['USERID1', 'USERID21'])
+        ipq.assert_called_once_with(['USERID21'])
+        update_cpumem_data.assert_not_called()
+        self.assertEqual({'USERID1': CPUMEM_SAMPLE1,
+                          'USERID21': CPUMEM_SAMPLE2}, rdata)
+        self.assertEqual(CPUMEM_SAMPLE2,
+                         self._monitor._cache.get('cpumem', 'USERID21'))
+        self.assertEqual(timestamp,
+                         self._monitor._cache.get_snapshot('cpumem')[1])
+        self.assertEqual(
+            1, self._monitor.get_cache_stats()['cpumem']
+            ['partial_loads_total'])
+
+    @mock.patch("zvmsdk.smtclient.SMTClient.image_performance_query")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
+    @mock.patch("zvmsdk.monitor.ZVMMonitor._update_cpumem_data")
+    def test_private_get_inspect_data_high_miss_ratio(self,
+                                                      update_cpumem_data,
+                                                      get_ps, ipq):
+        self._fill_cache(20)
+        uid_list = ['USERID21', 'USERID22', 'USERID23']
+        get_ps.return_value = set(uid_list)
+        update_cpumem_data.return_value = {'USERID21': CPUMEM_SAMPLE2}
+        rdata = self._monitor._get_inspect_data('cpumem', uid_list)
+        update_cpumem_data.assert_called_once_with(uid_list)
+        ipq.assert_not_called()
+        self.assertEqual({'USERID21': CPUMEM_SAMPLE2}, rdata)
+
+    @mock.patch("zvmsdk.smtclient.SMTClient.image_performance_query")
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
+    @mock.patch("zvmsdk.monitor.ZVMMonitor._update_nic_data")
+    def test_private_get_inspect_data_vnics_no_partial(self,
+                                                       update_nic_data,
+                                                       get_ps, ipq):
+        self._monitor._cache.refresh('vnics', dict(
+            ('USERID%d' % i, INST_NICS_SAMPLE1) for i in range(1, 21)))
+        get_ps.return_value = set(['USERID21'])
+        update_nic_data.return_value = {'USERID21': INST_NICS_SAMPLE2}
+        rdata = self._monitor._get_inspect_data('vnics', ['USERID21'])
+        update_nic_data.assert_called_once_with()
+        ipq.assert_not_called()
+        self.assertEqual({'USERID21': INST_NICS_SAMPLE2}, rdata)
+
     @mock.patch("zvmsdk.smtclient.SMTClient.system_image_performance_query")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._cache_enabled")
     @mock.patch("zvmsdk.smtclient.SMTClient.get_vm_list")
@@ -292,17 +356,18 @@ class SDKMonitorTestCase(base.SDKTestCase):
             'USERID1': CPUMEM_SAMPLE1,
             'USERID2': CPUMEM_SAMPLE2
             }
-        rdata = self._monitor._update_cpumem_data(['userid1'])
+        rdata, _timestamp = self._monitor._refresh('cpumem',
+                                                   uid_list=['userid1'])
         image_performance_query.assert_called_once_with('TSTNLIST')
-        namelist_query.assert_called_once_with('TSTNLIST')
+        namelist_query.assert_called_once_with('TSTNLIST',
+            ignore_errors=False)
         get_vm_list.assert_called_once_with()
         self.assertEqual(sorted(rdata.keys()), sorted(['USERID1', 'USERID2']))
         self.assertEqual(rdata['USERID1']['guest_cpus'], '1')
         self.assertEqual(rdata['USERID1']['used_cpu_time'], '6185838 uS')
         self.assertEqual(rdata['USERID1']['used_memory'], '290232 KB')
         self.assertEqual(
-        self._monitor._cache._cache['cpumem']['data']['USERID2']['guest_cpus'],
-        '3')
+            self._monitor._cache.get('cpumem', 'USERID2')['guest_cpus'], '3')
 
     @mock.patch("zvmsdk.smtclient.SMTClient.system_image_performance_query")
     @mock.patch("zvmsdk.smtclient.SMTClient.namelist_add")
@@ -319,18 +384,20 @@ class SDKMonitorTestCase(base.SDKTestCase):
             'USERID1': CPUMEM_SAMPLE1,
             'USERID2': CPUMEM_SAMPLE2,
             }
-        rdata = self._monitor._update_cpumem_data(['USERID1', 'USERID2'])
+        rdata, _timestamp = self._monitor._refresh(
+            'cpumem', uid_list=['USERID1', 'USERID2'])
         image_performance_query.assert_called_once_with('TSTNLIST')
-        namelist_query.assert_called_once_with('TSTNLIST')
+        namelist_query.assert_called_once_with('TSTNLIST',
+            ignore_errors=False)
         get_vm_list.assert_called_once_with()
-        namelist_add.assert_called_once_with('TSTNLIST', 'USERID2')
+        namelist_add.assert_called_once_with('TSTNLIST', 'USERID2',
+                                             ignore_errors=False)
         self.assertEqual(sorted(rdata.keys()), sorted(['USERID1', 'USERID2']))
         self.assertEqual(rdata['USERID1']['guest_cpus'], '1')
         self.assertEqual(rdata['USERID1']['used_cpu_time'], '6185838 uS')
         self.assertEqual(rdata['USERID1']['used_memory'], '290232 KB')
         self.assertEqual(
-        self._monitor._cache._cache['cpumem']['data']['USERID2']['guest_cpus'],
-        '3')
+            self._monitor._cache.get('cpumem', 'USERID2')['guest_cpus'], '3')
 
     @mock.patch("zvmsdk.smtclient.SMTClient.get_vm_list")
     @mock.patch("zvmsdk.monitor.ZVMMonitor._cache_enabled")
@@ -346,7 +413,8 @@ class SDKMonitorTestCase(base.SDKTestCase):
             }
         get_vm_list.return_value = ['USERID1', 'USERID2']
         rdata = self._monitor._update_cpumem_data(['userid1'])
-        namelist_query.assert_called_once_with('TSTNLIST')
+        namelist_query.assert_called_once_with('TSTNLIST',
+            ignore_errors=False)
         get_vm_list.assert_called_once_with()
         image_perform_query.assert_called_once_with('TSTNLIST')
         self.assertEqual(list(rdata.keys()), ['USERID1'])
@@ -355,8 +423,8 @@ class SDKMonitorTestCase(base.SDKTestCase):
         self.assertEqual(rdata['USERID1']['guest_cpus'], '1')
         self.assertEqual(rdata['USERID1']['used_cpu_time'], '6185838 uS')
         self.assertEqual(rdata['USERID1']['used_memory'], '290232 KB')
-        self.assertEqual(
-            list(self._monitor._cache._cache['cpumem']['data'].keys()), [])
+        self.assertEqual(self._monitor._cache.get_snapshot('cpumem'),
+                         ({}, None))
 
     @mock.patch("zvmsdk.monitor.ZVMMonitor._get_inspect_data")
     def test_inspect_stats_single(self, _get_inspect_data):
@@ -440,7 +508,7 @@ class SDKMonitorTestCase(base.SDKTestCase):
     def test_private_update_nic_data(self, cache_enabled, smcli_iuo_query):
         smcli_iuo_query.return_value = SMCLI_VSW_NIC_DATA
         cache_enabled.return_value = True
-        nics_dict = self._monitor._update_nic_data()
+        nics_dict, _timestamp = self._monitor._refresh('vnics')
         self.assertEqual(sorted(["USERID1", "USERID2"]),
                          sorted(nics_dict.keys()))
         self.assertEqual(nics_dict['USERID1'], INST_NICS_SAMPLE1)
@@ -464,3 +532,598 @@ class SDKMonitorTestCase(base.SDKTestCase):
                          None)
         self.assertEqual(self._monitor._cache.get('vnics', 'USERID2'),
                          None)
+
+
+class MeteringCollectorTestCase(base.SDKTestCase):
+    def setUp(self):
+        self.addCleanup(base.set_conf, 'monitor', 'collect_interval',
+                        monitor.CONF.monitor.collect_interval)
+        base.set_conf('monitor', 'collect_interval', 60)
+        self._monitor = monitor.ZVMMonitor()
+        self._monitor._start_collector = mock.Mock()
+        self._smtclient = mock.Mock()
+        self._monitor._smtclient = self._smtclient
+        self._monitor._namelist_mirror = monitor.NamelistMirror()
+        self._monitor._namelist_mirror._smtclient = self._smtclient
+        self._smtclient.get_vm_list.return_value = ['USERID1', 'USERID2']
+        self._smtclient.namelist_query.return_value = ['USERID1']
+        self._smtclient.system_image_performance_query.return_value = {
+            'USERID1': CPUMEM_SAMPLE1,
+            'USERID2': CPUMEM_SAMPLE2,
+            }
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            return_value = SMCLI_VSW_NIC_DATA
+
+    def test_collect(self):
+        self._monitor.collect()
+        self._smtclient.namelist_add.assert_called_once_with(
+            'TSTNLIST', 'USERID2', ignore_errors=False)
+        data, timestamp = self._monitor._cache.get_snapshot('cpumem')
+        self.assertEqual(['USERID1', 'USERID2'], sorted(data.keys()))
+        self.assertIsNotNone(timestamp)
+        data, timestamp = self._monitor._cache.get_snapshot('vnics')
+        self.assertEqual(INST_NICS_SAMPLE1, data['USERID1'])
+
+    def test_collect_failed(self):
+        self._monitor.collect()
+        old = self._monitor._cache.get_snapshot('cpumem')
+        self._smtclient.system_image_performance_query.side_effect = (
+            exception.SDKInternalError(msg='failed'))
+        self._monitor.collect()
+        self.assertEqual(old, self._monitor._cache.get_snapshot('cpumem'))
+        self.assertEqual(
+            2, self._smtclient.virtual_network_vswitch_query_byte_stats.
+            call_count)
+
+    @mock.patch("zvmsdk.monitor.tracing.add_timing")
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_inspect_stats_from_snapshot(self, time, add_timing):
+        time.return_value = 1000
+        self._monitor.collect()
+        self._smtclient.reset_mock()
+
+        # The snapshot is served even after the cache expired
+        time.return_value = 1000 + monitor.CONF.monitor.cache_interval + 5
+        rdata = self._monitor.inspect_stats(['USERID2'])
+        self.assertEqual(['USERID2'], list(rdata.keys()))
+        self.assertEqual(3, rdata['USERID2']['guest_cpus'])
+        self._smtclient.system_image_performance_query.assert_not_called()
+        self._smtclient.get_logged_on_users.assert_not_called()
+        add_timing.assert_called_once_with(
+            'cpumem_age', monitor.CONF.monitor.cache_interval + 5)
+        self._monitor._start_collector.assert_called_once_with()
+
+    def test_inspect_vnics_first_read(self):
+        rdata = self._monitor.inspect_vnics(['USERID1'])
+        self.assertEqual({'USERID1': INST_NICS_SAMPLE1}, rdata)
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            assert_called_once_with()
+        self._monitor.inspect_vnics(['USERID1'])
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            assert_called_once_with()
+        self._smtclient.system_image_performance_query.assert_not_called()
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_get_metering_data_snapshot(self, time):
+        time.return_value = 1000
+        self._monitor.collect()
+        self._smtclient.reset_mock()
+
+        time.return_value = 1010
+        data, age = self._monitor.get_metering_data('cpumem')
+        self.assertEqual(['USERID1', 'USERID2'], sorted(data.keys()))
+        self.assertEqual(10, age)
+        self._smtclient.system_image_performance_query.assert_not_called()
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_get_metering_data_cache(self, time):
+        base.set_conf('monitor', 'collect_interval', 0)
+        time.return_value = 1000
+        data, age = self._monitor.get_metering_data('vnics')
+        self.assertEqual(INST_NICS_SAMPLE1, data['USERID1'])
+        self.assertEqual(0, age)
+
+        # The cached data is served until it expires
+        time.return_value = 1005
+        data, age = self._monitor.get_metering_data('vnics')
+        self.assertEqual(5, age)
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            assert_called_once_with()
+
+        time.return_value = 1000 + monitor.CONF.monitor.cache_interval
+        data, age = self._monitor.get_metering_data('vnics')
+        self.assertEqual(0, age)
+        self.assertEqual(
+            2, self._smtclient.virtual_network_vswitch_query_byte_stats.
+            call_count)
+        self._monitor._start_collector.assert_not_called()
+
+
+class MeteringCacheTestCase(base.SDKTestCase):
+    def setUp(self):
+        self._cache = monitor.MeteringCache(('cpumem', 'vnics'), ttl=60,
+                                            capacity=2)
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_get_ttl_per_entry(self, time):
+        time.return_value = 1000
+        self._cache.set('cpumem', 'USERID1', 'data1')
+        time.return_value = 1030
+        self._cache.set('cpumem', 'USERID2', 'data2')
+        time.return_value = 1070
+        self.assertIsNone(self._cache.get('cpumem', 'USERID1'))
+        self.assertEqual('data2', self._cache.get('cpumem', 'USERID2'))
+        stats = self._cache.get_stats()['cpumem']
+        self.assertEqual(1, stats['hits_total'])
+        self.assertEqual(1, stats['misses_total'])
+
+    def test_set_lru_eviction(self):
+        self._cache.set('cpumem', 'USERID1', 'data1')
+        self._cache.set('cpumem', 'USERID2', 'data2')
+        self._cache.get('cpumem', 'USERID1')
+        self._cache.set('cpumem', 'USERID3', 'data3')
+        data, _timestamp = self._cache.get_snapshot('cpumem')
+        self.assertEqual({'USERID1': 'data1', 'USERID3': 'data3'}, data)
+        stats = self._cache.get_stats()['cpumem']
+        self.assertEqual(1, stats['evictions_total'])
+        self.assertEqual(2, stats['entries'])
+
+    def test_clear_all(self):
+        self._cache.refresh('cpumem', {'USERID1': 'data1'})
+        self._cache.refresh('vnics', {'USERID1': 'nics1'})
+        self._cache.clear()
+        self.assertEqual(({}, None), self._cache.get_snapshot('cpumem'))
+        self.assertEqual(({}, None), self._cache.get_snapshot('vnics'))
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_load(self, time):
+        time.return_value = 1000
+        loader = mock.Mock(return_value={'USERID1': 'data1'})
+        self.assertEqual(({'USERID1': 'data1'}, 1000),
+                         self._cache.load('cpumem', loader, max_age=60))
+        time.return_value = 1030
+        self._cache.load('cpumem', loader, max_age=60)
+        self._cache.load('cpumem', loader)
+        loader.assert_called_once_with()
+        time.return_value = 1060
+        self._cache.load('cpumem', loader, max_age=60)
+        self.assertEqual(2, loader.call_count)
+        self.assertEqual(2, self._cache.get_stats()['cpumem']['loads_total'])
+
+    def test_load_single_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def loader():
+            started.set()
+            release.wait(10)
+            return {'USERID1': 'data1'}
+
+        loader = mock.Mock(side_effect=loader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+                       self._cache.load('cpumem', loader, max_age=0)))
+                   for i in range(3)]
+        threads[0].start()
+        started.wait(10)
+        for thread in threads[1:]:
+            thread.start()
+        # Let the other threads wait for the running load
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        loader.assert_called_once_with()
+        self.assertEqual(
+            2, self._cache.get_stats()['cpumem']['load_waits_total'])
+        self.assertEqual(3, len(results))
+        for data, _timestamp in results:
+            self.assertEqual({'USERID1': 'data1'}, data)
+
+    def test_load_failed(self):
+        loader = mock.Mock(side_effect=exception.SDKInternalError(
+            msg='failed'))
+        self.assertRaises(exception.SDKInternalError, self._cache.load,
+                          'cpumem', loader)
+        self.assertEqual(({}, None), self._cache.get_snapshot('cpumem'))
+
+
+class NamelistMirrorTestCase(base.SDKTestCase):
+    def setUp(self):
+        self._mirror = monitor.NamelistMirror()
+        self._smtclient = mock.Mock()
+        self._mirror._smtclient = self._smtclient
+        self._smtclient.namelist_query.return_value = ['USERID1', 'USERID3']
+        self._smtclient.get_vm_list.return_value = ['USERID1', 'USERID2']
+
+    def test_sync_reconcile(self):
+        self._mirror.sync()
+        self._smtclient.namelist_add.assert_called_once_with(
+            'TSTNLIST', 'USERID2', ignore_errors=False)
+        self.assertEqual(set(['USERID1', 'USERID2', 'USERID3']),
+                         self._mirror.get_userids())
+
+        # No query until the resync interval expired
+        self._mirror.sync()
+        self._smtclient.namelist_query.assert_called_once_with('TSTNLIST',
+            ignore_errors=False)
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_sync_resync(self, time):
+        interval = monitor.CONF.monitor.namelist_resync_interval
+        time.return_value = 1000
+        self._mirror.sync()
+        self._mirror.add('userid4')
+        self._mirror.remove('USERID3')
+        self._smtclient.reset_mock()
+
+        # The namelist matches the mirror
+        self._smtclient.namelist_query.return_value = ['USERID1', 'USERID2',
+                                                       'USERID4']
+        time.return_value = 1000 + interval
+        self._mirror.sync()
+        self._smtclient.namelist_query.assert_called_once_with('TSTNLIST',
+            ignore_errors=False)
+        self._smtclient.namelist_add.assert_not_called()
+
+        # A guest was removed from the namelist outside of the SDK
+        self._smtclient.namelist_query.return_value = ['USERID1', 'USERID4']
+        time.return_value = 1000 + interval * 2
+        self._mirror.sync()
+        self._smtclient.namelist_add.assert_called_once_with(
+            'TSTNLIST', 'USERID2', ignore_errors=False)
+        self.assertEqual(set(['USERID1', 'USERID2', 'USERID4']),
+                         self._mirror.get_userids())
+
+    def test_sync_query_failed(self):
+        self._smtclient.namelist_query.side_effect = (
+            exception.SDKSMTRequestFailed({'overallRC': 1}, 'not ready'))
+        self._mirror.sync()
+        self._smtclient.namelist_add.assert_not_called()
+        self.assertEqual(set(), self._mirror.get_userids())
+
+        # The next sync tries again
+        self._smtclient.namelist_query.side_effect = None
+        self._mirror.sync()
+        self.assertEqual(set(['USERID1', 'USERID2', 'USERID3']),
+                         self._mirror.get_userids())
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_sync_add_failed(self, time):
+        time.return_value = 1000
+        self._smtclient.namelist_add.side_effect = (
+            exception.SDKSMTRequestFailed({'overallRC': 1}, 'not ready'))
+        self._mirror.sync()
+        self.assertEqual(set(), self._mirror.get_userids())
+        self._mirror.add('USERID4')
+        self.assertEqual(set(), self._mirror.get_userids())
+
+        self._smtclient.namelist_add.side_effect = None
+        self._mirror.sync()
+        self.assertEqual(set(['USERID1', 'USERID2', 'USERID3']),
+                         self._mirror.get_userids())
+
+        # A failed query of the resync doesn't change the copy
+        interval = monitor.CONF.monitor.namelist_resync_interval
+        time.return_value = 1000 + interval
+        self._smtclient.reset_mock()
+        self._smtclient.namelist_query.side_effect = (
+            exception.SDKSMTRequestFailed({'overallRC': 1}, 'failed'))
+        self._mirror.sync()
+        self._smtclient.namelist_add.assert_not_called()
+        self.assertEqual(set(['USERID1', 'USERID2', 'USERID3']),
+                         self._mirror.get_userids())
+
+    def test_add_missing(self):
+        self._mirror.sync()
+        self._smtclient.reset_mock()
+        self._mirror.add_missing(['userid1', 'userid2'])
+        self._smtclient.get_vm_list.assert_not_called()
+
+        self._smtclient.get_vm_list.return_value = ['USERID1', 'USERID5']
+        self._mirror.add_missing(['USERID5', 'USERID6'])
+        self._smtclient.namelist_add.assert_called_once_with(
+            'TSTNLIST', 'USERID5', ignore_errors=False)
+        self.assertIn('USERID5', self._mirror.get_userids())
+
+    @mock.patch("zvmsdk.smtclient.SMTClient.system_image_performance_query")
+    def test_update_cpumem_data_one_call(self, image_performance_query):
+        zvm_monitor = monitor.ZVMMonitor()
+        zvm_monitor._namelist_mirror = self._mirror
+        self._mirror.sync()
+        self._smtclient.reset_mock()
+        zvm_monitor._update_cpumem_data(['USERID1'])
+        zvm_monitor._update_cpumem_data(['USERID2'])
+        self.assertEqual([], self._smtclient.method_calls)
+        self.assertEqual(2, image_performance_query.call_count)
+
+
+class MetricHistoryTestCase(base.SDKTestCase):
+    def setUp(self):
+        self._history = monitor.MetricHistory(('nic_rx', 'used_mem_kb'), 3)
+
+    def _append(self, timestamp, nic_rx, used_mem_kb):
+        self._history.append(timestamp, {'nic_rx': nic_rx,
+                                         'used_mem_kb': used_mem_kb})
+
+    def test_summarize(self):
+        self._append(100, 1000, 10)
+        self._append(110, 3000, 30)
+        summary = self._history.summarize(('nic_rx', 'used_mem_kb'),
+                                          ('nic_rx',))
+        self.assertEqual({'samples': 2, 'start': 100, 'end': 110,
+                          'interval': 10,
+                          'metrics': {
+                              'nic_rx': {'last': 3000, 'delta': 2000,
+                                         'rate': 200},
+                              'used_mem_kb': {'last': 30, 'min': 10,
+                                              'max': 30, 'avg': 20}}},
+                         summary)
+
+    def test_summarize_ring(self):
+        for i in range(5):
+            self._append(100 + i * 10, i * 100, i)
+        summary = self._history.summarize(('nic_rx',), ('nic_rx',))
+        self.assertEqual((3, 120, 140), (summary['samples'],
+                                         summary['start'], summary['end']))
+        self.assertEqual(200, summary['metrics']['nic_rx']['delta'])
+        self.assertEqual(3, len(self._history.columns['nic_rx']))
+
+        summary = self._history.summarize(('nic_rx',), ('nic_rx',), 135)
+        self.assertEqual(1, summary['samples'])
+        self.assertIsNone(summary['metrics']['nic_rx']['rate'])
+        self.assertIsNone(
+            self._history.summarize(('nic_rx',), ('nic_rx',), 150))
+
+    def test_summarize_counter_reset(self):
+        self._append(100, 1000, 0)
+        self._append(110, 1500, 0)
+        self._append(120, 200, 0)
+        summary = self._history.summarize(('nic_rx',), ('nic_rx',))
+        self.assertEqual(700, summary['metrics']['nic_rx']['delta'])
+        self.assertEqual(35, summary['metrics']['nic_rx']['rate'])
+
+
+class MonitorHistoryTestCase(base.SDKTestCase):
+    def setUp(self):
+        self._monitor = monitor.ZVMMonitor()
+        self._smtclient = mock.Mock()
+        self._monitor._smtclient = self._smtclient
+        self._monitor._namelist_mirror = monitor.NamelistMirror()
+        self._monitor._namelist_mirror._smtclient = self._smtclient
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            return_value = SMCLI_VSW_NIC_DATA
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_inspect_history(self, time):
+        self._smtclient.get_vm_list.return_value = ['USERID1', 'USERID2']
+        self._smtclient.namelist_query.return_value = ['USERID1', 'USERID2']
+        sample2 = dict(CPUMEM_SAMPLE1, used_cpu_time='7185838 uS',
+                       used_memory='390232 KB')
+        self._smtclient.system_image_performance_query.side_effect = [
+            {'USERID1': CPUMEM_SAMPLE1, 'USERID2': CPUMEM_SAMPLE2},
+            {'USERID1': sample2}]
+        time.return_value = 1000
+        self._monitor._update_cpumem_data([])
+        self._monitor._update_nic_data()
+        time.return_value = 1010
+        self._monitor._update_cpumem_data([])
+
+        result = self._monitor.inspect_history(
+            ['userid1', 'USERID2'], metrics=['used_cpu_time_us',
+                                             'used_mem_kb'])
+        # USERID2 was not reported by the last query
+        self.assertEqual(['userid1'], list(result.keys()))
+        self.assertEqual(['cpumem'], list(result['userid1'].keys()))
+        cpumem = result['userid1']['cpumem']
+        self.assertEqual((2, 10), (cpumem['samples'], cpumem['interval']))
+        self.assertEqual({'last': 7185838, 'delta': 1000000,
+                          'rate': 100000},
+                         cpumem['metrics']['used_cpu_time_us'])
+        self.assertEqual(340232, cpumem['metrics']['used_mem_kb']['avg'])
+
+        result = self._monitor.inspect_history(['USERID1'], window=5)
+        self.assertEqual(1, result['USERID1']['cpumem']['samples'])
+        self.assertNotIn('vnics', result['USERID1'])
+
+        result = self._monitor.inspect_history(['USERID1'], window=60)
+        vnics = result['USERID1']['vnics']
+        self.assertEqual(1, vnics['samples'])
+        self.assertEqual(103024058 + 4684435,
+                         vnics['metrics']['nic_rx']['last'])
+
+    def test_inspect_history_unknown_metric(self):
+        self.assertRaises(exception.SDKInvalidInputFormat,
+                          self._monitor.inspect_history, ['USERID1'],
+                          metrics=['nic_rx', 'cpu_percent'])
+
+    def test_inspect_history_disabled(self):
+        self.addCleanup(base.set_conf, 'monitor', 'history_size',
+                        monitor.CONF.monitor.history_size)
+        base.set_conf('monitor', 'history_size', 0)
+        self._monitor._update_nic_data()
+        self.assertEqual({}, self._monitor._history['vnics'])
+        self.assertRaises(exception.SDKFunctionNotImplementError,
+                          self._monitor.inspect_history, ['USERID1'])
+
+    def test_update_cpumem_data_archive(self):
+        self._smtclient.get_vm_list.return_value = ['USERID1']
+        self._smtclient.namelist_query.return_value = ['USERID1']
+        rdata = {'USERID1': CPUMEM_SAMPLE1}
+        self._smtclient.system_image_performance_query.return_value = rdata
+        self._monitor._archive = mock.Mock()
+        self._monitor._archive.enabled.return_value = True
+        self._monitor._archive.append.side_effect = IOError('disk full')
+        self.assertEqual(rdata, self._monitor._update_cpumem_data([]))
+        self._monitor._archive.append.assert_called_once_with(rdata)
+
+        self._monitor._archive.query.return_value = {'USERID1': []}
+        self.assertEqual({'USERID1': []},
+                         self._monitor.inspect_archive(['USERID1'], start=10))
+        self._monitor._archive.query.assert_called_once_with(
+            ['USERID1'], start=10, end=None)
+
+    def test_inspect_archive_disabled(self):
+        self.assertFalse(self._monitor._archive.enabled())
+        self.assertRaises(exception.SDKFunctionNotImplementError,
+                          self._monitor.inspect_archive, ['USERID1'])
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_inspect_vnics_delta(self, time):
+        self._monitor._get_inspect_data = mock.Mock()
+        vsw1 = {'vswitch_name': 'TESTVSW1', 'nics': [
+            dict(SMCLI_VSW_NIC_DATA['vswitches'][0]['nics'][0],
+                 nic_rx='103025058', nic_fr_rx='573962'),
+            # USERID2 logged on again, its counters restarted from 0
+            dict(SMCLI_VSW_NIC_DATA['vswitches'][0]['nics'][1],
+                 nic_rx='1000', nic_tx='2000', nic_fr_rx='10',
+                 nic_fr_tx='20', nic_fr_tx_err='0')]}
+        self._smtclient.virtual_network_vswitch_query_byte_stats.\
+            side_effect = [SMCLI_VSW_NIC_DATA,
+                           {'vswitch_count': 1, 'vswitches': [vsw1]}]
+        time.return_value = 1000
+        self._monitor._update_nic_data()
+        self.assertEqual({}, self._monitor.inspect_vnics_delta(['USERID1']))
+
+        time.return_value = 1060
+        self._monitor._update_nic_data()
+        result = self._monitor.inspect_vnics_delta(['userid1', 'USERID2',
+                                                    'USERID3'])
+        self._monitor._get_inspect_data.assert_called_with(
+            'vnics', ['userid1', 'USERID2', 'USERID3'])
+        self.assertEqual(['USERID2', 'userid1'], sorted(result))
+        # The nic of USERID1 on TESTVSW2 is not reported anymore
+        self.assertEqual([{'vswitch_name': 'TESTVSW1', 'nic_vdev': '0600',
+                           'interval': 60, 'reset': False,
+                           'nic_rx': 1000, 'nic_tx': 0,
+                           'nic_fr_rx': 10, 'nic_fr_tx': 0,
+                           'nic_fr_rx_dsc': 0, 'nic_fr_tx_dsc': 0,
+                           'nic_fr_rx_err': 0, 'nic_fr_tx_err': 0}],
+                         result['userid1'])
+        delta = result['USERID2'][0]
+        self.assertTrue(delta['reset'])
+        self.assertEqual((1000, 2000, 10, 20, 0),
+                         (delta['nic_rx'], delta['nic_tx'],
+                          delta['nic_fr_rx'], delta['nic_fr_tx'],
+                          delta['nic_fr_tx_err']))
+
+    def test_update_nic_data_vswitches(self):
+        self.addCleanup(base.set_conf, 'monitor', 'vnics_vswitches',
+                        monitor.CONF.monitor.vnics_vswitches)
+        base.set_conf('monitor', 'vnics_vswitches', 'testvsw1, TESTVSW2')
+        query = self._smtclient.virtual_network_vswitch_query_byte_stats
+        query.side_effect = [
+            {'vswitch_count': 1,
+             'vswitches': SMCLI_VSW_NIC_DATA['vswitches'][:1]},
+            exception.SDKSMTRequestFailed({'overallRC': 1}, 'failed')]
+        nics = self._monitor._update_nic_data()
+        query.assert_has_calls([mock.call('TESTVSW1'),
+                                mock.call('TESTVSW2')])
+        self.assertEqual(INST_NICS_SAMPLE1[:1], nics['USERID1'])
+
+    @mock.patch("zvmsdk.database.NetworkDbOperator.switch_select_table")
+    def test_update_nic_data_registered_vswitches(self, switch_select):
+        self.addCleanup(base.set_conf, 'monitor', 'vnics_vswitches',
+                        monitor.CONF.monitor.vnics_vswitches)
+        base.set_conf('monitor', 'vnics_vswitches', 'registered')
+        switch_select.return_value = [
+            {'userid': 'USERID1', 'interface': '1000', 'switch': 'TESTVSW2',
+             'port': None, 'comments': None},
+            {'userid': 'USERID2', 'interface': '1000', 'switch': 'TESTVSW2',
+             'port': None, 'comments': None},
+            {'userid': 'USERID2', 'interface': '2000', 'switch': None,
+             'port': None, 'comments': None}]
+        query = self._smtclient.virtual_network_vswitch_query_byte_stats
+        query.return_value = {
+            'vswitch_count': 1,
+            'vswitches': SMCLI_VSW_NIC_DATA['vswitches'][1:]}
+        nics = self._monitor._update_nic_data()
+        query.assert_called_once_with('TESTVSW2')
+        self.assertEqual(INST_NICS_SAMPLE1[1:], nics['USERID1'])
+
+
+class GuestStateWatcherTestCase(base.SDKTestCase):
+    def setUp(self):
+        self._watcher = monitor.GuestStateWatcher()
+        self._watcher._start = mock.Mock()
+        self._smtclient = mock.Mock()
+        self._watcher._smtclient = self._smtclient
+
+    def _poll(self, userids, logged_on):
+        self._smtclient.get_vm_list.return_value = userids
+        self._smtclient.get_logged_on_users.return_value = set(logged_on)
+        self._watcher.poll()
+
+    def test_poll(self):
+        self._poll(['USERID1', 'USERID2'], ['USERID1'])
+        first = self._watcher.get_events()
+        self.assertEqual([], first['events'])
+
+        self._poll(['USERID1', 'USERID3'], ['USERID3'])
+        result = self._watcher.get_events(first['last_event_id'])
+        self.assertFalse(result['missed'])
+        events = dict((e['userid'], e) for e in result['events'])
+        self.assertEqual(3, len(events))
+        self.assertEqual(('power_state', 'off', 'on'),
+                         (events['USERID1']['event'],
+                          events['USERID1']['power_state'],
+                          events['USERID1']['previous_power_state']))
+        self.assertEqual(('guest_removed', None),
+                         (events['USERID2']['event'],
+                          events['USERID2']['power_state']))
+        self.assertEqual(('guest_added', 'on'),
+                         (events['USERID3']['event'],
+                          events['USERID3']['power_state']))
+        self.assertEqual(first['last_event_id'] + 3,
+                         result['last_event_id'])
+
+        # no change since the last poll
+        self._poll(['USERID1', 'USERID3'], ['USERID3'])
+        result = self._watcher.get_events(result['last_event_id'])
+        self.assertEqual([], result['events'])
+        self.assertFalse(result['missed'])
+
+    def test_get_events_missed(self):
+        self._watcher._events = monitor.collections.deque(maxlen=2)
+        self._poll(['USERID1', 'USERID2', 'USERID3'], [])
+        last_event_id = self._watcher.get_events()['last_event_id']
+        self._poll(['USERID1', 'USERID2', 'USERID3'],
+                   ['USERID1', 'USERID2', 'USERID3'])
+
+        result = self._watcher.get_events(last_event_id)
+        self.assertTrue(result['missed'])
+        self.assertEqual(['USERID2', 'USERID3'],
+                         [e['userid'] for e in result['events']])
+
+        # an id from after a restart of the server
+        result = self._watcher.get_events(result['last_event_id'] + 10)
+        self.assertTrue(result['missed'])
+
+    def test_get_events_missed_before_start(self):
+        self._poll(['USERID1'], [])
+        last_event_id = self._watcher.get_events()['last_event_id']
+        # no event recorded yet, an id from before a restart of the server
+        result = self._watcher.get_events(last_event_id - 5)
+        self.assertTrue(result['missed'])
+        self.assertEqual([], result['events'])
+
+        result = self._watcher.get_events(last_event_id)
+        self.assertFalse(result['missed'])
+
+    @mock.patch("zvmsdk.monitor.time.time")
+    def test_get_events_timeout(self, time):
+        wait_timeout = monitor.CONF.monitor.event_wait_timeout
+        time.side_effect = [1000, 1000, 1000 + wait_timeout]
+        self._poll([], [])
+        self._watcher._cond = mock.MagicMock()
+        result = self._watcher.get_events(timeout=wait_timeout * 10)
+        self._watcher._cond.wait.assert_called_once_with(wait_timeout)
+        self.assertEqual([], result['events'])
+
+    def test_get_events_disabled(self):
+        interval = monitor.CONF.monitor.event_poll_interval
+        self.addCleanup(base.set_conf, 'monitor', 'event_poll_interval',
+                        interval)
+        base.set_conf('monitor', 'event_poll_interval', 0)
+        self.assertRaises(exception.SDKFunctionNotImplementError,
+                          self._watcher.get_events)
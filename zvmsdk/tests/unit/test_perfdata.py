@@ -0,0 +1,94 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from zvmsdk import exception
+from zvmsdk import perfdata
+from zvmsdk.tests.unit import base
+
+
+def _record(userid, cpus='2', used_memory='302180 KB'):
+    return ['Virtual server ID: %s' % userid.lower(),
+            'Record version: "1"',
+            'Used CPU time: "646609178 uS"',
+            'Elapsed time: "596837441984 uS"',
+            'Minimum memory: "0 KB"',
+            'Max memory: "2097152 KB"',
+            'Shared memory: "302180 KB"',
+            'Used memory: "%s"' % used_memory,
+            'Guest CPUs: "%s"' % cpus,
+            'Minimum CPU count: "2"',
+            'Max CPU limit: "10000"',
+            'Samples CPU in use: "371"',
+            ',Samples CPU delay: "116"',
+            'Guest name: "%-8s"' % userid,
+            '']
+
+
+RECORD1 = {'userid': 'FAKEVM',
+           'guest_cpus': '2',
+           'used_cpu_time': '646609178 uS',
+           'elapsed_cpu_time': '596837441984 uS',
+           'min_cpu_count': '2',
+           'max_cpu_limit': '10000',
+           'samples_cpu_in_use': '371',
+           'samples_cpu_delay': '116',
+           'used_memory': '302180 KB',
+           'max_memory': '2097152 KB',
+           'min_memory': '0 KB',
+           'shared_memory': '302180 KB'}
+
+
+class PerformanceDataTestCase(base.SDKTestCase):
+
+    def test_parse(self):
+        data = perfdata.parse_performance_data(
+            _record('FAKEVM') + _record('FAKEVM2', cpus='4'))
+        self.assertEqual(['FAKEVM', 'FAKEVM2'], sorted(data.keys()))
+        self.assertEqual(['FAKEVM', 'FAKEVM2'], data.userids)
+        self.assertEqual([2, 4], list(data.columns[0]))
+        self.assertEqual(RECORD1, data['FAKEVM'])
+        self.assertEqual('4', data['FAKEVM2']['guest_cpus'])
+        self.assertEqual({'guest_cpus': 4,
+                          'used_cpu_time_us': 646609178,
+                          'elapsed_cpu_time_us': 596837441984,
+                          'min_cpu_count': 2,
+                          'max_cpu_limit': 10000,
+                          'samples_cpu_in_use': 371,
+                          'samples_cpu_delay': 116,
+                          'used_mem_kb': 302180,
+                          'max_mem_kb': 2097152,
+                          'min_mem_kb': 0,
+                          'shared_mem_kb': 302180},
+                         perfdata.get_stats(data['FAKEVM2']))
+
+    def test_parse_no_guest_name(self):
+        # The query of a guest which is logged off only returns its count
+        data = perfdata.parse_performance_data(['1', ''] +
+                                               _record('FAKEVM')[:-2])
+        self.assertEqual({}, data)
+
+    def test_parse_invalid_value(self):
+        lines = _record('FAKEVM', used_memory='302180 MB')
+        lines.remove('Max CPU limit: "10000"')
+        data = perfdata.parse_performance_data(lines)
+        record = data['FAKEVM']
+        self.assertEqual('302180 MB', record['used_memory'])
+        self.assertNotIn('max_cpu_limit', record)
+        self.assertEqual(len(RECORD1) - 1, len(record))
+        self.assertRaises(exception.SDKInternalError, perfdata.get_stats,
+                          record)
+
+    def test_get_stats_dict(self):
+        self.assertEqual(646609178,
+                         perfdata.get_stats(RECORD1)['used_cpu_time_us'])
@@ -61,78 +61,98 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         self.assertRaises(exception.SDKSMTRequestFailed,
                           self._smtclient._request, requestData)
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smt.SMT, 'call')
+    def test_private_call_success(self, call):
+        call.return_value = {'overallRC': 0}
+        self._smtclient._call('PowerVM', 'off', 'fakeuid', {'maxWait': 60})
+        call.assert_called_once_with('PowerVM', 'off', 'fakeuid',
+                                     {'maxWait': 60})
+
+    @mock.patch.object(smt.SMT, 'call')
+    def test_private_call_failed(self, call):
+        call.return_value = {'overallRC': 1, 'logEntries': []}
+        with self.assertRaises(exception.SDKSMTRequestFailed) as cm:
+            self._smtclient._call('PowerVM', 'status', 'fakeuid',
+                                  {'maxWait': 60})
+        self.assertIn("RequestData: 'PowerVM fakeuid status "
+                      "{'maxWait': 60}'", cm.exception.format_message())
+
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_start(self, request):
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID on"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_start(fake_userid)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'on', fake_userid)
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_stop(self, request):
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID off"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_stop(fake_userid)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'off', fake_userid, {})
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_stop_with_timeout(self, request):
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID off --maxwait 300"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_stop(fake_userid, timeout=300)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'off', fake_userid,
+                                        {'maxWait': 300})
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_stop_with_poll_interval(self, request):
         fake_userid = 'FakeID'
-        rd = "PowerVM FakeID off --maxwait 300 --poll 10"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_stop(fake_userid, timeout=300,
                                     poll_interval=10)
-        request.assert_called_once_with(rd)
+        request.assert_called_once_with('PowerVM', 'off', fake_userid,
+                                        {'maxWait': 300, 'poll': 10})
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_softstop(self, request):
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID softoff --wait --maxwait 300 --poll 10"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_softstop(fake_userid, timeout=300,
                                         poll_interval=10)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with(
+            'PowerVM', 'softoff', fake_userid,
+            {'wait': True, 'maxWait': 300, 'poll': 10})
 
     @mock.patch.object(smtclient.SMTClient, 'get_power_state')
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_pause(self, request, power_state):
         power_state.return_value = 'on'
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID pause"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_pause(fake_userid)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'pause', fake_userid)
 
     @mock.patch.object(smtclient.SMTClient, 'get_power_state')
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_unpause(self, request, power_state):
         power_state.return_value = 'on'
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID unpause"
         request.return_value = {'overallRC': 0}
         self._smtclient.guest_unpause(fake_userid)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'unpause', fake_userid)
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_get_power_state(self, request):
         fake_userid = 'FakeID'
-        requestData = "PowerVM FakeID status"
         request.return_value = {'overallRC': 0,
                                 'response': [fake_userid + ': on']}
         status = self._smtclient.get_power_state(fake_userid)
-        request.assert_called_once_with(requestData)
+        request.assert_called_once_with('PowerVM', 'status', fake_userid)
         self.assertEqual('on', status)
 
+    @mock.patch.object(smtclient.SMTClient, '_call')
+    def test_get_logged_on_users(self, request):
+        request.return_value = {'overallRC': 0,
+                                'response': ['TEST0001', 'TEST0002']}
+        users = self._smtclient.get_logged_on_users()
+        request.assert_called_once_with('PowerVM', 'loggedon')
+        self.assertEqual(set(['TEST0001', 'TEST0002']), users)
+
     @mock.patch.object(smtclient.SMTClient, 'add_mdisks')
     @mock.patch.object(smtclient.SMTClient, '_request')
     @mock.patch.object(database.GuestDbOperator, 'add_guest')
@@ -943,8 +963,20 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                          vsw_dict['vswitches'][0]['nics'][0]['userid'])
         self.assertEqual('3577163',
                          vsw_dict['vswitches'][1]['nics'][1]['nic_rx'])
+        self.assertIn('-k "switch_name=*"', smt_req.call_args[0][0])
 
+    @mock.patch.object(zvmutils, 'get_smt_userid')
     @mock.patch.object(smtclient.SMTClient, '_request')
+    def test_virtual_network_vswitch_query_byte_stats_switch(self, smt_req,
+                                                            get_smt_userid):
+        get_smt_userid.return_value = "SMTUSER"
+        smt_req.return_value = {'rs': 0, 'errno': 0, 'strError': '',
+                                'overallRC': 0, 'logEntries': [],
+                                'rc': 0, 'response': ['vswitch count: 0']}
+        self._smtclient.virtual_network_vswitch_query_byte_stats('VSW1')
+        self.assertIn('-k "switch_name=VSW1"', smt_req.call_args[0][0])
+
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_get_host_info(self, smt_req):
         resp = ['ZCC USERID: OPNCLOUD',
                 'z/VM Host: OPNSTK2',
@@ -978,10 +1010,10 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                   'zvm_host': 'OPNSTK2'}
         host_info = self._smtclient.get_host_info()
 
-        smt_req.assert_called_once_with('getHost general')
+        smt_req.assert_called_once_with('getHost', 'general')
         self.assertDictEqual(host_info, expect)
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_get_diskpool_info(self, smt_req):
         resp = ['XCATECKD Total: 3623.0G',
                 'XCATECKD Used: 397.4G',
@@ -994,7 +1026,8 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                   'disk_used': '397.4G'}
         dp_info = self._smtclient.get_diskpool_info('pool')
 
-        smt_req.assert_called_once_with('getHost diskpoolspace pool')
+        smt_req.assert_called_once_with('getHost', 'diskpoolspace',
+                                        parms={'poolName': 'pool'})
         self.assertDictEqual(dp_info, expect)
 
     @mock.patch.object(zvmutils, 'get_smt_userid')
@@ -1226,11 +1259,11 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         request.assert_any_call(rd1)
         request.assert_any_call(rd2)
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_get_user_direct(self, req):
         req.return_value = {'response': 'OK'}
         resp = self._smtclient.get_user_direct('user1')
-        req.assert_called_once_with('getvm user1 directory')
+        req.assert_called_once_with('getvm', 'directory', 'user1')
         self.assertEqual(resp, 'OK')
 
     @mock.patch.object(database.NetworkDbOperator,
@@ -1394,6 +1427,17 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         self._smtclient.execute_cmd('fuser1', 'ls')
         request.assert_called_once_with(rd)
 
+    @mock.patch.object(smtclient.SMTClient, '_call')
+    def test_execute_cmds(self, call):
+        call.return_value = {'cmdResults': [{'rc': 0, 'response': '/root\n'},
+                                            {'rc': 2, 'response': 'a\nb\n'}]}
+        res = self._smtclient.execute_cmds('fuser1', ['pwd', 'ls x'],
+                                           stop_on_error=True)
+        self.assertEqual([(0, ['/root']), (2, ['a', 'b'])], res)
+        call.assert_called_once_with('CMDVM', 'CMDS', 'fuser1',
+                                     {'cmds': ['pwd', 'ls x'],
+                                      'stopOnError': True})
+
     @mock.patch.object(smtclient.SMTClient, '_request')
     def test_delete_userid_not_exist(self, request):
         rd = 'deletevm fuser1 directory'
@@ -1706,17 +1750,17 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         self.assertRaises(exception.SDKSMTRequestFailed,
                           self._smtclient.get_user_console_output, 'fakeuser')
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_reboot(self, req):
         req.return_value = self._generate_results()
         self._smtclient.guest_reboot('fakeuser')
-        req.assert_called_once_with('PowerVM fakeuser reboot')
+        req.assert_called_once_with('PowerVM', 'reboot', 'fakeuser')
 
-    @mock.patch.object(smtclient.SMTClient, '_request')
+    @mock.patch.object(smtclient.SMTClient, '_call')
     def test_guest_reset(self, req):
         req.return_value = self._generate_results()
         self._smtclient.guest_reset('fakeuser')
-        req.assert_called_once_with('PowerVM fakeuser reset')
+        req.assert_called_once_with('PowerVM', 'reset', 'fakeuser')
 
     @mock.patch.object(smtclient.SMTClient, '_request')
     def test_get_guest_connection_status(self, req):
@@ -1732,75 +1776,127 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         select.assert_called_with(userid='testid', nic_id='fake_nic',
                                   vswitch=None)
 
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
-    def test_guest_capture_get_capture_devices_rh7(self, execcmd):
+    def test_guest_capture_get_capture_devices_rh7(self, execcmd, execcmds):
         userid = 'fakeid'
-        execcmd.side_effect = [['/dev/disk/by-path/ccw-0.0.0100-part1'],
-                               ['/dev/dasda1'],
-                               ['0.0.0100(ECKD) at ( 94:     0) is dasda'
-                                '       : active at blocksize: 4096,'
-                                ' 600840 blocks, 2347 MB']]
+        execcmd.return_value = ['/dev/disk/by-path/ccw-0.0.0100-part1']
+        execcmds.return_value = [(0, ['/dev/dasda1']),
+                                 (0, ['0.0.0101(ECKD) at ( 94:     4) is '
+                                      'dasdb       : active at blocksize: '
+                                      '4096, 600840 blocks, 2347 MB',
+                                      '0.0.0100(ECKD) at ( 94:     0) is '
+                                      'dasda       : active at blocksize: '
+                                      '4096, 600840 blocks, 2347 MB'])]
         result = self._smtclient._get_capture_devices(userid)
         self.assertEqual(result, ['0100'])
+        execcmds.assert_called_once_with(userid, [
+            'readlink -f /dev/disk/by-path/ccw-0.0.0100-part1',
+            'cat /proc/dasd/devices'], stop_on_error=True)
+
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    def test_guest_capture_get_capture_devices_cmd_failed(self, execcmd,
+                                                         execcmds):
+        userid = 'fakeid'
+        execcmd.return_value = ['/dev/disk/by-path/ccw-0.0.0100-part1']
+        execcmds.return_value = [(1, ['readlink: missing operand'])]
+        self.assertRaises(exception.SDKSMTRequestFailed,
+                          self._smtclient._get_capture_devices, userid)
+
+        execcmds.return_value = [(0, ['/dev/dasda1'])]
+        self.assertRaises(exception.SDKSMTRequestFailed,
+                          self._smtclient._get_capture_devices, userid)
+
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    def test_guest_capture_get_capture_devices_not_found(self, execcmd,
+                                                         execcmds):
+        userid = 'fakeid'
+        execcmd.return_value = ['/dev/disk/by-path/ccw-0.0.0100-part1']
+        execcmds.return_value = [(0, ['/dev/dasdc1']),
+                                 (0, ['0.0.0100(ECKD) at ( 94:     0) is '
+                                      'dasda       : active at blocksize: '
+                                      '4096, 600840 blocks, 2347 MB'])]
+        self.assertRaises(exception.SDKSMTRequestFailed,
+                          self._smtclient._get_capture_devices, userid)
 
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
-    def test_guest_capture_get_capture_devices_ubuntu(self, execcmd):
+    def test_guest_capture_get_capture_devices_ubuntu(self, execcmd, execcmds):
         userid = 'fakeid'
-        execcmd.side_effect = [['UUID=8320ec9d-c2b5-439f-b0a0-cede08afe957'
+        execcmd.return_value = ['UUID=8320ec9d-c2b5-439f-b0a0-cede08afe957'
                                 ' allow_lun_scan=0 crashkernel=128M'
-                                ' BOOT_IMAGE=0'],
-                                ['/dev/dasda1'],
-                                ['0.0.0100(ECKD) at ( 94:     0) is dasda'
-                                 '       : active at blocksize: 4096,'
-                                 ' 600840 blocks, 2347 MB']]
+                                ' BOOT_IMAGE=0']
+        execcmds.return_value = [(0, ['/dev/dasda1']),
+                                 (0, ['0.0.0100(ECKD) at ( 94:     0) is '
+                                      'dasda       : active at blocksize: '
+                                      '4096, 600840 blocks, 2347 MB'])]
         result = self._smtclient._get_capture_devices(userid)
         self.assertEqual(result, ['0100'])
 
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     def test_guest_capture_get_os_version_rh7(self, execcmd):
         userid = 'fakeid'
-        execcmd.side_effect = [['/etc/os-release', '/etc/redhat-release',
-                                '/etc/system-release'],
-                               ['NAME="Red Hat Enterprise Linux Server"',
-                                'VERSION="7.0 (Maipo)"',
-                                'ID="rhel"',
-                                'ID_LIKE="fedora"',
-                                'VERSION_ID="7.0"',
-                                'PRETTY_NAME="Red Hat Enterprise Linux'
-                                ' Server 7.0 (Maipo)"',
-                                'ANSI_COLOR="0;31"',
-                                'CPE_NAME="cpe:/o:redhat:enterprise_linux:'
-                                '7.0:GA:server"',
-                                'HOME_URL="https://www.redhat.com/"']]
+        execcmd.return_value = [(0, ['/etc/os-release',
+                                     '/etc/redhat-release',
+                                     '/etc/system-release']),
+                                (0, ['NAME="Red Hat Enterprise Linux Server"',
+                                     'VERSION="7.0 (Maipo)"',
+                                     'ID="rhel"',
+                                     'ID_LIKE="fedora"',
+                                     'VERSION_ID="7.0"',
+                                     'PRETTY_NAME="Red Hat Enterprise Linux'
+                                     ' Server 7.0 (Maipo)"',
+                                     'ANSI_COLOR="0;31"',
+                                     'CPE_NAME="cpe:/o:redhat:enterprise_'
+                                     'linux:7.0:GA:server"',
+                                     'HOME_URL="https://www.redhat.com/"']),
+                                (0, ['Red Hat Enterprise Linux Server '
+                                     'release 7.0 (Maipo)']),
+                                (1, ['cat: /etc/SuSE-release: No such file '
+                                     'or directory']),
+                                (0, ['Red Hat Enterprise Linux Server '
+                                     'release 7.0 (Maipo)'])]
         result = self._smtclient._guest_get_os_version(userid)
         self.assertEqual(result, 'rhel7.0')
+        execcmd.assert_called_once_with(userid, ['ls /etc/*-release',
+            'cat /etc/os-release', 'cat /etc/redhat-release',
+            'cat /etc/SuSE-release', 'cat /etc/system-release'])
 
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     def test_guest_capture_get_os_version_rhel67_sles11(self, execcmd):
         userid = 'fakeid'
-        execcmd.side_effect = [['/etc/redhat-release',
-                                '/etc/system-release'],
-                               ['Red Hat Enterprise Linux Server release 6.7'
-                                ' (Santiago)']]
+        execcmd.return_value = [(0, ['/etc/redhat-release',
+                                     '/etc/system-release']),
+                                (1, ['cat: /etc/os-release: No such file '
+                                     'or directory']),
+                                (0, ['Red Hat Enterprise Linux Server '
+                                     'release 6.7 (Santiago)']),
+                                (1, ['cat: /etc/SuSE-release: No such file '
+                                     'or directory']),
+                                (0, ['Red Hat Enterprise Linux Server '
+                                     'release 6.7 (Santiago)'])]
         result = self._smtclient._guest_get_os_version(userid)
         self.assertEqual(result, 'rhel6.7')
 
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     def test_guest_capture_get_os_version_ubuntu(self, execcmd):
         userid = 'fakeid'
-        execcmd.side_effect = [['/etc/lsb-release',
-                                '/etc/os-release'],
-                               ['NAME="Ubuntu"',
-                                'VERSION="16.04 (Xenial Xerus)"',
-                                'ID=ubuntu',
-                                'ID_LIKE=debian',
-                                'PRETTY_NAME="Ubuntu 16.04"',
-                                'VERSION_ID="16.04"',
-                                'HOME_URL="http://www.ubuntu.com/"',
-                                'SUPPORT_URL="http://help.ubuntu.com/"',
-                                'BUG_REPORT_URL="http://bugs.launchpad.net'
-                                '/ubuntu/"',
-                                'UBUNTU_CODENAME=xenial']]
+        execcmd.return_value = [(0, ['/etc/lsb-release',
+                                     '/etc/os-release']),
+                                (0, ['NAME="Ubuntu"',
+                                     'VERSION="16.04 (Xenial Xerus)"',
+                                     'ID=ubuntu',
+                                     'ID_LIKE=debian',
+                                     'PRETTY_NAME="Ubuntu 16.04"',
+                                     'VERSION_ID="16.04"',
+                                     'HOME_URL="http://www.ubuntu.com/"',
+                                     'SUPPORT_URL="http://help.ubuntu.com/"',
+                                     'BUG_REPORT_URL="http://bugs.launchpad.'
+                                     'net/ubuntu/"',
+                                     'UBUNTU_CODENAME=xenial']),
+                                (1, []), (1, []), (1, [])]
         result = self._smtclient._guest_get_os_version(userid)
         self.assertEqual(result, 'ubuntu16.04')
 
@@ -2252,6 +2348,16 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         req.assert_called_once_with(rd)
         self.assertEqual([], resp)
 
+    @mock.patch.object(smtclient.SMTClient, '_request')
+    def test_namelist_query_err_raised(self, req):
+        req.side_effect = exception.SDKSMTRequestFailed({}, 'err')
+        self.assertRaises(exception.SDKSMTRequestFailed,
+                          self._smtclient.namelist_query, 'tnlist',
+                          ignore_errors=False)
+        self.assertRaises(exception.SDKSMTRequestFailed,
+                          self._smtclient.namelist_add, 'tnlist', 'testid',
+                          ignore_errors=False)
+
     @mock.patch.object(smtclient.SMTClient, '_request_with_error_ignored')
     def test_namelist_destroy(self, req):
         self._smtclient.namelist_destroy('tnlist')
@@ -2320,7 +2426,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         self.assertListEqual(addrs, ['00', '03', '0A', '13'])
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2335,18 +2441,19 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                      '12', '13', '14', '15', '16', '17', '18', '19',
                      '1A', '1B', '1C', '1D', '1E', '1F']
         get_avail.return_value = avail_lst
+        exec_cmd.return_value = [(0, []), (0, [])]
         self._smtclient.live_resize_cpus(userid, count)
         get_active.assert_called_once_with(userid)
         resize.assert_called_once_with(userid, count)
         get_avail.assert_called_once_with(['00', '01'], 32)
         cmd_def_cpu = "vmcp def cpu 02 03"
         cmd_rescan_cpu = "chcpu -r"
-        exec_cmd.assert_has_calls([mock.call(userid, cmd_def_cpu),
-                                   mock.call(userid, cmd_rescan_cpu)])
+        exec_cmd.assert_called_once_with(userid, [cmd_def_cpu, cmd_rescan_cpu],
+                                         stop_on_error=True)
         request.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2364,7 +2471,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         request.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2382,7 +2489,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         request.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2399,17 +2506,19 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                      '12', '13', '14', '15', '16', '17', '18', '19',
                      '1A', '1B', '1C', '1D', '1E', '1F']
         get_avail.return_value = avail_lst
-        exec_cmd.side_effect = [exception.SDKSMTRequestFailed({}, 'err'), ""]
+        exec_cmd.return_value = [(1, ['HCPDCP1002E Invalid CPU address'])]
         self.assertRaises(exception.SDKGuestOperationError,
                           self._smtclient.live_resize_cpus, userid, count)
         get_active.assert_called_once_with(userid)
         resize.assert_called_once_with(userid, count)
         get_avail.assert_called_once_with(['00', '01'], 32)
-        exec_cmd.assert_called_once_with(userid, "vmcp def cpu 02 03")
+        exec_cmd.assert_called_once_with(userid, ["vmcp def cpu 02 03",
+                                                  "chcpu -r"],
+                                         stop_on_error=True)
         request.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2431,13 +2540,15 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         get_active.assert_called_once_with(userid)
         resize.assert_called_once_with(userid, count)
         get_avail.assert_called_once_with(['00', '01'], 32)
-        exec_cmd.assert_called_once_with(userid, "vmcp def cpu 02 03")
+        exec_cmd.assert_called_once_with(userid, ["vmcp def cpu 02 03",
+                                                  "chcpu -r"],
+                                         stop_on_error=True)
         rd = ("SMAPI testuid API Image_Definition_Delete_DM --operands "
               "-k CPU=CPUADDR=01 -k CPU=CPUADDR=02 -k CPU=CPUADDR=03")
         request.assert_called_once_with(rd)
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2459,13 +2570,15 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         get_active.assert_called_once_with(userid)
         resize.assert_called_once_with(userid, count)
         get_avail.assert_called_once_with(['00', '01'], 32)
-        exec_cmd.assert_called_once_with(userid, "vmcp def cpu 02 03")
+        exec_cmd.assert_called_once_with(userid, ["vmcp def cpu 02 03",
+                                                  "chcpu -r"],
+                                         stop_on_error=True)
         rd = ("SMAPI testuid API Image_Definition_Create_DM --operands "
               "-k CPU=CPUADDR=04 -k CPU=CPUADDR=0A")
         request.assert_called_once_with(rd)
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2488,13 +2601,15 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         get_active.assert_called_once_with(userid)
         resize.assert_called_once_with(userid, count)
         get_avail.assert_called_once_with(['00', '01'], 32)
-        exec_cmd.assert_called_once_with(userid, "vmcp def cpu 02 03")
+        exec_cmd.assert_called_once_with(userid, ["vmcp def cpu 02 03",
+                                                  "chcpu -r"],
+                                         stop_on_error=True)
         rd = ("SMAPI testuid API Image_Definition_Create_DM --operands "
               "-k CPU=CPUADDR=04 -k CPU=CPUADDR=0A")
         request.assert_called_once_with(rd)
 
     @mock.patch.object(smtclient.SMTClient, '_request')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_get_available_cpu_addrs')
     @mock.patch.object(smtclient.SMTClient, 'resize_cpus')
     @mock.patch.object(smtclient.SMTClient, '_get_active_cpu_addrs')
@@ -2510,7 +2625,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                      '12', '13', '14', '15', '16', '17', '18', '19',
                      '1A', '1B', '1C', '1D', '1E', '1F']
         get_avail.return_value = avail_lst
-        exec_cmd.side_effect = ["", exception.SDKSMTRequestFailed({}, 'err')]
+        exec_cmd.return_value = [(0, []), (1, ['chcpu: failed'])]
         self.assertRaises(exception.SDKGuestOperationError,
                           self._smtclient.live_resize_cpus, userid, count)
         get_active.assert_called_once_with(userid)
@@ -2518,8 +2633,8 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         get_avail.assert_called_once_with(['00', '01'], 32)
         cmd_def_cpu = "vmcp def cpu 02 03"
         cmd_rescan_cpu = "chcpu -r"
-        exec_cmd.assert_has_calls([mock.call(userid, cmd_def_cpu),
-                                   mock.call(userid, cmd_rescan_cpu)])
+        exec_cmd.assert_called_once_with(userid, [cmd_def_cpu, cmd_rescan_cpu],
+                                         stop_on_error=True)
         request.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_request')
@@ -2885,7 +3000,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
 
     @mock.patch.object(smtclient.SMTClient, '_get_active_memory')
     @mock.patch.object(smtclient.SMTClient, 'resize_memory')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     def test_live_resize_memory_equal(self, exec_cmd, resize_mem,
                                       get_active_mem):
         userid = 'testuid'
@@ -2898,7 +3013,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
 
     @mock.patch.object(smtclient.SMTClient, '_get_active_memory')
     @mock.patch.object(smtclient.SMTClient, 'resize_memory')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_revert_user_direct')
     def test_live_resize_memory_more(self, revert, exec_cmd, resize_mem,
                                      get_active_mem):
@@ -2906,18 +3021,19 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         req_mem = "4096m"
         get_active_mem.return_value = 2048
         resize_mem.return_value = (1, 2048, 65536, [])
-        exec_cmd.side_effect = ['', '']
+        exec_cmd.return_value = [(0, []), (0, [])]
         self._smtclient.live_resize_memory(userid, req_mem)
         resize_mem.assert_called_once_with(userid, req_mem)
         def_standby_cmd = "vmcp def storage standby 2048M"
         online_mem_cmd = "chmem -e 2048M"
-        exec_cmd.assert_has_calls([mock.call(userid, def_standby_cmd),
-                                   mock.call(userid, online_mem_cmd)])
+        exec_cmd.assert_called_once_with(userid,
+                                         [def_standby_cmd, online_mem_cmd],
+                                         stop_on_error=True)
         revert.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_get_active_memory')
     @mock.patch.object(smtclient.SMTClient, 'resize_memory')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_revert_user_direct')
     def test_live_resize_memory_standby_failed(self, revert, exec_cmd,
                                                resize_mem, get_active_mem):
@@ -2938,12 +3054,15 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                           req_mem)
         resize_mem.assert_called_once_with(userid, req_mem)
         def_standby_cmd = "vmcp def storage standby 2048M"
-        exec_cmd.assert_called_with(userid, def_standby_cmd)
+        online_mem_cmd = "chmem -e 2048M"
+        exec_cmd.assert_called_once_with(userid,
+                                         [def_standby_cmd, online_mem_cmd],
+                                         stop_on_error=True)
         revert.assert_called_once_with(userid, sample_direct)
 
     @mock.patch.object(smtclient.SMTClient, '_get_active_memory')
     @mock.patch.object(smtclient.SMTClient, 'resize_memory')
-    @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_revert_user_direct')
     def test_live_resize_memory_standby_failed_no_revert(self, revert,
                                                          exec_cmd,
@@ -2960,22 +3079,25 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                          u'MDISK 0100 3390 5501 5500 OMB1BA MR',
                          u'']
         resize_mem.return_value = (0, 4096, 65536, sample_direct)
-        exec_cmd.side_effect = [exception.SDKSMTRequestFailed({}, 'fake err'),
-                                '']
+        exec_cmd.return_value = [(1, ['HCPDST003E Invalid option'])]
         self.assertRaises(exception.SDKGuestOperationError,
                           self._smtclient.live_resize_memory, userid,
                           req_mem)
         resize_mem.assert_called_once_with(userid, req_mem)
         def_standby_cmd = "vmcp def storage standby 2048M"
-        exec_cmd.assert_called_with(userid, def_standby_cmd)
+        online_mem_cmd = "chmem -e 2048M"
+        exec_cmd.assert_called_once_with(userid,
+                                         [def_standby_cmd, online_mem_cmd],
+                                         stop_on_error=True)
         revert.assert_not_called()
 
     @mock.patch.object(smtclient.SMTClient, '_get_active_memory')
     @mock.patch.object(smtclient.SMTClient, 'resize_memory')
     @mock.patch.object(smtclient.SMTClient, 'execute_cmd')
+    @mock.patch.object(smtclient.SMTClient, 'execute_cmds')
     @mock.patch.object(smtclient.SMTClient, '_revert_user_direct')
     def test_live_resize_memory_online_failed(self, revert,
-                                              exec_cmd,
+                                              exec_cmds, exec_cmd,
                                               resize_mem,
                                               get_active_mem):
         userid = 'testuid'
@@ -2989,9 +3111,7 @@ class SDKSMTClientTestCases(base.SDKTestCase):
                          u'MDISK 0100 3390 5501 5500 OMB1BA MR',
                          u'']
         resize_mem.return_value = (1, 4096, 65536, sample_direct)
-        exec_cmd.side_effect = ['',
-                                exception.SDKSMTRequestFailed({}, 'fake err'),
-                                '']
+        exec_cmds.return_value = [(0, []), (1, ['chmem: failed'])]
         self.assertRaises(exception.SDKGuestOperationError,
                           self._smtclient.live_resize_memory, userid,
                           req_mem)
@@ -2999,7 +3119,8 @@ class SDKSMTClientTestCases(base.SDKTestCase):
         def_standby_cmd = "vmcp def storage standby 2048M"
         online_mem_cmd = "chmem -e 2048M"
         revert_standby_cmd = "vmcp def storage standby 0M"
-        exec_cmd.assert_has_calls([mock.call(userid, def_standby_cmd),
-                                   mock.call(userid, online_mem_cmd),
-                                   mock.call(userid, revert_standby_cmd)])
+        exec_cmds.assert_called_once_with(userid,
+                                          [def_standby_cmd, online_mem_cmd],
+                                          stop_on_error=True)
+        exec_cmd.assert_called_once_with(userid, revert_standby_cmd)
         revert.assert_called_once_with(userid, sample_direct)
@@ -0,0 +1,71 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import mock
+import threading
+
+from zvmsdk.tests.unit import base
+from zvmsdk import tracing
+
+
+class TracingTestCase(base.SDKTestCase):
+
+    def tearDown(self):
+        tracing.end_request()
+        super(TracingTestCase, self).tearDown()
+
+    def test_start_request(self):
+        self.assertEqual('abc-1', tracing.start_request('abc-1'))
+        self.assertEqual('abc-1', tracing.get_request_id())
+
+    def test_start_request_invalid_id(self):
+        request_id = tracing.start_request('bad id\r\nX-Injected: 1')
+        self.assertTrue(request_id.startswith('req-'))
+        self.assertTrue(tracing.is_valid_request_id(request_id))
+
+    @mock.patch.object(tracing.time, 'time')
+    def test_timed(self, time):
+        time.side_effect = [10, 10.5, 20, 20.25]
+        tracing.start_request()
+        with tracing.timed('smcli'):
+            pass
+        with tracing.timed('smcli'):
+            pass
+        self.assertEqual({'smcli': 0.75}, tracing.get_timings())
+        self.assertEqual('smcli;dur=750.0',
+                         tracing.format_server_timing(
+                             tracing.get_timings()))
+
+    def test_add_timing_without_request(self):
+        tracing.add_timing('api', 1)
+        self.assertEqual({}, tracing.get_timings())
+
+    def test_request_is_per_thread(self):
+        tracing.start_request('main-thread')
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(tracing.get_request_id()))
+        thread.start()
+        thread.join()
+        self.assertEqual([None], result)
+
+    def test_request_id_filter(self):
+        record = logging.LogRecord('test', logging.INFO, __file__, 1,
+                                   'msg', None, None)
+        tracing.RequestIdFilter().filter(record)
+        self.assertEqual('-', record.request_id)
+        tracing.start_request('abc-1')
+        tracing.RequestIdFilter().filter(record)
+        self.assertEqual('abc-1', record.request_id)
@@ -25,6 +25,13 @@ class SDKVMOpsTestCase(base.SDKTestCase):
         super(SDKVMOpsTestCase, self).setUp()
         self.vmops = vmops.get_vmops()
 
+    @mock.patch("zvmsdk.smtclient.SMTClient.get_logged_on_users")
+    def test_get_power_state_list(self, get_logged_on_users):
+        get_logged_on_users.return_value = set(['CBI00063', 'OTHER'])
+        self.assertEqual({'CBI00063': 'on', 'CBI00064': 'off'},
+                         self.vmops.get_power_state_list(['CBI00063',
+                                                          'CBI00064']))
+
     @mock.patch("zvmsdk.smtclient.SMTClient.get_power_state")
     def test_get_power_state(self, gps):
         gps.return_value = 'on'
@@ -69,7 +76,8 @@ class SDKVMOpsTestCase(base.SDKTestCase):
         create_vm.assert_called_once_with(userid, cpu, memory, disk_list,
                                           user_profile, max_cpu, max_mem,
                                           '', '', '', vdevs, loaddev)
-        namelistadd.assert_called_once_with('TSTNLIST', userid)
+        namelistadd.assert_called_once_with('TSTNLIST', userid,
+                                            ignore_errors=False)
 
     @mock.patch("zvmsdk.smtclient.SMTClient.process_additional_minidisks")
     def test_guest_config_minidisks(self, process_additional_minidisks):
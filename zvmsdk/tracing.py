@@ -0,0 +1,104 @@
+# Copyright 2018 IBM Corp.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Request id and per phase timings of the request handled by a thread.
+
+The request id is minted by the WSGI layer or accepted from the
+X-Request-Id header, sent along the API call to the SDK server and passed
+to SMT, so that the log entries of all the layers can be correlated. Each
+layer adds the time it spent in its phases, which is returned to the REST
+client in the Server-Timing response header.
+"""
+
+import contextlib
+import logging
+import re
+import threading
+import time
+import uuid
+
+
+REQUEST_ID_HEADER = 'X-Request-Id'
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+_CONTEXT = threading.local()
+
+
+def new_request_id():
+    return 'req-' + uuid.uuid4().hex
+
+
+def is_valid_request_id(request_id):
+    return bool(request_id and REQUEST_ID_RE.match(request_id))
+
+
+def start_request(request_id=None):
+    """Start tracing the request handled by the current thread.
+
+    A new request id is generated when request_id is None or invalid.
+    """
+    if not is_valid_request_id(request_id):
+        request_id = new_request_id()
+    _CONTEXT.request_id = request_id
+    _CONTEXT.timings = {}
+    return request_id
+
+
+def end_request():
+    _CONTEXT.request_id = None
+    _CONTEXT.timings = None
+
+
+def get_request_id():
+    return getattr(_CONTEXT, 'request_id', None)
+
+
+def get_timings():
+    """Get the seconds spent in each phase of the current request."""
+    return dict(getattr(_CONTEXT, 'timings', None) or {})
+
+
+def add_timing(phase, seconds):
+    timings = getattr(_CONTEXT, 'timings', None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0) + seconds
+
+
+def add_timings(timings):
+    for phase, seconds in timings.items():
+        add_timing(phase, seconds)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Add the time spent in the with block to the given phase."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        add_timing(phase, time.time() - start)
+
+
+def format_server_timing(timings):
+    """Format the timings as the value of a Server-Timing header."""
+    return ', '.join('%s;dur=%.1f' % (phase, seconds * 1000)
+                     for phase, seconds in sorted(timings.items()))
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the request id of the current thread to the log records."""
+
+    def filter(self, record):
+        record.request_id = get_request_id() or '-'
+        return True
@@ -30,21 +30,25 @@ import tempfile
 import time
 import traceback
 
+from zvmsdk import cmdrunner
 from zvmsdk import config
 from zvmsdk import constants
 from zvmsdk import exception
 from zvmsdk import log
+from zvmsdk import tracing
 
 
 CONF = config.CONF
 LOG = log.LOG
 
 
-def execute(cmd):
+def execute(cmd, timeout=None):
     """ execute command, return rc and output string.
     The cmd argument can be a string or a list composed of
     the command name and each of its argument.
-    eg, ['/usr/bin/cp', '-r', 'src', 'dst'] """
+    eg, ['/usr/bin/cp', '-r', 'src', 'dst']
+    The command is killed after timeout seconds, the default is the
+    [zvm] command_timeout option. """
 
     # Parse cmd string to a list
     if not isinstance(cmd, list):
@@ -53,8 +57,9 @@ def execute(cmd):
     rc = 0
     output = ""
     try:
-        output = subprocess.check_output(cmd, close_fds=True,
-                                         stderr=subprocess.STDOUT)
+        with tracing.timed('exec'):
+            output = cmdrunner.check_output(cmd, stderr=subprocess.STDOUT,
+                                            timeout=timeout)
     except subprocess.CalledProcessError as err:
         rc = err.returncode
         output = err.output
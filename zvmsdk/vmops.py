@@ -20,6 +20,7 @@ from zvmsdk import config
 from zvmsdk import dist
 from zvmsdk import exception
 from zvmsdk import log
+from zvmsdk import monitor
 from zvmsdk import smtclient
 from zvmsdk import database
 from zvmsdk import utils as zvmutils
@@ -43,7 +44,6 @@ class VMOps(object):
         self._smtclient = smtclient.get_smtclient()
         self._dist_manager = dist.LinuxDistManager()
         self._pathutils = zvmutils.PathUtils()
-        self._namelist = zvmutils.get_namelist()
         self._GuestDbOperator = database.GuestDbOperator()
         self._ImageDbOperator = database.ImageDbOperator()
 
@@ -51,6 +51,12 @@ class VMOps(object):
         """Get power status of a z/VM instance."""
         return self._smtclient.get_power_state(userid)
 
+    def get_power_state_list(self, userid_list):
+        """Get power status of several z/VM instances with one query."""
+        logged_on = self._smtclient.get_logged_on_users()
+        return dict((userid, 'on' if userid in logged_on else 'off')
+                    for userid in userid_list)
+
     def _get_cpu_num_from_user_dict(self, dict_info):
         cpu_num = 0
         for inf in dict_info:
@@ -177,7 +183,7 @@ class VMOps(object):
                                    dedicate_vdevs, loaddev)
 
         # add userid into smapi namelist
-        self._smtclient.namelist_add(self._namelist, userid)
+        monitor.get_namelist_mirror().add(userid)
         return info
 
     def create_disks(self, userid, disk_list):
@@ -231,7 +237,7 @@ class VMOps(object):
         self._smtclient.delete_vm(userid)
 
         # remove userid from smapi namelist
-        self._smtclient.namelist_remove(self._namelist, userid)
+        monitor.get_namelist_mirror().remove(userid)
         LOG.info("Complete delete vm %s", userid)
 
     def execute_cmd(self, userid, cmdStr):